@@ -21,6 +21,19 @@ function [posterior,sweep] = fit_seismic_observations(filenames, location, q_met
 %           z_max       maximum depth for observation range [km]
 %          (smooth_rad  radius (in degrees) to smooth over observations)
 %
+%       grain_size_prior    structure with optional grain size prior
+%                           fields (gs_mean, gs_std, gs_pdf_type, gs_pdf)
+%
+%       sweep       (optional) a pre-calculated sweep to re-use, see
+%                   generate_parameter_sweep. Alternatively, sweep
+%                   parameters (fields T, phi, gs and optionally gs_params)
+%                   with sweep.sampler = 'adaptive' to calculate VBR only
+%                   where the posterior is not negligible rather than at
+%                   every combination of T, phi and gs (see
+%                   posterior_adaptive_grid). Optional fields
+%                   sweep.sampler_options is a cell array of key-value
+%                   options passed on to posterior_adaptive_grid.
+%
 % Hardwired variables most worth playing with:
 % -------------------------------------------
 %       sweep_params        lines 91-97
@@ -72,6 +85,7 @@ QExists=checkFileNames(filenames,'Q');
 
 
 ifplot = 0;
+obs_Vs = []; sigma_Vs = []; obs_Q = []; sigma_Q = [];
 if VsExists
     [obs_Vs, sigma_Vs] = process_SeismicModels('Vs', ...
         location, filenames.Vs, ifplot);
@@ -89,6 +103,9 @@ end
 % The probability that the given state variable is actually correct.     %
 %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 
+adaptive = exist('sweep','var') && isfield(sweep, 'sampler') ...
+    && strcmp(sweep.sampler, 'adaptive');
+
 % Preferably, load in a large, pre-calculated box
 if ~exist('sweep','var')
 fname = 'data/plate_VBR/sweep_log_gs.mat'; % the fine res one 
@@ -118,6 +135,11 @@ if ~exist(fname, 'file')
     sweep_params.per_bw_max = 150; % max period (s)
     sweep_params.per_bw_min = 50; % min period (s)
 
+    % save each depth step as it completes so an interrupted sweep resumes
+    % where it stopped. Set n_workers to calculate steps in parallel (parfor).
+    sweep_params.checkpoint_dir = 'data/plate_VBR/sweep_steps';
+    % sweep_params.n_workers = 4;
+
     sweep = generate_parameter_sweep(sweep_params);
     clear sweep_params
     try
@@ -133,12 +155,15 @@ end
 
 load(fname, 'sweep');
 end
-if VsExists
+if adaptive
+    % meanVs and meanQ are calculated below, once the prior is known
+    sweep.state_names = {'T', 'phi', 'gs'};
+elseif VsExists
     disp('        extracting Vs')
     [sweep.meanVs, sweep.z_inds] = extract_calculated_values_in_depth_range(...
         sweep, 'Vs', q_method, [location.z_min, location.z_max]);
 end
-if QExists
+if QExists && ~adaptive
     disp('        extracting Q')
     sweep.meanQ = extract_calculated_values_in_depth_range(sweep, ...
         'Q', q_method, [location.z_min, location.z_max]);
@@ -186,6 +211,11 @@ if gslognormal
 end 
 sweep.prior_model_params = params; % store it so we have it. 
 
+if adaptive
+    sweep = adaptive_sweep(sweep, location, q_method, prior_statevars, ...
+        VsExists, QExists, obs_Vs, sigma_Vs, obs_Q, sigma_Q);
+end
+
 %% %%%%%%%%%%%%%%%%%%%%% Get likelihood for Vs, Q %%%%%%%%%%%%%%%%%%%%%% %%
 % The likelihood p(D|A), e.g., P(Vs | T, phi, gs), is calculated using    %
 % the residual (See manual, Menke book Ch 11):                            %
@@ -270,6 +300,44 @@ end
 
 end
 
+function sweep = adaptive_sweep(sweep, location, q_method, prior_statevars, ...
+    VsExists, QExists, obs_Vs, sigma_Vs, obs_Q, sigma_Q)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % sweep = adaptive_sweep(sweep, location, q_method, prior_statevars, ...)
+  %
+  % calculates sweep.meanVs and sweep.meanQ over the full (T, phi, gs) grid
+  % with posterior_adaptive_grid, calling VBR (calculate_sweep_points) only
+  % in the high-probability regions and interpolating elsewhere.
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  obs_names = {};
+  observations = struct('value', {}, 'std', {});
+  if VsExists
+    obs_names{end+1} = 'Vs';
+    observations(end+1) = struct('value', obs_Vs, 'std', sigma_Vs);
+  end
+  if QExists
+    obs_names{end+1} = 'Q';
+    observations(end+1) = struct('value', obs_Q, 'std', sigma_Q);
+  end
+
+  options = {};
+  if isfield(sweep, 'sampler_options')
+    options = sweep.sampler_options;
+  end
+  forward_fun = @(points) calculate_sweep_points(points, location, q_method, obs_names);
+  disp('        adaptively sampling the parameter sweep')
+  [Post, predicted] = posterior_adaptive_grid(sweep, sweep.state_names, forward_fun, ...
+      observations, 'log_prior', log(prior_statevars), options{:});
+  disp(['        VBR calculated at ', num2str(Post.n_evaluations), ' of ', ...
+        num2str(numel(Post.evaluated)), ' grid points'])
+
+  for i_obs = 1:numel(obs_names)
+    sweep.(['mean', obs_names{i_obs}]) = predicted{i_obs};
+  end
+  sweep.n_evaluations = Post.n_evaluations;
+  sweep.evaluated = Post.evaluated;
+end
+
 function FileExists = checkFileNames(filenames,field)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
   % FileExists = checkFileNames(filenames,field)
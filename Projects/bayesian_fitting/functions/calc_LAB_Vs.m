@@ -29,6 +29,11 @@ function predicted_vals = calc_LAB_Vs(VbrBoxFile, settings)
 %           q_LAB_value     value to use in LAB search
 %                               default 20 (i.e., Q_factor=20)
 %
+%       If the VBR box was calculated with band averaging (band_tol in
+%       process_ThermalEvolution_vbr), the band-averaged Vs and Q of each
+%       box are interpolated in depth only, and per_bw_max and per_bw_min
+%       are not used: the band is the one set when calculating the box.
+%
 % Output:
 % -------
 %       predicted_vals  structure of predictions with the following fields
@@ -99,6 +104,22 @@ function predictions =  predictObs(Box,settings)
   
   for iBox = 1:numel(Box)
     Z_km = Box(iBox).Z_km;
+    zplate=Box(iBox).BoxParams.var2val;
+
+    if isfield(Box(iBox).out, 'band')
+      % band averages, only interpolated in depth
+      Z_km_interp = linspace(Z_km(1),Z_km(end),nn_pts);
+      Vs_z = Box(iBox).out.anelastic.(q_method).Vave/1000; % m/s to km/s
+      Qs_z = Box(iBox).out.anelastic.(q_method).Qave;
+      Vs_z = interp1(Z_km(:),Vs_z(:),Z_km_interp(:));
+      Qs_z = interp1(Z_km(:),Qs_z(:),Z_km_interp(:));
+      z_mask = (Z_km_interp>=zplate & Z_km_interp<=zplate+dz_adi_km);
+      meanVs(iBox)=mean(Vs_z(z_mask));
+      Z_LAB_Q(iBox) = find_LAB_Q(Qs_z,Z_km_interp,'method',q_LAB_method, ...
+                                        'value',q_LAB_value,'z_min_km',zplate);
+      continue
+    end
+
     Qs_fz = Box(iBox).out.anelastic.(q_method).Q;
     Vs_fz = Box(iBox).out.anelastic.(q_method).V/1000; % m/s to km/s
 
@@ -111,7 +132,6 @@ function predictions =  predictObs(Box,settings)
     % Mask Vs and Q in frequency and depth
     f_mask = (freq_interp>=settings.freq_range(1) & freq_interp<=settings.freq_range(2));
     % index adiabatic velocity within dZ of LAB
-    zplate=Box(iBox).BoxParams.var2val;
     z_mask = (Z_km_interp>=zplate & Z_km_interp<=zplate+dz_adi_km);
     Vs_zf_mask = Vs_zf(z_mask,f_mask);
     %Qs_zf_mask = Qs_zf(z_mask,f_mask);
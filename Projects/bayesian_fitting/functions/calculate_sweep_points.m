@@ -0,0 +1,67 @@
+function predicted = calculate_sweep_points(points, location, q_method, obs_names)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+%
+% predicted = calculate_sweep_points(points, location, q_method, obs_names)
+%
+% Calculates the mean Vs and/or Q in the depth range of location for a list
+% of (T, phi, gs) points, with the same VBR input as
+% generate_parameter_sweep. The result for each point matches the value
+% from extract_calculated_values_in_depth_range for a full sweep, but only
+% the given points (and depths in range) are calculated. Used as the
+% forward model of the adaptive sampler (see fit_seismic_observations).
+%
+% Parameters:
+% -----------
+%       points      structure with column vectors of the same length:
+%               T               temperature [deg C]
+%               phi             melt fraction
+%               gs              grain size [micrometres]
+%
+%       location    structure with fields z_min and z_max, the depth range
+%                   to average over [km]
+%
+%       q_method    the anelastic method, e.g., 'xfit_premelt'
+%
+%       obs_names   cell array of the observations to calculate, 'Vs'
+%                   and/or 'Q'
+%
+% Output:
+% -------
+%       predicted   (number of points, numel(obs_names)) array of the mean
+%                   Vs [km/s] and/or Q
+%
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+VBR = sweep_VBR_input(points.T(:), points.phi(:), points.gs(:));
+VBR.in.anelastic.methods_list = {q_method};
+z = VBR.in.z;
+z_inds = find(location.z_min * 1e3 <= z & z <= location.z_max * 1e3);
+n_pts = numel(points.T);
+n_z = numel(z_inds);
+
+% each row is a point, each column a depth
+SV_fields = fieldnames(VBR.in.SV);
+for i_fi = 1:numel(SV_fields)
+    if ~strcmp(SV_fields{i_fi}, 'f')
+        VBR.in.SV.(SV_fields{i_fi}) = repmat(VBR.in.SV.(SV_fields{i_fi}), 1, n_z);
+    end
+end
+P_GPa = z(z_inds)' * 3300 * 9.8 / 1e9;
+VBR.in.SV.P_GPa = repmat(P_GPa, n_pts, 1);
+solidus_C = SoLiquidus(VBR.in.SV.P_GPa*1e9, zeros(n_pts, n_z), zeros(n_pts, n_z), 'hirschmann');
+VBR.in.SV.Tsolidus_K = solidus_C.Tsol + 273;
+
+VBR = VBR_spine(VBR);
+
+% average over frequency, then depth
+predicted = zeros(n_pts, numel(obs_names));
+for i_obs = 1:numel(obs_names)
+    if strcmp(obs_names{i_obs}, 'Vs')
+        vals = VBR.out.anelastic.(q_method).V / 1e3;
+    else
+        vals = VBR.out.anelastic.(q_method).(obs_names{i_obs});
+    end
+    predicted(:, i_obs) = mean(mean(vals, 3), 2);
+end
+
+end
@@ -4,22 +4,38 @@ fetch_data.py
 python script for fetching velocity and Q models from IRIS. If fetch is succesful,
 will process the files and save as .mat files.
 
+Downloads run concurrently, one thread per model file. Each file is first
+written to a .part file that is renamed once complete, so an interrupted
+transfer is never mistaken for a finished download. A subsequent run resumes
+the .part file with an HTTP range request (when the server supports it). The
+size and sha256 hash of each completed file are stored in a manifest.json
+within the save directory and are used to validate existing files on later
+runs: a completed file that fails the check is deleted and fetched again.
+
+The NetCDF files are converted to .mat files in one of two ways. By default,
+each model is loaded into memory and saved with scipy.io.savemat. With
+--chunked, the model is instead read and written in depth (or latitude) slabs
+sized to stay below --maxMemMB and is saved as an HDF5-based v7.3 .mat file,
+so that large models can be converted on small machines. Note that v7.3 .mat
+files can be loaded by MATLAB but not by GNU Octave.
+
 Required libraries: xarray, scipy, numpy (all are easily installed with pip)
+Optional libraries: h5py (required for --chunked)
 
-Works with Python 2 or 3. 
+Requires Python 3.
 '''
 
-try:
-    import urllib.request as urlrequest
-except ImportError:
-    import urllib as urlrequest
+import urllib.request as urlrequest
+from concurrent.futures import ThreadPoolExecutor
 import xarray as xr # for loading netcdf
-import os, argparse
+import os, argparse, hashlib, json, shutil, datetime, contextlib
 import scipy.io as scp
 import numpy as np
 
 
 url_base='https://ds.iris.edu/files/products/emc/emc-files/'
+manifest_name='manifest.json'
+chunk_bytes=1024*1024
 
 vel_models={
  'Porter_Liu_Holt_2015':
@@ -36,91 +52,480 @@ vel_models={
     }
 }
 
+# Q models given as a perturbation, dQinv_x1000 = 1000 * dQinv / Qinv_ref, are
+# corrected with a 1D reference profile in 'Q_reference'. The profile is
+# interpolated onto the depth axis of the model, repeated depths mark
+# discontinuities (the first value applies above, the second below).
 Q_models={
  'Gung_Romanowicz_2002':
    {
     'server_name':'QRLW8_percent.nc',
     'dQinv_x1000':'dqp','z_field':'depth','lat_field':'latitude',
-    'lon_field':'longitude','dims':'z,lat,lon'
+    'lon_field':'longitude','dims':'z,lat,lon',
+    'Q_reference':
+      {
+       'name':'QL6c.1D',
+       'depth':[80., 80., 100., 120., 140., 160., 180., 200., 220., 240.,
+                265., 310., 355., 400., 400., 450., 500., 550., 600., 600.,
+                635., 670.],
+       'Q':[191., 70., 70, 70., 70., 80., 90., 100., 110., 120., 130., 140.,
+            150., 160.,  165., 165., 165., 165., 165., 165., 165., 165.]
+      }
    }
 }
 
-def fetchVelModels(savedir='./vel_models'):
+def fetchVelModels(savedir='./vel_models', base_url=None, n_workers=4,
+                   chunked=False, max_mem_mb=512, slab_dim='depth'):
     ''' fetchVelModels: fetches and processes velocity files from IRIS '''
 
     setupDir(savedir)
     iris_files=vel_models
-
-    for ref in iris_files.keys():
-        full_url=url_base+iris_files[ref]['server_name']
-        if os.path.isfile(os.path.join(savedir,ref)+'.nc') or os.path.isfile(os.path.join(savedir,ref)+'.mat'):
-            print('  '+ref+' already downloaded.')
-        else:
-            print("'  '+attempting to fetch "+full_url)
-            urlrequest.urlretrieve(full_url, os.path.join(savedir,ref)+'.nc')
-            print("'  '+file downloaded as "+os.path.join(savedir,ref)+'.nc')
-
+    fetchFiles(iris_files, savedir, base_url=base_url, n_workers=n_workers)
 
     # slightly different fieldnames
     for fi in iris_files.keys():
         if os.path.isfile(os.path.join(savedir,fi)+'.mat') is False:
             ds=xr.open_dataset(os.path.join(savedir,fi)+'.nc')
-            save_dict={'Latitude':ds[iris_files[fi]['lat_field']].values,
-                       'Longitude':ds[iris_files[fi]['lon_field']].values,
-                       'Depth':ds[iris_files[fi]['z_field']].values,
-                       'Vs':ds[iris_files[fi]['Vs_field']].values.transpose(1,2,0)}
+            convertModel(ds, iris_files[fi], velSlab,
+                         os.path.join(savedir,fi)+'.mat', 'Vs_Model',
+                         chunked=chunked, max_mem_mb=max_mem_mb,
+                         slab_dim=slab_dim)
+            ds.close()
             print('  '+fi+'.nc converted to '+fi+'.mat')
-            scp.savemat(os.path.join(savedir,fi)+'.mat',{'Vs_Model':save_dict})
         else:
             print('  '+fi+'.mat already exists')
     return
 
-def fetchQModels(savedir='./Q_models'):
+def fetchQModels(savedir='./Q_models', base_url=None, n_workers=4,
+                 chunked=False, max_mem_mb=512, slab_dim='depth'):
     ''' fetchVelModels: fetches and processes Q model files from IRIS '''
 
     iris_files=Q_models
     setupDir(savedir)
-    for ref in iris_files.keys():
-        full_url=url_base+iris_files[ref]['server_name']
-        if os.path.isfile(os.path.join(savedir,ref)+'.nc') or os.path.isfile(os.path.join(savedir,ref)+'.mat'):
-            print('  '+ref+' already downloaded.')
-        else:
-            print('  '+"attempting to fetch "+full_url)
-            urlrequest.urlretrieve(full_url, os.path.join(savedir,ref)+'.nc')
-            print('  '+"file downloaded as "+os.path.join(savedir,ref)+'.nc')
+    fetchFiles(iris_files, savedir, base_url=base_url, n_workers=n_workers)
 
     # slightly different fieldnames
     for fi in iris_files.keys():
         if os.path.isfile(os.path.join(savedir,fi)+'.mat') is False:
             ds=xr.open_dataset(os.path.join(savedir,fi)+'.nc')
-
-            if fi is 'Gung_Romanowicz_2002':
-                print('  '+'ref Q is QL6c.1D')
-                # Values below are at the depths [80, 80, 100, 120, 140, 160, 180
-                # 200, 220, 200, 265, 310, 355, 400, 400, 450, 500, 550, 600, 600,
-                # 635, 670]
-                QL6c = np.tile(
-                        np.array([[[191., 70., 70, 70., 70., 80., 90., 100., 110.,
-                                    120., 130., 140., 150., 160.,  165., 165.,
-                                    165., 165., 165., 165., 165., 165.]]]),
-                        (91, 180, 1))
-                Qinv_field = (
-                    ds[iris_files[fi]['dQinv_x1000']].values.transpose(1, 2, 0)
-                    / 1000 * 1 / QL6c + 1 / QL6c)
-                Q_field = 1 /  Qinv_field
-            else:
-                Q_field = ds[iris_files[fi]['Q_field']].values.transpose(1, 2, 0)
-
-            save_dict={'Latitude':ds[iris_files[fi]['lat_field']].values,
-                       'Longitude':ds[iris_files[fi]['lon_field']].values,
-                       'Depth':ds[iris_files[fi]['z_field']].values,
-                       'Q':Q_field, 'Qinv':1/Q_field}
+            if 'Q_reference' in iris_files[fi]:
+                print('  '+'ref Q is '+iris_files[fi]['Q_reference']['name'])
+            convertModel(ds, iris_files[fi], QSlab,
+                         os.path.join(savedir,fi)+'.mat', 'Q_Model',
+                         chunked=chunked, max_mem_mb=max_mem_mb,
+                         slab_dim=slab_dim)
+            ds.close()
             print('  '+fi+'.nc converted to '+fi+'.mat')
-            scp.savemat(os.path.join(savedir,fi)+'.mat',{'Q_Model':save_dict})
         else:
             print('  '+fi+'.mat already exists')
     return
 
+def velSlab(ds, entry, slabs):
+    ''' velSlab: Vs over the index ranges in slabs, in (z, lat, lon) order '''
+
+    return {'Vs':readSlab(ds, entry, entry['Vs_field'], slabs)}
+
+def QSlab(ds, entry, slabs):
+    ''' QSlab: Q and Qinv over the index ranges in slabs, in (z, lat, lon) order '''
+
+    if 'dQinv_x1000' in entry:
+        # Qinv = (dQinv_x1000 / 1000 + 1) / Q_ref, computed in place with the
+        # reference profile broadcast along lat and lon. The sides of the
+        # reference discontinuities are resolved on the full depth axis, so
+        # a repeated depth split across slabs gets the same Q as unsplit.
+        depth=ds[entry['z_field']].values
+        Q_ref=interpReferenceQ(entry['Q_reference'], depth)[slabs['z']]
+        Qinv_field=readSlab(ds, entry, entry['dQinv_x1000'], slabs).astype('float64')
+        Qinv_field/=1000.
+        Qinv_field+=1.
+        Qinv_field/=Q_ref[:, np.newaxis, np.newaxis]
+        Q_field=np.reciprocal(Qinv_field)
+    else:
+        Q_field = readSlab(ds, entry, entry['Q_field'], slabs).astype('float64')
+        Qinv_field = np.reciprocal(Q_field)
+
+    return {'Q':Q_field, 'Qinv':Qinv_field}
+
+def interpReferenceQ(Q_reference, depth):
+    ''' interpReferenceQ: interpolates a 1D reference Q profile onto depth
+
+    Parameters
+    ----------
+    Q_reference : dict
+        the reference model with 'depth' and 'Q' lists. depth must be
+        non-decreasing, a repeated depth marks a discontinuity.
+    depth : array
+        the depths to interpolate to. The first occurrence of a discontinuity
+        depth takes the value above the discontinuity, later occurrences take
+        the value below.
+
+    Returns
+    -------
+    array of reference Q at each depth
+    '''
+
+    ref_z=np.asarray(Q_reference['depth'],dtype='float64')
+    ref_Q=np.asarray(Q_reference['Q'],dtype='float64')
+    if ref_z.shape != ref_Q.shape or np.any(np.diff(ref_z) < 0):
+        raise ValueError('Q_reference depth must be non-decreasing and match Q in size')
+
+    depth=np.asarray(depth,dtype='float64')
+    Q_out=np.interp(depth,ref_z,ref_Q)
+
+    # pick the side of any discontinuity by occurrence within depth
+    i_above=np.searchsorted(ref_z,depth,side='left')
+    i_below=np.searchsorted(ref_z,depth,side='right')-1
+    seen=set()
+    for iz in range(depth.size):
+        if i_above[iz] < ref_z.size and ref_z[i_above[iz]] == depth[iz]:
+            if depth[iz] in seen:
+                Q_out[iz]=ref_Q[i_below[iz]]
+            else:
+                Q_out[iz]=ref_Q[i_above[iz]]
+            seen.add(depth[iz])
+    return Q_out
+
+def readSlab(ds, entry, field, slabs):
+    ''' readSlab: reads field over the index ranges in slabs, (z, lat, lon) order '''
+
+    dims=[entry['z_field'],entry['lat_field'],entry['lon_field']]
+    isel={dims[0]:slabs['z'],dims[1]:slabs['lat'],dims[2]:slabs['lon']}
+    return ds[field].isel(isel).transpose(*dims).values
+
+def convertModel(ds, entry, slab_func, matfile, struct_name, chunked=False,
+                 max_mem_mb=512, slab_dim='depth'):
+    ''' convertModel: converts a model dataset to a .mat file
+
+    Parameters
+    ----------
+    ds : xarray.Dataset
+        the opened NetCDF model
+    entry : dict
+        the model entry from vel_models or Q_models
+    slab_func : callable
+        slab_func(ds, entry, slabs) returns a dict of the 3D output fields,
+        in (z, lat, lon) order, over the index slices in slabs
+    matfile : str
+        the .mat file to write
+    struct_name : str
+        name of the structure in the .mat file (e.g., 'Vs_Model')
+    chunked : bool
+        if False (default), the full model is loaded and saved with
+        scipy.io.savemat. If True, the model is processed in slabs and
+        written to an HDF5-based v7.3 .mat file.
+    max_mem_mb : float
+        approximate memory ceiling in MB for the chunked conversion
+    slab_dim : str
+        'depth' or 'lat', the dimension to split the model along
+    '''
+
+    save_dict={'Latitude':ds[entry['lat_field']].values,
+               'Longitude':ds[entry['lon_field']].values,
+               'Depth':ds[entry['z_field']].values}
+    shape={'z':save_dict['Depth'].size,
+           'lat':save_dict['Latitude'].size,
+           'lon':save_dict['Longitude'].size}
+    full={'z':slice(None),'lat':slice(None),'lon':slice(None)}
+
+    if chunked is False:
+        fields=slab_func(ds, entry, full)
+        for fld in fields.keys():
+            save_dict[fld]=fields[fld].transpose(1,2,0)
+        scp.savemat(matfile,{struct_name:save_dict})
+        return
+
+    if slab_dim == 'depth':
+        dim='z'
+    elif slab_dim == 'lat':
+        dim='lat'
+    else:
+        raise ValueError("slab_dim must be 'depth' or 'lat', found "+str(slab_dim))
+
+    # memory per unit slab thickness: each output field is held alongside
+    # the input slab and its transposed write buffer (~4 copies in total).
+    out_names=list(slab_func(ds, entry, {'z':slice(0,1),'lat':slice(0,1),
+                                         'lon':slice(0,1)}).keys())
+    n_per_unit=shape['z']*shape['lat']*shape['lon']/shape[dim]
+    bytes_per_unit=n_per_unit*8*4*len(out_names)
+    thickness=int(max(1,max_mem_mb*1024**2//bytes_per_unit))
+
+    # MATLAB arrays are column-major: a (lat, lon, z) MATLAB array is stored
+    # as an HDF5 dataset of shape (z, lon, lat).
+    h5shape=(shape['z'],shape['lon'],shape['lat'])
+    with openMat73(matfile) as f5:
+        grp=matlabStruct(f5, struct_name, list(save_dict.keys())+out_names)
+        for fld in save_dict.keys():
+            writeMatlabDouble(grp, fld, save_dict[fld].reshape(-1,1))
+        dsets={}
+        for fld in out_names:
+            dsets[fld]=writeMatlabDouble(grp, fld, None, shape=h5shape)
+
+        for i0 in range(0,shape[dim],thickness):
+            i1=min(i0+thickness,shape[dim])
+            slabs=dict(full)
+            slabs[dim]=slice(i0,i1)
+            fields=slab_func(ds, entry, slabs)
+            for fld in out_names:
+                # (z, lat, lon) slab to (z, lon, lat), only one slab at a time
+                if dim == 'z':
+                    dsets[fld][i0:i1,:,:]=fields[fld].transpose(0,2,1)
+                else:
+                    dsets[fld][:,:,i0:i1]=fields[fld].transpose(0,2,1)
+            print('    wrote '+slab_dim+' slab '+str(i0)+':'+str(i1)+' of '+str(shape[dim]))
+
+@contextlib.contextmanager
+def openMat73(matfile):
+    ''' openMat73: context manager for writing a new HDF5 file that is
+    stamped with a MATLAB v7.3 header on close. The file is written to
+    matfile.tmp and only renamed to matfile once complete, so an interrupted
+    conversion is not mistaken for a finished one. '''
+
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError('chunked conversion requires h5py: pip install h5py')
+
+    tmpfile=matfile+'.tmp'
+    with h5py.File(tmpfile,'w',userblock_size=512) as f5:
+        yield f5
+
+    now_str=datetime.datetime.now().strftime("%a %b %d %H:%M:%S %Y")
+    header=('MATLAB 7.3 MAT-file, Platform: GLNXA64, Created on: '+now_str+
+            ' HDF5 schema 1.00 .').ljust(116).encode('ascii')
+    header=header+b'\x00'*8+b'\x00\x02'+b'IM'
+    with open(tmpfile,'r+b') as fi:
+        fi.write(header.ljust(512,b'\x00'))
+    os.replace(tmpfile,matfile)
+
+def matlabStruct(f5, name, field_names):
+    ''' matlabStruct: creates an HDF5 group that MATLAB reads as a structure '''
+
+    import h5py
+    grp=f5.create_group(name)
+    grp.attrs['MATLAB_class']=np.bytes_('struct')
+    vlen=h5py.vlen_dtype(np.dtype('S1'))
+    names=np.empty(len(field_names),dtype=object)
+    for ifld, fld in enumerate(field_names):
+        names[ifld]=np.array(list(fld),dtype='S1')
+    grp.attrs.create('MATLAB_fields',names,dtype=vlen)
+    return grp
+
+def writeMatlabDouble(grp, name, data, shape=None):
+    ''' writeMatlabDouble: creates a double precision dataset in grp '''
+
+    if data is None:
+        dset=grp.create_dataset(name,shape=shape,dtype='float64',chunks=True)
+    else:
+        dset=grp.create_dataset(name,data=np.asarray(data,dtype='float64'))
+    dset.attrs['MATLAB_class']=np.bytes_('double')
+    return dset
+
+def fetchFiles(iris_files, savedir, base_url=None, n_workers=4):
+    ''' fetchFiles: concurrently downloads every missing entry of iris_files
+
+    Parameters
+    ----------
+    iris_files : dict
+        model dictionary (e.g., vel_models). Each entry must contain
+        'server_name' and may optionally contain the expected 'size' (bytes)
+        and 'sha256' of the file.
+    savedir : str
+        directory to save the .nc files to
+    base_url : str
+        the url to fetch from, defaults to url_base. Set this to point at a
+        mirror or a local test server.
+    n_workers : int
+        the number of download threads
+    '''
+
+    if base_url is None:
+        base_url=url_base
+
+    manifest=loadManifest(savedir)
+    to_fetch=[]
+    for ref in iris_files.keys():
+        ncfile=os.path.join(savedir,ref)+'.nc'
+        if os.path.isfile(os.path.join(savedir,ref)+'.mat'):
+            print('  '+ref+' already downloaded.')
+        elif os.path.isfile(ncfile) and checkFile(ncfile,ref,iris_files[ref],manifest):
+            print('  '+ref+' already downloaded.')
+        else:
+            if os.path.isfile(ncfile):
+                # a completed file that fails the check is corrupt: refetch
+                # it from the start, only .part files are resumed
+                print('  '+ref+'.nc does not match manifest, refetching.')
+                os.remove(ncfile)
+            to_fetch.append(ref)
+
+    if len(to_fetch) == 0:
+        return
+
+    n_workers=max(1,min(n_workers,len(to_fetch)))
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        futures={}
+        for ref in to_fetch:
+            full_url=base_url+iris_files[ref]['server_name']
+            ncfile=os.path.join(savedir,ref)+'.nc'
+            print('  '+"attempting to fetch "+full_url)
+            futures[ref]=pool.submit(downloadFile,full_url,ncfile,iris_files[ref])
+
+        failed=[]
+        for ref in to_fetch:
+            try:
+                manifest[ref]=futures[ref].result()
+            except Exception as err:
+                print('  '+ref+' failed to download: '+str(err))
+                failed.append(ref)
+                continue
+
+            expected=iris_files[ref]
+            if not entryMatches(manifest[ref],expected):
+                ncfile=os.path.join(savedir,ref)+'.nc'
+                os.remove(ncfile)
+                manifest.pop(ref)
+                print('  '+ref+' does not match expected size or sha256, removed.')
+                failed.append(ref)
+            else:
+                print('  '+"file downloaded as "+os.path.join(savedir,ref)+'.nc')
+
+    saveManifest(savedir,manifest)
+    if len(failed) > 0:
+        raise RuntimeError('failed to fetch: '+', '.join(failed))
+
+def downloadFile(full_url, ncfile, expected=None):
+    ''' downloadFile: fetches full_url to ncfile, resuming ncfile.part if
+    present. returns a manifest entry for the completed file.
+
+    A partial file is only resumed if the server answers the range request
+    with the requested range (206 with a matching Content-Range), otherwise
+    the download restarts from the first byte. A 416 (range not satisfiable)
+    response only completes the download if the partial file matches the
+    expected size or sha256, or the total size reported by the server.
+    '''
+
+    if expected is None:
+        expected={}
+    partfile=ncfile+'.part'
+    offset=0
+    if os.path.isfile(partfile):
+        offset=os.path.getsize(partfile)
+
+    resp=None
+    if offset > 0:
+        req=urlrequest.Request(full_url)
+        req.add_header('Range','bytes='+str(offset)+'-')
+        try:
+            resp=urlrequest.urlopen(req)
+        except urlrequest.HTTPError as err:
+            if err.code != 416:
+                raise
+            total=contentRangeTotal(err.headers.get('Content-Range'))
+            if partComplete(partfile, total, expected):
+                entry=fileEntry(partfile)
+                os.replace(partfile,ncfile)
+                return entry
+            print('  '+'partial file does not match the server, restarting '+full_url)
+            offset=0
+
+        if resp is not None and resp.getcode() == 206:
+            if contentRangeStart(resp.headers.get('Content-Range')) != offset:
+                print('  '+'server returned a different range, restarting '+full_url)
+                resp.close()
+                resp=None
+                offset=0
+        elif resp is not None:
+            print('  '+'server ignored range request, restarting '+full_url)
+            offset=0
+
+    if resp is None:
+        resp=urlrequest.urlopen(urlrequest.Request(full_url))
+
+    with resp:
+        mode='wb'
+        if offset > 0:
+            mode='ab'
+        with open(partfile,mode) as fi:
+            shutil.copyfileobj(resp,fi,chunk_bytes)
+
+    entry=fileEntry(partfile)
+    os.replace(partfile,ncfile)
+    return entry
+
+def contentRangeStart(content_range):
+    ''' contentRangeStart: the first byte of a Content-Range header,
+    'bytes start-end/total', or None if missing or malformed '''
+
+    try:
+        unit,byte_range=content_range.strip().split(' ',1)
+        if unit != 'bytes':
+            return None
+        return int(byte_range.split('-',1)[0])
+    except (AttributeError, ValueError):
+        return None
+
+def contentRangeTotal(content_range):
+    ''' contentRangeTotal: the total size of a Content-Range header,
+    'bytes */total' or 'bytes start-end/total', or None if unknown '''
+
+    try:
+        total=content_range.strip().rsplit('/',1)[1]
+        return int(total)
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def partComplete(partfile, total, expected):
+    ''' partComplete: True if partfile is a complete download, checked
+    against the expected size and sha256 if given, otherwise against the
+    total size reported by the server '''
+
+    if 'size' in expected or 'sha256' in expected:
+        return entryMatches(fileEntry(partfile),expected)
+    return total is not None and os.path.getsize(partfile) == total
+
+def fileEntry(fname):
+    ''' fileEntry: the size and sha256 manifest entry of a file '''
+
+    sha=hashlib.sha256()
+    with open(fname,'rb') as fi:
+        for chunk in iter(lambda: fi.read(chunk_bytes), b''):
+            sha.update(chunk)
+    return {'size':os.path.getsize(fname),'sha256':sha.hexdigest()}
+
+def entryMatches(entry, expected):
+    ''' entryMatches: True if entry agrees with any size/sha256 in expected '''
+
+    for key in ['size','sha256']:
+        if key in expected and expected[key] != entry[key]:
+            return False
+    return True
+
+def checkFile(ncfile, ref, expected, manifest):
+    ''' checkFile: True if ncfile matches its manifest entry and any expected
+    size/sha256. Files without a manifest entry are treated as incomplete. '''
+
+    if ref not in manifest or not entryMatches(manifest[ref],expected):
+        return False
+    if os.path.getsize(ncfile) != manifest[ref]['size']:
+        return False
+    return fileEntry(ncfile)['sha256'] == manifest[ref]['sha256']
+
+def loadManifest(savedir):
+    ''' loadManifest: loads the download manifest in savedir, if present '''
+
+    fname=os.path.join(savedir,manifest_name)
+    if os.path.isfile(fname):
+        with open(fname,'r') as fi:
+            return json.load(fi)
+    return {}
+
+def saveManifest(savedir, manifest):
+    ''' saveManifest: atomically writes the download manifest to savedir '''
+
+    fname=os.path.join(savedir,manifest_name)
+    with open(fname+'.tmp','w') as fi:
+        json.dump(manifest,fi,indent=2,sort_keys=True)
+    os.replace(fname+'.tmp',fname)
+
 def setupDir(savedir):
     ''' checks if directory exists, tries to make it '''
 
@@ -139,9 +544,27 @@ if __name__=='__main__':
     parser.add_argument('--QDir',
             type=str,default='./data/Q_models',
             help='directory to save Q models')
+    parser.add_argument('--urlBase',
+            type=str,default=url_base,
+            help='base url to fetch from')
+    parser.add_argument('--nWorkers',
+            type=int,default=4,
+            help='number of concurrent downloads')
+    parser.add_argument('--chunked',action='store_true',
+            help='convert in slabs to a v7.3 .mat file (requires h5py)')
+    parser.add_argument('--maxMemMB',
+            type=float,default=512,
+            help='approximate memory ceiling for --chunked conversion')
+    parser.add_argument('--slabDim',
+            type=str,default='depth',choices=['depth','lat'],
+            help='dimension to split along for --chunked conversion')
     arg = parser.parse_args()
 
+    conv_kwargs={'chunked':arg.chunked,'max_mem_mb':arg.maxMemMB,
+                 'slab_dim':arg.slabDim}
     print("\nAttempting to fetch Q Models\n")
-    fetchQModels(arg.QDir)
+    fetchQModels(arg.QDir, base_url=arg.urlBase, n_workers=arg.nWorkers,
+                 **conv_kwargs)
     print("\nAttempting to fetch Velocity Models\n")
-    fetchVelModels(arg.velDir)
+    fetchVelModels(arg.velDir, base_url=arg.urlBase, n_workers=arg.nWorkers,
+                   **conv_kwargs)
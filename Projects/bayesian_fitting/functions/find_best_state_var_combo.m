@@ -14,7 +14,8 @@ function [best_vars, posterior_var1] = ...
 % Parameters:
 % -----------
 %      posterior           (size(sweep.Box)) matrix of posterior
-%                          probability for each parameter combination
+%                          probability for each parameter combination, or
+%                          the output structure of posterior_streaming
 %
 %      sweep               structure with the following fields
 %            state_names     cell of the names of the varied parameters
@@ -40,6 +41,19 @@ var2 = sweep.state_names{2};
 var3 = sweep.state_names{3};
 
 best_vars = zeros(length(sweep.(var1)), 3);
+
+if isstruct(posterior)
+    % the maxima were found while streaming through the grid
+    [~, i_var2, i_var3] = ind2sub(posterior.grid_size, ...
+        posterior.max_profile_index.(var1));
+    posterior_var1 = reshape(posterior.max_profile.(var1), ...
+        size(sweep.(var1)));
+    best_vars(:, 1) = sweep.(var1)(:);
+    best_vars(:, 2) = reshape(sweep.(var2)(i_var2), [], 1);
+    best_vars(:, 3) = reshape(sweep.(var3)(i_var3), [], 1);
+    return
+end
+
 [var3_grid, var2_grid] = meshgrid(sweep.(var3), sweep.(var2));
 posterior_var1 = zeros(size(sweep.(var1)));
 
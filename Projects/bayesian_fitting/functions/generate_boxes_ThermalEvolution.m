@@ -1,8 +1,17 @@
-function generate_boxes_ThermalEvolution(BoxName,Trange_C,zPlateRange_km)
+function generate_boxes_ThermalEvolution(BoxName,Trange_C,zPlateRange_km,n_workers)
 % generate suite of solutions for thermal evolution of lithosphere. Plate model
 % with variable thermal conductivity -- run to steady state. This is time
 % consuming, only do this step when sweeping through Tpot and zPlate
 % (other variables do not impact thermal evolution).
+%
+% Each run is saved to its own checkpoint file in the directory
+% <BoxName>_runs when it completes (see runBoxEnsemble), so an interrupted
+% sweep resumes with the remaining runs when called again.
+% n_workers (optional): maximum number of parallel workers (parfor) for the
+% runs. Default 0 (serial).
+if ~exist('n_workers','var')
+    n_workers = 0;
+end
 
 % Parameter sweep
 %  define parameter sweep here. var1name must match EXACTLY a field in
@@ -30,92 +39,17 @@ settings.t_max_Myrs=500; % max time to calculate [Myr]
 settings.sstol = 1e-5; % steady state target residual
 settings.Flags.T_init='continental'; % 'continental' 'oceanic' or 'adiabatic'
 
-Box=drive_svfm_plate(settings);
-save(BoxName,'Box')
-
-end
-
-function Box=drive_svfm_plate(settings)
-%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-% this script builds the initial settings to call Thermal_Evolution. Commonly
-% changed parameters are set here, less frequently changed parameters are
-% in initialize_settings. Anything set here can overwrite anything set in
-% settings.
-%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-   disp(' ');disp('--------------------------------------------------')
-
-% %% --------------------------------------------------------------------- %%
-% %%                       Problem Setup
-% %% --------------------------------------------------------------------- %%
-
-% settings common to all runs
-%  Load Default Settings
-
-   [settings]=init_settings(settings);
-
 %  Specify data reduction method for Box storage
-   settings.Box.DownSampleMeth='interp';
-   settings.Box.DownSampleFactor=1;
-   [Box,settings] = BuildBox(settings); %% Build The Box (do this once):
-
-% %% --------------------------------------------------------------------- %%
-% %% --------------  thermodynamic state forward model ------------------- %%
-% %% --------------------------------------------------------------------- %%
-
-   Work.nBox=settings.Box.nvar1 * settings.Box.nvar2;
-   for iBox = 1:Work.nBox
-
-      disp(' ');disp('--------------------------------------------------')
-      disp(['Starting run ' num2str(iBox) ' of ' num2str(Work.nBox)])
-
-% %% ---------------------------- %
-% %%    set the Box parameters    %
-% %% ---------------------------- %
-
-      settings.(settings.Box.var1name) = Box(iBox).info.var1val;
-      disp([settings.Box.var1name '=' num2str(settings.(settings.Box.var1name))...
-           settings.Box.var1units]);
-      if isfield(settings.Box,'var2name')
-        settings.(settings.Box.var2name) = Box(iBox).info.var2val;
-        disp([settings.Box.var2name '=' num2str(settings.(settings.Box.var2name))...
-           settings.Box.var2units]);
-      end
-
-% %% ------------------------------ %%
-% %%    Initialize Thermal Solve    %%
-% %% ------------------------------ %%
-
-%      build mesh and initial conditions
-       settings.Zinfo.zmax=settings.zPlate;
-       settings.Zinfo.dz0 = settings.dz0;
-       settings.Zinfo = init_mesh(settings.Zinfo); % build the mesh!
-       [Info] = init_values(settings); % calculate initial values
-
-%      set the boundary conditions
-       [Info.BCs]=init_BCs(struct(),'T','zmin','dirichlet',0);
-       [Info.BCs]=init_BCs(Info.BCs,'T','zmax','dirichlet',Info.init.T(end));
-
-% %% ----------------------------- %%
-% %%     Forward model solution    %%
-% %% ----------------------------- %%
-
-%     Lithosphere temperature evolution
-       [Vars,Info]=Thermal_Evolution(Info,settings);
-
-%     Add on adiabatic asthenosphere
-       [Vars,Info]=postproc_append_astheno(Vars,Info,settings);
-
-% %% ------------------- %%
-% %%     Data Storage    %%
-% %% ------------------- %%
-
-%      Put the run in the Box.
-       [Box] = Put_in_Box(Box,Vars,Info,settings,iBox);
-
-%      update the user
-       disp(['Completed Run ' num2str(iBox) ' of ' num2str(Work.nBox)])
-   end
-
-disp(' ');disp('--------------------------------------------------');disp(' ')
+settings.Box.DownSampleMeth='interp';
+settings.Box.DownSampleFactor=1;
+
+[box_dir,box_file] = fileparts(BoxName);
+checkpoint_dir = fullfile(box_dir,[box_file,'_runs']);
+[Box,~,Status] = runBoxEnsemble(settings,checkpoint_dir,'n_workers',n_workers);
+if ~all(Status.complete(:))
+    error(['generate_boxes_ThermalEvolution: some runs failed, see ',checkpoint_dir,...
+           ' and call again to resume'])
+end
+save(BoxName,'Box')
 
 end
@@ -21,6 +21,27 @@ function sweep = generate_parameter_sweep(sweep_params)
 %               per_bw_max      maximum period (min. freq.) considered [s]
 %               per_bw_min      minimum period (max. freq.) considered [s]
 %
+%        optional fields of sweep_params:
+%               n_workers       maximum number of parallel workers (parfor)
+%                               used to calculate the depth steps. Default 0
+%                               (serial).
+%               checkpoint_dir  directory to save each completed depth step
+%                               to. Steps already saved for the same inputs
+%                               are loaded instead of recalculated, so an
+%                               interrupted sweep can be resumed.
+%               shard           two element vector, [i_shard, n_shards]: only
+%                               calculate depth steps i_shard, i_shard +
+%                               n_shards, etc. Requires checkpoint_dir. Use
+%                               to split a sweep across separate processes
+%                               (e.g., several Octave sessions), then call
+%                               again without shard to assemble the sweep.
+%               band_tol        if set, Vs and Q are averaged over the band
+%                               per_bw_min to per_bw_max, evaluating only
+%                               the quadrature frequencies needed to reach
+%                               this relative tolerance (see VBR.in.band in
+%                               VBR_spine), instead of the mean over the
+%                               frequencies in sweep_VBR_input.
+%
 % Output:
 % -------
 %        sweep              structure with the following fields
@@ -35,7 +56,9 @@ function sweep = generate_parameter_sweep(sweep_params)
 %                           x numel(sweep_params.gs)) structure.  Each
 %                          element contains a field for each of the
 %                          anelastic methods in given in
-%                          VBR.in.anelastic.methods_list
+%                          VBR.in.anelastic.methods_list. Empty if only
+%                          some of the depth steps are complete (see
+%                          sweep_params.shard).
 %
 %       sweep.Box.[anelastic method name]
 %                           structure with the following fields
@@ -48,32 +71,14 @@ function sweep = generate_parameter_sweep(sweep_params)
 
 
 % construct state variable fields
-z = linspace(50,170,100)*1e3; z= z';
-VBR.in.z = z;
-sweep_params.P_GPa = z * 3300 * 9.8 /1e9;
-VBR.in.SV.f = logspace(-2.2,-1.3,10);
-
 [T,phi,gs] = ndgrid(sweep_params.T,sweep_params.phi,sweep_params.gs);
-VBR.in.SV.T_K = T + 273;
-VBR.in.SV.phi = phi;
-VBR.in.SV.dg_um = gs;
-
-Tshp = size(T);
-VBR.in.SV.sig_MPa = 0.1*ones(Tshp);
-VBR.in.SV.Ch2o = zeros(Tshp); % in PPM!
-VBR.in.SV.rho = 3300 * ones(Tshp); % [Pa]
-VBR.in.SV.chi = ones(Tshp);
-
-% write method list (these are the things to calculate)
-% Use all available methods except xfit_premelt
-elastic = feval(fetchParamFunction('elastic'), '');
-VBR.in.elastic.methods_list = elastic.possible_methods;
-viscous = feval(fetchParamFunction('viscous'), '');
-VBR.in.viscous.methods_list = viscous.possible_methods;
-anelastic = feval(fetchParamFunction('anelastic'), '');
-VBR.in.anelastic.methods_list = anelastic.possible_methods;
-VBR.in.anelastic.eburgers_psp = Params_Anelastic('eburgers_psp');
-VBR.in.anelastic.eburgers_psp.method = 'FastBurger';
+VBR = sweep_VBR_input(T, phi, gs);
+if isfield(sweep_params, 'band_tol')
+  VBR.in.band.f_range = sort(1 ./ [sweep_params.per_bw_max, sweep_params.per_bw_min]);
+  VBR.in.band.tol = sweep_params.band_tol;
+end
+z = VBR.in.z;
+sweep_params.P_GPa = z * 3300 * 9.8 /1e9;
 
 % Generate parameter sweep and calculate VBR at each combination
 sweepBox = calculate_sweep(VBR, sweep_params);
@@ -127,7 +132,6 @@ function [sweepBox] = calculate_sweep(VBR_init, sweep_params)
     %
     %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 
-    VBR = VBR_init; 
     P_GPa0 = sweep_params.P_GPa; 
     n_T   = numel(sweep_params.T);
     n_phi    = numel(sweep_params.phi);
@@ -135,44 +139,72 @@ function [sweepBox] = calculate_sweep(VBR_init, sweep_params)
     nZ = numel(P_GPa0);
     nP = numel(P_GPa0);
 
-    VBRBox(numel(P_GPa0)) = struct();
-    % now loop it, store the mean value arrays
-    disp('    generating parameter sweep')
-    Tshp = size(VBR.in.SV.T_K);
-    
+    % parallel and checkpoint settings
+    n_workers = 0;
+    if isfield(sweep_params, 'n_workers')
+      n_workers = sweep_params.n_workers;
+    end
+    checkpoint_dir = '';
+    if isfield(sweep_params, 'checkpoint_dir')
+      checkpoint_dir = sweep_params.checkpoint_dir;
+      if exist(checkpoint_dir, 'dir') == 0
+        mkdir(checkpoint_dir);
+      end
+    end
+    shard = [1, 1];
+    if isfield(sweep_params, 'shard')
+      shard = sweep_params.shard;
+      if numel(checkpoint_dir) == 0
+        error('sweep_params.shard requires sweep_params.checkpoint_dir')
+      end
+    end
+
+    % load depth steps completed in a previous run, collect the steps to
+    % calculate in this one
+    VBRBox = cell(nP, 1);
+    steps_todo = [];
     for i_P = 1:nP
-      tic()
-      disp(['    calculating step ',num2str(i_P),' of ',num2str(nP)])
-      VBR.in.SV.P_GPa = P_GPa0(i_P) * ones(Tshp);
-      solidus_C = SoLiquidus(VBR.in.SV.P_GPa*1e9, zeros(Tshp), zeros(Tshp), 'hirschmann');
-      VBR.in.SV.Tsolidus_K = solidus_C.Tsol + 273;
-      VBR = VBR_spine(VBR);
-      telapsed = toc() ;
-      disp(['         step complete after ',num2str(telapsed/60),' mins, storing result.'])
-      % get averages over frequencies at this pressure/depth 
-      anelastic_methods = fieldnames(VBR.out.anelastic);
-      for i_an = 1:length(anelastic_methods)
-        ameth = anelastic_methods{i_an};
-        % disp(ameth)
-        Q = VBR.out.anelastic.(ameth).Q;
-        V = VBR.out.anelastic.(ameth).V/1e3;
-        % disp(size(V))
-        
-        VBRBox(i_P).(ameth).Qmean = mean(Q,4); % size is (T,phi,gs)
-        VBRBox(i_P).(ameth).Vsmean = mean(V,4); % size is (T,phi,gs)
-        % disp(size(VBRBox(i_P).(ameth).Qmean))
-        % disp(VBRBox(i_P).(ameth).Qmean(1:5))
-        % disp(VBRBox(i_P).(ameth).Vsmean(1:5))
-        % pause(5.)
-      end 
-      
-    end 
+      if numel(checkpoint_dir) > 0
+        [~, key] = step_VBR(VBR_init, P_GPa0(i_P));
+        step_file = step_filename(checkpoint_dir, i_P);
+        if exist(step_file, 'file') == 2
+          saved = load(step_file);
+          if strcmp(saved.key, key)
+            VBRBox{i_P} = saved.step;
+            continue
+          end
+        end
+      end
+      if mod(i_P - 1, shard(2)) == shard(1) - 1
+        steps_todo(end+1) = i_P;
+      end
+    end
+    disp(['    generating parameter sweep: ', num2str(nP - numel(steps_todo)), ...
+          ' of ', num2str(nP), ' steps loaded from checkpoints'])
+
+    % calculate the remaining steps, results are stored by step index so that
+    % the merged sweep does not depend on the order in which steps complete
+    n_todo = numel(steps_todo);
+    step_results = cell(n_todo, 1);
+    parfor (i_todo = 1:n_todo, n_workers)
+      i_P = steps_todo(i_todo);
+      step_results{i_todo} = calculate_step(VBR_init, P_GPa0(i_P), i_P, nP, checkpoint_dir);
+    end
+    VBRBox(steps_todo) = step_results;
+
+    n_missing = sum(cellfun(@isempty, VBRBox));
+    if n_missing > 0
+      disp(['    sweep incomplete: ', num2str(n_missing), ' of ', num2str(nP), ...
+            ' steps remaining in other shards'])
+      sweepBox = struct([]);
+      return
+    end
 
     disp('    sweep complete: rearranging structure...')
     % re-arrange it all to match what's expected later
     sweepBox(n_T,n_phi,n_gs) = struct();
     for i_state=1:n_T*n_phi*n_gs
-        anelastic_methods = VBR.in.anelastic.methods_list;
+        anelastic_methods = VBR_init.in.anelastic.methods_list;
         for i_an = 1:length(anelastic_methods)
            ameth = anelastic_methods{i_an};
            if isfield(sweepBox(i_state),ameth)==0
@@ -183,10 +215,73 @@ function [sweepBox] = calculate_sweep(VBR_init, sweep_params)
              sweepBox(i_state).(ameth).meanVs=zeros(nZ,1);              
            end
            for i_P = 1:nP
-               sweepBox(i_state).(ameth).meanQ(i_P)=VBRBox(i_P).(ameth).Qmean(i_state);
-               sweepBox(i_state).(ameth).meanVs(i_P)=VBRBox(i_P).(ameth).Vsmean(i_state);
+               sweepBox(i_state).(ameth).meanQ(i_P)=VBRBox{i_P}.(ameth).Qmean(i_state);
+               sweepBox(i_state).(ameth).meanVs(i_P)=VBRBox{i_P}.(ameth).Vsmean(i_state);
            end
         end
     end
     disp('    sweep complete!')
 end
+
+function step = calculate_step(VBR_init, P_GPa, i_P, nP, checkpoint_dir)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    %
+    % step = calculate_step(VBR_init, P_GPa, i_P, nP, checkpoint_dir)
+    %
+    % Calculates the frequency-averaged Q and Vs of every anelastic method at
+    % a single pressure (depth step), saving the result to checkpoint_dir if
+    % it is not empty.
+    %
+    % Output:
+    % -------
+    %       step            structure with a field for each anelastic method,
+    %                       each with fields Qmean and Vsmean, size (T,phi,gs)
+    %
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    t_start = tic;
+    disp(['    calculating step ',num2str(i_P),' of ',num2str(nP)])
+    [VBR, key] = step_VBR(VBR_init, P_GPa);
+    VBR = VBR_spine(VBR);
+
+    % get averages over frequencies at this pressure/depth 
+    step = struct();
+    anelastic_methods = fieldnames(VBR.out.anelastic);
+    for i_an = 1:length(anelastic_methods)
+      ameth = anelastic_methods{i_an};
+      Q = VBR.out.anelastic.(ameth).Q;
+      V = VBR.out.anelastic.(ameth).V/1e3;
+      if isfield(VBR.out, 'band')
+        % band averages, frequency is not evenly weighted
+        step.(ameth).Qmean = VBR.out.anelastic.(ameth).Qave;
+        step.(ameth).Vsmean = VBR.out.anelastic.(ameth).Vave/1e3;
+      else
+        step.(ameth).Qmean = mean(Q,4); % size is (T,phi,gs)
+        step.(ameth).Vsmean = mean(V,4); % size is (T,phi,gs)
+      end
+    end
+
+    if numel(checkpoint_dir) > 0
+      % write to a temporary file first so an interrupted save is not
+      % mistaken for a completed step
+      step_file = step_filename(checkpoint_dir, i_P);
+      tmp_file = [step_file(1:end-4), '_tmp.mat'];
+      VBR_save(struct('key', key, 'step', step), tmp_file);
+      movefile(tmp_file, step_file);
+    end
+    disp(['         step ',num2str(i_P),' complete after ', ...
+          num2str(toc(t_start)/60),' mins, storing result.'])
+end
+
+function [VBR, key] = step_VBR(VBR, P_GPa)
+    % the VBR input for a single pressure and its cache key, used to check
+    % that a saved step matches the current inputs
+    Tshp = size(VBR.in.SV.T_K);
+    VBR.in.SV.P_GPa = P_GPa * ones(Tshp);
+    solidus_C = SoLiquidus(VBR.in.SV.P_GPa*1e9, zeros(Tshp), zeros(Tshp), 'hirschmann');
+    VBR.in.SV.Tsolidus_K = solidus_C.Tsol + 273;
+    key = VBR_cache_key(VBR);
+end
+
+function step_file = step_filename(checkpoint_dir, i_P)
+    step_file = fullfile(checkpoint_dir, sprintf('sweep_step_%04d.mat', i_P));
+end
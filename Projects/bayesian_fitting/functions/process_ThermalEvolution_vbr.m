@@ -1,15 +1,27 @@
-function Work = process_ThermalEvolution_vbr(Files,freq)
+function Work = process_ThermalEvolution_vbr(Files,freq,n_workers,band_tol)
+% n_workers (optional): maximum number of parallel workers (parfor) for the
+% loop over Box elements. Default 0 (serial).
+% band_tol (optional): if set, V and Q are averaged over the band
+% freq(1) to freq(end), evaluating only the quadrature frequencies needed to
+% reach this relative tolerance (see VBR.in.band in VBR_spine), instead of
+% at every frequency in freq. calc_LAB_Vs then uses the band averages.
+if ~exist('n_workers','var')
+    n_workers = 0;
+end
+if ~exist('band_tol','var')
+    band_tol = [];
+end
 
 disp(['Period range: ' num2str(round(10/freq(end))/10) ' - ' ...
     num2str(round(10/freq(1))/10) ' s']);
 
 Work.Box_name_IN=Files.SV_Box;
-VBR=drive_VBR(Work, freq);
+VBR=drive_VBR(Work, freq, n_workers, band_tol);
 save(Files.VBR_Box,'VBR')
 
 end
 
-function VBRBox=drive_VBR(Work, freq)
+function VBRBox=drive_VBR(Work, freq, n_workers, band_tol)
 
 %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 % DRIVE_VBR.m
@@ -23,6 +35,10 @@ function VBRBox=drive_VBR(Work, freq)
 
 % input frequency band
 VBR.in.SV.f = freq;
+if numel(band_tol) > 0
+    VBR.in.band.f_range = [min(freq), max(freq)];
+    VBR.in.band.tol = band_tol;
+end
 
 % write VBR methods lists (these are the things to calculate)
 elastic = feval(fetchParamFunction('elastic'), '');
@@ -44,36 +60,40 @@ VBR.in.elastic.anharmonic.Gu_0_ol=73.6; %%%%%%%!!!!!!!!!%%%%%%%%
 %%% ---------------- %%%
 
 % load the Box
-load(Work.Box_name_IN) ;
+Box = load(Work.Box_name_IN);
+Box = Box.Box;
 
 VBRBox(size(Box, 1),size(Box, 2))=struct('in', struct(), 'BoxParams', struct(),...
     'Z_km', zeros(110,1), 'status', 0, 'error_message','','out',struct());
 % loop over box indeces, run VBR calculator on last frame of each run
 Work.nBox = numel(Box); Work.tstart = cputime;
-for iBox = 1:Work.nBox
+nBox = Work.nBox;
+parfor (iBox = 1:nBox, n_workers)
 
     disp('-------------------------------------------------------- ')
-    display(['Run ' num2str(iBox) ' of ' num2str(Work.nBox)])
+    disp(['Run ' num2str(iBox) ' of ' num2str(nBox)])
 
     % pass along some of the Box settings
-    VBR.BoxParams=Box(iBox).info;
-    VBR.Z_km=Box(iBox).run_info.Z_km;
-
-    sz_SV=size(Box(iBox).Frames(end).P);
-    VBR.in.SV.P_GPa = (Box(iBox).Frames(end).P)./1e9 ;
-    VBR.in.SV.T_K = Box(iBox).Frames(end).T +273;
-    VBR.in.SV.rho = Box(iBox).Frames(end).rho ;
-    VBR.in.SV.sig_MPa = 1 * ones(sz_SV) ; %Frames(ifr).sig_MPa ;
-    VBR.in.SV.chi = Box(iBox).Frames(end).comp;
-    VBR.in.SV.Ch2o = Box(iBox).Frames(end).Cs_H2O;
-    VBR.in.SV.phi =  Box(iBox).Frames(end).phi;
-    VBR.in.SV.dg_um = Box(iBox).Frames(end).dg_um;
-    solidus_C = SoLiquidus(VBR.in.SV.P_GPa, zeros(sz_SV),zeros(sz_SV),...
+    VBR_i = VBR;
+    VBR_i.BoxParams=Box(iBox).info;
+    VBR_i.Z_km=Box(iBox).run_info.Z_km;
+
+    Frame = getBoxFrame(Box(iBox),1,'end');
+    sz_SV=size(Frame.P);
+    VBR_i.in.SV.P_GPa = (Frame.P)./1e9 ;
+    VBR_i.in.SV.T_K = Frame.T +273;
+    VBR_i.in.SV.rho = Frame.rho ;
+    VBR_i.in.SV.sig_MPa = 1 * ones(sz_SV) ; %Frames(ifr).sig_MPa ;
+    VBR_i.in.SV.chi = Frame.comp;
+    VBR_i.in.SV.Ch2o = Frame.Cs_H2O;
+    VBR_i.in.SV.phi =  Frame.phi;
+    VBR_i.in.SV.dg_um = Frame.dg_um;
+    solidus_C = SoLiquidus(VBR_i.in.SV.P_GPa, zeros(sz_SV),zeros(sz_SV),...
         'hirschmann');
-    VBR.in.SV.Tsolidus_K = solidus_C.Tsol + 273;
+    VBR_i.in.SV.Tsolidus_K = solidus_C.Tsol + 273;
     
     % VBR time!
-    VBRBox(iBox)=VBR_spine(VBR) ;
+    VBRBox(iBox)=VBR_spine(VBR_i) ;
 
 end
 Work.tend = cputime;
@@ -0,0 +1,531 @@
+'''
+seismic_profiles.py
+
+bulk extraction of profiles and observations from the seismic model .mat
+files written by fetch_IRIS_data.py (e.g., Vs_Model, Q_Model structures with
+Latitude, Longitude, Depth and (lat, lon, depth) fields).
+
+On first use, each model is converted to an index directory next to the .mat
+file (model.mat -> model.mat.index/) containing:
+
+  index.json    the grid description: field names, shape, the source file
+                size and modification time (the index is rebuilt if the .mat
+                file changes) and, for regularly spaced axes, the origin and
+                spacing used to locate points without a search
+  coords.npz    the Latitude, Longitude (0 to 360, sorted) and Depth vectors
+  <field>.npy   each 3D field as a (lat, lon, depth) C-ordered array, so that
+                the depth profile at a grid node is contiguous on disk
+
+The .npy files are opened memory-mapped, so any number of worker processes
+share one copy of the cube through the page cache and only the profiles that
+are actually needed are read. Points are located with the regular-grid index
+when the axes are evenly spaced and by binary search otherwise; nearest node
+queries use a KD-tree of the grid nodes on the unit sphere.
+
+Two bulk operations are provided, each vectorized over many locations:
+
+  SeismicModel.profiles(lat, lon, field)
+      bilinear (or nearest node) interpolation of depth profiles
+  SeismicModel.observations(lat, lon, z_min, z_max, smooth_rad, field)
+      the observation and its uncertainty, as calculated by
+      process_SeismicModels.m for a single location
+
+Command line usage (locations.csv has columns lat,lon and optionally
+z_min,z_max,smooth_rad):
+
+  python seismic_profiles.py ./data/vel_models/Shen_Ritzwoller_2016.mat \\
+      locations.csv Vs_obs.mat --field Vs --zMin 75 --zMax 105 --nWorkers 4
+
+Required libraries: scipy, numpy
+Optional libraries: h5py (for v7.3 .mat files, e.g., from --chunked)
+
+Requires Python 3.
+'''
+
+import os, argparse, json, warnings
+from multiprocessing import Pool
+import scipy.io as scp
+import numpy as np
+
+index_version=1
+
+# constant uncertainties used when a model has no Error field, as in
+# check_errors of process_SeismicModels.m
+default_errors={'Vs':0.05, 'LAB_Depth':5., 'Q':10.}
+
+class SeismicModel(object):
+    ''' SeismicModel: memory-mapped, indexed access to a seismic model .mat file
+
+    Parameters
+    ----------
+    matfile : str
+        the model .mat file (v5 from scipy.io.savemat or v7.3)
+    index_dir : str
+        the index directory, defaults to matfile + '.index'
+    max_mem_mb : float
+        approximate memory ceiling in MB for building the index from a v7.3
+        file and for the blocks of points interpolated at once
+    '''
+
+    def __init__(self, matfile, index_dir=None, max_mem_mb=512):
+        if index_dir is None:
+            index_dir=matfile+'.index'
+        self.matfile=matfile
+        self.index_dir=index_dir
+        self.max_mem_mb=max_mem_mb
+        self.info=loadIndex(matfile, index_dir)
+        if self.info is None:
+            self.info=buildIndex(matfile, index_dir, max_mem_mb)
+
+        coords=np.load(os.path.join(index_dir,'coords.npz'))
+        self.Latitude=coords['Latitude']
+        self.Longitude=coords['Longitude']
+        self.Depth=coords['Depth'] if 'Depth' in coords else None
+        self.fields={}
+        for fld in self.info['fields']:
+            self.fields[fld]=np.load(os.path.join(index_dir,fld+'.npy'),
+                                     mmap_mode='r')
+        self._tree=None
+
+    def profiles(self, lat, lon, field, method='linear'):
+        ''' profiles: depth profiles of field at many (lat, lon) points
+
+        Parameters
+        ----------
+        lat, lon : array
+            the point coordinates [degrees N, degrees E]. Negative longitudes
+            are converted to 0 to 360.
+        field : str
+            the field name, e.g., 'Vs'
+        method : str
+            'linear' for bilinear interpolation in lat, lon (default) or
+            'nearest' for the closest grid node (great circle distance)
+
+        Returns
+        -------
+        (n_points, n_depth) array, NaN for points outside the model
+        '''
+
+        cube=self.fields[field]
+        lat=np.asarray(lat,dtype='float64').ravel()
+        lon=np.mod(np.asarray(lon,dtype='float64').ravel(),360.)
+        n_z=cube.shape[2]
+        result=np.full((lat.size,n_z),np.nan)
+        block=int(max(1,self.max_mem_mb*1024**2//(n_z*8*6)))
+
+        for i0 in range(0,lat.size,block):
+            pts=slice(i0,min(i0+block,lat.size))
+            if method == 'nearest':
+                i_lat,i_lon,inside=self.nearestNodes(lat[pts],lon[pts])
+                vals=cube[i_lat[inside],i_lon[inside],:]
+            elif method == 'linear':
+                i_lat,w_lat,in_lat=self._locate(lat[pts],'lat')
+                i_lon,w_lon,in_lon=self._locate(lon[pts],'lon')
+                inside=in_lat & in_lon
+                i_lat,w_lat=i_lat[inside],w_lat[inside,np.newaxis]
+                i_lon,w_lon=i_lon[inside],w_lon[inside,np.newaxis]
+                j_lon=self._nextLon(i_lon)
+                vals=((1-w_lat)*(1-w_lon)*cube[i_lat,i_lon,:]
+                      +(1-w_lat)*w_lon*cube[i_lat,j_lon,:]
+                      +w_lat*(1-w_lon)*cube[i_lat+1,i_lon,:]
+                      +w_lat*w_lon*cube[i_lat+1,j_lon,:])
+            else:
+                raise ValueError("method must be 'linear' or 'nearest', found "+str(method))
+            result[np.arange(pts.start,pts.stop)[inside]]=vals
+        return result
+
+    def observations(self, lat, lon, z_min, z_max, smooth_rad=0.5, field='Vs',
+                     error=None):
+        ''' observations: observed values and uncertainties at many locations
+
+        For each location, takes the median of field over the box
+        lat +- smooth_rad, lon +- smooth_rad at each depth and the uncertainty
+        as the maximum of the median Error (or a constant, see default_errors)
+        and the standard deviation within the box. The results are then the
+        median over z_min <= depth <= z_max, as in process_SeismicModels.m.
+        Locations are processed together in groups with the same box size.
+        A warning is issued for locations whose depth range is outside the
+        model depth bounds or contains no depth node.
+
+        Parameters
+        ----------
+        lat, lon : array
+            the location coordinates [degrees N, degrees E]
+        z_min, z_max : float or array
+            the depth range [km] for each location (ignored for models
+            without depth, e.g., LAB_Depth)
+        smooth_rad : float or array
+            half-width of the averaging box [degrees]
+        field : str
+            the field name ('Vs', 'Q', 'LAB_Depth')
+        error : float
+            constant uncertainty to use if the model has no Error field,
+            defaults to default_errors[field]
+
+        Returns
+        -------
+        obs_value, obs_error : arrays with a value for each location, NaN
+            for locations outside the model (in lat, lon or depth)
+        '''
+
+        lat=np.asarray(lat,dtype='float64').ravel()
+        lon=np.mod(np.asarray(lon,dtype='float64').ravel(),360.)
+        n_pts=lat.size
+        z_min=np.broadcast_to(np.asarray(z_min,dtype='float64'),(n_pts,))
+        z_max=np.broadcast_to(np.asarray(z_max,dtype='float64'),(n_pts,))
+        smooth_rad=np.broadcast_to(np.asarray(smooth_rad,dtype='float64'),(n_pts,))
+        if error is None and 'Error' not in self.fields:
+            error=default_errors[field]
+
+        cube=self.fields[field]
+        n_z=cube.shape[2]
+        lat_lo=np.searchsorted(self.Latitude,lat-smooth_rad,side='left')
+        lat_hi=np.searchsorted(self.Latitude,lat+smooth_rad,side='right')
+        lon_lo=np.searchsorted(self.Longitude,lon-smooth_rad,side='left')
+        lon_hi=np.searchsorted(self.Longitude,lon+smooth_rad,side='right')
+        n_lat=np.maximum(lat_hi-lat_lo,0)
+        n_lon=np.maximum(lon_hi-lon_lo,0)
+
+        # the depth range check of check_overlap in process_SeismicModels.m,
+        # also rejecting ranges that fall between two depth nodes
+        valid=(n_lat > 0) & (n_lon > 0)
+        if self.Depth is not None:
+            in_z=(self.Depth >= z_min[:,np.newaxis]) & (self.Depth <= z_max[:,np.newaxis])
+            bad_z=((z_min < self.Depth[0]) | (z_max > self.Depth[-1])
+                   | ~np.any(in_z,axis=1))
+            if np.any(bad_z):
+                warnings.warn(str(int(np.sum(bad_z)))+' of '+str(n_pts)+
+                              ' locations have z_min, z_max outside the model '
+                              'depth bounds ('+str(self.Depth[0])+' to '+
+                              str(self.Depth[-1])+' km) or between two depth '
+                              'nodes, their observations are NaN')
+            valid=valid & ~bad_z
+
+        obs_value=np.full(n_pts,np.nan)
+        obs_error=np.full(n_pts,np.nan)
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            # all-NaN boxes and single-value standard deviations give NaN
+            warnings.simplefilter('ignore',RuntimeWarning)
+            # points with the same box shape are gathered into one array
+            shapes=np.stack((n_lat,n_lon),axis=1)[valid]
+            pts_valid=np.flatnonzero(valid)
+            for box_shape in np.unique(shapes,axis=0):
+                pts=pts_valid[np.all(shapes == box_shape,axis=1)]
+                box_size=int(box_shape[0]*box_shape[1])
+                block=int(max(1,self.max_mem_mb*1024**2//(box_size*n_z*8*4)))
+                for i0 in range(0,pts.size,block):
+                    ipts=pts[i0:i0+block]
+                    i_lat=lat_lo[ipts,np.newaxis]+np.arange(box_shape[0])
+                    i_lon=lon_lo[ipts,np.newaxis]+np.arange(box_shape[1])
+                    box=(i_lat[:,:,np.newaxis],i_lon[:,np.newaxis,:])
+                    vals=np.asarray(cube[box]).reshape(ipts.size,box_size,n_z)
+                    value_z=np.nanmedian(vals,axis=1)
+                    lateral_z=np.nanstd(vals,axis=1,ddof=1)
+                    if error is None:
+                        errs=np.asarray(self.fields['Error'][box]).reshape(ipts.size,box_size,n_z)
+                        error_z=np.nanmedian(errs,axis=1)
+                    else:
+                        error_z=np.full(value_z.shape,float(error))
+                    error_z=np.fmax(error_z,lateral_z)
+
+                    if self.Depth is not None:
+                        value_z[~in_z[ipts]]=np.nan
+                        error_z[~in_z[ipts]]=np.nan
+                    obs_value[ipts]=np.nanmedian(value_z,axis=1)
+                    obs_error[ipts]=np.nanmedian(error_z,axis=1)
+        return obs_value, obs_error
+
+    def nearestNodes(self, lat, lon):
+        ''' nearestNodes: the (lat, lon) indices of the closest grid nodes.
+        Points further than one grid cell outside the model are flagged as
+        outside. '''
+
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+            node_lat,node_lon=np.meshgrid(self.Latitude,self.Longitude,indexing='ij')
+            self._tree=cKDTree(unitVectors(node_lat.ravel(),node_lon.ravel()))
+        _,i_node=self._tree.query(unitVectors(lat,lon))
+        i_lat,i_lon=np.unravel_index(i_node,(self.Latitude.size,self.Longitude.size))
+        _,_,in_lat=self._locate(lat,'lat',pad=1)
+        _,_,in_lon=self._locate(lon,'lon',pad=1)
+        return i_lat,i_lon,in_lat & in_lon
+
+    def _locate(self, x, axis, pad=0):
+        ''' _locate: lower cell index, fractional position and inside flag of
+        x along the lat or lon axis, using the regular-grid index if
+        available. pad extends the inside range by pad grid cells. '''
+
+        grid=self.info['grid'][axis]
+        nodes=self.Latitude if axis == 'lat' else self.Longitude
+        n_cells=nodes.size-1
+        if axis == 'lon' and grid['periodic']:
+            n_cells=nodes.size
+        if grid['regular']:
+            pos=(x-grid['origin'])/grid['spacing']
+            if axis == 'lon' and grid['periodic']:
+                pos=np.mod(pos,nodes.size)
+            i_cell=np.clip(np.floor(pos).astype('int64'),0,max(n_cells-1,0))
+            frac=pos-i_cell
+        else:
+            i_cell=np.clip(np.searchsorted(nodes,x,side='right')-1,0,max(n_cells-1,0))
+            frac=(x-nodes[i_cell])/(nodes[np.minimum(i_cell+1,nodes.size-1)]-nodes[i_cell])
+        if axis == 'lon' and grid['periodic']:
+            inside=np.ones(x.shape,dtype=bool)
+        else:
+            spacing=np.min(np.diff(nodes)) if nodes.size > 1 else 0.
+            inside=(x >= nodes[0]-pad*spacing) & (x <= nodes[-1]+pad*spacing)
+        return i_cell, frac, inside
+
+    def _nextLon(self, i_lon):
+        ''' _nextLon: index of the next longitude node, wrapping for global models '''
+
+        if self.info['grid']['lon']['periodic']:
+            return np.mod(i_lon+1,self.Longitude.size)
+        return np.minimum(i_lon+1,self.Longitude.size-1)
+
+def unitVectors(lat, lon):
+    ''' unitVectors: (n, 3) cartesian unit vectors of lat, lon in degrees '''
+
+    lat=np.radians(np.asarray(lat,dtype='float64'))
+    lon=np.radians(np.asarray(lon,dtype='float64'))
+    return np.column_stack((np.cos(lat)*np.cos(lon),np.cos(lat)*np.sin(lon),
+                            np.sin(lat)))
+
+def sourceStamp(matfile):
+    ''' sourceStamp: size and modification time of the source .mat file '''
+
+    stat=os.stat(matfile)
+    return {'size':stat.st_size,'mtime':stat.st_mtime}
+
+def loadIndex(matfile, index_dir):
+    ''' loadIndex: the index description, or None if missing or out of date '''
+
+    fname=os.path.join(index_dir,'index.json')
+    if not os.path.isfile(fname):
+        return None
+    with open(fname,'r') as fi:
+        info=json.load(fi)
+    if info.get('version') != index_version or info.get('source') != sourceStamp(matfile):
+        return None
+    return info
+
+def axisGrid(nodes, periodic_check=False):
+    ''' axisGrid: regular-grid description of a sorted coordinate axis '''
+
+    grid={'regular':False,'origin':float(nodes[0]),'spacing':0.,'periodic':False}
+    if nodes.size > 1:
+        steps=np.diff(nodes)
+        if np.allclose(steps,steps[0],rtol=1e-6,atol=0):
+            grid['regular']=True
+            grid['spacing']=float(steps[0])
+        if periodic_check:
+            gap=360.-(nodes[-1]-nodes[0])
+            grid['periodic']=bool(grid['regular'] and np.isclose(gap,steps[0],rtol=1e-6))
+    return grid
+
+def buildIndex(matfile, index_dir, max_mem_mb=512):
+    ''' buildIndex: converts a model .mat file to the memory-mapped index
+
+    Parameters
+    ----------
+    matfile : str
+        the model .mat file
+    index_dir : str
+        the index directory to write
+    max_mem_mb : float
+        approximate memory ceiling in MB for converting v7.3 files, which
+        are copied in depth slabs
+
+    Returns
+    -------
+    the index description (contents of index.json)
+    '''
+
+    if os.path.isdir(index_dir) is not True:
+        os.makedirs(index_dir)
+
+    reader=readMat73 if isMat73(matfile) else readMat5
+    with reader(matfile) as model:
+        lat=np.asarray(model.coord('Latitude'),dtype='float64').ravel()
+        lon=np.mod(np.asarray(model.coord('Longitude'),dtype='float64').ravel(),360.)
+        lat_order=np.argsort(lat,kind='stable')
+        lon_order=np.argsort(lon,kind='stable')
+        coords={'Latitude':lat[lat_order],'Longitude':lon[lon_order]}
+        if 'Depth' in model.names:
+            coords['Depth']=np.asarray(model.coord('Depth'),dtype='float64').ravel()
+        np.savez(os.path.join(index_dir,'coords.npz'),**coords)
+
+        fields=[]
+        for fld in model.names:
+            if fld in ['Latitude','Longitude','Depth']:
+                continue
+            shape=model.shape(fld)
+            if len(shape) < 2 or shape[0] != lat.size or shape[1] != lon.size:
+                continue
+            n_z=shape[2] if len(shape) > 2 else 1
+            npy=os.path.join(index_dir,fld+'.npy')
+            cube=np.lib.format.open_memmap(npy+'.tmp',mode='w+',dtype='float64',
+                                           shape=(lat.size,lon.size,n_z))
+            thickness=int(max(1,max_mem_mb*1024**2//(lat.size*lon.size*8*3)))
+            for iz0 in range(0,n_z,thickness):
+                iz1=min(iz0+thickness,n_z)
+                slab=model.slab(fld,iz0,iz1)
+                cube[:,:,iz0:iz1]=slab[lat_order][:,lon_order]
+            cube.flush()
+            del cube
+            os.replace(npy+'.tmp',npy)
+            fields.append(fld)
+
+    info={'version':index_version,'source':sourceStamp(matfile),
+          'fields':fields,'shape':[int(lat.size),int(lon.size)],
+          'grid':{'lat':axisGrid(coords['Latitude']),
+                  'lon':axisGrid(coords['Longitude'],periodic_check=True)}}
+    with open(os.path.join(index_dir,'index.json.tmp'),'w') as fi:
+        json.dump(info,fi,indent=2,sort_keys=True)
+    os.replace(os.path.join(index_dir,'index.json.tmp'),os.path.join(index_dir,'index.json'))
+    print('  built index for '+matfile+' in '+index_dir)
+    return info
+
+def isMat73(matfile):
+    ''' isMat73: True if matfile is an HDF5-based v7.3 .mat file '''
+
+    with open(matfile,'rb') as fi:
+        header=fi.read(128)
+    return header[:10] == b'MATLAB 7.3'
+
+class readMat5(object):
+    ''' readMat5: context manager reading the model structure of a v5 .mat
+    file (loaded into memory once, while building the index) '''
+
+    def __init__(self, matfile):
+        contents=scp.loadmat(matfile,squeeze_me=False,struct_as_record=False)
+        names=[key for key in contents.keys() if not key.startswith('__')]
+        self.model=contents[names[0]][0,0]
+        self.names=list(self.model._fieldnames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.model=None
+
+    def coord(self, name):
+        return getattr(self.model,name)
+
+    def shape(self, name):
+        return np.shape(getattr(self.model,name))
+
+    def slab(self, name, iz0, iz1):
+        vals=np.asarray(getattr(self.model,name),dtype='float64')
+        if vals.ndim == 2:
+            vals=vals[:,:,np.newaxis]
+        return vals[:,:,iz0:iz1]
+
+class readMat73(object):
+    ''' readMat73: context manager reading the model structure of a v7.3
+    .mat file in depth slabs. MATLAB (lat, lon, z) arrays are stored as
+    HDF5 datasets of shape (z, lon, lat). '''
+
+    def __init__(self, matfile):
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError('reading v7.3 .mat files requires h5py: pip install h5py')
+        self.f5=h5py.File(matfile,'r')
+        names=[key for key in self.f5.keys() if not key.startswith('#')]
+        self.grp=self.f5[names[0]]
+        self.names=list(self.grp.keys())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.f5.close()
+
+    def coord(self, name):
+        return self.grp[name][()]
+
+    def shape(self, name):
+        return self.grp[name].shape[::-1]
+
+    def slab(self, name, iz0, iz1):
+        dset=self.grp[name]
+        if dset.ndim == 2:
+            return dset[()].T[:,:,np.newaxis]
+        return dset[iz0:iz1,:,:].transpose(2,1,0)
+
+_worker_model=None
+
+def _initWorker(matfile, index_dir):
+    global _worker_model
+    _worker_model=SeismicModel(matfile, index_dir)
+
+def _workerObservations(args):
+    return _worker_model.observations(*args)
+
+def bulkObservations(matfile, lat, lon, z_min, z_max, smooth_rad=0.5,
+                     field='Vs', n_workers=1, index_dir=None):
+    ''' bulkObservations: SeismicModel.observations split over n_workers
+    processes. The index is built once, then each worker memory-maps the
+    same files. '''
+
+    model=SeismicModel(matfile, index_dir)
+    if n_workers <= 1:
+        return model.observations(lat, lon, z_min, z_max, smooth_rad, field)
+
+    lat=np.asarray(lat,dtype='float64').ravel()
+    n_pts=lat.size
+    args=[np.broadcast_to(np.asarray(val,dtype='float64').ravel(),(n_pts,))
+          for val in [lat,lon,z_min,z_max,smooth_rad]]
+    splits=np.array_split(np.arange(n_pts),n_workers)
+    tasks=[tuple(val[idx] for val in args)+(field,) for idx in splits if idx.size > 0]
+    with Pool(n_workers,initializer=_initWorker,
+              initargs=(matfile,model.index_dir)) as pool:
+        results=pool.map(_workerObservations,tasks)
+    obs_value=np.concatenate([res[0] for res in results])
+    obs_error=np.concatenate([res[1] for res in results])
+    return obs_value, obs_error
+
+def readLocations(csvfile):
+    ''' readLocations: the columns of a locations csv file with a header row '''
+
+    data=np.genfromtxt(csvfile,delimiter=',',names=True)
+    return {name:np.atleast_1d(data[name]) for name in data.dtype.names}
+
+if __name__=='__main__':
+
+    parser = argparse.ArgumentParser(description='bulk extraction from seismic models')
+    parser.add_argument('model',type=str,help='the model .mat file')
+    parser.add_argument('locations',type=str,
+            help='csv file with columns lat,lon and optionally z_min,z_max,smooth_rad')
+    parser.add_argument('output',type=str,help='the .mat file to save to')
+    parser.add_argument('--field',type=str,default='Vs',
+            help='the field to extract, e.g., Vs, Q, LAB_Depth')
+    parser.add_argument('--profiles',action='store_true',
+            help='save interpolated depth profiles instead of observations')
+    parser.add_argument('--method',type=str,default='linear',choices=['linear','nearest'],
+            help='interpolation method for --profiles')
+    parser.add_argument('--zMin',type=float,default=75.,help='default minimum depth [km]')
+    parser.add_argument('--zMax',type=float,default=105.,help='default maximum depth [km]')
+    parser.add_argument('--smoothRad',type=float,default=0.5,
+            help='default averaging box half-width [degrees]')
+    parser.add_argument('--nWorkers',type=int,default=1,help='number of worker processes')
+    arg = parser.parse_args()
+
+    locs=readLocations(arg.locations)
+    save_dict={'lat':locs['lat'],'lon':locs['lon']}
+    if arg.profiles:
+        model=SeismicModel(arg.model)
+        save_dict['profiles']=model.profiles(locs['lat'],locs['lon'],arg.field,arg.method)
+        save_dict['Depth']=model.Depth
+    else:
+        z_min=locs.get('z_min',arg.zMin)
+        z_max=locs.get('z_max',arg.zMax)
+        smooth_rad=locs.get('smooth_rad',arg.smoothRad)
+        obs_value,obs_error=bulkObservations(arg.model,locs['lat'],locs['lon'],
+                                             z_min,z_max,smooth_rad,arg.field,
+                                             n_workers=arg.nWorkers)
+        save_dict['obs_value']=obs_value
+        save_dict['obs_error']=obs_error
+    scp.savemat(arg.output,save_dict)
+    print('  saved '+str(locs['lat'].size)+' locations to '+arg.output)
@@ -0,0 +1,48 @@
+function VBR = sweep_VBR_input(T, phi, gs)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+%
+% VBR = sweep_VBR_input(T, phi, gs)
+%
+% The VBR input shared by generate_parameter_sweep and
+% calculate_sweep_points: the depths, frequencies, fixed state variables
+% and methods, for the given temperature, melt fraction and grain size.
+% The pressure and solidus are set for each depth separately.
+%
+% Parameters:
+% -----------
+%       T           array of temperatures [deg C]
+%       phi         array of melt fractions (same size as T)
+%       gs          array of grain sizes [micrometres] (same size as T)
+%
+% Output:
+% -------
+%       VBR         VBR structure with VBR.in.z the sweep depths [m]
+%
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+z = linspace(50,170,100)*1e3; z= z';
+VBR.in.z = z;
+VBR.in.SV.f = logspace(-2.2,-1.3,10);
+
+VBR.in.SV.T_K = T + 273;
+VBR.in.SV.phi = phi;
+VBR.in.SV.dg_um = gs;
+
+Tshp = size(T);
+VBR.in.SV.sig_MPa = 0.1*ones(Tshp);
+VBR.in.SV.Ch2o = zeros(Tshp); % in PPM!
+VBR.in.SV.rho = 3300 * ones(Tshp); % [Pa]
+VBR.in.SV.chi = ones(Tshp);
+
+% write method list (these are the things to calculate)
+% Use all available methods except xfit_premelt
+elastic = feval(fetchParamFunction('elastic'), '');
+VBR.in.elastic.methods_list = elastic.possible_methods;
+viscous = feval(fetchParamFunction('viscous'), '');
+VBR.in.viscous.methods_list = viscous.possible_methods;
+anelastic = feval(fetchParamFunction('anelastic'), '');
+VBR.in.anelastic.methods_list = anelastic.possible_methods;
+VBR.in.anelastic.eburgers_psp = Params_Anelastic('eburgers_psp');
+VBR.in.anelastic.eburgers_psp.method = 'FastBurger';
+
+end
@@ -0,0 +1,208 @@
+'''
+test_fetch_IRIS_data.py
+
+tests for fetch_IRIS_data.py: the downloads, against a local HTTP server
+(http.server in a thread) standing in for the IRIS server, and the Q model
+conversion. Run with pytest from this directory.
+'''
+
+import http.server, threading, os, json, hashlib
+import numpy as np
+import xarray as xr
+import pytest
+
+import fetch_IRIS_data as fid
+
+
+content=bytes(range(256))*40 # the served file, 10240 bytes
+server_name='model.nc'
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    ''' serves content at /server_name. self.server.mode sets how range
+    requests are answered: 'range' (206 with the requested range), 'ignore'
+    (200 with the full file), 'wrong_range' (206 from byte 0) '''
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get('Range'))
+        if self.path != '/'+server_name:
+            self.send_error(404)
+            return
+        start=0
+        byte_range=self.headers.get('Range')
+        if byte_range is not None and self.server.mode != 'ignore':
+            start=int(byte_range.split('=')[1].split('-')[0])
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header('Content-Range','bytes */'+str(len(content)))
+                self.send_header('Content-Length','0')
+                self.end_headers()
+                return
+            if self.server.mode == 'wrong_range':
+                start=0
+            self.send_response(206)
+            self.send_header('Content-Range','bytes '+str(start)+'-'+
+                             str(len(content)-1)+'/'+str(len(content)))
+        else:
+            self.send_response(200)
+        body=content[start:]
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd=http.server.HTTPServer(('127.0.0.1',0),StandInHandler)
+    httpd.mode='range'
+    httpd.requests=[]
+    thread=threading.Thread(target=httpd.serve_forever,daemon=True)
+    thread.start()
+    httpd.base_url='http://127.0.0.1:'+str(httpd.server_address[1])+'/'
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def read(fname):
+    with open(fname,'rb') as fi:
+        return fi.read()
+
+
+def write(fname, data):
+    with open(fname,'wb') as fi:
+        fi.write(data)
+
+
+def test_resume(server, tmp_path):
+    ncfile=str(tmp_path/'model.nc')
+    write(ncfile+'.part',content[:4000])
+    entry=fid.downloadFile(server.base_url+server_name,ncfile)
+    assert server.requests == ['bytes=4000-']
+    assert read(ncfile) == content
+    assert not os.path.exists(ncfile+'.part')
+    assert entry == {'size':len(content),
+                     'sha256':hashlib.sha256(content).hexdigest()}
+
+
+def test_server_ignores_range(server, tmp_path):
+    server.mode='ignore'
+    ncfile=str(tmp_path/'model.nc')
+    write(ncfile+'.part',b'x'*4000)
+    fid.downloadFile(server.base_url+server_name,ncfile)
+    assert read(ncfile) == content
+
+
+def test_wrong_content_range(server, tmp_path):
+    server.mode='wrong_range'
+    ncfile=str(tmp_path/'model.nc')
+    write(ncfile+'.part',b'x'*4000)
+    fid.downloadFile(server.base_url+server_name,ncfile)
+    assert server.requests == ['bytes=4000-', None]
+    assert read(ncfile) == content
+
+
+def test_416_complete_part(server, tmp_path):
+    # the partial file is the complete file: the server size confirms it
+    ncfile=str(tmp_path/'model.nc')
+    write(ncfile+'.part',content)
+    fid.downloadFile(server.base_url+server_name,ncfile)
+    assert server.requests == ['bytes='+str(len(content))+'-']
+    assert read(ncfile) == content
+
+
+def test_416_corrupt_part(server, tmp_path):
+    # a corrupt partial file of the full size fails the expected hash, and
+    # one larger than the served file fails the server size: both restart
+    ncfile=str(tmp_path/'model.nc')
+    expected={'sha256':hashlib.sha256(content).hexdigest()}
+    write(ncfile+'.part',b'x'*len(content))
+    fid.downloadFile(server.base_url+server_name,ncfile,expected)
+    assert server.requests == ['bytes='+str(len(content))+'-', None]
+    assert read(ncfile) == content
+
+    write(ncfile+'.part',content+b'x')
+    fid.downloadFile(server.base_url+server_name,ncfile)
+    assert read(ncfile) == content
+
+
+def test_corrupt_file_refetched(server, tmp_path):
+    # a complete .nc that fails its manifest hash is refetched from byte 0
+    savedir=str(tmp_path)
+    iris_files={'model':{'server_name':server_name}}
+    fid.fetchFiles(iris_files,savedir,base_url=server.base_url,n_workers=1)
+    assert server.requests == [None]
+
+    corrupt=b'y'*len(content)
+    write(os.path.join(savedir,'model.nc'),corrupt)
+    fid.fetchFiles(iris_files,savedir,base_url=server.base_url,n_workers=1)
+    assert server.requests == [None, None]
+    assert read(os.path.join(savedir,'model.nc')) == content
+    with open(os.path.join(savedir,fid.manifest_name)) as fi:
+        manifest=json.load(fi)
+    assert manifest['model']['sha256'] == hashlib.sha256(content).hexdigest()
+
+
+def Q_dataset(dtype):
+    ''' a small perturbation Q model with a repeated (discontinuity) depth '''
+
+    depth=np.array([60., 80., 80., 100., 120.])
+    dqp=(np.arange(5*3*4).reshape(5,3,4) % 7 - 3).astype(dtype)
+    ds=xr.Dataset({'dqp':(('depth','latitude','longitude'),dqp)},
+                  coords={'depth':depth,'latitude':[30.,35.,40.],
+                          'longitude':[-120.,-115.,-110.,-105.]})
+    return ds
+
+
+@pytest.mark.parametrize('dtype', ['float64', 'float32', 'int16'])
+def test_QSlab_discontinuity_across_slabs(dtype):
+    ds=Q_dataset(dtype)
+    entry=fid.Q_models['Gung_Romanowicz_2002']
+    full={'z':slice(None),'lat':slice(None),'lon':slice(None)}
+    expected=fid.QSlab(ds, entry, full)
+
+    # above the 80 km discontinuity Q_ref is 191, below it is 70
+    Q_ref=(ds['dqp'].values.astype('float64')/1000.+1.)/expected['Qinv']
+    assert np.allclose(Q_ref[:,0,0],[191.,191.,70.,70.,70.])
+
+    # slabs with the boundary between the two 80 km depths
+    for slab in [slice(0,2), slice(2,5)]:
+        slabs=dict(full)
+        slabs['z']=slab
+        fields=fid.QSlab(ds, entry, slabs)
+        assert fields['Qinv'].dtype == np.float64
+        assert np.array_equal(fields['Qinv'],expected['Qinv'][slab])
+        assert np.array_equal(fields['Q'],expected['Q'][slab])
+
+
+def test_chunked_conversion_is_atomic(tmp_path):
+    # an interrupted chunked conversion leaves no .mat file behind, a
+    # completed one matches the unchunked conversion
+    import h5py
+    import scipy.io as scp
+    ds=Q_dataset('float64')
+    entry=fid.Q_models['Gung_Romanowicz_2002']
+    matfile=str(tmp_path/'model.mat')
+
+    def failing_slab(ds, entry, slabs):
+        if slabs['z'] != slice(0,1):
+            raise RuntimeError('interrupted')
+        return fid.QSlab(ds, entry, slabs)
+
+    with pytest.raises(RuntimeError):
+        fid.convertModel(ds, entry, failing_slab, matfile, 'Q_Model',
+                         chunked=True, max_mem_mb=1e-4)
+    assert not os.path.exists(matfile)
+
+    fid.convertModel(ds, entry, fid.QSlab, matfile, 'Q_Model', chunked=True,
+                     max_mem_mb=1e-4)
+    assert not os.path.exists(matfile+'.tmp')
+    unchunked=str(tmp_path/'unchunked.mat')
+    fid.convertModel(ds, entry, fid.QSlab, unchunked, 'Q_Model')
+    expected=scp.loadmat(unchunked)['Q_Model']['Q'][0,0]
+    with h5py.File(matfile,'r') as f5:
+        # MATLAB (lat, lon, z) is stored as (z, lon, lat)
+        assert np.array_equal(f5['Q_Model']['Q'][()].transpose(2,1,0),expected)
@@ -0,0 +1,115 @@
+'''
+test_seismic_profiles.py
+
+tests for seismic_profiles.py: profiles and observations from the index of a
+small synthetic model, compared to brute force calculations over the full
+arrays (following process_SeismicModels.m for the observations). Run with
+pytest from this directory.
+'''
+
+import warnings
+import numpy as np
+import scipy.io as scp
+from scipy.interpolate import RegularGridInterpolator
+import pytest
+
+import seismic_profiles as sp
+
+
+Latitude=np.arange(30.,40.01,0.5)
+Longitude=np.arange(-120.,-109.99,0.5)
+Depth=np.array([50.,60.,75.,80.,90.,100.,120.])
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    ''' a Vs model with an Error field and some missing values '''
+
+    rng=np.random.default_rng(42)
+    shape=(Latitude.size,Longitude.size,Depth.size)
+    Vs=4.+0.3*rng.standard_normal(shape)
+    Vs[rng.random(shape) < 0.05]=np.nan
+    Error=0.02+0.1*rng.random(shape)
+    matfile=str(tmp_path/'model.mat')
+    scp.savemat(matfile,{'Vs_Model':{'Latitude':Latitude,'Longitude':Longitude,
+                                     'Depth':Depth,'Vs':Vs,'Error':Error}})
+    return matfile, Vs, Error
+
+
+def brute_observation(Vs, Error, lat, lon, z_min, z_max, smooth_rad):
+    ''' one location, as in process_SeismicModels.m '''
+
+    lon_360=np.mod(Longitude,360.)
+    lat_mask=(Latitude >= lat-smooth_rad) & (Latitude <= lat+smooth_rad)
+    lon_mask=(lon_360 >= lon-smooth_rad) & (lon_360 <= lon+smooth_rad)
+    if not np.any(lat_mask) or not np.any(lon_mask):
+        return np.nan, np.nan
+    vals=Vs[lat_mask][:,lon_mask].reshape(-1,Depth.size)
+    errs=Error[lat_mask][:,lon_mask].reshape(-1,Depth.size)
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore',RuntimeWarning)
+        value_z=np.nanmedian(vals,axis=0)
+        error_z=np.fmax(np.nanmedian(errs,axis=0),np.nanstd(vals,axis=0,ddof=1))
+    in_z=(Depth >= z_min) & (Depth <= z_max)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore',RuntimeWarning)
+        return np.nanmedian(value_z[in_z]), np.nanmedian(error_z[in_z])
+
+
+def test_observations(model_file):
+    matfile, Vs, Error=model_file
+    model=sp.SeismicModel(matfile)
+    rng=np.random.default_rng(0)
+    n_pts=60
+    lat=rng.uniform(31.,39.,n_pts)
+    lon=rng.uniform(-119.,-111.,n_pts)
+    # several box sizes, including single-node boxes
+    smooth_rad=rng.choice([0.2,0.5,0.8,1.3],n_pts)
+    z_min=rng.choice([50.,60.,75.],n_pts)
+    z_max=rng.choice([80.,100.,120.],n_pts)
+    obs_value,obs_error=model.observations(lat,lon,z_min,z_max,smooth_rad,'Vs')
+
+    for ipt in range(n_pts):
+        value,error=brute_observation(Vs,Error,lat[ipt],np.mod(lon[ipt],360.),
+                                      z_min[ipt],z_max[ipt],smooth_rad[ipt])
+        assert np.allclose(obs_value[ipt],value,equal_nan=True)
+        assert np.allclose(obs_error[ipt],error,equal_nan=True)
+
+
+def test_observations_depth_bounds(model_file):
+    matfile, Vs, Error=model_file
+    model=sp.SeismicModel(matfile)
+    lat=[35.,35.,35.]
+    lon=[-115.,-115.,-115.]
+    # inside the bounds, above the shallowest node, between two nodes
+    z_min=[60.,40.,81.]
+    z_max=[100.,100.,85.]
+    with pytest.warns(UserWarning, match='2 of 3 locations'):
+        obs_value,obs_error=model.observations(lat,lon,z_min,z_max,0.5,'Vs')
+    assert np.isfinite(obs_value[0]) and np.isfinite(obs_error[0])
+    assert np.all(np.isnan(obs_value[1:])) and np.all(np.isnan(obs_error[1:]))
+
+
+def test_profiles(model_file):
+    matfile, Vs, Error=model_file
+    model=sp.SeismicModel(matfile)
+    rng=np.random.default_rng(1)
+    n_pts=40
+    lat=np.append(rng.uniform(30.,40.,n_pts),45.)
+    lon=np.append(rng.uniform(-120.,-110.,n_pts),-115.)
+
+    linear=model.profiles(lat,lon,'Vs','linear')
+    interp=RegularGridInterpolator((Latitude,np.mod(Longitude,360.)),Vs,
+                                   bounds_error=False)
+    expected=interp(np.column_stack((lat,np.mod(lon,360.))))
+    assert np.allclose(linear,expected,equal_nan=True)
+
+    nearest=model.profiles(lat,lon,'Vs','nearest')
+    node_lat,node_lon=np.meshgrid(Latitude,Longitude,indexing='ij')
+    nodes=sp.unitVectors(node_lat.ravel(),node_lon.ravel())
+    for ipt in range(n_pts):
+        point=sp.unitVectors([lat[ipt]],[lon[ipt]])
+        i_lat,i_lon=np.unravel_index(np.argmax(nodes @ point[0]),node_lat.shape)
+        assert np.array_equal(nearest[ipt],Vs[i_lat,i_lon],equal_nan=True)
+    # the last point is outside the model
+    assert np.all(np.isnan(linear[-1])) and np.all(np.isnan(nearest[-1]))
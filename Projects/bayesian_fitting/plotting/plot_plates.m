@@ -55,7 +55,7 @@ for i_Tp = 1:size(Box.Box, 1)
     for i_zPlate = 1:size(Box.Box, 2)
         b = Box.Box(i_Tp, i_zPlate);
         z = b.run_info.Z_km;
-        t = b.Frames(end).T;
+        t = getBoxFrame(b, 1, 'end').T;
         % Plot Vs and Q at the frequency closest to T = 80 s.
         [~, i_f] = min(abs(1 ./ VBR.VBR(i_Tp, i_zPlate).in.SV.f - 80));
         vs = VBR.VBR(i_Tp, i_zPlate).out.anelastic.(q_method).V(:, i_f) ./1e3;
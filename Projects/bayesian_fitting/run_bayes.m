@@ -35,6 +35,19 @@ filenames.LAB = './data/LAB_models/HopperFischer2018.mat';
 
 q_methods = {'eburgers_psp'; 'xfit_mxw'; 'xfit_premelt'; 'andrade_psp'};
 
+% 'full_grid' calculates (or loads) VBR at every combination of the state
+% variables once. 'adaptive' calculates VBR for each location only where the
+% posterior is not negligible, see posterior_adaptive_grid.
+sampler = 'full_grid';
+if strcmp(sampler, 'adaptive')
+    sampler_params.sampler = 'adaptive';
+    sampler_params.T = 1100:20:1800; %[degrees C]
+    sampler_params.phi = (0.0:0.0025:0.05); % melt fraction
+    gsmin = 0.0001*1e6; gsmax = 0.03*1e6; gsref = 0.001*1e6;
+    sampler_params.gs = gsref * exp(linspace(log(gsmin/gsref),log(gsmax/gsref),25));
+    sampler_params.gs_params = struct('type','log','gsmin',gsmin,'gsmax',gsmax,'gsref',gsref);
+end
+
 gs_prior_case = 'log_uniform';
 switch gs_prior_case
   case 'log_uniform'  
@@ -79,7 +92,9 @@ for iq = 1:length(q_methods)
         locname = names{il};
         disp(['     fitting ',locname])
 
-        if firstRun==1
+        if strcmp(sampler, 'adaptive')
+          [posterior_A,sweep] = fit_seismic_observations(filenames, location, q_method, grain_size_prior, sampler_params);
+        elseif firstRun==1
           [posterior_A,sweep] = fit_seismic_observations(filenames, location, q_method, grain_size_prior);
           firstRun=0;
         else
@@ -2,8 +2,9 @@ function Ranges=getVarRange(VBR,target_val,target_var,freq_target,cutoff,scl)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
   % Ranges=getVarRange(VBR,target_val,target_var,freq_target,cutoff,scl)
   %
-  % finds parameter ranges within cutoff percent of target_val. Only a simple
-  % gridsearch, does not account for co-varying parameters. 
+  % finds parameter ranges within cutoff percent of target_val, using the
+  % inverse LUT index (lut_inverse_index, lut_inverse_query). Does not
+  % account for co-varying parameters.
   %
   % Parameters
   % ----------
@@ -22,20 +23,19 @@ function Ranges=getVarRange(VBR,target_val,target_var,freq_target,cutoff,scl)
   meths=fieldnames(VBR.out.anelastic);
   Nmeths=numel(meths);
 
-  [val,ifreq]=min(abs(VBR.in.SV.f-freq_target));
+  % states within cutoff percent of target_val, from the inverse LUT index
+  Index=lut_inverse_index(VBR,{target_var},'scale',scl);
+  obs.(target_var)=target_val;
+  obs.f=freq_target;
+  Matches=lut_inverse_query(Index,obs,'rel_tol',cutoff/100,'ranges',0);
+
   SVflds={'T_K';'dg_um';'phi'};
   for imeth=1:Nmeths
     meth=meths{imeth};
-    var=squeeze(VBR.out.anelastic.(meth).(target_var)(:,:,:,ifreq))*scl;
-    dvar=abs(var-target_val)./target_val*100;
-
-    T=VBR.in.SV.T_K(dvar<=cutoff)-273;
-    d=VBR.in.SV.dg_um(dvar<=cutoff);
-    phi=VBR.in.SV.phi(dvar<=cutoff);
+    good=Matches.(meth).state_index;
 
     for ifl=1:numel(SVflds)
-%       goodvals=VBR.in.SV.(SVflds{ifl})(dvar<=cutoff)(:); % WAS
-      goodvals=VBR.in.SV.(SVflds{ifl})(dvar<=cutoff);
+      goodvals=VBR.in.SV.(SVflds{ifl})(good);
       fldn=SVflds{ifl};
       if strcmp(fldn,'T_K')
         fldn='T_C';
@@ -62,7 +62,7 @@ function Ranges=getVarRange(VBR,target_val,target_var,freq_target,cutoff,scl)
     thisline=meths{imeth};
     for ifl=1:numel(SVflds)
       fldn=SVflds{ifl};
-      thisline=[thisline,',',num2str(Ranges.(meth).(fldn).min),',',num2str(Ranges.(meth).(fldn).max)];
+      thisline=[thisline,',',num2str(Ranges.(meths{imeth}).(fldn).min),',',num2str(Ranges.(meths{imeth}).(fldn).max)];
     end
     thisline=[thisline,'\n'];
     fprintf(thisline)
@@ -41,47 +41,14 @@ settings.Flags.T_init='oceanic'; % 'continental' 'oceanic' or 'adiabatic'
 %  Specify data reduction method for Box storage
 settings.Box.DownSampleMeth='interp';
 settings.Box.DownSampleFactor=1;
-[Box,settings] = BuildBox(settings); %% Build The Box (do this once):
 
-% Load Default Settings for the forward model runs
-[settings]=init_settings(settings);
-
-% loop over Parameter sweep settings settings, run forward model for each permuatation
-Work.nBox=settings.Box.nvar1 * settings.Box.nvar2;
-for iBox = 1:Work.nBox
-
-  disp(' ');disp('--------------------------------------------------')
-  disp(['Starting run ' num2str(iBox) ' of ' num2str(Work.nBox)])
-
-  % update the current settings for this permutation
-  settings.(settings.Box.var1name) = Box(iBox).info.var1val;
-  disp([settings.Box.var1name '=' num2str(settings.(settings.Box.var1name))...
-       settings.Box.var1units]);
-  if isfield(settings.Box,'var2name')
-    settings.(settings.Box.var2name) = Box(iBox).info.var2val;
-    disp([settings.Box.var2name '=' num2str(settings.(settings.Box.var2name))...
-       settings.Box.var2units]);
-  end
-
-  % build the initial conditions for this permutation
-  settings.Zinfo.zmax=settings.zPlate;
-  settings.Zinfo.dz0 = settings.dz0;
-  settings.Zinfo = init_mesh(settings.Zinfo); % build the mesh!
-  [Info] = init_values(settings); % calculate initial values
-
-  % initalize  the boundary conditions
-  [Info.BCs]=init_BCs(struct(),'T','zmin','dirichlet',0);
-  [Info.BCs]=init_BCs(Info.BCs,'T','zmax','dirichlet',Info.init.T(end));
-
-  % Lithosphere temperature evolution (the actual calculation)
-  [Vars,Info]=Thermal_Evolution(Info,settings);
-
-  % Add on adiabatic asthenosphere
-  [Vars,Info]=postproc_append_astheno(Vars,Info,settings);
-
-  % Put the run in the Box.
-  [Box] = Put_in_Box(Box,Vars,Info,settings,iBox);
-end
+% run the forward model for each permutation of the parameter sweep. Each
+% run is saved to its own file in checkpoint_dir when it completes: if the
+% sweep is interrupted, running this script again only runs the remaining
+% models. Set n_workers to run the models in parallel (parfor).
+checkpoint_dir = 'box_runs';
+n_workers = 0;
+[Box,settings] = runBoxEnsemble(settings,checkpoint_dir,'n_workers',n_workers);
 
 disp(' ');disp('--------------------------------------------------');disp(' ')
 
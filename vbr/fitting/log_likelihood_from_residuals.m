@@ -0,0 +1,34 @@
+function log_likelihood = log_likelihood_from_residuals(obs_val, obs_std, predicted_vals)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+%
+% log_likelihood = log_likelihood_from_residuals(obs_val, obs_std, predicted_vals)
+%
+% Calculate the natural log of the likelihood of the observed value at each
+% of the given combination of state variables, see
+% likelihood_from_residuals. Unlike the likelihood itself, the log
+% likelihood does not underflow to 0 for large residuals:
+%       log(p(D|A)) = -0.5 * log(2 * pi * sigma^2) - 0.5 * chi-square
+%
+% Parameters:
+% -----------
+% obs_val
+%     observed (seismic) property
+% obs_std
+%     standard deviation on the observed value
+% predicted_vals
+%     matrix of calculated values of the observed property at each of the
+%     different parameter sweep combinations
+%
+% Output:
+% -------
+% log_likelihood
+%       (size(predicted_vals)) matrix of the log likelihood
+%
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+chi_squared = ((predicted_vals - obs_val) .^ 2 ...
+               ./ (obs_std .^ 2));
+
+log_likelihood = -0.5 * log(2 * pi * obs_std.^2) - 0.5 * chi_squared;
+
+end
@@ -0,0 +1,80 @@
+function [log_marginals, sigmaPreds] = log_prior_marginals(states, states_fields)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+%
+% [log_marginals, sigmaPreds] = log_prior_marginals(states, states_fields)
+%
+% Calculate the natural log of the prior probability of each state variable
+% in states_fields, using the same distributions as priorModelProbs. As the
+% state variables are independent, the log of the joint prior is the sum of
+% the log marginals, which is how posterior_streaming combines them without
+% building the joint prior over the full grid.
+%
+% Parameters
+% ----------
+% states: structure
+%   A structure with the fields described in priorModelProbs for each
+%   state in the list states_fields. [field] may be either the vector of
+%   values of that state variable or the full grid of size
+%   (n_var1, n_var2, ...). An input [field]_pdf is used as given (a vector
+%   or a full grid).
+%
+% states_fields: cell array
+%    names of all of the state variables we are varying.
+%
+% Returns
+% -------
+% [log_marginals, sigmaPreds]
+%   log_marginals
+%       cell array with the log prior probability of each state variable,
+%       each the same size as states.(field) (or states.([field, '_pdf']))
+%   sigmaPreds
+%       joint standard deviation, as in priorModelProbs
+%
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  sigmaPreds = 1;
+  log_marginals = cell(1, numel(states_fields));
+
+  for i_field = 1:numel(states_fields)
+    this_field = states_fields{i_field};
+    std_field = [this_field, '_std'];
+    mn_field = [this_field, '_mean'];
+
+    if isfield(states, [this_field, '_pdf_type'])
+        pdf_type = states.([this_field, '_pdf_type']);
+    else
+        pdf_type = 'uniform';
+    end
+    if isfield(states, [this_field, '_pdf'])
+        pdf_type = 'input';
+    end
+
+    switch pdf_type
+        case 'input'
+            log_marginals{i_field} = log(states.([this_field, '_pdf']));
+            sigma = states.(std_field);
+        case 'normal'
+            sigma = states.(std_field);
+            mu = states.(mn_field);
+            x = states.(this_field);
+            log_marginals{i_field} = -0.5 * log(2 * pi * sigma.^2) ...
+                                     - (x - mu).^2 ./ (2 * sigma.^2);
+        case 'lognormal'
+            sigma = states.(std_field);
+            mu = states.(mn_field);
+            x = states.(this_field);
+            log_marginals{i_field} = -(log(x) - mu).^2 ./ (2 * sigma.^2) ...
+                                     - log(x .* sigma * sqrt(2 * pi));
+        case 'uniformlog'
+            x = log(states.(this_field));
+            sigma = 1;
+            log_marginals{i_field} = -log(max(x(:)) - min(x(:))) * ones(size(x));
+        otherwise
+            x = states.(this_field);
+            sigma = 1;
+            log_marginals{i_field} = -log(max(x(:)) - min(x(:))) * ones(size(x));
+    end
+
+    sigmaPreds = sigmaPreds .* sigma;
+  end
+end
@@ -0,0 +1,127 @@
+function Index = lut_inverse_index(VBR, fields, varargin)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+%
+% Index = lut_inverse_index(VBR, fields, varargin)
+%
+% Builds an inverse index over the anelastic output of a VBR look-up table
+% (LUT), for finding the states that match observations of one or more
+% output fields (e.g., V and Q) with lut_inverse_query. For each method and
+% frequency, the states are sorted by the first field, so that the states
+% within a tolerance of an observation are found by binary search rather
+% than by scanning the whole LUT. Build the index once, then query it with
+% any number of observations.
+%
+% Parameters
+% ----------
+% VBR: structure
+%   the VBR structure after VBR_spine, with VBR.out.anelastic
+%
+% fields: cell array
+%   the output fields to index, e.g., {'V', 'Q'}. Observations are matched
+%   to the states with lut_inverse_query, using the first field for the
+%   sorted search and the others as filters, so list the field with the
+%   most selective tolerance first.
+%
+% optional key-value pairs:
+%   'methods' : cell array of the anelastic methods to index, default all
+%               methods in VBR.out.anelastic
+%   'scale' : a factor for each field applied to the LUT values, e.g.,
+%             [1e-3, 1] to match V observations in km/s. Default 1.
+%
+% Returns
+% -------
+% Index: structure with fields
+%   fields, methods
+%       the indexed fields and methods
+%   f
+%       the LUT frequencies (empty if the fields do not depend on frequency)
+%   SV_size
+%       the size of the state variable arrays
+%   SV
+%       the state variables (except f) as column vectors, for the state
+%       variable ranges of the matches
+%   lut.(method)
+%       for each method, with n_f frequencies (1 if the fields do not depend
+%       on frequency):
+%         .values  cell array with the (n_states, n_f) scaled values of
+%                  each field
+%         .sorted  (n_states, n_f) values of the first field, sorted for
+%                  each frequency (NaN values last)
+%         .order   (n_states, n_f) linear state index of each sorted value
+%
+% Examples
+% --------
+%    Index = lut_inverse_index(VBR, {'V', 'Q'}, 'scale', [1e-3, 1]);
+%    obs.V = [4.3; 4.4]; obs.Q = [80; 120]; obs.f = 0.01;
+%    Matches = lut_inverse_query(Index, obs, 'rel_tol', [0.001, 0.05]);
+%
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  defaults.methods = fieldnames(VBR.out.anelastic);
+  defaults.scale = 1;
+  options = nested_structure_update(defaults, varargin_keyvals_to_structure(varargin));
+  if ischar(fields)
+    fields = {fields};
+  end
+  n_fields = numel(fields);
+  scale = options.scale;
+  if numel(scale) == 1
+    scale = scale * ones(1, n_fields);
+  elseif numel(scale) ~= n_fields
+    error('lut_inverse_index: scale must have one value for each field')
+  end
+
+  % the state variables, as columns
+  SV_flds = fieldnames(VBR.in.SV);
+  SV_size = [1, 1];
+  for ifld = 1:numel(SV_flds)
+    val = VBR.in.SV.(SV_flds{ifld});
+    if ~strcmp(SV_flds{ifld}, 'f') && isnumeric(val) && numel(val) > prod(SV_size)
+      SV_size = size(val);
+    end
+  end
+  n_states = prod(SV_size);
+  Index = struct();
+  Index.fields = fields;
+  Index.methods = options.methods;
+  Index.f = [];
+  Index.SV_size = SV_size;
+  Index.SV = struct();
+  for ifld = 1:numel(SV_flds)
+    val = VBR.in.SV.(SV_flds{ifld});
+    if ~strcmp(SV_flds{ifld}, 'f') && isnumeric(val) && numel(val) == n_states
+      Index.SV.(SV_flds{ifld}) = val(:);
+    end
+  end
+
+  Index.lut = struct();
+  for i_meth = 1:numel(Index.methods)
+    meth = Index.methods{i_meth};
+    lut = struct();
+    lut.values = cell(1, n_fields);
+    for ifld = 1:n_fields
+      val = VBR.out.anelastic.(meth).(fields{ifld});
+      n_f = numel(val) / n_states;
+      if n_f > 1
+        Index.f = VBR.in.SV.f(:)';
+        if n_f ~= numel(Index.f)
+          error(['lut_inverse_index: ', meth, '.', fields{ifld}, ...
+                 ' does not have one value per state and frequency'])
+        end
+      elseif n_f ~= 1
+        error(['lut_inverse_index: ', meth, '.', fields{ifld}, ...
+               ' does not have one value per state'])
+      end
+      lut.values{ifld} = reshape(double(val), n_states, n_f) * scale(ifld);
+    end
+    n_f = max(cellfun(@(v) size(v, 2), lut.values));
+    for ifld = 1:n_fields
+      if size(lut.values{ifld}, 2) < n_f
+        lut.values{ifld} = repmat(lut.values{ifld}, 1, n_f);
+      end
+    end
+    [lut.sorted, order] = sort(lut.values{1}, 1);
+    lut.order = uint32(order);
+    Index.lut.(meth) = lut;
+  end
+end
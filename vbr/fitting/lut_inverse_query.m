@@ -0,0 +1,199 @@
+function Matches = lut_inverse_query(Index, obs, varargin)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+%
+% Matches = lut_inverse_query(Index, obs, varargin)
+%
+% Finds the states of a look-up table that match each of a batch of
+% observations within a relative tolerance,
+%       abs(value - observed) <= rel_tol * abs(observed)
+% for every indexed field, using the inverse index from lut_inverse_index.
+% For each observation, the candidate states of the first field are found
+% by binary search in the sorted values (vectorized over all observations)
+% and then filtered by the other fields, so the cost depends on the number
+% of candidates rather than the size of the LUT.
+%
+% Parameters
+% ----------
+% Index: structure
+%   the inverse index from lut_inverse_index
+%
+% obs: structure
+%   the observations, with a field for each of Index.fields holding a
+%   vector of n_obs observed values (in the units of the scaled LUT), and
+%   optionally
+%     f : the frequency of the observations, a scalar or n_obs vector. Each
+%         observation is matched at the nearest LUT frequency. Required if
+%         the index has more than one frequency.
+%
+% optional key-value pairs:
+%   'rel_tol' : relative tolerance, a scalar or one value for each field,
+%               default 0.01
+%   'methods' : cell array of the methods to search, default Index.methods
+%   'ranges' : if 1 (default), also return the minimum and maximum of each
+%              state variable over the matches of each observation
+%
+% Returns
+% -------
+% Matches: structure with fields
+%   f_index
+%       (n_obs, 1) index of the LUT frequency used for each observation
+%   (method)
+%       for each method, the matches of all observations, grouped by
+%       observation:
+%         .state_index  linear indices of the matching states (in the state
+%                       variable arrays of the LUT), for observation i_obs
+%                       state_index(obs_start(i_obs) + (0:n_matches(i_obs)-1))
+%         .obs_start    (n_obs, 1) position of the first match of each
+%                       observation in state_index
+%         .n_matches    (n_obs, 1) number of matches of each observation
+%         .ranges.(SV field).min, .max
+%                       (n_obs, 1) range of each state variable over the
+%                       matches, NaN without matches
+%
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  defaults.rel_tol = 0.01;
+  defaults.methods = Index.methods;
+  defaults.ranges = 1;
+  options = nested_structure_update(defaults, varargin_keyvals_to_structure(varargin));
+
+  fields = Index.fields;
+  n_fields = numel(fields);
+  rel_tol = options.rel_tol;
+  if numel(rel_tol) == 1
+    rel_tol = rel_tol * ones(1, n_fields);
+  elseif numel(rel_tol) ~= n_fields
+    error('lut_inverse_query: rel_tol must have one value for each field')
+  end
+
+  targets = cell(1, n_fields);
+  for ifld = 1:n_fields
+    if ~isfield(obs, fields{ifld})
+      error(['lut_inverse_query: obs.', fields{ifld}, ' is required'])
+    end
+    targets{ifld} = double(obs.(fields{ifld})(:));
+  end
+  n_obs = numel(targets{1});
+
+  % the LUT frequency of each observation
+  if numel(Index.f) > 1
+    if ~isfield(obs, 'f')
+      error('lut_inverse_query: obs.f is required for a LUT with several frequencies')
+    end
+    f_obs = obs.f(:) .* ones(n_obs, 1);
+    [~, f_index] = min(abs(bsxfun(@minus, f_obs, Index.f)), [], 2);
+  else
+    f_index = ones(n_obs, 1);
+  end
+  Matches = struct();
+  Matches.f_index = f_index;
+
+  for i_meth = 1:numel(options.methods)
+    meth = options.methods{i_meth};
+    lut = Index.lut.(meth);
+    obs_id = [];
+    state_index = [];
+    for i_f = unique(f_index)'
+      i_obs = find(f_index == i_f);
+      [obs_f, states_f] = match_frequency(lut, i_f, targets, i_obs, rel_tol);
+      obs_id = [obs_id; obs_f];
+      state_index = [state_index; states_f];
+    end
+
+    % group the matches by observation (sort is stable)
+    [obs_id, order] = sort(obs_id);
+    state_index = state_index(order);
+    n_matches = accumarray(obs_id, ones(size(obs_id)), [n_obs, 1]);
+    result = struct();
+    result.state_index = state_index;
+    result.obs_start = cumsum([1; n_matches(1:end-1)]);
+    result.n_matches = n_matches;
+    if options.ranges
+      result.ranges = state_ranges(Index.SV, obs_id, state_index, n_obs);
+    end
+    Matches.(meth) = result;
+  end
+end
+
+
+function [obs_id, states] = match_frequency(lut, i_f, targets, i_obs, rel_tol)
+  % the matching (observation, state) pairs at a single frequency
+  sorted = lut.sorted(:, i_f);
+  n_valid = sum(~isnan(sorted)); % NaN values are sorted last
+  sorted = sorted(1:n_valid);
+
+  % candidate range of the first field, widened slightly so that rounding
+  % does not drop states on the edge of the tolerance
+  target = targets{1}(i_obs);
+  half_width = rel_tol(1) * abs(target);
+  lo = target - half_width;
+  hi = target + half_width;
+  lo = lo - 4 * eps(abs(lo));
+  hi = hi + 4 * eps(abs(hi));
+  first = count_below(sorted, lo, 0) + 1;
+  last = count_below(sorted, hi, 1);
+  n_cand = max(last - first + 1, 0);
+
+  % expand to one row per candidate
+  n_total = sum(n_cand);
+  if n_total == 0
+    obs_id = zeros(0, 1);
+    states = zeros(0, 1);
+    return
+  end
+  obs_local = zeros(n_total, 1);
+  has_cand = find(n_cand > 0);
+  starts = cumsum([1; n_cand(1:end-1)]);
+  obs_local(starts(has_cand)) = [has_cand(1); diff(has_cand)];
+  obs_local = cumsum(obs_local);
+  sorted_pos = first(obs_local) + (1:n_total)' - starts(obs_local);
+  states = double(lut.order(sorted_pos, i_f));
+
+  keep = true(n_total, 1);
+  for ifld = 1:numel(targets)
+    target = targets{ifld}(i_obs(obs_local));
+    vals = lut.values{ifld}(states, i_f);
+    keep = keep & abs(vals - target) <= rel_tol(ifld) * abs(target);
+  end
+  obs_id = i_obs(obs_local(keep));
+  states = states(keep);
+end
+
+
+function n = count_below(sorted, x, inclusive)
+  % the number of sorted values < x (or <= x if inclusive), a binary search
+  % vectorized over x
+  lo = zeros(size(x));
+  hi = numel(sorted) * ones(size(x));
+  active = lo < hi;
+  while any(active)
+    mid = floor((lo(active) + hi(active) + 1) / 2);
+    if inclusive
+      below = sorted(mid) <= x(active);
+    else
+      below = sorted(mid) < x(active);
+    end
+    below = below(:);
+    lo_a = lo(active);
+    hi_a = hi(active);
+    lo_a(below) = mid(below);
+    hi_a(~below) = mid(~below) - 1;
+    lo(active) = lo_a;
+    hi(active) = hi_a;
+    active = lo < hi;
+  end
+  n = lo;
+end
+
+
+function ranges = state_ranges(SV, obs_id, state_index, n_obs)
+  % the minimum and maximum of each state variable over the matches of each
+  % observation
+  ranges = struct();
+  flds = fieldnames(SV);
+  for ifld = 1:numel(flds)
+    vals = SV.(flds{ifld})(state_index);
+    ranges.(flds{ifld}).min = accumarray(obs_id, vals, [n_obs, 1], @min, NaN);
+    ranges.(flds{ifld}).max = accumarray(obs_id, vals, [n_obs, 1], @max, NaN);
+  end
+end
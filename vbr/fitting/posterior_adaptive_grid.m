@@ -0,0 +1,243 @@
+function [Post, predicted] = posterior_adaptive_grid(states, states_fields, forward_fun, observations, varargin)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+%
+% [Post, predicted] = posterior_adaptive_grid(states, states_fields, ...
+%                                             forward_fun, observations, varargin)
+%
+% Calculate the posterior over a grid of state variables while calling the
+% forward model at only some of the grid points, by refining the grid
+% where the posterior is not negligible.
+%
+% The forward model is first evaluated on a coarse lattice (every
+% initial_spacing-th value of each state variable). At each refinement
+% level, the posterior is calculated on the current lattice and every
+% lattice cell with a corner within a factor of threshold of the maximum
+% posterior (for each observation alone and for all observations together)
+% is flagged, along with buffer neighboring cells. The lattice spacing is
+% then halved: points in flagged cells are evaluated with the forward
+% model, all others are interpolated (multilinearly, in grid index space)
+% from the coarser lattice. At the final level the lattice is the full
+% grid, and the posterior is calculated with posterior_streaming from the
+% evaluated and interpolated predictions. Points far from the
+% high-probability regions are interpolated, so their predictions are
+% approximate, but their posterior probability is negligible.
+%
+% Parameters
+% ----------
+% states: structure
+%   the grid axes and priors, as in posterior_streaming. Each state
+%   variable must have at least 2 values.
+%
+% states_fields: cell array
+%    names of the state variables, in the order of the grid dimensions.
+%
+% forward_fun: function handle
+%    predicted = forward_fun(points), where points is a structure with a
+%    column vector of values for each state variable (one row per point)
+%    and predicted is a (number of points, number of observations) array of
+%    the predicted observations.
+%
+% observations: structure array
+%   one element for each observation (in the order of the forward_fun
+%   output columns), with fields value and std (see posterior_streaming).
+%
+% optional key-value pairs:
+%   'initial_spacing' : spacing of the coarsest lattice in grid points,
+%                       rounded up to a power of 2, default 8
+%   'threshold' : cells with a posterior above threshold times the maximum
+%                 posterior are refined, default 1e-4
+%   'buffer' : number of neighboring cells also refined, default 1
+%   'batch_size' : maximum number of points per forward_fun call,
+%                  default 1e4
+%   'log_prior', 'chunk_size', 'top_k', 'pair_marginals' : passed on to
+%                 posterior_streaming (log_prior is also used for refining)
+%
+% Returns
+% -------
+% Post: structure
+%   the output of posterior_streaming, with additional fields
+%     n_evaluations
+%         number of grid points at which forward_fun was evaluated
+%     evaluated
+%         (n_var1, n_var2, ...) logical array, true where forward_fun was
+%         evaluated
+% predicted: cell array
+%   the (n_var1, n_var2, ...) array of the predictions of each observation,
+%   evaluated or interpolated, e.g., to calculate the full posterior with
+%   priorModelProbs and likelihood_from_residuals.
+%
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  defaults.initial_spacing = 8;
+  defaults.threshold = 1e-4;
+  defaults.buffer = 1;
+  defaults.batch_size = 1e4;
+  defaults.log_prior = [];
+  defaults.chunk_size = 1e5;
+  defaults.top_k = 10;
+  defaults.pair_marginals = 0;
+  options = nested_structure_update(defaults, varargin_keyvals_to_structure(varargin));
+
+  n_vars = numel(states_fields);
+  n_obs = numel(observations);
+  grid_size = ones(1, max(n_vars, 2));
+  for i_var = 1:n_vars
+    grid_size(i_var) = numel(states.(states_fields{i_var}));
+  end
+  if any(grid_size(1:n_vars) < 2)
+    error('posterior_adaptive_grid: each state variable needs at least 2 values')
+  end
+  n_grid = prod(grid_size);
+  if isempty(options.log_prior)
+    log_priors = log_prior_marginals(states, states_fields);
+  else
+    log_priors = {options.log_prior};
+  end
+
+  % lattice convolution kernels: 2^d corners of a cell and the buffer
+  corners = ones([2 * ones(1, n_vars), 1]);
+  neighbors = ones([(2 * options.buffer + 1) * ones(1, n_vars), 1]);
+
+  pred = NaN(n_grid, n_obs);
+  evaluated = false(n_grid, 1);
+
+  spacing = 2^ceil(log2(max(options.initial_spacing, 1)));
+  L = lattice(grid_size(1:n_vars), spacing);
+  lin = lattice_indices(L, grid_size);
+  [pred, evaluated] = evaluate_points(pred, evaluated, lin, states, ...
+      states_fields, grid_size, forward_fun, options.batch_size);
+  V = pred(lin, :);
+
+  while spacing > 1
+    % flag the cells of the current lattice with a significant posterior
+    lp = lattice_log_posteriors(V, lin, log_priors, observations, grid_size);
+    important = false(numel(lin), 1);
+    for i_lp = 1:size(lp, 2)
+      lp_max = max(lp(:, i_lp));
+      if lp_max > -Inf
+        important = important | lp(:, i_lp) >= lp_max + log(options.threshold);
+      end
+    end
+    lattice_size = [cellfun(@numel, L), 1];
+    flags = convn(double(reshape(important, lattice_size)), corners, 'valid') > 0;
+    if options.buffer > 0
+      flags = convn(double(flags), neighbors, 'same') > 0;
+    end
+
+    % halve the spacing, evaluate the points in flagged cells
+    spacing = spacing / 2;
+    L_fine = lattice(grid_size(1:n_vars), spacing);
+    lin_fine = lattice_indices(L_fine, grid_size);
+    cells = cell(1, n_vars);
+    for i_var = 1:n_vars
+      cells{i_var} = sum(bsxfun(@le, L{i_var}(:), L_fine{i_var}(:)'), 1);
+      cells{i_var} = min(cells{i_var}, numel(L{i_var}) - 1);
+    end
+    in_flagged = flags(cells{:});
+    todo = lin_fine(in_flagged(:) & ~evaluated(lin_fine));
+    [pred, evaluated] = evaluate_points(pred, evaluated, todo, states, ...
+        states_fields, grid_size, forward_fun, options.batch_size);
+
+    % interpolate the rest from the current lattice
+    V_fine = zeros(numel(lin_fine), n_obs);
+    for i_obs = 1:n_obs
+      V_fine(:, i_obs) = interpolate_lattice(L, V(:, i_obs), L_fine);
+    end
+    is_eval = evaluated(lin_fine);
+    V_fine(is_eval, :) = pred(lin_fine(is_eval), :);
+
+    L = L_fine;
+    lin = lin_fine;
+    V = V_fine;
+  end
+
+  % the final lattice is the full grid, in linear index order
+  predicted = cell(1, n_obs);
+  for i_obs = 1:n_obs
+    predicted{i_obs} = reshape(V(:, i_obs), grid_size);
+    observations(i_obs).predicted = predicted{i_obs};
+  end
+  Post = posterior_streaming(states, states_fields, observations, ...
+                             'chunk_size', options.chunk_size, ...
+                             'top_k', options.top_k, ...
+                             'pair_marginals', options.pair_marginals, ...
+                             'log_prior', options.log_prior);
+  Post.n_evaluations = sum(evaluated);
+  Post.evaluated = reshape(evaluated, grid_size);
+end
+
+function L = lattice(grid_size, spacing)
+  % grid indices of the lattice with the given spacing along each axis,
+  % always including the last index
+  L = cell(1, numel(grid_size));
+  for i_var = 1:numel(grid_size)
+    L{i_var} = unique([1:spacing:grid_size(i_var), grid_size(i_var)]);
+  end
+end
+
+function lin = lattice_indices(L, grid_size)
+  % linear grid indices of every lattice point, in lattice (ndgrid) order
+  if numel(L) == 1
+    lin = L{1}(:);
+    return
+  end
+  subs = cell(1, numel(L));
+  [subs{:}] = ndgrid(L{:});
+  lin = sub2ind(grid_size, subs{:});
+  lin = lin(:);
+end
+
+function lp = lattice_log_posteriors(V, lin, log_priors, observations, grid_size)
+  % log posterior at the lattice points for each observation alone and for
+  % all together (one column each)
+  subs = cell(1, numel(grid_size));
+  [subs{:}] = ind2sub(grid_size, lin);
+  log_prior = zeros(numel(lin), 1);
+  for i_var = 1:numel(log_priors)
+    if numel(log_priors{i_var}) == prod(grid_size)
+      log_prior = log_prior + reshape(log_priors{i_var}(lin), [], 1);
+    else
+      log_prior = log_prior + reshape(log_priors{i_var}(subs{i_var}), [], 1);
+    end
+  end
+
+  n_obs = numel(observations);
+  lp = repmat(log_prior, 1, n_obs + 1);
+  for i_obs = 1:n_obs
+    ll = log_likelihood_from_residuals(observations(i_obs).value, ...
+                                       observations(i_obs).std, V(:, i_obs));
+    lp(:, i_obs) = lp(:, i_obs) + ll;
+    lp(:, end) = lp(:, end) + ll;
+  end
+  lp(isnan(lp)) = -Inf;
+end
+
+function [pred, evaluated] = evaluate_points(pred, evaluated, inds, states, ...
+                                             states_fields, grid_size, forward_fun, batch_size)
+  % calls the forward model at the given linear grid indices, in batches
+  for i_start = 1:batch_size:numel(inds)
+    batch = inds(i_start:min(i_start + batch_size - 1, numel(inds)));
+    subs = cell(1, numel(grid_size));
+    [subs{:}] = ind2sub(grid_size, batch);
+    points = struct();
+    for i_var = 1:numel(states_fields)
+      points.(states_fields{i_var}) = reshape(states.(states_fields{i_var})(subs{i_var}), [], 1);
+    end
+    pred(batch, :) = forward_fun(points);
+    evaluated(batch) = true;
+  end
+end
+
+function V_fine = interpolate_lattice(L, V, L_fine)
+  % multilinear interpolation in grid index space from one lattice to a
+  % finer one
+  if numel(L) == 1
+    V_fine = interp1(L{1}(:), V(:), L_fine{1}(:));
+    return
+  end
+  lattice_size = cellfun(@numel, L);
+  query = cell(1, numel(L));
+  [query{:}] = ndgrid(L_fine{:});
+  V_fine = interpn(L{:}, reshape(V, lattice_size), query{:});
+  V_fine = V_fine(:);
+end
@@ -0,0 +1,228 @@
+function Post = posterior_streaming(states, states_fields, observations, varargin)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+%
+% Post = posterior_streaming(states, states_fields, observations, varargin)
+%
+% Calculate the posterior probability of every combination of the state
+% variables given one or more (independent) observations,
+%       p(S | D1, D2, ...) = p(D1 | S) * p(D2 | S) * ... * p(S) / p(D1, D2, ...)
+% without building the prior, likelihood or posterior over the full grid.
+% The log posterior is evaluated for chunks of the grid at a time, keeping
+% only running (log-space) sums for the normalization and the marginals,
+% the maximum posterior for each value of each state variable and the k
+% most probable combinations. Memory use is set by the chunk size rather
+% than the grid size, and working in log-probability avoids the underflow
+% of small probabilities when multiplying many terms.
+%
+% Parameters
+% ----------
+% states: structure
+%   A structure with the fields described in priorModelProbs for each
+%   state in states_fields, except that states.(field) is the vector of
+%   values of that state variable (the grid axis), not the full grid. The
+%   grid has size (n_var1, n_var2, ...), in the order of states_fields.
+%   Optional [field]_pdf priors may be a vector along the axis or a full
+%   grid.
+%
+% states_fields: cell array
+%    names of the state variables, in the order of the grid dimensions.
+%
+% observations: structure array
+%   one element for each observation, with fields
+%     value : scalar
+%       observed value
+%     std : scalar
+%       standard deviation on the observed value
+%     predicted : array | function handle
+%       the predicted value at every grid point, either as an array of
+%       size (n_var1, n_var2, ...) or a function handle that returns the
+%       predicted values at a column vector of linear grid indices, e.g.,
+%       to read them from disk
+%   An empty structure array gives the prior.
+%
+% optional key-value pairs:
+%   'chunk_size' : number of grid points per chunk, default 1e5
+%   'top_k' : number of most probable combinations to keep, default 10
+%   'pair_marginals' : if 1, also accumulate the 2D marginals for every
+%                      pair of state variables, default 0
+%   'log_prior' : the log prior over the full grid, (n_var1, n_var2, ...),
+%                 used instead of the priors described by states. Default
+%                 [] (use states).
+%
+% Returns
+% -------
+% Post: structure with fields
+%   state_names
+%       states_fields
+%   grid_size
+%       (n_var1, n_var2, ...)
+%   [field]
+%       the values of each state variable
+%   log_evidence
+%       log of the sum of likelihood * prior over the grid, i.e., the log
+%       normalization of the posterior
+%   marginals.(field)
+%       posterior marginal probability of each value of the state
+%       variable (sums to 1)
+%   pair_marginals.([field1, '_', field2])
+%       (n_var1, n_var2) posterior marginal of each pair, if requested
+%   max_profile.(field)
+%       maximum posterior probability for each value of the state variable
+%   max_profile_index.(field)
+%       linear grid index where that maximum occurs
+%   top_k
+%       structure with the k most probable combinations, in order, with
+%       fields index (linear grid index), posterior, log_posterior and the
+%       value of each state variable
+%
+% The posterior probabilities are normalized to sum to 1 over the grid, as
+% in plot_tradeoffs_posterior. Grid points with NaN predictions have zero
+% probability.
+%
+% Examples
+% --------
+% for a sweep with Vs predictions (see fit_seismic_observations):
+%
+%    obs = struct('value', obs_Vs, 'std', sigma_Vs, 'predicted', sweep.meanVs);
+%    Post = posterior_streaming(sweep, sweep.state_names, obs, 'top_k', 5);
+%    [best_vars, posterior_var1] = find_best_state_var_combo(Post, sweep);
+%
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  defaults.chunk_size = 1e5;
+  defaults.top_k = 10;
+  defaults.pair_marginals = 0;
+  defaults.log_prior = [];
+  options = nested_structure_update(defaults, varargin_keyvals_to_structure(varargin));
+
+  n_vars = numel(states_fields);
+  grid_size = ones(1, max(n_vars, 2));
+  for i_var = 1:n_vars
+    grid_size(i_var) = numel(states.(states_fields{i_var}));
+  end
+  n_grid = prod(grid_size);
+  if isempty(options.log_prior)
+    log_priors = log_prior_marginals(states, states_fields);
+  else
+    log_priors = {options.log_prior};
+  end
+
+  % running accumulators, all in log space
+  log_total = -Inf;
+  log_marg = cell(1, n_vars);
+  max_lp = cell(1, n_vars);
+  max_ind = cell(1, n_vars);
+  for i_var = 1:n_vars
+    log_marg{i_var} = -Inf(grid_size(i_var), 1);
+    max_lp{i_var} = -Inf(grid_size(i_var), 1);
+    max_ind{i_var} = zeros(grid_size(i_var), 1);
+  end
+  pairs = zeros(0, 2);
+  if options.pair_marginals
+    for i_var = 1:n_vars
+      for j_var = i_var+1:n_vars
+        pairs(end+1, :) = [i_var, j_var];
+      end
+    end
+  end
+  log_pair = cell(1, size(pairs, 1));
+  for i_pair = 1:size(pairs, 1)
+    log_pair{i_pair} = -Inf(grid_size(pairs(i_pair, 1)), grid_size(pairs(i_pair, 2)));
+  end
+  top_lp = zeros(0, 1);
+  top_ind = zeros(0, 1);
+
+  for i_start = 1:options.chunk_size:n_grid
+    inds = (i_start:min(i_start + options.chunk_size - 1, n_grid))';
+    subs = cell(1, numel(grid_size));
+    [subs{:}] = ind2sub(grid_size, inds);
+
+    % log prior + log likelihood of this chunk
+    lp = zeros(numel(inds), 1);
+    for i_var = 1:numel(log_priors)
+      if numel(log_priors{i_var}) == n_grid
+        lp = lp + reshape(log_priors{i_var}(inds), [], 1);
+      else
+        lp = lp + reshape(log_priors{i_var}(subs{i_var}), [], 1);
+      end
+    end
+    for i_obs = 1:numel(observations)
+      obs = observations(i_obs);
+      predicted = obs.predicted(inds); % indexes an array or calls a function handle
+      lp = lp + reshape(log_likelihood_from_residuals(obs.value, obs.std, predicted), [], 1);
+    end
+    lp(isnan(lp)) = -Inf;
+
+    lp_max = max(lp);
+    if lp_max == -Inf
+      continue
+    end
+
+    % sums, scaled by the chunk maximum
+    w = exp(lp - lp_max);
+    log_total = log_add(log_total, lp_max + log(sum(w)));
+    for i_var = 1:n_vars
+      acc = accumarray(subs{i_var}, w, [grid_size(i_var), 1]);
+      log_marg{i_var} = log_add(log_marg{i_var}, lp_max + log(acc));
+    end
+    for i_pair = 1:size(pairs, 1)
+      i_var = pairs(i_pair, 1);
+      j_var = pairs(i_pair, 2);
+      acc = accumarray([subs{i_var}, subs{j_var}], w, grid_size([i_var, j_var]));
+      log_pair{i_pair} = log_add(log_pair{i_pair}, lp_max + log(acc));
+    end
+
+    % maxima: the first occurrence of each value in the sorted chunk
+    [lp_sorted, order] = sort(lp, 'descend');
+    for i_var = 1:n_vars
+      [vals, first] = unique(subs{i_var}(order), 'first');
+      is_new = lp_sorted(first) > max_lp{i_var}(vals);
+      max_lp{i_var}(vals(is_new)) = lp_sorted(first(is_new));
+      max_ind{i_var}(vals(is_new)) = inds(order(first(is_new)));
+    end
+
+    n_keep = min(options.top_k, numel(lp));
+    [top_lp, top_order] = sort([top_lp; lp_sorted(1:n_keep)], 'descend');
+    top_ind = [top_ind; inds(order(1:n_keep))];
+    top_ind = top_ind(top_order);
+    n_keep = min(options.top_k, numel(top_lp));
+    top_lp = top_lp(1:n_keep);
+    top_ind = top_ind(1:n_keep);
+  end
+
+  if log_total == -Inf
+    warning('posterior_streaming: the posterior is 0 at every grid point')
+  end
+
+  Post.state_names = states_fields;
+  Post.grid_size = grid_size;
+  Post.log_evidence = log_total;
+  for i_var = 1:n_vars
+    field = states_fields{i_var};
+    Post.(field) = states.(field);
+    Post.marginals.(field) = exp(log_marg{i_var} - log_total);
+    Post.max_profile.(field) = exp(max_lp{i_var} - log_total);
+    Post.max_profile_index.(field) = max_ind{i_var};
+  end
+  for i_pair = 1:size(pairs, 1)
+    pair_name = [states_fields{pairs(i_pair, 1)}, '_', states_fields{pairs(i_pair, 2)}];
+    Post.pair_marginals.(pair_name) = exp(log_pair{i_pair} - log_total);
+  end
+
+  Post.top_k.index = top_ind;
+  Post.top_k.log_posterior = top_lp - log_total;
+  Post.top_k.posterior = exp(Post.top_k.log_posterior);
+  subs = cell(1, numel(grid_size));
+  [subs{:}] = ind2sub(grid_size, top_ind);
+  for i_var = 1:n_vars
+    field = states_fields{i_var};
+    Post.top_k.(field) = reshape(states.(field)(subs{i_var}), [], 1);
+  end
+end
+
+function c = log_add(a, b)
+  % log(exp(a) + exp(b)), elementwise, without overflow or underflow
+  c = max(a, b);
+  finite = c > -Inf;
+  c(finite) = c(finite) + log(exp(a(finite) - c(finite)) + exp(b(finite) - c(finite)));
+end
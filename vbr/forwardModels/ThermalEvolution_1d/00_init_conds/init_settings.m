@@ -13,6 +13,8 @@ function [settings]=init_settings(settings_in)
    settings.Flags.T_init='continental'; % 'continental' 'oceanic' or 'adiabatic'
    settings.Flags.ModelDomain='asth_lith'; % 'asth_lith' or 'lith'
    settings.Flags.verbosity_level=1; % verbosity level, 1 or 0. Runs silent if 0.
+   settings.Flags.DiffusionScheme='explicit'; % 'explicit', 'implicit' (backward Euler) or 'crank_nicolson'
+                                              % implicit schemes use adaptive steps, see timestep.m
 
 % thermal
   settings.Tpot = 1325; % potential temperature of lithosphere
@@ -82,6 +84,8 @@ function [settings]=init_settings(settings_in)
    settings.outk = 5; % output frequency
    settings.sstol = 1e-16; % steady state target residual
    settings.dt_max = 10;  % max step for advection [Myrs] if advective velo is 0
+   settings.dT_tol = 0.1; % max local temperature error per step [C] for implicit DiffusionScheme
+   settings.dT_max_tries = 50; % max tries per step to meet dT_tol, the last is then accepted
 
    settings.Vbg = 0; % [cm/yr]
 %    settings.Q_LAB = -40 / 1e3; % LAB heat flux [ W / m2]
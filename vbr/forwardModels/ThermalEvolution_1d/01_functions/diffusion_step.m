@@ -0,0 +1,102 @@
+function T1 = diffusion_step(z,Rho,Cp,K,T,dt,theta,BCs,dz)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % T1 = diffusion_step(z,Rho,Cp,K,T,dt,theta,BCs,dz)
+  %
+  % implicit (theta-method) step of the diffusion equation
+  %
+  % rho*Cp*dT/dt = d/dz (k*dT/dz)
+  %
+  % using the same finite volume discretization as make_dTdt_diff, with the
+  % ghost cells eliminated using the boundary conditions. The material
+  % properties are held fixed over the step. With the interior diffusion
+  % operator written as dT/dt = A*T + b, solves
+  %
+  % (I - theta*dt*A) T1 = (I + (1-theta)*dt*A) T + dt*b
+  %
+  % as a sparse tridiagonal system.
+  %
+  % Parameters
+  % ----------
+  % z         the 1d mesh (with ghost cells)
+  % Rho       density (same size as z)
+  % Cp        heat capacity (same size as z)
+  % K         conductiviy (same size as z)
+  % T         temperature at the start of the step (same size as z)
+  % dt        time step [s]
+  % theta     1 for backward Euler, 0.5 for Crank-Nicolson
+  % BCs       boundary condition structure (see init_BCs), uses .val_T, .type_T
+  % dz        mesh spacing
+  %
+  % Output
+  % ------
+  % T1        temperature at the end of the step, with ghost cells set
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  [A,b] = make_diff_operator(z,Rho,Cp,K,BCs,dz);
+  nz = numel(z);
+  n = nz - 2;
+  I = speye(n);
+  u = T(2:nz-1);
+  u = u(:);
+
+  rhs = u + dt*b;
+  if theta < 1
+    rhs = rhs + (1-theta)*dt*(A*u);
+  end
+  u1 = (I - theta*dt*A) \ rhs;
+
+  T1 = T;
+  T1(2:nz-1) = u1;
+  T1 = BC_setghosts(T1,BCs.val_T,BCs.type_T,dz);
+end
+
+function [A,b] = make_diff_operator(z,Rho,Cp,K,BCs,dz)
+  % sparse interior diffusion operator, dT/dt(2:nz-1) = A*T(2:nz-1) + b
+  z = z(:); Rho = Rho(:); Cp = Cp(:); K = K(:);
+  nz = numel(z);
+  n = nz - 2;
+  iz = (2:nz-1)';
+
+  z_m = (z(iz) + z(iz-1))/2;
+  z_p = (z(iz) + z(iz+1))/2;
+  k_m = (K(iz-1) + K(iz))/2;
+  k_p = (K(iz+1) + K(iz))/2;
+  scl = 1 ./ (Rho(iz).*Cp(iz).*(z_p - z_m));
+  c_m = scl .* k_m ./ (z(iz) - z(iz-1)); % coefficient of T(iz-1)
+  c_p = scl .* k_p ./ (z(iz+1) - z(iz)); % coefficient of T(iz+1)
+
+  % ghost cells as affine functions of the first two interior cells:
+  % T(1) = g_top(1)*T(2) + g_top(2)*T(3) + g_top(3), same for the bottom
+  g_top = ghost_coefs(BCs.type_T(1),BCs.val_T(1),-dz);
+  g_bot = ghost_coefs(BCs.type_T(2),BCs.val_T(2),dz);
+
+  diag_0 = -(c_m + c_p);
+  diag_0(1) = diag_0(1) + c_m(1)*g_top(1);
+  diag_0(n) = diag_0(n) + c_p(n)*g_bot(1);
+  b = zeros(n,1);
+  b(1) = c_m(1)*g_top(3);
+  b(n) = b(n) + c_p(n)*g_bot(3);
+
+  rows = [(1:n)'; (2:n)'; (1:n-1)'];
+  cols = [(1:n)'; (1:n-1)'; (2:n)'];
+  vals = [diag_0; c_m(2:n); c_p(1:n-1)];
+  if n > 1
+    rows = [rows; 1; n];
+    cols = [cols; 2; n-1];
+    vals = [vals; c_m(1)*g_top(2); c_p(n)*g_bot(2)];
+  end
+  A = sparse(rows,cols,vals,n,n);
+end
+
+function g = ghost_coefs(BCtype,BCval,dz_out)
+  % ghost value = g(1)*(first interior) + g(2)*(second interior) + g(3),
+  % matching BC_setghosts. dz_out is the signed spacing from the first
+  % interior cell to the ghost cell.
+  if BCtype == 1 % dirichlet
+    g = [-1, 0, 2*BCval];
+  elseif BCtype == 2 % neumann
+    g = [1, 0, BCval*dz_out];
+  else % continuous flux
+    g = [2, -1, 0];
+  end
+end
@@ -1,11 +1,24 @@
-function [Vark1,resid,tnow_s_1,LABInfo] = timestep(Vark,tnow_s,LABInfo,settings,z,dz,IVals,BCs)
+function [Vark1,resid,tnow_s_1,LABInfo,dt_next] = timestep(Vark,tnow_s,LABInfo,settings,z,dz,IVals,BCs,dt_try)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-  % [Vark1,resid,tnow_s_1,LABInfo] = timestep(Vark,tnow_s,LABInfo,settings,z,dz,IVals,BCs)
+  % [Vark1,resid,tnow_s_1,LABInfo,dt_next] = timestep(Vark,tnow_s,LABInfo,settings,z,dz,IVals,BCs,dt_try)
   %
-  % explicit forward step of temperature evolution
+  % forward step of temperature evolution
   %
   % rho*Cp*dT/dt = d/dz (k*dT/dz) - rho * Cp * Vbgzs * dT/dz + Vbgs * dTdz_ad
   %
+  % settings.Flags.DiffusionScheme sets the time stepping:
+  %   'explicit'        (default) forward step of the full operator, with
+  %                     the time step limited by diffusive stability
+  %   'implicit'        backward Euler diffusion step
+  %   'crank_nicolson'  Crank-Nicolson diffusion step
+  % For the implicit schemes, advection and the adiabatic term are applied
+  % explicitly first (still limited by the CFL condition), followed by the
+  % implicit diffusion step (see diffusion_step). The step size is adaptive:
+  % the local error is estimated by step doubling and kept below
+  % settings.dT_tol [C], rejecting and retrying steps that exceed it. After
+  % settings.dT_max_tries (default 50) tries the last attempt is accepted and
+  % resid.dT_tol_exceeded is set.
+  %
   % Parameters
   % ----------
   % Vark      structure of variables at timestep k
@@ -16,44 +29,65 @@ function [Vark1,resid,tnow_s_1,LABInfo] = timestep(Vark,tnow_s,LABInfo,settings,
   % dz        grid spacing
   % IVals     initial values structure
   % BCs       boundary condition structure
+  % dt_try    optional, the time step to attempt for the implicit schemes [s],
+  %           usually dt_next of the previous step
   %
   % Output
   % ------
   % Vark1    structure of variables at timestep k + 1
-  % resid    structure of residuals
+  % resid    structure of residuals. resid.dT_tol_exceeded is 1 if an
+  %          implicit step was accepted with a local error above
+  %          settings.dT_tol, 0 otherwise
   % tnow_s_1 model time at timestep k + 1
   % LABInfo  LABInfo structure at timestep k + 1
+  % dt_next  the time step to attempt next (implicit schemes, [] otherwise)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 
   dt_max = settings.dt_max; % max step for advection if velocity = 0 [Myrs]
   TempUpdate= 1-strcmp(settings.Flags.TempUpdate,'DiffusionOnly');
   cfl = settings.cfl;
 
+  scheme = 'explicit';
+  if isfield(settings.Flags,'DiffusionScheme')
+    scheme = settings.Flags.DiffusionScheme;
+  end
+  if ~exist('dt_try','var')
+    dt_try = [];
+  end
+
   % adiabatic heat flux
   Fluxes.adi = Vark.Vbgz.* settings.dTdz_ad;
 
-  % diffusive heat flux
-  Fluxes.diff = make_dTdt_diff(z,Vark.rho,Vark.cp,Vark.Kc,Vark.T);
-  Fluxes.diff(1) = 0; Fluxes.diff(end) = 0;
-
   % calculate stable thermal step
   dt_TDiff = 0.5*dz*dz/max(Vark.Kc./Vark.rho./Vark.cp);
   dt_TAdv = dtCFL(Vark.Vbgzs,dz,cfl,dt_max);
   dt_adi = 0.1 * min(abs(Vark.T./Fluxes.adi));
-  dt=min([dt_TDiff dt_TAdv dt_adi]);
-
-  % advective heat fluxes
-  Fluxes.adv = advection_driver(Vark.T,Vark.Vbgzs,dz,dt,'VL_nc');
-
-  % calculate full operator
-  Fluxes.Total =  (Fluxes.diff + Fluxes.adi*TempUpdate + Fluxes.adv*TempUpdate);
 
   % save old values
   Old.T = Vark.T;
-
-  % update
   nz = numel(z);
-  Vark.T(2:nz-1) = Vark.T(2:nz-1) + Fluxes.Total(2:nz-1)*dt;
+
+  if strcmp(scheme,'explicit')
+    dt=min([dt_TDiff dt_TAdv dt_adi]);
+    dt_next = [];
+    dT_tol_exceeded = 0;
+
+    % diffusive heat flux
+    Fluxes.diff = make_dTdt_diff(z,Vark.rho,Vark.cp,Vark.Kc,Vark.T);
+    Fluxes.diff(1) = 0; Fluxes.diff(end) = 0;
+
+    % advective heat fluxes
+    Fluxes.adv = advection_driver(Vark.T,Vark.Vbgzs,dz,dt,'VL_nc');
+
+    % calculate full operator
+    Fluxes.Total =  (Fluxes.diff + Fluxes.adi*TempUpdate + Fluxes.adv*TempUpdate);
+
+    % update
+    Vark.T(2:nz-1) = Vark.T(2:nz-1) + Fluxes.Total(2:nz-1)*dt;
+  else
+    [Vark.T,dt,dt_next,dT_tol_exceeded] = implicit_step(Vark,Fluxes,settings,scheme,...
+                                        z,dz,BCs,dt_try,dt_TDiff,min(dt_TAdv,dt_adi),TempUpdate);
+  end
 
   % set BCs
   Vark.T = BC_setghosts(Vark.T,BCs.val_T,BCs.type_T,dz);
@@ -61,6 +95,11 @@ function [Vark1,resid,tnow_s_1,LABInfo] = timestep(Vark,tnow_s,LABInfo,settings,
 
   % calculate residuals
   resid.T = max(abs(Vark.T(2:nz-1) - Old.T(2:nz-1))./(Old.T(2:nz-1)));
+  if ~strcmp(scheme,'explicit')
+    % residual over an explicit-sized step, so that sstol has the same meaning
+    resid.T = resid.T * min(1, dt_TDiff/dt);
+  end
+  resid.dT_tol_exceeded = dT_tol_exceeded;
 
   % calculate solidus, set phi to phi_min above solidus
   Solidus = SoLiquidus([Vark.P(2); Vark.P(2:end)],Vark.Cf_H2O,Vark.Cf_CO2,'katz');
@@ -81,6 +120,85 @@ function [Vark1,resid,tnow_s_1,LABInfo] = timestep(Vark,tnow_s,LABInfo,settings,
 
 end
 
+function [T,dt,dt_next,dT_tol_exceeded] = implicit_step(Vark,Fluxes,settings,scheme,...
+                                        z,dz,BCs,dt_try,dt_TDiff,dt_limit,TempUpdate)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % [T,dt,dt_next,dT_tol_exceeded] = implicit_step(Vark,Fluxes,settings,scheme,...
+  %                                z,dz,BCs,dt_try,dt_TDiff,dt_limit,TempUpdate)
+  %
+  % adaptive step with an implicit diffusion step. The local error is
+  % estimated by comparing one step of dt with two steps of dt/2 and the
+  % two half steps are kept if the error is below settings.dT_tol. If the
+  % error is still above dT_tol after settings.dT_max_tries steps, the last
+  % step is kept.
+  %
+  % Parameters
+  % ----------
+  % Vark        structure of variables at the start of the step
+  % Fluxes      structure with the adiabatic heat flux, .adi
+  % settings    settings structure
+  % scheme      'implicit' or 'crank_nicolson'
+  % z, dz, BCs  the mesh, spacing and boundary conditions
+  % dt_try      time step to attempt, [] to start from the explicit limit
+  % dt_TDiff    explicit diffusive stability limit
+  % dt_limit    limit from the explicit advection and adiabatic terms
+  % TempUpdate  0 to skip advection and adiabatic terms, 1 otherwise
+  %
+  % Output
+  % ------
+  % T           the temperature after the step (ghost cells not set)
+  % dt          the step taken
+  % dt_next     the step to attempt next
+  % dT_tol_exceeded  1 if the step was kept with an error above dT_tol
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  if strcmp(scheme,'crank_nicolson')
+    theta = 0.5; order = 2;
+  elseif strcmp(scheme,'implicit')
+    theta = 1; order = 1;
+  else
+    error(['settings.Flags.DiffusionScheme must be explicit, implicit or ',...
+           'crank_nicolson, found ',scheme])
+  end
+  dT_tol = 0.1;
+  if isfield(settings,'dT_tol')
+    dT_tol = settings.dT_tol;
+  end
+
+  if isempty(dt_try)
+    dt_try = dt_TDiff;
+  end
+  dt = min(dt_try,dt_limit);
+  nz = numel(z);
+  max_tries = 50;
+  if isfield(settings,'dT_max_tries')
+    max_tries = settings.dT_max_tries;
+  end
+  for i_try = 1:max_tries
+    % explicit advection and adiabatic terms
+    T = Vark.T;
+    if TempUpdate
+      Fluxes.adv = advection_driver(Vark.T,Vark.Vbgzs,dz,dt,'VL_nc');
+      T(2:nz-1) = T(2:nz-1) + (Fluxes.adi(2:nz-1) + Fluxes.adv(2:nz-1))*dt;
+      T = BC_setghosts(T,BCs.val_T,BCs.type_T,dz);
+    end
+
+    % implicit diffusion: one full step and two half steps
+    T_full = diffusion_step(z,Vark.rho,Vark.cp,Vark.Kc,T,dt,theta,BCs,dz);
+    T_half = diffusion_step(z,Vark.rho,Vark.cp,Vark.Kc,T,dt/2,theta,BCs,dz);
+    T_half = diffusion_step(z,Vark.rho,Vark.cp,Vark.Kc,T_half,dt/2,theta,BCs,dz);
+    err = max(abs(T_half(2:nz-1) - T_full(2:nz-1))) / (2^order - 1);
+
+    scale = 0.9 * (dT_tol / max(err,eps))^(1/(order+1));
+    if err <= dT_tol || i_try == max_tries
+      dT_tol_exceeded = err > dT_tol;
+      T = T_half;
+      dt_next = min(dt * min(2, max(0.2, scale)), dt_limit);
+      return
+    end
+    dt = dt * max(0.2, min(0.9, scale));
+  end
+end
+
 function [dt] = dtCFL(vf,dz,cfl,dt_max)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
   % [dt] = dtCFL(vf,dz,cfl,dt_max)
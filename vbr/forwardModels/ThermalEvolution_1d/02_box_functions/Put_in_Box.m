@@ -4,6 +4,13 @@ function  [Box] = Put_in_Box(Box,Vars,Info,settings,iBox)
   %
   % Stores a single forward model in the Box
   %
+  % The profiles are downsampled in depth (all timesteps at once) and stored
+  % according to settings.Box.Format:
+  %   'columnar'  (default) Box(iBox).Profiles.(Field) is a [nz x nt] array,
+  %               column it is the profile at timestep it
+  %   'frames'    Box(iBox).Frames(it).(Field) is the profile at timestep it
+  % Use getBoxField, getBoxFrame or pullFromBox to read either format.
+  %
   % Parameters
   % ----------
   %   Box        the container for the runs, array-structure
@@ -34,6 +41,9 @@ function  [Box] = Put_in_Box(Box,Vars,Info,settings,iBox)
   for iFie=1:numel(vars2cp)
     Box(iBox).run_info.(vars2cp{iFie})=Info.(vars2cp{iFie});
   end
+  if isfield(Info,'n_dT_tol_exceeded')
+    Box(iBox).run_info.n_dT_tol_exceeded=Info.n_dT_tol_exceeded;
+  end
 
 % get downsampled depth bins or points
   if strcmp(meth,'interp')
@@ -42,22 +52,26 @@ function  [Box] = Put_in_Box(Box,Vars,Info,settings,iBox)
   Box(iBox).run_info.Z_km=zLow;
   Box(iBox).run_info.settings = settings;
 
-% loop over time steps, store in Movie Frames
-  for it = 1:nt
+% downsample every variable in the Vars structure, all time steps at once
+  Profiles = struct();
+  Fields = fieldnames(Vars);
+  for iFie = 1:numel(Fields);
+    Profiles.(Fields{iFie}) = downsample(Vars.(Fields{iFie})(:,1:nt),zHigh,zLow,meth);
+  end
 
-%  loop over variables in the Vars structure
-   Fields = fieldnames(Vars);
-   for iFie = 1:numel(Fields);
-      LowRes = downsample((Vars.(Fields{iFie})(:,it)),zHigh,zLow,meth);
-      Box(iBox).Frames(it).(Fields{iFie})=LowRes;
-   end
+  Format = 'columnar';
+  if isfield(settings.Box,'Format')
+    Format = settings.Box.Format;
   end
+  Box = storeBoxProfiles(Box,iBox,Profiles,Format);
 
 end
 
 function Ylow = downsample(Yhigh,Xhigh,Xlow,meth)
+ % downsamples each column of Yhigh
  if strcmp(meth,'interp')
-     Ylow = interp1(Xhigh,Yhigh,Xlow);
+     Ylow = interp1(Xhigh(:),Yhigh,Xlow);
+     Ylow = reshape(Ylow,numel(Xlow),[]);
  elseif strcmp(meth,'averaging')
      disp('not implemented!')
  end
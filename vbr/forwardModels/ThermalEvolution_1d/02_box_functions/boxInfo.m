@@ -24,6 +24,13 @@ function boxInfo(Box)
   end
 
 
+  if isfield(Box(1),'Profiles') && ~isempty(Box(1).Profiles)
+    disp('profiles are stored in the columnar format (Box(iBox).Profiles)')
+  else
+    disp('profiles are stored in the frames format (Box(iBox).Frames)')
+  end
+  disp('');
+
   for iBox=1:numel(Box)
     if isfield(Box(1).info,'var2name')
       disp([num2str(iBox),',',num2str(Box(iBox).info.var1val),',',num2str(Box(iBox).info.var2val)])
@@ -0,0 +1,36 @@
+function Box = convertBoxFormat(Box,Format)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % Box = convertBoxFormat(Box,Format)
+  %
+  % converts every run in a box to the columnar or frames format (see
+  % Put_in_Box), e.g., to use older Boxes with columnar storage.
+  %
+  % Parameters
+  % ----------
+  % Box     the box of runs (structure array)
+  % Format  'columnar' or 'frames'
+  %
+  % Output
+  % ------
+  % Box     the converted box
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  Profiles = cell(size(Box));
+  for iBox = 1:numel(Box)
+    Frame = getBoxFrame(Box,iBox,1);
+    Fields = fieldnames(Frame);
+    Profiles{iBox} = struct();
+    for iFie = 1:numel(Fields)
+      Profiles{iBox}.(Fields{iFie}) = getBoxField(Box,iBox,Fields{iFie});
+    end
+  end
+
+  if isfield(Box,'Profiles')
+    Box = rmfield(Box,'Profiles');
+  end
+  if isfield(Box,'Frames')
+    Box = rmfield(Box,'Frames');
+  end
+  for iBox = 1:numel(Box)
+    Box = storeBoxProfiles(Box,iBox,Profiles{iBox},Format);
+  end
+end
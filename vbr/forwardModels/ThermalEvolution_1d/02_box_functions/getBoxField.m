@@ -0,0 +1,23 @@
+function Field = getBoxField(Box,iBox,FieldName)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % Field = getBoxField(Box,iBox,FieldName)
+  %
+  % pulls out a single variable of a single run from a box, for either Box
+  % format (see Put_in_Box)
+  %
+  % Parameters
+  % ----------
+  % Box        the box of runs (structure array)
+  % iBox       the box index to pull out
+  % FieldName  the variable name, e.g., 'T'
+  %
+  % Output
+  % ------
+  % Field      [nz x nt] array, Field(:,it) is the profile at timestep it
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  if isfield(Box(iBox),'Profiles') && ~isempty(Box(iBox).Profiles)
+    Field = Box(iBox).Profiles.(FieldName);
+  else
+    Field = [Box(iBox).Frames.(FieldName)];
+  end
+end
@@ -0,0 +1,35 @@
+function Frame = getBoxFrame(Box,iBox,it)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % Frame = getBoxFrame(Box,iBox,it)
+  %
+  % pulls out the profiles of a single timestep of a single run from a box,
+  % for either Box format (see Put_in_Box). Equivalent to Box(iBox).Frames(it)
+  % for the frames format.
+  %
+  % Parameters
+  % ----------
+  % Box    the box of runs (structure array)
+  % iBox   the box index to pull out
+  % it     the timestep index, or 'end' for the final timestep
+  %
+  % Output
+  % ------
+  % Frame  structure with the profile of each variable at timestep it
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  if isfield(Box(iBox),'Profiles') && ~isempty(Box(iBox).Profiles)
+    Profiles = Box(iBox).Profiles;
+    Fields = fieldnames(Profiles);
+    if strcmp(it,'end')
+      it = size(Profiles.(Fields{1}),2);
+    end
+    Frame = struct();
+    for iFie = 1:numel(Fields)
+      Frame.(Fields{iFie}) = Profiles.(Fields{iFie})(:,it);
+    end
+  else
+    if strcmp(it,'end')
+      it = numel(Box(iBox).Frames);
+    end
+    Frame = Box(iBox).Frames(it);
+  end
+end
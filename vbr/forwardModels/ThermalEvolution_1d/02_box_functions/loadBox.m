@@ -0,0 +1,73 @@
+function Box = loadBox(fname,varargin)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % Box = loadBox(fname,varargin)
+  %
+  % loads a box saved with saveBox, optionally only some of the variables
+  % and runs. The returned Box is in the columnar format (see Put_in_Box).
+  %
+  % Parameters
+  % ----------
+  % fname     the file saved with saveBox
+  % optional key-value pairs:
+  %   'fields'  cell array of the variables to load, default all
+  %   'iBox'    the box indices to load, default all. If set, Box is a
+  %             row array with one element for each index.
+  %
+  % Output
+  % ------
+  % Box       the box of runs (structure array)
+  %
+  % Examples
+  % --------
+  % the final temperature profile of runs 3 and 4:
+  %   Box = loadBox('box.mat','fields',{'T'},'iBox',[3,4]);
+  %   T_end = getBoxFrame(Box,1,'end').T;
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  Options = varargin_keyvals_to_structure(varargin);
+  info = load(fname,'box_size','box_fields','box_nz','box_nt','Box_meta');
+  Fields = info.box_fields;
+  if isfield(Options,'fields')
+    Fields = Options.fields;
+  end
+  all_boxes = ~isfield(Options,'iBox');
+  if all_boxes
+    iBoxes = 1:prod(info.box_size);
+  else
+    iBoxes = Options.iBox(:)';
+  end
+
+  Box = info.Box_meta(iBoxes);
+  Profiles = cell(1,numel(iBoxes));
+  for ib = 1:numel(iBoxes)
+    Profiles{ib} = struct();
+  end
+
+  use_matfile = ~is_octave() && ~all_boxes;
+  if use_matfile
+    mfile = matfile(fname);
+  end
+  for iFie = 1:numel(Fields)
+    varname = ['Profiles_',Fields{iFie}];
+    if use_matfile
+      % only reads the chunks of the requested runs
+      for ib = 1:numel(iBoxes)
+        iBox = iBoxes(ib);
+        Profiles{ib}.(Fields{iFie}) = mfile.(varname)(1:info.box_nz(iBox),1:info.box_nt(iBox),iBox);
+      end
+    else
+      vals = load(fname,varname);
+      vals = vals.(varname);
+      for ib = 1:numel(iBoxes)
+        iBox = iBoxes(ib);
+        Profiles{ib}.(Fields{iFie}) = vals(1:info.box_nz(iBox),1:info.box_nt(iBox),iBox);
+      end
+    end
+  end
+
+  for ib = 1:numel(iBoxes)
+    Box = storeBoxProfiles(Box,ib,Profiles{ib},'columnar');
+  end
+  if all_boxes
+    Box = reshape(Box,info.box_size);
+  end
+end
@@ -32,24 +32,28 @@ function  [Box] = par_Put_in_Box(Box0,Box)
           Box(iBox).run_info.Z_km=zLow;
           Box(iBox).run_info.settings = settings;
           
-          % loop over time steps, store in Movie Frames
-          for it = 1:nt
-              
-              %  loop over variables in the Vars structure
-              Fields = fieldnames(Vars);
-              for iFie = 1:numel(Fields);
-                  LowRes = downsample(Vars.(Fields{iFie})(:,it),zHigh,zLow,meth);
-                  Box(iBox).Frames(it).(Fields{iFie})=LowRes;
-              end
+          % downsample all time steps of each variable at once
+          Profiles = struct();
+          Fields = fieldnames(Vars);
+          for iFie = 1:numel(Fields);
+              Profiles.(Fields{iFie}) = downsample(Vars.(Fields{iFie})(:,1:nt),zHigh,zLow,meth);
           end
+
+          Format = 'columnar';
+          if isfield(settings.Box,'Format')
+              Format = settings.Box.Format;
+          end
+          Box = storeBoxProfiles(Box,iBox,Profiles,Format);
           
   end
   
 end
 
 function Ylow = downsample(Yhigh,Xhigh,Xlow,meth)
+ % downsamples each column of Yhigh
  if strcmp(meth,'interp')
-     Ylow = interp1(Xhigh,Yhigh,Xlow);
+     Ylow = interp1(Xhigh(:),Yhigh,Xlow);
+     Ylow = reshape(Ylow,numel(Xlow),[]);
  elseif strcmp(meth,'averaging')
      disp('not implemented!')
  end
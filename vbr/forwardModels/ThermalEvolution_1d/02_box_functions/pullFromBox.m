@@ -7,7 +7,7 @@ function [Vars,Info,settings] = pullFromBox(Box,iBox)
   %
   % Parameters
   % ----------
-  % Box    the box of runs (structure array)
+  % Box    the box of runs (structure array), in either format (see Put_in_Box)
   % iBox   the box index to pull out
   %
   % Output
@@ -29,20 +29,15 @@ function [Vars,Info,settings] = pullFromBox(Box,iBox)
 
   settings=  Box(iBox).run_info.settings;
 
-  % initialize 1D variables
-  nt=numel(Box(iBox).Frames);
-  nz=numel(Info.z_km);
-  Fields = fieldnames(Box(iBox).Frames(1));
-  for iFie = 1:numel(Fields);
-    Vars.(Fields{iFie})=zeros(nz,nt);
+  % copy over this box into Vars (from either Box format)
+  if isfield(Box(iBox),'Profiles') && ~isempty(Box(iBox).Profiles)
+    Fields = fieldnames(Box(iBox).Profiles);
+  else
+    Fields = fieldnames(Box(iBox).Frames(1));
   end
-
-  % copy over this box into Vars from frames
-  for it = 1:nt
-    %  loop over variables in the Vars structure
-    for iFie = 1:numel(Fields);
-      Vars.(Fields{iFie})(:,it)=  Box(iBox).Frames(it).(Fields{iFie});
-    end
+  Vars = struct();
+  for iFie = 1:numel(Fields)
+    Vars.(Fields{iFie}) = getBoxField(Box,iBox,Fields{iFie});
   end
 
 end
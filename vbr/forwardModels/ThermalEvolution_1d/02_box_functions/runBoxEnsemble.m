@@ -0,0 +1,186 @@
+function [Box,settings,Status] = runBoxEnsemble(settings,checkpoint_dir,varargin)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % [Box,settings,Status] = runBoxEnsemble(settings,checkpoint_dir,varargin)
+  %
+  % runs the Thermal_Evolution model for every permutation of the Box
+  % parameter sweep (settings.Box.var1range, var2range, see BuildBox), with
+  % the runs optionally distributed over parallel workers (parfor).
+  %
+  % Each completed run is saved to its own checkpoint file in checkpoint_dir
+  % (box_run_000001.mat, etc.) as soon as it finishes. Runs with a checkpoint
+  % for the same settings are loaded instead of recalculated, so an ensemble
+  % that was interrupted (or in which some runs failed) is resumed by calling
+  % runBoxEnsemble again with the same arguments. The Box is assembled from
+  % the checkpoints once all runs are complete.
+  %
+  % Parameters
+  % ----------
+  % settings        the settings structure, with the Box parameter sweep set
+  %                 (settings.Box.var1range, etc.). Any settings not set are
+  %                 loaded from init_settings.
+  % checkpoint_dir  the directory for the checkpoint files, created if it does
+  %                 not exist
+  % optional key-value pairs:
+  %   'n_workers'  maximum number of parallel workers (parfor), default 0
+  %                (serial). parfor runs in serial in Octave, use shard to
+  %                run in parallel there.
+  %   'shard'      two element vector, [i_shard, n_shards]: only run models
+  %                i_shard, i_shard + n_shards, etc. Use to split an ensemble
+  %                across separate processes (e.g., several Octave sessions),
+  %                then call again without shard to assemble the Box.
+  %
+  % Output
+  % ------
+  % Box       the box of runs (see Put_in_Box). Runs that are not complete
+  %           only have Box(iBox).info set.
+  % settings  the settings structure, with the defaults and Box information
+  % Status    structure with fields
+  %             .complete        logical array (size of Box), true for the
+  %                              completed runs
+  %             .error_messages  cell array (size of Box), the error message
+  %                              of each run that failed in this call
+  %
+  % Examples
+  % --------
+  %   settings.Box.var1range = [1300, 1400];
+  %   settings.Box.var1name = 'Tpot';
+  %   settings.Box.var1units = ' C';
+  %   [Box,settings] = runBoxEnsemble(settings,'box_runs','n_workers',4);
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  defaults.n_workers = 0;
+  defaults.shard = [1, 1];
+  Options = nested_structure_update(defaults,varargin_keyvals_to_structure(varargin));
+
+  % settings common to all runs and the Box
+  settings = init_settings(settings);
+  if ~isfield(settings.Box,'DownSampleMeth')
+    settings.Box.DownSampleMeth = 'interp';
+  end
+  if ~isfield(settings.Box,'DownSampleFactor')
+    settings.Box.DownSampleFactor = 1;
+  end
+  [Box,settings] = BuildBox(settings);
+  nBox = numel(Box);
+  if exist(checkpoint_dir,'dir') == 0
+    mkdir(checkpoint_dir);
+  end
+
+  % the settings of each run, and the runs completed in a previous call
+  run_settings = cell(nBox,1);
+  complete = false(size(Box));
+  runs_todo = [];
+  for iBox = 1:nBox
+    run_settings{iBox} = box_run_settings(settings,Box(iBox).info);
+    run_file = run_filename(checkpoint_dir,iBox);
+    if exist(run_file,'file') == 2
+      saved = load(run_file,'settings');
+      if isequal(saved.settings,run_settings{iBox})
+        complete(iBox) = true;
+        continue
+      end
+    end
+    if mod(iBox - 1,Options.shard(2)) == Options.shard(1) - 1
+      runs_todo(end+1) = iBox;
+    end
+  end
+  disp(['Box ensemble: ',num2str(sum(complete(:))),' of ',num2str(nBox),...
+        ' runs loaded from checkpoints, ',num2str(numel(runs_todo)),' to run'])
+
+  % the remaining runs, each saves its own checkpoint
+  n_todo = numel(runs_todo);
+  n_workers = Options.n_workers;
+  run_errors = cell(n_todo,1);
+  parfor (i_todo = 1:n_todo, n_workers)
+    iBox = runs_todo(i_todo);
+    run_errors{i_todo} = run_model(run_settings{iBox},Box(iBox),iBox,nBox,checkpoint_dir);
+  end
+
+  Status = struct();
+  Status.error_messages = cell(size(Box));
+  Status.error_messages(runs_todo) = run_errors;
+  failed = runs_todo(~cellfun(@isempty,run_errors));
+  complete(setdiff(runs_todo,failed)) = true;
+  Status.complete = complete;
+  for iBox = failed
+    disp(['Box ensemble: run ',num2str(iBox),' failed: ',Status.error_messages{iBox}])
+  end
+
+  % assemble the Box from the checkpoints
+  for iBox = find(complete(:))'
+    saved = load(run_filename(checkpoint_dir,iBox),'Box_run');
+    Fields = fieldnames(saved.Box_run);
+    for iFie = 1:numel(Fields)
+      Box(iBox).(Fields{iFie}) = saved.Box_run.(Fields{iFie});
+    end
+  end
+
+  n_missing = sum(~complete(:));
+  if n_missing > 0
+    disp(['Box ensemble incomplete: ',num2str(n_missing),' of ',num2str(nBox),...
+          ' runs failed or remain in other shards, call again to resume'])
+  else
+    disp(['Box ensemble complete: ',num2str(nBox),' runs'])
+  end
+end
+
+function settings = box_run_settings(settings,info)
+  % the settings for a single permutation of the Box parameters
+  settings.(info.var1name) = info.var1val;
+  if numel(info.var2name) > 0
+    settings.(info.var2name) = info.var2val;
+  end
+  settings.Zinfo.zmax = settings.zPlate;
+  settings.Zinfo.dz0 = settings.dz0;
+end
+
+function error_message = run_model(settings,Box_run,iBox,nBox,checkpoint_dir)
+  % runs a single forward model and saves it to its checkpoint file. Returns
+  % the error message if the run fails, an empty string otherwise.
+  t_start = tic;
+  error_message = '';
+  disp(['Starting run ',num2str(iBox),' of ',num2str(nBox),': ',...
+        box_run_label(Box_run.info)])
+  key_settings = settings;
+  try
+    % build mesh and initial conditions
+    settings.Zinfo = init_mesh(settings.Zinfo);
+    [Info] = init_values(settings);
+
+    % set the boundary conditions
+    [Info.BCs]=init_BCs(struct(),'T','zmin','dirichlet',0);
+    [Info.BCs]=init_BCs(Info.BCs,'T','zmax','dirichlet',Info.init.T(end));
+
+    % Lithosphere temperature evolution, with the adiabatic asthenosphere
+    [Vars,Info]=Thermal_Evolution(Info,settings);
+    [Vars,Info]=postproc_append_astheno(Vars,Info,settings);
+    Box_run = Put_in_Box(Box_run,Vars,Info,settings,1);
+  catch err
+    error_message = err.message;
+    return
+  end
+
+  % write to a temporary file first so an interrupted save is not mistaken
+  % for a completed run
+  run_file = run_filename(checkpoint_dir,iBox);
+  tmp_file = fullfile(checkpoint_dir,sprintf('tmp_box_run_%06d.mat',iBox));
+  VBR_save(struct('settings',key_settings,'Box_run',Box_run),tmp_file);
+  movefile(tmp_file,run_file);
+
+  % progress across all workers, from the checkpoint files
+  n_saved = numel(dir(fullfile(checkpoint_dir,'box_run_*.mat')));
+  disp(['Completed run ',num2str(iBox),' of ',num2str(nBox),' after ',...
+        num2str(toc(t_start)/60),' mins (',num2str(n_saved),' of ',...
+        num2str(nBox),' runs complete)'])
+end
+
+function label = box_run_label(info)
+  label = [info.var1name,'=',num2str(info.var1val),info.var1units];
+  if numel(info.var2name) > 0
+    label = [label,', ',info.var2name,'=',num2str(info.var2val),info.var2units];
+  end
+end
+
+function run_file = run_filename(checkpoint_dir,iBox)
+  run_file = fullfile(checkpoint_dir,sprintf('box_run_%06d.mat',iBox));
+end
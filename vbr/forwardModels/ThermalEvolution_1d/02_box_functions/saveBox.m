@@ -0,0 +1,52 @@
+function saveBox(Box,fname)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % saveBox(Box,fname)
+  %
+  % saves a box of runs for partial loading with loadBox. The profiles of
+  % each variable are stored for all runs as a single [nz x nt x nBox] array
+  % (padded with NaN for runs with fewer depths or timesteps) in its own
+  % variable, Profiles_<variable>, alongside the Box without the profiles.
+  %
+  % In MATLAB, the file is saved in the HDF5-based v7.3 format, in which
+  % each array is stored in chunks: loadBox then reads only the requested
+  % variables and runs from disk. In Octave (which cannot read v7.3 files),
+  % the file is a compressed v7 file and loadBox reads only the requested
+  % variables.
+  %
+  % Parameters
+  % ----------
+  % Box    the box of runs (structure array), in either format
+  % fname  the filename to save to
+  %
+  % Output
+  % ------
+  % none, saves to fname
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  Box = convertBoxFormat(Box,'columnar');
+  nBox = numel(Box);
+  Fields = fieldnames(Box(1).Profiles);
+
+  S = struct();
+  S.box_size = size(Box);
+  S.box_fields = Fields;
+  S.box_nz = zeros(nBox,1);
+  S.box_nt = zeros(nBox,1);
+  for iBox = 1:nBox
+    [S.box_nz(iBox),S.box_nt(iBox)] = size(Box(iBox).Profiles.(Fields{1}));
+  end
+
+  for iFie = 1:numel(Fields)
+    vals = NaN(max(S.box_nz),max(S.box_nt),nBox);
+    for iBox = 1:nBox
+      vals(1:S.box_nz(iBox),1:S.box_nt(iBox),iBox) = Box(iBox).Profiles.(Fields{iFie});
+    end
+    S.(['Profiles_',Fields{iFie}]) = vals;
+  end
+  S.Box_meta = rmfield(Box,'Profiles');
+
+  if is_octave()
+    save('-v7',fname,'-struct','S');
+  else
+    save(fname,'-struct','S','-v7.3');
+  end
+end
@@ -0,0 +1,33 @@
+function Box = storeBoxProfiles(Box,iBox,Profiles,Format)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % Box = storeBoxProfiles(Box,iBox,Profiles,Format)
+  %
+  % stores the profiles of a single run in the Box
+  %
+  % Parameters
+  % ----------
+  % Box       the box of runs (structure array)
+  % iBox      the box index to store
+  % Profiles  structure with a [nz x nt] array for each variable
+  % Format    'columnar' to store Profiles as Box(iBox).Profiles or 'frames'
+  %           to store each timestep in Box(iBox).Frames(it)
+  %
+  % Output
+  % ------
+  % Box       the updated box
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  if strcmp(Format,'columnar')
+    Box(iBox).Profiles = Profiles;
+  elseif strcmp(Format,'frames')
+    Fields = fieldnames(Profiles);
+    nt = size(Profiles.(Fields{1}),2);
+    Frames = struct();
+    for iFie = 1:numel(Fields)
+      cols = num2cell(Profiles.(Fields{iFie}),1);
+      [Frames(1:nt).(Fields{iFie})] = cols{:};
+    end
+    Box(iBox).Frames = Frames;
+  else
+    error(['Box format must be columnar or frames, found ',Format])
+  end
+end
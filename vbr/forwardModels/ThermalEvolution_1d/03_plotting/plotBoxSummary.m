@@ -58,12 +58,12 @@ function  plotBoxSummary(Box,settings,varargin)
   if settings.Box.nvar2>1
     for iv2 = 1: settings.Box.nvar2
       cf=(iv2 - 1) / (settings.Box.nvar2 -1);
-      plot(Box(1,iv2).Frames(end).Tsol,Box(1,iv2).run_info.Z_km,'color',[0,cf,0],'linestyle','--')
+      plot(getBoxFrame(Box(1,iv2),1,'end').Tsol,Box(1,iv2).run_info.Z_km,'color',[0,cf,0],'linestyle','--')
     end
   end
   for iv1 = 1:settings.Box.nvar1
     cf=(iv1 - 1) / (settings.Box.nvar1 -1);
-    plot(Box(iv1,1).Frames(end).T,Box(iv1,1).run_info.Z_km,'color',[cf,0,0])
+    plot(getBoxFrame(Box(iv1,1),1,'end').T,Box(iv1,1).run_info.Z_km,'color',[cf,0,0])
   end
   box on
   set(gca,'ydir','reverse')
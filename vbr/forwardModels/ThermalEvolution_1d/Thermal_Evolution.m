@@ -48,6 +48,9 @@
 %     .t_Myr    same as t except [Myr]
 %     .init.    structure containing initial conditions
 %     .ssresid  final max residual
+%     .n_dT_tol_exceeded  number of implicit time steps accepted with a local
+%             error above settings.dT_tol (see timestep.m), 0 for the
+%             explicit scheme. A warning is issued if it is not 0.
 %
 %%% Definitions for variables of note that are not output
 %    Vark: structure with current time step values of variables
@@ -119,6 +122,8 @@ function [Vars,Info] = Thermal_Evolution(Info,settings)
 %%% ---------- Solve Forward Problem (time stepping starts here) -------- %%
 %%% --------------------------------------------------------------------- %%
   LABInfo.lag_steps=0;
+  dt_next = []; % adaptive step size for implicit diffusion schemes
+  n_dT_tol_exceeded = 0;
   while keepgoing == 1 && k <= nt
       k = k + 1;
 
@@ -126,8 +131,9 @@ function [Vars,Info] = Thermal_Evolution(Info,settings)
   %%% Time step %%
   %%%%%%%%%%%%%%%%
 
-    [Vark,resid,tnow_s,LABInfo] = timestep(Vark,tnow_s,LABInfo,settings,...
-                                                          z,dz,InitVals,BCs);
+    [Vark,resid,tnow_s,LABInfo,dt_next] = timestep(Vark,tnow_s,LABInfo,settings,...
+                                                          z,dz,InitVals,BCs,dt_next);
+    n_dT_tol_exceeded = n_dT_tol_exceeded + resid.dT_tol_exceeded;
 
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
   %%% Output and error/ss check %
@@ -161,6 +167,12 @@ function [Vars,Info] = Thermal_Evolution(Info,settings)
   [Vars,Info]=var_finalize(Vars,Info,kk); % removes unfilled columns
   Info.tMyrs=Info.t/3600/24/365/1e6;
   Info.ssresid=resid.T;
+  Info.n_dT_tol_exceeded = n_dT_tol_exceeded;
+  if n_dT_tol_exceeded > 0
+    warning(['Thermal_Evolution: ',num2str(n_dT_tol_exceeded),' time steps ',...
+             'were accepted with a local error above settings.dT_tol after ',...
+             'settings.dT_max_tries tries'])
+  end
   % elapsed time
   t_elapsed=toc(tinit);
   if verbose > 0
@@ -0,0 +1,8 @@
+'''
+pyvbr: a numpy implementation of a subset of the VBRc for batch use in python
+
+see README.md in this directory.
+'''
+from .params import load_params, ParamStruct
+from .spine import vbr_spine, nested_structure_update
+from .reader import load_vbr, VBRFile, LazyArray
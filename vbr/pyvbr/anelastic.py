@@ -0,0 +1,185 @@
+'''
+closed-form anelastic methods, ports of vbr/vbrCore/functions/Q_*.m
+
+All methods broadcast over frequency in the same way as the MATLAB methods:
+frequency dependent outputs have the shape of the state variable arrays with
+a new trailing dimension of length numel(f).
+'''
+import math
+
+import numpy as np
+
+from .params import ParamStruct
+
+
+# number of (state, frequency) pairs integrated at once by xfit_mxw, bounds
+# the memory of the (pairs x tau points) integration arrays
+xfit_mxw_block_size = 2**16
+
+
+def Q_andrade_analytical(VBR):
+    ''' analytical andrade model, port of Q_andrade_analytical.m '''
+    method_settings = VBR['in'].anelastic.andrade_analytical
+    rho_in, Mu_in, Ju_in, f_vec = Q_get_state_vars(VBR)
+
+    alf = method_settings.alpha
+    beta = method_settings.Beta
+    eta_ss = select_steady_state_viscosity(VBR, method_settings, 'andrade_analytical')
+    tau_maxwell = eta_ss / Mu_in
+
+    w = 2 * np.pi * f_vec
+    gam = beta * math.gamma(1 + alf)
+    MJ_real = 1 + gam * np.cos(alf * np.pi / 2) / w**alf
+    MJ_imag = (1. / (w * tau_maxwell[..., np.newaxis])
+               + gam * np.sin(alf * np.pi / 2) / w**alf)
+
+    J1 = Ju_in[..., np.newaxis] * MJ_real
+    J2 = Ju_in[..., np.newaxis] * MJ_imag
+    out = _store_output(J1, J2, rho_in, f_vec)
+    out.tau_M = tau_maxwell
+    out.units.tau_M = 's'
+    VBR.out.anelastic.andrade_analytical = out
+    return VBR
+
+
+def Q_maxwell_analytical(VBR):
+    ''' analytical maxwell model, port of Q_maxwell_analytical.m '''
+    method_settings = VBR['in'].anelastic.maxwell_analytical
+    rho_in, Mu_in, Ju_in, f_vec = Q_get_state_vars(VBR)
+
+    eta_ss = select_steady_state_viscosity(VBR, method_settings, 'maxwell_analytical')
+    tau_maxwell = eta_ss / Mu_in
+
+    w = 2 * np.pi * f_vec
+    J1 = Ju_in[..., np.newaxis] * np.ones(w.shape)
+    J2 = Ju_in[..., np.newaxis] / (w * tau_maxwell[..., np.newaxis])
+    out = _store_output(J1, J2, rho_in, f_vec)
+    out.tau_M = tau_maxwell
+    out.units.tau_M = 's'
+    VBR.out.anelastic.maxwell_analytical = out
+    return VBR
+
+
+def Q_xfit_mxw(VBR):
+    ''' master curve maxwell scaling, port of Q_xfit_mxw.m '''
+    params = VBR['in'].anelastic.xfit_mxw
+    rho_in, Mu_in, Ju_in, f_vec = Q_get_state_vars(VBR)
+
+    visc_method = VBR['in'].viscous.methods_list[0]
+    eta_diff = VBR.out.viscous[visc_method].diff.eta
+    tau_maxwell = eta_diff / Mu_in
+
+    # normalized frequency and the upper limit of the tau integration for
+    # every (state, frequency) pair
+    f_norm = tau_maxwell[..., np.newaxis] * f_vec
+    max_tau_norm = 1. / (2 * np.pi * f_norm)
+    tau_norm = (1. / (2 * np.pi * f_vec)) / tau_maxwell[..., np.newaxis]
+
+    # integrate on logspace(-30, log10(max_tau_norm), 100) in blocks of pairs
+    int1 = np.empty(max_tau_norm.size)
+    X_end = np.empty(max_tau_norm.size)
+    log_max = np.log10(max_tau_norm).ravel()
+    frac = np.linspace(0., 1., 100)
+    for i0 in range(0, log_max.size, xfit_mxw_block_size):
+        i1 = min(i0 + xfit_mxw_block_size, log_max.size)
+        lims = log_max[i0:i1, np.newaxis]
+        tau_local = 10.**(-30. + (lims + 30.) * frac)
+        X_tau = Q_xfit_mxw_xfunc(tau_local, params)
+        int1[i0:i1] = _trapz(tau_local, X_tau / tau_local)
+        X_end[i0:i1] = X_tau[:, -1]
+    int1 = int1.reshape(max_tau_norm.shape)
+    X_end = X_end.reshape(max_tau_norm.shape)
+
+    Ju = Ju_in[..., np.newaxis]
+    J1 = Ju * (1 + int1)
+    J2 = Ju * ((np.pi / 2) * X_end + tau_norm)
+
+    out = _store_output(J1, J2, rho_in, f_vec)
+    # note: xfit_mxw velocity uses J1 only
+    out.V = np.sqrt(1. / (J1 * rho_in[..., np.newaxis]))
+    out.Vave = Q_aveVoverf(out.V, f_vec)
+    out.f_norm = f_norm
+    out.tau_norm = max_tau_norm
+    out.tau_M = tau_maxwell
+    out.units.tau_M = 's'
+    out.units.f_norm = ''
+    out.units.tau_norm = ''
+    VBR.out.anelastic.xfit_mxw = out
+    return VBR
+
+
+def Q_xfit_mxw_xfunc(tau_norm_vec, params):
+    ''' relaxation spectrum of xfit_mxw, port of Q_xfit_mxw_xfunc.m '''
+    tau_cutoff = params.tau_cutoff
+    beta2 = params.beta2
+    if params.fit == 'fit2':
+        tau_cutoff = params.tau_cutoff_fit2
+        beta2 = params.beta2_fit2
+
+    Alpha = params.Alpha_a - params.Alpha_b / (1 + params.Alpha_c * tau_norm_vec**params.Alpha_taun)
+    Beta = np.full(np.shape(tau_norm_vec), params.beta1)
+    htb = tau_norm_vec < tau_cutoff
+    Beta[htb] = beta2
+    Alpha[htb] = params.alpha2
+    return Beta * tau_norm_vec**Alpha
+
+
+def Q_get_state_vars(VBR):
+    ''' port of Q_get_state_vars.m, frequency is returned as a 1d array '''
+    rho_in = VBR['in'].SV.rho
+    if 'anh_poro' in VBR['in'].elastic:
+        Mu_in = VBR.out.elastic.anh_poro.Gu
+    else:
+        Mu_in = VBR.out.elastic.anharmonic.Gu
+    return rho_in, Mu_in, 1. / Mu_in, VBR['in'].SV.f
+
+
+def select_steady_state_viscosity(VBR, method_settings, method_name):
+    ''' port of select_steady_state_viscosity.m '''
+    if method_settings.viscosity_method == 'calculated':
+        visc_method = VBR['in'].viscous.methods_list[0]
+        mech = method_settings.viscosity_method_mechanism
+        if mech == 'eta_total':
+            return VBR.out.viscous[visc_method][mech]
+        return VBR.out.viscous[visc_method][mech].eta
+    elif method_settings.viscosity_method == 'fixed':
+        return method_settings.eta_ss * np.ones(np.shape(VBR['in'].SV.T_K))
+    raise ValueError("VBR['in'].anelastic." + method_name + ".viscosity_method "
+                     "must be one of 'calculated' or 'fixed', but found "
+                     + str(method_settings.viscosity_method))
+
+
+def Qinv_from_J1_J2(J1, J2, use_correction=0):
+    ''' port of Qinv_from_J1_J2.m '''
+    Qinv = J2 / J1
+    if use_correction == 1:
+        Qinv = Qinv / ((1 + np.sqrt(1 + Qinv**2)) / 2)
+    return Qinv
+
+
+def Q_aveVoverf(V_f, f_vec):
+    ''' average velocity over the (trailing) frequency dimension '''
+    return np.mean(V_f, axis=-1)
+
+
+def Q_method_units():
+    return ParamStruct(J1='1/Pa', J2='1/Pa', Q='', Qinv='', M='Pa', V='m/s',
+                       Vave='m/s')
+
+
+def _store_output(J1, J2, rho_in, f_vec):
+    out = ParamStruct()
+    out.J1 = J1
+    out.J2 = J2
+    out.Qinv = Qinv_from_J1_J2(J1, J2)
+    out.Q = 1. / out.Qinv
+    out.M = (J1**2 + J2**2)**(-0.5)
+    out.V = np.sqrt(out.M / rho_in[..., np.newaxis])
+    out.Vave = Q_aveVoverf(out.V, f_vec)
+    out.units = Q_method_units()
+    return out
+
+
+def _trapz(x, y):
+    # trapezoidal integration along the last axis
+    return np.sum(np.diff(x, axis=-1) * (y[..., 1:] + y[..., :-1]), axis=-1) / 2.
@@ -0,0 +1,81 @@
+'''
+elastic methods, ports of vbr/vbrCore/functions/el_*.m
+'''
+import numpy as np
+
+from .params import ParamStruct
+
+
+def el_anharmonic(VBR):
+    ''' anharmonic moduli, port of el_anharmonic.m '''
+    ela = VBR['in'].elastic.anharmonic
+    SV = VBR['in'].SV
+    anharmonic = ParamStruct()
+
+    if 'Gu_TP' in VBR['in'].elastic and 'Ku_TP' in VBR['in'].elastic:
+        Gu_TP = np.asarray(VBR['in'].elastic.Gu_TP, dtype='float64')
+        Ku_TP = np.asarray(VBR['in'].elastic.Ku_TP, dtype='float64')
+    else:
+        T_K_ref, P_Pa_ref = _get_ref_TP(ela)
+        dT = SV.T_K - T_K_ref
+        dP = SV.P_GPa * 1e9 - P_Pa_ref
+        t_scale = ela.temperature_scaling
+        p_scale = ela.pressure_scaling
+        Ku_0 = _get_M(ela, 'K')
+        anharmonic.Ku_0 = Ku_0
+        Ku_TP = _calc_Mu(ela, t_scale, p_scale, 'K', Ku_0, dT, dP)
+        if 'Gu_TP' in VBR['in'].elastic:
+            Gu_TP = np.asarray(VBR['in'].elastic.Gu_TP, dtype='float64')
+        else:
+            Gu_0 = _get_M(ela, 'G')
+            anharmonic.Gu_0 = Gu_0
+            Gu_TP = _calc_Mu(ela, t_scale, p_scale, 'G', Gu_0, dT, dP)
+            if ela.chi_mixing == 1:
+                Gu_TP, Ku_TP = _chi_mixing(ela, Gu_TP, Ku_TP, dT, dP, SV.chi)
+
+    Vp, Vs = el_VpVs_unrelaxed(Ku_TP, Gu_TP, SV.rho)
+    anharmonic.Gu = Gu_TP
+    anharmonic.Ku = Ku_TP
+    anharmonic.Vpu = Vp
+    anharmonic.Vsu = Vs
+    units = ParamStruct(Gu='Pa', Ku='Pa', Vpu='m/s', Vsu='m/s')
+    anharmonic.units = units
+
+    VBR.out.elastic.units = units
+    VBR.out.elastic.anharmonic = anharmonic
+    return VBR
+
+
+def el_VpVs_unrelaxed(bulk_mod, shear_mod, rho):
+    ''' unrelaxed velocities, port of el_VpVs_unrelaxed.m '''
+    Vp = np.sqrt((bulk_mod + 4. / 3. * shear_mod) / rho)
+    Vs = np.sqrt(shear_mod / rho)
+    return Vp, Vs
+
+
+def _get_ref_TP(ela):
+    if ela.reference_scaling == 'default':
+        return ela.T_K_ref, ela.P_Pa_ref
+    ref = ela[ela.reference_scaling]
+    return ref.T_K_ref, ref.P_Pa_ref
+
+
+def _get_M(ela, G_or_K):
+    if ela.reference_scaling == 'default':
+        return 1e9 * ela[G_or_K + 'u_0_ol']
+    return 1e9 * ela[ela.reference_scaling][G_or_K + 'u_0']
+
+
+def _calc_Mu(ela, t_scale, p_scale, G_or_K, Mu_0, dT, dP):
+    dMdT = ela[t_scale]['d' + G_or_K + '_dT']
+    dMdP = ela[p_scale]['d' + G_or_K + '_dP']
+    dMdP2 = ela[p_scale]['d' + G_or_K + '_dP2']
+    return Mu_0 + dMdT * dT + dP * dMdP + dP**2 * dMdP2
+
+
+def _chi_mixing(ela, Gu_TP, Ku_TP, dT, dP, chi):
+    Gu_TP_c = _calc_Mu(ela, 'crust', 'crust', 'G', ela.crust.Gu_0 * 1e9, dT, dP)
+    Ku_TP_c = _calc_Mu(ela, 'crust', 'crust', 'K', ela.crust.Ku_0 * 1e9, dT, dP)
+    Gu_TP = chi * Gu_TP + (1 - chi) * Gu_TP_c
+    Ku_TP = chi * Ku_TP + (1 - chi) * Ku_TP_c
+    return Gu_TP, Ku_TP
@@ -0,0 +1,122 @@
+'''
+checks the python methods against the MATLAB/Octave VBRc
+
+runs VBR_spine in Octave (or MATLAB) and vbr_spine in python for the same
+state variables and compares every frequency dependent output. Run with:
+
+    python -m pyvbr.matlab_check --executable octave
+
+from the vbr/ directory (requires scipy and an Octave or MATLAB executable).
+'''
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import scipy.io as scp
+
+from .spine import supported_methods, vbr_spine
+
+
+_vbr_top = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+ported_methods = supported_methods['anelastic']
+
+compared_fields = ['J1', 'J2', 'Qinv', 'M', 'V', 'Vave', 'tau_M']
+
+
+def default_state_variables():
+    ''' a small grid of state variables spanning the upper mantle '''
+    T_C, phi, dg_um = np.meshgrid(np.linspace(800, 1500, 8),
+                                  np.array([0., 0.005, 0.01]),
+                                  np.array([1e3, 1e4]), indexing='ij')
+    sz = T_C.shape
+    return {'T_K': (T_C + 273).ravel(), 'phi': phi.ravel(),
+            'dg_um': dg_um.ravel(), 'P_GPa': np.full(sz, 2.5).ravel(),
+            'rho': np.full(sz, 3300.).ravel(),
+            'sig_MPa': np.full(sz, 0.1).ravel(),
+            'f': np.logspace(-2.2, -1.3, 4)}
+
+
+def run_matlab(SV, methods, executable='octave', workdir=None):
+    ''' runs VBR_spine through MATLAB or Octave, returns VBR.out.anelastic '''
+    if workdir is None:
+        workdir = tempfile.mkdtemp()
+    sv_file = os.path.join(workdir, 'sv_in.mat')
+    out_file = os.path.join(workdir, 'vbr_out.mat')
+    mat_SV = {}
+    for fld, val in SV.items():
+        val = np.asarray(val, dtype='float64')
+        mat_SV[fld] = val.reshape(1, -1) if fld == 'f' else val.reshape(-1, 1)
+    scp.savemat(sv_file, mat_SV)
+
+    methods_cell = '{' + ';'.join("'" + m + "'" for m in methods) + '}'
+    script = ("addpath('" + _vbr_top + "'); vbr_init('quiet', 1); "
+              "VBR = struct(); VBR.in.SV = load('" + sv_file + "'); "
+              "VBR.in.elastic.methods_list = {'anharmonic'}; "
+              "VBR.in.viscous.methods_list = {'HZK2011'}; "
+              "VBR.in.anelastic.methods_list = " + methods_cell + "; "
+              "VBR = VBR_spine(VBR); VBR_save(VBR, '" + out_file + "', 1);")
+    if 'matlab' in os.path.basename(executable):
+        cmd = [executable, '-batch', script]
+    else:
+        cmd = [executable, '--no-gui', '--quiet', '--eval', script]
+    subprocess.run(cmd, check=True)
+
+    VBR = scp.loadmat(out_file, squeeze_me=False, struct_as_record=False)
+    return VBR['out'][0, 0].anelastic[0, 0]
+
+
+def compare(SV=None, methods=None, executable='octave', rtol=1e-6):
+    '''
+    compare python and MATLAB output for the ported anelastic methods
+
+    Returns
+    -------
+    dict
+        maximum relative difference for each method and field. Raises an
+        AssertionError if any difference exceeds rtol.
+    '''
+    if SV is None:
+        SV = default_state_variables()
+    if methods is None:
+        methods = ported_methods
+
+    VBR = vbr_spine({'in': {'SV': SV,
+                            'elastic': {'methods_list': ['anharmonic']},
+                            'viscous': {'methods_list': ['HZK2011']},
+                            'anelastic': {'methods_list': methods}}})
+    mat_out = run_matlab(SV, methods, executable=executable)
+
+    diffs = {}
+    failed = []
+    for meth in methods:
+        py_meth = VBR.out.anelastic[meth]
+        mat_meth = getattr(mat_out, meth)[0, 0]
+        for fld in compared_fields:
+            py_val = np.asarray(py_meth[fld])
+            mat_val = np.reshape(getattr(mat_meth, fld), py_val.shape)
+            rel = np.max(np.abs(py_val - mat_val) / np.abs(mat_val))
+            diffs[(meth, fld)] = rel
+            if rel > rtol:
+                failed.append(meth + '.' + fld + ': ' + str(rel))
+
+    if len(failed) > 0:
+        raise AssertionError('python and MATLAB outputs differ:\n  ' + '\n  '.join(failed))
+    return diffs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compare pyvbr to the MATLAB VBRc')
+    parser.add_argument('--executable', type=str, default='octave',
+                        help='octave or matlab executable')
+    parser.add_argument('--rtol', type=float, default=1e-6,
+                        help='maximum allowed relative difference')
+    arg = parser.parse_args()
+
+    diffs = compare(executable=arg.executable, rtol=arg.rtol)
+    for (meth, fld), rel in diffs.items():
+        print(meth + '.' + fld + ' max relative difference: ' + str(rel))
+    sys.exit(0)
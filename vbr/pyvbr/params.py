@@ -0,0 +1,423 @@
+'''
+reads the default parameters from the VBRc MATLAB parameter files
+
+The Params_*.m files in vbr/vbrCore/params are the single source of truth for
+method parameters. Rather than duplicating the values here, the parameter
+files are read and their assignment statements are evaluated. Only the subset
+of MATLAB used by the parameter files is supported: assignments to (nested)
+fields of params, numeric and string expressions, arrays and cell arrays,
+if-blocks on the method name and calls to the parameter functions. Anything
+else (e.g., for loops) raises a ValueError naming the file and statement, so
+that parameters are never silently missing.
+'''
+import math
+import os
+import re
+
+import numpy as np
+
+
+_params_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           '..', 'vbrCore', 'params')
+
+_param_files = {'elastic': 'Params_Elastic',
+                'viscous': 'Params_Viscous',
+                'anelastic': 'Params_Anelastic',
+                'global': 'Params_Global'}
+
+_math_funcs = {'exp': np.exp, 'log': np.log, 'log10': np.log10,
+               'sqrt': np.sqrt, 'abs': np.abs, 'ones': np.ones,
+               'zeros': np.zeros}
+
+_tokens = re.compile(r"""
+    (?P<num>(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?)
+   |(?P<name>[A-Za-z_]\w*(\.[A-Za-z_]\w*)*)
+   |(?P<op>\.\^|\.\*|\./|==|~=|[-+*/^(),;\[\]{}~<>=:])
+   |(?P<ws>\s+)
+""", re.VERBOSE)
+
+_ends_value = ('num', 'str', 'name', ')', ']', '}')
+
+
+class ParamStruct(dict):
+    ''' a dict with attribute access, mirroring a MATLAB structure '''
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key, val):
+        self[key] = val
+
+
+def load_params(prop, method, global_params=None):
+    '''
+    load the default parameters for a method
+
+    Parameters
+    ----------
+    prop : str
+        the property: 'elastic', 'viscous', 'anelastic' or 'global'
+    method : str
+        the method to load, e.g., 'andrade_analytical'. Use '' to load only
+        the list of possible methods.
+    global_params : dict
+        optional global settings (as in VBR.in.GlobalSettings), used for the
+        small-melt effect parameters.
+
+    Returns
+    -------
+    ParamStruct
+        the parameter structure, as returned by Params_*.m
+    '''
+    func = _param_files[prop]
+    args = [method]
+    if global_params is not None:
+        args.append(global_params)
+    return _ParamFile(func).call(func, args)
+
+
+def _strip_comment(line):
+    # remove a trailing % comment that is not inside a string
+    in_str = False
+    prev = ''
+    for ic, c in enumerate(line):
+        if c == "'" and not in_str and prev not in _ends_value_chars:
+            in_str = True
+        elif c == "'" and in_str:
+            in_str = False
+        elif c == '%' and not in_str:
+            return line[:ic]
+        if not c.isspace():
+            prev = c if not in_str else "'"
+    return line
+
+
+# characters after which a single quote is a transpose, not a string
+_ends_value_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_)]}.')
+
+
+def _statements(text):
+    '''
+    split MATLAB source into statements, joining ... continuations and lines
+    within unclosed brackets (a new line within brackets starts a new row)
+    '''
+    stmts = []
+    buffer = ''
+    for line in text.splitlines():
+        line = _strip_comment(line)
+        if line.rstrip().endswith('...'):
+            buffer += line.rstrip()[:-3] + ' '
+            continue
+        line = buffer + line
+        if _bracket_depth(line) > 0:
+            buffer = line.rstrip().rstrip(';') + '; '
+            continue
+        buffer = ''
+        stmts += _split_top_level(line)
+    return [st.strip() for st in stmts if len(st.strip()) > 0]
+
+
+def _bracket_depth(line):
+    # the number of brackets left open at the end of a line
+    depth = 0
+    in_str = False
+    prev = ''
+    for c in line:
+        if c == "'":
+            if in_str:
+                in_str = False
+            elif prev not in _ends_value_chars:
+                in_str = True
+        elif not in_str:
+            if c in '([{':
+                depth += 1
+            elif c in ')]}':
+                depth -= 1
+        if not c.isspace():
+            prev = c if not in_str else "'"
+    return depth
+
+
+def _split_top_level(line):
+    # split a line at ; and , that are outside of brackets and strings
+    parts = []
+    depth = 0
+    in_str = False
+    start = 0
+    prev = ''
+    keyword = re.match(r'\s*(if|elseif|for|while)\b', line) is not None
+    for ic, c in enumerate(line):
+        if c == "'":
+            if in_str:
+                in_str = False
+            elif prev not in _ends_value_chars:
+                in_str = True
+        elif not in_str:
+            if c in '([{':
+                depth += 1
+            elif c in ')]}':
+                depth -= 1
+            elif c == ';' and depth == 0:
+                parts.append(line[start:ic])
+                start = ic + 1
+            elif c == ',' and depth == 0 and not keyword:
+                parts.append(line[start:ic])
+                start = ic + 1
+        if not c.isspace():
+            prev = c if not in_str else "'"
+    parts.append(line[start:])
+    return parts
+
+
+def _tokenize(expr):
+    toks = []
+    ic = 0
+    while ic < len(expr):
+        c = expr[ic]
+        if c == "'" and (len(toks) == 0 or toks[-1][0] not in _ends_value
+                         or toks[-1][2]):
+            # a string literal, '' is an escaped quote
+            jc = ic + 1
+            val = ''
+            while jc < len(expr):
+                if expr[jc] == "'":
+                    if jc + 1 < len(expr) and expr[jc + 1] == "'":
+                        val += "'"
+                        jc += 2
+                        continue
+                    break
+                val += expr[jc]
+                jc += 1
+            toks.append(('str', val, False))
+            ic = jc + 1
+            continue
+        if c == '"':
+            jc = expr.index('"', ic + 1)
+            toks.append(('str', expr[ic + 1:jc], False))
+            ic = jc + 1
+            continue
+        m = _tokens.match(expr, ic)
+        if m is None:
+            raise ValueError('could not parse: ' + expr)
+        kind = m.lastgroup
+        val = m.group(kind)
+        if kind == 'ws':
+            # track whitespace to separate elements within [] and {}
+            if len(toks) > 0:
+                toks[-1] = (toks[-1][0], toks[-1][1], True)
+        elif kind == 'op' and val in ')]}':
+            toks.append((val, val, False))
+        else:
+            toks.append((kind, val, False))
+        ic = m.end()
+    return toks
+
+
+def _to_python(expr, names):
+    '''
+    translates a MATLAB expression to a python expression. names is the set of
+    known variables, "name(...)" is treated as 1-based indexing for known
+    variables and as a function call otherwise.
+    '''
+    toks = _tokenize(expr)
+    out = []
+    brackets = []
+    for it, (kind, val, space_after) in enumerate(toks):
+        nxt = toks[it + 1] if it + 1 < len(toks) else (None, None, False)
+        if kind == 'num':
+            out.append(repr(float(val)))
+        elif kind == 'str':
+            out.append(repr(val))
+        elif kind == 'name':
+            root = val.split('.')[0]
+            if val == 'pi':
+                out.append('_pi')
+            elif val in ('true', 'false'):
+                out.append('1.0' if val == 'true' else '0.0')
+            elif nxt[1] == '(' and root in names:
+                out.append('_index(' + val + ')')
+            elif nxt[1] == '(':
+                out.append('_func(' + repr(val) + ')')
+            else:
+                out.append(val)
+        elif kind == 'op':
+            if val in ('^', '.^'):
+                out.append('**')
+            elif val in ('.*', './'):
+                out.append(val[1])
+            elif val == '~=':
+                out.append('!=')
+            elif val == '~':
+                out.append(' not ')
+            elif val in ('[', '{'):
+                brackets.append(val)
+                out.append('_cat([' if val == '[' else '[')
+            elif val == ';' and len(brackets) > 0:
+                out.append(',')
+            else:
+                out.append(val)
+        elif kind in (']', '}'):
+            brackets.pop()
+            out.append('])' if kind == ']' else ']')
+        else:
+            out.append(val)
+
+        # whitespace between two values within [] or {} separates elements
+        if (len(brackets) > 0 and space_after and kind in _ends_value
+                and (nxt[0] in ('num', 'str', 'name') or nxt[1] in ('(', '[', '{'))):
+            out.append(',')
+    return ''.join(out)
+
+
+def _cat(elements):
+    # MATLAB [] concatenation: strings are joined, numbers form an array
+    if len(elements) > 0 and all(isinstance(el, str) for el in elements):
+        return ''.join(elements)
+    flat = []
+    for el in elements:
+        flat += list(np.ravel(el))
+    return np.array(flat, dtype='float64')
+
+
+class _Indexer(object):
+    def __init__(self, val):
+        self.val = val
+
+    def __call__(self, *idx):
+        return np.ravel(self.val)[int(idx[-1]) - 1]
+
+
+class _ParamFile(object):
+    ''' evaluates the functions within a single Params_*.m file '''
+
+    def __init__(self, name):
+        self.name = name
+        fname = os.path.join(_params_dir, name + '.m')
+        with open(fname, 'r') as fi:
+            text = fi.read()
+        self.functions = {}
+        current = None
+        for st in _statements(text):
+            m = re.match(r'function\s+(\[?[\w,\s]*\]?)\s*=\s*(\w+)\s*\(([\w,\s]*)\)', st)
+            if m is not None:
+                outs = [o for o in re.split(r'[\[\],\s]+', m.group(1)) if o]
+                ins = [i.strip() for i in m.group(3).split(',') if i.strip()]
+                current = m.group(2)
+                self.functions[current] = (outs, ins, [])
+            elif current is not None:
+                self.functions[current][2].append(st)
+
+    def call(self, func, args):
+        outs, ins, body = self.functions[func]
+        scope = {}
+        for name, val in zip(ins, args):
+            scope[name] = val
+        self._run(body, scope)
+        vals = [scope.get(o, None) for o in outs]
+        return vals[0] if len(vals) == 1 else vals
+
+    def _func(self, name, scope):
+        if name in self.functions:
+            return lambda *args: self.call(name, list(args))
+        if name in _param_files.values():
+            return lambda *args: _ParamFile(name).call(name, list(args))
+        if name == 'setGlobalMeltEffects':
+            return _set_global_melt_effects
+        if name == 'strcmp':
+            return lambda a, b: float(a == b)
+        if name == 'exist':
+            return lambda var, *a: float(var in scope)
+        if name in _math_funcs:
+            return _math_funcs[name]
+        raise NameError(name)
+
+    def _eval(self, expr, scope):
+        names = set(scope.keys())
+        pyexpr = _to_python(expr, names)
+        env = {'_pi': math.pi, '_cat': _cat, '_index': _Indexer,
+               '_func': lambda nm: self._func(nm, scope)}
+        for key, val in scope.items():
+            env[key] = val
+        return eval(pyexpr, {'__builtins__': {}}, env)
+
+    def _run(self, body, scope):
+        # stack of [this branch active, a branch already taken, enclosing active]
+        stack = []
+        active = True
+        for st in body:
+            head = st.split()[0].split('(')[0]
+            if head in ('if', 'elseif', 'else', 'for', 'while', 'switch', 'end'):
+                if head in ('for', 'while', 'switch') and active:
+                    raise self._error(st, head + ' blocks are not supported')
+                if head in ('if', 'for', 'while', 'switch'):
+                    cond = self._condition(st, scope) if (head == 'if' and active) else False
+                    stack.append([cond, cond, active])
+                elif head == 'elseif':
+                    branch = stack[-1]
+                    cond = (not branch[1]) and branch[2] and self._condition(st, scope)
+                    branch[0] = cond
+                    branch[1] = branch[1] or cond
+                elif head == 'else':
+                    branch = stack[-1]
+                    branch[0] = (not branch[1]) and branch[2]
+                    branch[1] = True
+                elif head == 'end' and len(stack) > 0:
+                    stack.pop()
+                active = all(b[0] for b in stack)
+                continue
+            if active:
+                self._assign(st, scope)
+
+    def _error(self, st, reason):
+        return ValueError(self.name + '.m: could not evaluate "' + st + '" ('
+                          + reason + ')')
+
+    def _condition(self, st, scope):
+        cond = re.sub(r'^(if|elseif)\b', '', st).strip()
+        cond = cond.replace('||', ' or ').replace('&&', ' and ')
+        try:
+            return bool(self._eval(cond, scope))
+        except Exception as err:
+            raise self._error(st, repr(err)) from err
+
+    def _assign(self, st, scope):
+        m = re.match(r'^(\[[\w,\s]+\]|[\w.]+)\s*=(?!=)(.*)$', st)
+        if m is None:
+            raise self._error(st, 'not an assignment')
+        lhs, rhs = m.group(1).strip(), m.group(2).strip()
+        try:
+            val = self._eval(rhs, scope)
+        except Exception as err:
+            raise self._error(st, repr(err)) from err
+        if lhs.startswith('['):
+            names = [n for n in re.split(r'[\[\],\s]+', lhs) if n]
+            for name, v in zip(names, val):
+                scope[name] = v
+            return
+        path = lhs.split('.')
+        if len(path) == 1:
+            scope[path[0]] = val
+            return
+        node = scope.setdefault(path[0], ParamStruct())
+        for key in path[1:-1]:
+            if key not in node or not isinstance(node[key], dict):
+                node[key] = ParamStruct()
+            node = node[key]
+        node[path[-1]] = val
+
+
+def _set_global_melt_effects(global_params):
+    ''' port of setGlobalMeltEffects.m '''
+    defaults = load_params('global', None)
+    for fld in ('phi_c', 'x_phi_c', 'melt_enhancement'):
+        if fld not in global_params:
+            global_params[fld] = defaults[fld]
+    phi_c = global_params['phi_c']
+    if global_params['melt_enhancement'] == 0:
+        x_phi_c = np.array([1., 1., 1.])
+    else:
+        x_phi_c = global_params['x_phi_c']
+    return [phi_c, x_phi_c]
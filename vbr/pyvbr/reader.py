@@ -0,0 +1,373 @@
+'''
+lazy reader for VBR structures saved with VBR_save.m
+
+HDF5 files (VBR_save(VBR, fname, 0, 'hdf5'): MATLAB v7.3 .mat files or Octave
+HDF5 files) are opened with h5py, and numeric arrays are returned as
+LazyArray objects that only read the requested slices from disk:
+
+    from pyvbr.reader import VBRFile
+
+    with VBRFile('results.mat') as vbr_file:
+        VBR = vbr_file.VBR
+        V = VBR.out.anelastic.eburgers_psp.V  # LazyArray, nothing read yet
+        V.shape  # MATLAB dimension order, e.g., (n_T, n_phi, n_f)
+        V_1 = V[:, :, 0]  # numpy array, reads only the first frequency
+
+Other .mat files (VBR_save's default format) can not be read lazily and are
+loaded with scipy.io.loadmat, keeping the MATLAB array shapes.
+'''
+import numpy as np
+
+from .params import ParamStruct
+
+
+class LazyArray:
+    '''
+    a numeric MATLAB array in an HDF5 file, read on indexing. HDF5 stores
+    MATLAB's column-major arrays with their dimensions reversed, LazyArray
+    restores the MATLAB dimension order, so that indexing matches MATLAB
+    (with 0-based indices) and np.asarray(lazy_array) equals the MATLAB array.
+
+    Supports integers, slices, Ellipsis and integer or boolean index arrays
+    along any dimension. Index arrays select along each dimension separately,
+    as in MATLAB (like np.ix_, not numpy's broadcast fancy indexing). Only the
+    hyperslab spanning the requested elements is read (for index arrays, from
+    their minimum to maximum index).
+    '''
+
+    def __init__(self, dataset, convert=None, owner=None):
+        self._dataset = dataset
+        self._convert = convert
+        self._owner = owner  # keeps the file open while the array is used
+
+    @property
+    def shape(self):
+        return tuple(reversed(self._dataset.shape))
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def dtype(self):
+        if self._convert is not None:
+            return self._convert(np.zeros((0,), dtype=self._dataset.dtype)).dtype
+        return self._dataset.dtype
+
+    @property
+    def chunks(self):
+        ''' the HDF5 chunk shape in MATLAB dimension order, None if not chunked '''
+        if self._dataset.chunks is None:
+            return None
+        return tuple(reversed(self._dataset.chunks))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return 'LazyArray(shape={}, dtype={}, chunks={})'.format(self.shape, self.dtype, self.chunks)
+
+    def __array__(self, dtype=None, copy=None):
+        data = self[...]
+        return data if dtype is None else data.astype(dtype)
+
+    def __getitem__(self, key):
+        key = self._expand_key(key)
+        h5_key = []
+        take = []  # index arrays applied after reading, one per kept dimension
+        out_shape = []
+        for k, n in zip(key, self.shape):
+            if isinstance(k, slice):
+                start, stop, step = k.indices(n)
+                if step > 0:
+                    h5_key.append(slice(start, stop, step))
+                    take.append(None)
+                    out_shape.append(len(range(start, stop, step)))
+                    continue
+                k = np.arange(start, stop, step)
+            elif isinstance(k, (int, np.integer)):
+                if k < -n or k >= n:
+                    raise IndexError('index {} is out of bounds for size {}'.format(k, n))
+                h5_key.append(int(k) % n)
+                continue
+
+            idx = np.asarray(k)
+            if idx.dtype == bool:
+                if idx.shape != (n,):
+                    raise IndexError('boolean index does not match size {}'.format(n))
+                idx = np.nonzero(idx)[0]
+            idx = idx.astype(np.int64).ravel()
+            if np.any((idx < -n) | (idx >= n)):
+                raise IndexError('index out of bounds for size {}'.format(n))
+            idx = idx % n if n > 0 else idx
+            lo = int(idx.min()) if idx.size > 0 else 0
+            hi = int(idx.max()) + 1 if idx.size > 0 else 0
+            h5_key.append(slice(lo, hi))
+            take.append(idx - lo)
+            out_shape.append(idx.size)
+
+        if any(n == 0 for n in out_shape):
+            return np.zeros(out_shape, dtype=self.dtype)
+        data = np.asarray(self._dataset[tuple(reversed(h5_key))]).transpose()
+        for axis, idx in enumerate(take):
+            if idx is not None:
+                data = np.take(data, idx, axis=axis)
+        if self._convert is not None:
+            data = self._convert(data)
+        return data
+
+    def _expand_key(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        n_ellipsis = sum(k is Ellipsis for k in key)
+        if n_ellipsis > 1:
+            raise IndexError('only one Ellipsis is allowed')
+        if any(k is None for k in key):
+            raise IndexError('new axes are not supported, index the returned array instead')
+        n_fill = self.ndim - (len(key) - n_ellipsis)
+        if n_fill < 0:
+            raise IndexError('too many indices for an array with {} dimensions'.format(self.ndim))
+        expanded = []
+        for k in key:
+            if k is Ellipsis:
+                expanded += [slice(None)] * n_fill
+            else:
+                expanded.append(k)
+        if n_ellipsis == 0:
+            expanded += [slice(None)] * n_fill
+        return tuple(expanded)
+
+    def to_dask(self):
+        ''' a dask array over the file, chunked as stored (requires dask) '''
+        import dask.array
+        chunks = self.chunks if self.chunks is not None else 'auto'
+        return dask.array.from_array(self, chunks=chunks, asarray=True)
+
+    def to_xarray(self, dims=None, coords=None, name=None):
+        '''
+        an xarray.DataArray view backed by dask (requires xarray and dask),
+        for lazy, labeled selection, e.g.,
+
+            V = VBR.out.anelastic.eburgers_psp.V
+            da = V.to_xarray(dims=['T', 'phi', 'f'], coords={'f': VBR['in'].SV.f[0]})
+            da.sel(f=0.01, method='nearest').mean('phi').compute()
+
+        dims defaults to dim_0, dim_1, etc.
+        '''
+        import xarray
+        if dims is None:
+            dims = ['dim_{}'.format(i) for i in range(self.ndim)]
+        return xarray.DataArray(self.to_dask(), dims=dims, coords=coords, name=name)
+
+
+class VBRFile:
+    '''
+    a VBR structure saved with VBR_save.m. For HDF5 files, the file stays
+    open while the structure is used: use as a context manager or call
+    close(). Structures are ParamStruct objects (dicts with attribute access),
+    cell arrays are lists, strings are str, scalars are python scalars and
+    other numeric arrays are LazyArray (HDF5) or numpy arrays (other files).
+
+    Parameters
+    ----------
+    fname : str
+        the file saved by VBR_save
+    '''
+
+    def __init__(self, fname):
+        self.fname = fname
+        self._h5 = None
+        with open(fname, 'rb') as f:
+            is_hdf5 = _is_hdf5(f)
+        if is_hdf5:
+            try:
+                import h5py
+            except ImportError:
+                raise ImportError('reading HDF5 VBR files requires h5py')
+            self._h5 = h5py.File(fname, 'r')
+            if 'OCTAVE_NEW_FORMAT' in self._h5.attrs:
+                self.VBR = _OctaveReader(self).group(self._h5)
+            else:
+                self.VBR = _MatlabReader(self).group(self._h5)
+        else:
+            self.VBR = _read_loadmat(fname)
+
+    @property
+    def is_lazy(self):
+        return self._h5 is not None
+
+    def close(self):
+        if self._h5 is not None:
+            self._h5.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_vbr(fname):
+    '''
+    the VBR structure saved in fname by VBR_save.m, with lazy arrays for HDF5
+    files (see VBRFile). The file is closed when the arrays are no longer
+    referenced.
+    '''
+    return VBRFile(fname).VBR
+
+
+def _is_hdf5(f):
+    # the HDF5 signature is at offset 0, or at 512 for MATLAB v7.3 files
+    # (after the .mat header)
+    signature = b'\x89HDF\r\n\x1a\n'
+    for offset in (0, 512, 1024, 2048):
+        f.seek(offset)
+        if f.read(8) == signature:
+            return True
+    return False
+
+
+class _MatlabReader:
+    ''' MATLAB v7.3 layout: the MATLAB_class attribute marks each variable '''
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def group(self, grp):
+        out = ParamStruct()
+        for name in grp:
+            if name.startswith('#'):  # #refs# and #subsystem#
+                continue
+            out[name] = self.value(grp[name])
+        return out
+
+    def value(self, obj):
+        import h5py
+        matlab_class = _attr_str(obj.attrs.get('MATLAB_class', b''))
+        if isinstance(obj, h5py.Group):
+            return self.group(obj)
+        if obj.attrs.get('MATLAB_empty', 0):
+            return '' if matlab_class == 'char' else np.zeros(tuple(np.asarray(obj[()]).ravel()))
+        if matlab_class == 'char':
+            return _chars_to_str(np.asarray(obj[()]).transpose())
+        if matlab_class == 'cell' or obj.dtype == h5py.ref_dtype:
+            refs = np.asarray(obj[()]).transpose().ravel(order='F')
+            return [self.value(obj.file[ref]) for ref in refs]
+        if matlab_class == 'logical':
+            return _lazy_or_scalar(obj, lambda d: d.astype(bool), self.owner)
+        if obj.dtype.names is not None and 'real' in obj.dtype.names:
+            return _lazy_or_scalar(obj, _compound_to_complex, self.owner)
+        if matlab_class in ('function_handle', ''):
+            return None
+        return _lazy_or_scalar(obj, None, self.owner)
+
+
+class _OctaveReader:
+    ''' Octave HDF5 layout: each variable is a group with type and value '''
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def group(self, grp):
+        out = ParamStruct()
+        for name in grp:
+            out[name] = self.value(grp[name])
+        return out
+
+    def value(self, grp):
+        vtype = _attr_str(grp['type'][()])
+        val = grp['value']
+        if vtype == 'scalar struct':
+            return self.group(val)
+        if vtype == 'cell':
+            dims = np.asarray(val['dims'][()]).ravel()
+            n = int(np.prod(dims))
+            return [self.value(val['_{}'.format(i)]) for i in range(n)]
+        if vtype == 'struct':
+            # struct arrays: each field is a cell array of the elements
+            fields = {name: self.value(val[name]) for name in val if name != 'dims'}
+            n = len(next(iter(fields.values()))) if len(fields) > 0 else 0
+            return [ParamStruct({name: fields[name][i] for name in fields}) for i in range(n)]
+        if vtype in ('null_matrix', 'null_string', 'null_sq_string'):
+            return '' if 'string' in vtype else np.zeros((0, 0))
+        if 'OCTAVE_EMPTY_MATRIX' in val.attrs:
+            return '' if 'string' in vtype else np.zeros(tuple(np.asarray(val[()]).ravel()))
+        if vtype in ('string', 'sq_string'):
+            return _chars_to_str(np.asarray(val[()]).transpose())
+        if vtype in ('range', 'double_range'):
+            rng = val[()]
+            base, limit, inc = float(rng['base']), float(rng['limit']), float(rng['increment'])
+            n = int(np.floor((limit - base) / inc * (1 + np.finfo(float).eps))) + 1
+            return base + inc * np.arange(max(n, 0))
+        if vtype.startswith('bool'):
+            return _lazy_or_scalar(val, lambda d: d.astype(bool), self.owner)
+        if vtype.startswith('complex') or vtype.startswith('float complex'):
+            return _lazy_or_scalar(val, _compound_to_complex, self.owner)
+        if vtype.endswith('matrix') or vtype.endswith('scalar'):
+            return _lazy_or_scalar(val, None, self.owner)
+        return None  # function handles, objects, etc.
+
+
+def _lazy_or_scalar(dataset, convert, owner):
+    # scalars are read immediately, arrays are lazy
+    if dataset.ndim == 0 or dataset.size == 1:
+        data = np.asarray(dataset[()]).reshape(())
+        if convert is not None:
+            data = convert(data)
+        return data.item()
+    return LazyArray(dataset, convert=convert, owner=owner)
+
+
+def _compound_to_complex(data):
+    return data['real'] + 1j * data['imag']
+
+
+def _attr_str(val):
+    if isinstance(val, np.ndarray):
+        val = val.ravel()[0] if val.size > 0 else b''
+    if isinstance(val, bytes):
+        val = val.decode()
+    return str(val).rstrip('\x00')
+
+
+def _chars_to_str(codes):
+    # a char array (in MATLAB dimension order) to a string, or a list of
+    # strings for a multi-row char array
+    codes = np.atleast_2d(np.asarray(codes))
+    rows = [''.join(chr(c) for c in row).rstrip('\x00') for row in codes.astype(np.int64)]
+    return rows[0] if len(rows) == 1 else rows
+
+
+def _read_loadmat(fname):
+    import scipy.io
+    data = scipy.io.loadmat(fname, squeeze_me=False, struct_as_record=False,
+                            chars_as_strings=True)
+    out = ParamStruct()
+    for name, val in data.items():
+        if not name.startswith('__'):
+            out[name] = _from_loadmat(val)
+    return out
+
+
+def _from_loadmat(val):
+    import scipy.io.matlab
+    if isinstance(val, scipy.io.matlab.mat_struct):
+        return ParamStruct({name: _from_loadmat(getattr(val, name)) for name in val._fieldnames})
+    if isinstance(val, np.ndarray):
+        if val.dtype.kind == 'U':
+            strs = [str(s) for s in val.ravel()]
+            if len(strs) == 0:
+                return ''
+            return strs[0] if len(strs) == 1 else strs
+        if val.dtype == object:
+            items = [_from_loadmat(item) for item in val.ravel(order='F')]
+            if val.size == 1 and isinstance(items[0], ParamStruct):
+                return items[0]
+            return items
+        if val.size == 1:
+            return val.item()
+    return val
@@ -0,0 +1,148 @@
+'''
+the python batch engine, mirrors vbr/vbrCore/VBR_spine.m for the methods
+that have been ported to python
+'''
+import time
+
+import numpy as np
+
+from . import anelastic, elastic, viscous
+from .params import ParamStruct, load_params
+
+
+# python implementations, keyed by the func_name of each method in Params_*.m
+_functions = {
+    'el_anharmonic': elastic.el_anharmonic,
+    'sr_visc_calc_HZK2011': viscous.sr_visc_calc_HZK2011,
+    'Q_andrade_analytical': anelastic.Q_andrade_analytical,
+    'Q_maxwell_analytical': anelastic.Q_maxwell_analytical,
+    'Q_xfit_mxw': anelastic.Q_xfit_mxw,
+}
+
+# the methods available in python, any other method is rejected by check_input
+supported_methods = {'elastic': ['anharmonic'],
+                     'viscous': ['HZK2011'],
+                     'anelastic': ['andrade_analytical', 'maxwell_analytical',
+                                   'xfit_mxw']}
+
+# each row: property, method, the property it requires and its default method
+_requirements = [('anelastic', 'xfit_mxw', 'viscous', 'HZK2011'),
+                 ('anelastic', 'xfit_mxw', 'elastic', 'anharmonic'),
+                 ('anelastic', 'andrade_analytical', 'elastic', 'anharmonic'),
+                 ('anelastic', 'maxwell_analytical', 'elastic', 'anharmonic')]
+
+
+def vbr_spine(VBR):
+    '''
+    calculates mechanical properties for specified methods and thermodynamic
+    states, the python counterpart of VBR_spine.m.
+
+    Parameters
+    ----------
+    VBR : dict
+        nested dictionary mirroring the MATLAB VBR structure, e.g.,
+
+            VBR = {'in': {'SV': {'T_K': T_K, 'P_GPa': P_GPa, 'dg_um': dg_um,
+                                 'phi': phi, 'rho': rho, 'sig_MPa': sig_MPa,
+                                 'f': f},
+                          'elastic': {'methods_list': ['anharmonic']},
+                          'viscous': {'methods_list': ['HZK2011']},
+                          'anelastic': {'methods_list': ['andrade_analytical']}}}
+
+        state variables may be arrays of any shape as long as they are all the
+        same shape. Parameter overrides are set in the same way as in MATLAB,
+        e.g., VBR['in']['anelastic']['andrade_analytical'] = {'Beta': 1e-3}.
+
+    Returns
+    -------
+    ParamStruct
+        the VBR structure with output in VBR['out'] (also accessible as
+        VBR.out.anelastic.andrade_analytical.V, etc.). Frequency dependent
+        outputs have a new trailing dimension of length numel(f).
+    '''
+    VBR = check_input(VBR)
+    VBR.out = ParamStruct()
+    telapsed = ParamStruct()
+    for prop in ('elastic', 'viscous', 'anelastic'):
+        if prop in VBR['in'] and 'methods_list' in VBR['in'][prop]:
+            VBR.out[prop] = ParamStruct()
+            telapsed[prop] = spine_generalized(VBR, prop)
+    VBR.out.computation_time = telapsed
+    return VBR
+
+
+def spine_generalized(VBR, prop):
+    ''' loads the parameters and calls each method for a property '''
+    telapsed = ParamStruct()
+    for meth in VBR['in'][prop].methods_list:
+        t0 = time.perf_counter()
+        params = load_params(prop, meth, dict(VBR['in'].GlobalSettings))
+        if meth in VBR['in'][prop]:
+            params = nested_structure_update(params, VBR['in'][prop][meth])
+        VBR['in'][prop][meth] = params
+        _functions[params.func_name](VBR)
+        telapsed[meth] = time.perf_counter() - t0
+    return telapsed
+
+
+def check_input(VBR):
+    '''
+    copies the input, applies default methods and state variables. Raises a
+    ValueError for methods that are not available in python (see
+    supported_methods).
+    '''
+    VBR = _to_struct(VBR)
+    VBR['in'] = _to_struct(VBR['in'])
+    SV = VBR['in'].SV
+    for fld in list(SV.keys()):
+        SV[fld] = np.asarray(SV[fld], dtype='float64')
+    if 'f' in SV:
+        SV.f = np.atleast_1d(SV.f).ravel()
+
+    for prop, meth, req, default in _requirements:
+        if prop in VBR['in'] and meth in VBR['in'][prop].get('methods_list', []):
+            if req not in VBR['in'] or 'methods_list' not in VBR['in'][req]:
+                print(prop + " method " + meth + " requires a method for "
+                      + req + ", setting: VBR['in']['" + req
+                      + "']['methods_list']=['" + default + "']")
+                VBR['in'].setdefault(req, ParamStruct())
+                VBR['in'][req].methods_list = [default]
+
+    for prop, methods in supported_methods.items():
+        if prop not in VBR['in'] or 'methods_list' not in VBR['in'][prop]:
+            continue
+        unsupported = [m for m in VBR['in'][prop].methods_list if m not in methods]
+        if len(unsupported) > 0:
+            raise ValueError(prop + ' method(s) ' + ', '.join(unsupported)
+                             + ' not available in python, supported ' + prop
+                             + ' methods: ' + ', '.join(methods))
+
+    global_settings = load_params('global', None)
+    if 'GlobalSettings' in VBR['in']:
+        global_settings.update(VBR['in'].GlobalSettings)
+    VBR['in'].GlobalSettings = global_settings
+
+    sv_shape = np.shape(SV.T_K)
+    if 'Ch2o' not in SV:
+        SV.Ch2o = np.zeros(sv_shape)
+    if 'chi' not in SV:
+        SV.chi = np.ones(sv_shape)
+    return VBR
+
+
+def nested_structure_update(base, updates):
+    ''' port of nested_structure_update.m: recursively overwrite fields '''
+    base = ParamStruct(base)
+    for key, val in updates.items():
+        if isinstance(val, dict) and isinstance(base.get(key, None), dict):
+            base[key] = nested_structure_update(base[key], val)
+        else:
+            base[key] = val
+    return base
+
+
+def _to_struct(d):
+    out = ParamStruct()
+    for key, val in d.items():
+        out[key] = _to_struct(val) if isinstance(val, dict) else val
+    return out
@@ -0,0 +1,49 @@
+'''
+viscous methods, ports of vbr/vbrCore/functions/sr_*.m
+'''
+import numpy as np
+from scipy.special import erf
+
+from .params import ParamStruct
+
+
+def sr_visc_calc_HZK2011(VBR):
+    ''' strain rates and viscosities, port of sr_visc_calc_HZK2011.m '''
+    SV = VBR['in'].SV
+    params = VBR['in'].viscous.HZK2011
+    sig = SV.sig_MPa
+    fH2O = np.zeros(np.shape(SV.T_K))  # this is a dry flow law
+    P_Pa = 1e9 * SV.P_GPa * float(params.P_dep_calc == 'yes')
+
+    out = ParamStruct()
+    sr_tot = 0.
+    for mech in params.possible_mechs:
+        if mech in params:
+            FLP = ParamStruct(params[mech])
+            if VBR['in'].GlobalSettings.melt_enhancement == 0:
+                FLP.x_phi_c = 1.
+            sr = sr_flow_law_calculation(SV.T_K, P_Pa, sig, SV.dg_um, SV.phi,
+                                         fH2O, FLP)
+            sr_tot = sr_tot + sr
+            out[mech] = ParamStruct(sr=sr, eta=sig * 1e6 / sr)
+
+    out.sr_tot = sr_tot
+    out.eta_total = sig * 1e6 / sr_tot
+    out.units = ParamStruct(sr='1/s', eta='Pa*s', sr_tot='1/s', eta_tot='Pa*s')
+    VBR.out.viscous.HZK2011 = out
+    return VBR
+
+
+def sr_flow_law_calculation(T, P, sig_MPa, d, phi, fH2O, FLP):
+    ''' flow law strain rate [1/s], port of sr_flow_law_calculation.m '''
+    R = 8.314
+    sr = (FLP.A * sig_MPa**FLP.n * d**(-FLP.p)
+          * np.exp(-(FLP.Q + P * FLP.V) / (R * T)) * fH2O**FLP.r)
+    sr = sr / FLP.x_phi_c
+    return sr * sr_melt_enhancement(phi, FLP.alf, FLP.x_phi_c, FLP.phi_c)
+
+
+def sr_melt_enhancement(phi, alpha, x_phi_c, phi_c):
+    ''' strain rate melt enhancement, port of sr_melt_enhancement.m '''
+    step = np.log(x_phi_c) * erf(phi / phi_c)
+    return np.exp(alpha * phi + step)
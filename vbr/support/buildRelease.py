@@ -2,95 +2,276 @@
 # python script for building a release package outside of git
 #
 # run with:
-#  python buildRelease.py /path/to/vbr /path/to/release release_type
+#  python buildRelease.py /path/to/vbr /path/to/release release_type [options]
 #
 #    /path/to/vbr: the path to the top-level of the vbr repo and
-#    /path/to/release: the release folder to create
+#    /path/to/release: the release to create: a folder, or an archive if it
+#                      ends in .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz or .zip
 #    release_type: one of the keys from folder_sets, below, e.g., vbr_core
+#
+#  options:
+#    --link {copy,hardlink,reflink}: how files are placed in a release folder.
+#        hardlink and reflink (copy-on-write clone) fall back to copying when
+#        the filesystem does not support them. default copy.
+#    --clean: remove an existing release folder or archive first (required if
+#        it was not built by this script)
+#
+# The release is built without prompts. Archives are written directly from the
+# source files, without a staging folder. Every release includes
+# MANIFEST.sha256, the sha256 checksum of every file (check with
+# sha256sum -c MANIFEST.sha256). The checksums, sizes and modification times
+# are also kept next to the release, in [release].manifest.json, so later
+# builds only hash files that were modified and only re-package changed files:
+# a release folder is updated in place (changed files replaced, deleted files
+# removed) and an archive is only rewritten if its contents changed.
 ################################################################################
-import sys,os,datetime,shutil
-
-path_to_vbr=sys.argv[1] # absolute path to top level vbr directory
-path_to_vbr_release=sys.argv[2] # absolute path to the release folder
-release_type=sys.argv[3] # determines folder subsets to copy
-
-print("\nBuilding VBR release")
-print("\nTop Level VBR directory: "+path_to_vbr)
-print("VBR release directory: "+path_to_vbr_release)
-print("release type: "+release_type)
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tarfile
+import zipfile
+from io import BytesIO
 
 # define release_types (list of folder to be copied recursively)
 folder_sets={'vbr_core':[os.path.join('vbr','support'),
-                        os.path.join('vbr','4_VBR'),
+                        os.path.join('vbr','vbrCore'),
+                        os.path.join('vbr','fitting'),
                         os.path.join('Projects','vbr_core_examples')]}
 
-# read gitignore for list of file types to ignore
-ig_fi=os.path.join(path_to_vbr,'.gitignore')
-fi_ext_to_ignore=[]
-if os.path.isfile(ig_fi):
-    with open(ig_fi) as f:
-        fi_ext_to_ignore = f.read().splitlines()
-    fi_ext_to_ignore="|".join(fi_ext_to_ignore)
-    fi_ext_to_ignore=fi_ext_to_ignore.replace('*','')
-    fi_ext_to_ignore=fi_ext_to_ignore.split('|')
-
-def ignore_files(path, names):
-    # factory function for shutil.copytree
-    ignore_list = []
-    for file in os.listdir(path):
-        (path,fi_ext)=os.path.splitext(file)
-        if fi_ext in fi_ext_to_ignore:
-            ignore_list.append(file)
-    return tuple(ignore_list)
-
-# pull out the release type for this releaes
-fo_list=[]
-if release_type in folder_sets.keys():
-    fo_list=folder_sets[release_type]
-else:
-    print("release type "+release_type+" is not defined. possible types are:")
-    print(folder_sets.keys())
-
-# create the initial directory
-keepgoing=True
-if os.path.isdir(path_to_vbr_release) is False:
-    try:
-        os.mkdir(path_to_vbr_release)
-    except:
-        print("Cannot create release directory, check permissions?")
-        keepgoing=False
-else:
-    print("\nWarning! "+path_to_vbr_release+' already exists!')
-    Y_N = raw_input("Continue (will wipe that directory)? (Y/N):")
-    if Y_N.lower()!='y':
-        keepgoing=False
-        print("... quitting without building repo")
-    if keepgoing:
-        print(" trimming old tree, replanting")
-        shutil.rmtree(path_to_vbr_release)
-        os.mkdir(path_to_vbr_release)
-
-# copy over folders
-if keepgoing:
-    print("\ncopying folders...\n")
-    for fo in fo_list:
-        fo2cp=os.path.join(path_to_vbr,fo)
-        fo_dest=os.path.join(path_to_vbr_release,fo)
-        print('   copying '+fo2cp+' to '+fo_dest)
-        shutil.copytree(fo2cp,fo_dest,ignore=ignore_files)
-
-    print("\ncopying top-level files")
+archive_modes={'.tar': 'w', '.tar.gz': 'w:gz', '.tgz': 'w:gz',
+               '.tar.bz2': 'w:bz2', '.tar.xz': 'w:xz', '.zip': 'zip'}
+
+manifest_name='MANIFEST.sha256'
+notes_name='release_notes.txt'
+
+
+def read_ignored_extensions(path_to_vbr):
+    # read gitignore for list of file types to ignore
+    ig_fi=os.path.join(path_to_vbr,'.gitignore')
+    fi_ext_to_ignore=[]
+    if os.path.isfile(ig_fi):
+        with open(ig_fi) as f:
+            fi_ext_to_ignore = f.read().splitlines()
+        fi_ext_to_ignore="|".join(fi_ext_to_ignore)
+        fi_ext_to_ignore=fi_ext_to_ignore.replace('*','')
+        fi_ext_to_ignore=fi_ext_to_ignore.split('|')
+    return fi_ext_to_ignore
+
+
+def collect_files(path_to_vbr, release_type):
+    ''' the (relative path, full path) of every file in the release, sorted '''
+    fi_ext_to_ignore=read_ignored_extensions(path_to_vbr)
+
+    files=[]
+    for fo in folder_sets[release_type]:
+        for root, dirs, fis in os.walk(os.path.join(path_to_vbr,fo)):
+            dirs.sort()
+            for fi in fis:
+                if os.path.splitext(fi)[1] not in fi_ext_to_ignore:
+                    fullfi=os.path.join(root,fi)
+                    files.append((os.path.relpath(fullfi,path_to_vbr),fullfi))
+
     for fi in os.listdir(path_to_vbr):
         fullfi=os.path.join(path_to_vbr,fi)
         if os.path.isfile(fullfi):
-            dest=os.path.join(path_to_vbr_release,fi)
-            (path,fi_ext)=os.path.splitext(fullfi)
+            fi_ext=os.path.splitext(fullfi)[1]
             if fi_ext not in fi_ext_to_ignore and fi!='.gitignore':
-                print("   copying "+fullfi+" to " + dest )
-                shutil.copyfile(fullfi,dest)
+                files.append((fi,fullfi))
+
+    files.sort()
+    return files
+
+
+def file_sha256(fullfi):
+    sha=hashlib.sha256()
+    with open(fullfi,'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def load_build_manifest(manifest_file):
+    if os.path.isfile(manifest_file):
+        with open(manifest_file) as f:
+            return json.load(f)
+    return {}
+
+
+def hash_files(files, previous):
+    ''' sha256, size and mtime of every file, only hashing modified files '''
+    entries={}
+    n_hashed=0
+    for relfi, fullfi in files:
+        stat=os.stat(fullfi)
+        old=previous.get(relfi, None)
+        if old is not None and old['size']==stat.st_size and old['mtime']==stat.st_mtime:
+            sha=old['sha256']
+        else:
+            sha=file_sha256(fullfi)
+            n_hashed+=1
+        entries[relfi]={'sha256': sha, 'size': stat.st_size, 'mtime': stat.st_mtime}
+    print("   hashed "+str(n_hashed)+" new or modified files of "+str(len(files)))
+    return entries
+
+
+def manifest_text(entries):
+    lines=[entries[relfi]['sha256']+'  '+relfi.replace(os.sep,'/') for relfi in sorted(entries)]
+    return "\n".join(lines)+"\n"
+
 
+def notes_text():
     now_str=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    fi = open(os.path.join(path_to_vbr_release,'release_notes.txt'), "w")
-    fi.write('VBR release built: '+now_str)
-    fi.close()
+    return 'VBR release built: '+now_str
+
+
+def place_file(src, dest, link):
+    ''' copy, hardlink or reflink src to dest, falling back to a copy '''
+    if link=='hardlink':
+        try:
+            os.link(src,dest)
+            return
+        except OSError:
+            pass
+    elif link=='reflink':
+        try:
+            import fcntl
+            FICLONE=0x40049409 # linux ioctl for a copy-on-write clone
+            with open(src,'rb') as s, open(dest,'wb') as d:
+                fcntl.ioctl(d.fileno(),FICLONE,s.fileno())
+            shutil.copystat(src,dest)
+            return
+        except (ImportError, OSError):
+            if os.path.isfile(dest):
+                os.remove(dest)
+    shutil.copy2(src,dest)
+
+
+def write_folder(path_to_release, files, entries, previous, link):
+    ''' updates a release folder in place, only writing changed files '''
+    os.makedirs(path_to_release,exist_ok=True)
+    n_written=0
+    for relfi, fullfi in files:
+        dest=os.path.join(path_to_release,relfi)
+        old=previous.get(relfi, None)
+        if old is not None and old['sha256']==entries[relfi]['sha256'] and os.path.isfile(dest):
+            continue
+        os.makedirs(os.path.dirname(dest),exist_ok=True)
+        if os.path.lexists(dest):
+            os.remove(dest) # never write through an old hardlink
+        place_file(fullfi,dest,link)
+        n_written+=1
+
+    n_removed=0
+    for relfi in previous:
+        if relfi not in entries:
+            dest=os.path.join(path_to_release,relfi)
+            if os.path.lexists(dest):
+                os.remove(dest)
+                n_removed+=1
+
+    with open(os.path.join(path_to_release,manifest_name),'w') as f:
+        f.write(manifest_text(entries))
+    with open(os.path.join(path_to_release,notes_name),'w') as f:
+        f.write(notes_text())
+    print("   wrote "+str(n_written)+" files, "+str(len(files)-n_written)+
+          " unchanged, removed "+str(n_removed))
+
+
+def write_archive(path_to_release, archive_ext, files, entries):
+    ''' streams the files into a tar or zip archive under a top-level folder '''
+    top=os.path.basename(path_to_release)[:-len(archive_ext)]
+    extras={manifest_name: manifest_text(entries).encode(),
+            notes_name: notes_text().encode()}
+    tmp_release=path_to_release+'.tmp'
+    mode=archive_modes[archive_ext]
+    if mode=='zip':
+        with zipfile.ZipFile(tmp_release,'w',compression=zipfile.ZIP_DEFLATED) as zf:
+            for relfi, fullfi in files:
+                zf.write(fullfi,top+'/'+relfi.replace(os.sep,'/'))
+            for name, data in extras.items():
+                zf.writestr(top+'/'+name,data)
+    else:
+        with tarfile.open(tmp_release,mode) as tf:
+            for relfi, fullfi in files:
+                tf.add(fullfi,arcname=top+'/'+relfi.replace(os.sep,'/'),recursive=False)
+            for name, data in extras.items():
+                info=tarfile.TarInfo(top+'/'+name)
+                info.size=len(data)
+                info.mtime=int(datetime.datetime.now().timestamp())
+                tf.addfile(info,BytesIO(data))
+    os.replace(tmp_release,path_to_release)
+    print("   wrote "+str(len(files))+" files to "+path_to_release)
+
+
+def get_archive_ext(path_to_release):
+    for ext in sorted(archive_modes, key=len, reverse=True):
+        if path_to_release.endswith(ext):
+            return ext
+    return None
+
+
+def build_release(path_to_vbr, path_to_release, release_type, link='copy', clean=False):
+    print("\nBuilding VBR release")
+    print("\nTop Level VBR directory: "+path_to_vbr)
+    print("VBR release: "+path_to_release)
+    print("release type: "+release_type)
+
+    if release_type not in folder_sets.keys():
+        raise ValueError("release type "+release_type+" is not defined. possible types are: "+
+                         ", ".join(folder_sets.keys()))
+
+    archive_ext=get_archive_ext(path_to_release)
+    build_manifest_file=path_to_release.rstrip(os.sep)+'.manifest.json'
+    previous=load_build_manifest(build_manifest_file)
+
+    if len(previous)==0 and os.path.exists(path_to_release) and not clean:
+        raise ValueError(path_to_release+" already exists and was not built by buildRelease.py, "
+                         "use --clean to replace it")
+    if clean:
+        if os.path.exists(path_to_release):
+            print(" trimming old release, replanting")
+            if os.path.isdir(path_to_release):
+                shutil.rmtree(path_to_release)
+            else:
+                os.remove(path_to_release)
+        previous={}
+
+    files=collect_files(path_to_vbr,release_type)
+    entries=hash_files(files,previous)
+
+    if archive_ext is None:
+        write_folder(path_to_release,files,entries,previous,link)
+    elif entries.keys()==previous.keys() and os.path.isfile(path_to_release) and \
+            all(entries[fi]['sha256']==previous[fi]['sha256'] for fi in entries):
+        print("   archive is up to date, skipping")
+    else:
+        write_archive(path_to_release,archive_ext,files,entries)
+
+    with open(build_manifest_file,'w') as f:
+        json.dump(entries,f,indent=1,sort_keys=True)
     print("\nRelease Built!")
+    return entries
+
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description="build a VBRc release package outside of git")
+    parser.add_argument("path_to_vbr",help="absolute path to top level vbr directory")
+    parser.add_argument("path_to_release",help="the release folder or archive to create")
+    parser.add_argument("release_type",help="determines folder subsets to copy: "+
+                        ", ".join(folder_sets.keys()))
+    parser.add_argument("--link",choices=['copy','hardlink','reflink'],default='copy',
+                        help="how files are placed in a release folder")
+    parser.add_argument("--clean",action="store_true",
+                        help="remove an existing release first")
+    args=parser.parse_args()
+
+    try:
+        build_release(args.path_to_vbr,args.path_to_release,args.release_type,
+                      link=args.link,clean=args.clean)
+    except (ValueError, OSError) as err:
+        print(err)
+        sys.exit(1)
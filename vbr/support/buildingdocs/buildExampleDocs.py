@@ -2,18 +2,25 @@
 script for building /docs/_pages/examples/
 '''
 from doc_builder import converter
-import sys
+import argparse
+import os
 
 if __name__ == "__main__":
 
-    if len(sys.argv) > 1:
-        clear_dir = bool(sys.argv[1])
-    else:
-        clear_dir = False
+    parser = argparse.ArgumentParser(description="build the VBRc docs markdown")
+    parser.add_argument("clear_dir", nargs="?", default="",
+                        help="if set (e.g., 1), clear out the CB pages first")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rebuild pages and images whose sources changed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of processes for building pages")
+    args = parser.parse_args()
+    clear_dir = bool(args.clear_dir)
 
     # rebuild the cookbook examples
     CBwalker=converter.CBwalker()
-    CBwalker.walkDir(clearTargetDir=clear_dir)
+    CBwalker.walkDir(clearTargetDir=clear_dir, incremental=args.incremental,
+                     workers=args.workers)
 
     converter.sync_release_notes()
-    converter.sync_support_functions()
+    converter.sync_support_functions(incremental=args.incremental)
@@ -1,9 +1,15 @@
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from shutil import copyfile
 
 
 _possible_vbr_path_envs = ['VBRpath', 'vbrdir']
 
+# bump to force a full rebuild when the generated markdown changes
+_manifest_version = 1
+
 
 class VBRinit(object):
     ''' VBRinit class '''
@@ -120,10 +126,13 @@ class CBexample(VBRinit):
         self.ImTargDir=os.path.join(self.DocsPath,'assets','images','CBs')
         return
 
-    def copyImages(self):
+    def copyImages(self, ImFiles=None):
+        ''' copies the figures to the docs assets, all of them by default '''
+        if ImFiles is None:
+            ImFiles = self.ImFiles
 
         if self.HasImageFiles:
-            for ImFi in self.ImFiles:
+            for ImFi in ImFiles:
                 Targ=os.path.join(self.ImTargDir,ImFi)
                 TargFi=os.path.join(self.ImTargDir,ImFi)
                 FullFi=os.path.join(self.ImDir,ImFi)
@@ -151,8 +160,26 @@ class CBwalker(object):
                 os.remove(fullfi)
         return
 
-    def walkDir(self,clearTargetDir=True):
-        ''' walks the mfile directory, builds markdown file for each mfile '''
+    def walkDir(self,clearTargetDir=True,incremental=False,workers=1):
+        ''' walks the mfile directory, builds markdown file for each mfile
+
+        Parameters
+        ----------
+        clearTargetDir: bool
+            clear out the existing CB pages first (default True)
+        incremental: bool
+            only rebuild the pages and copy the images whose sources changed
+            since the last incremental build, as recorded in the build
+            manifest (default False)
+        workers: int
+            number of processes used to build the pages (default 1)
+
+        Returns
+        -------
+        dict
+            lists of the mfiles that were 'rebuilt' and 'skipped' and of the
+            images that were 'copied' and 'images_skipped'
+        '''
 
         if clearTargetDir:
             self.clearTargetDir()
@@ -161,27 +188,75 @@ class CBwalker(object):
                         if os.path.isfile(os.path.join(self.CB0.mfile_dir, f))]
 
         mFiles.sort()
-        CB_list=[]
-        for f in mFiles:
-            if '.m' in f and 'CB_' in f:
-                print("Processing "+f)
-                CB=CBexample(mfile=f)
-                CB.write_md()
-                CB.copyImages()
-                CB_list.append(self.CBlistEntry(f,CB.permalinkpath))
+        mFiles = [f for f in mFiles if '.m' in f and 'CB_' in f]
+
+        ImDir = os.path.join(self.CB0.mfile_dir, 'figures')
+        all_images = sorted(f for f in os.listdir(ImDir)
+                            if os.path.isfile(os.path.join(ImDir, f)))
+        ImTargDir = os.path.join(self.CB0.DocsPath, 'assets', 'images', 'CBs')
 
+        manifest = None
+        if incremental:
+            manifest = BuildManifest.for_vbr(self.CB0.VBRpath)
+
+        report = {'rebuilt': [], 'skipped': [], 'copied': [], 'images_skipped': []}
+        jobs = []
+        CB_list = []
+        for f in mFiles:
+            mfile = f.split('.')[0]
+            images = [im for im in all_images if mfile in im]
+            md_file = os.path.join(self.CB0.examplePath, mfile + '.md')
+            mfile_path = os.path.join(self.CB0.mfile_dir, f)
+
+            page_current = (manifest is not None and os.path.isfile(md_file)
+                            and manifest.is_current(mfile_path, images=images))
+            new_images = images
+            if manifest is not None:
+                new_images = [im for im in images
+                              if not (os.path.isfile(os.path.join(ImTargDir, im))
+                                      and manifest.is_current(os.path.join(ImDir, im)))]
+
+            if page_current:
+                report['skipped'].append(f)
+            else:
+                report['rebuilt'].append(f)
+            report['copied'] += new_images
+            report['images_skipped'] += [im for im in images if im not in new_images]
+            if not page_current or len(new_images) > 0:
+                jobs.append((f, str(self.CB0.VBRpath), not page_current, new_images))
+            CB_list.append(self.CBlistEntry(f, '/examples/' + mfile + '/'))
+
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_build_CB_page, *zip(*jobs)))
+        else:
+            for job in jobs:
+                _build_CB_page(*job)
+
+        if manifest is not None:
+            for f in report['rebuilt']:
+                mfile = f.split('.')[0]
+                manifest.update(os.path.join(self.CB0.mfile_dir, f),
+                                images=[im for im in all_images if mfile in im])
+            for im in report['copied']:
+                manifest.update(os.path.join(ImDir, im))
+            manifest.save()
 
         # rebuild vbrcore.md:
         vbrcore=self.header()
         for ln in CB_list:
             vbrcore.append(ln)
 
-        print("Rebuilding vbrcore.md")
-        with open(os.path.join(CB.examplePath,'vbrcore.md'),'w') as vbrCorefi:
-            for ln in vbrcore:
-                vbrCorefi.write(ln)
+        vbrcore_md = os.path.join(self.CB0.examplePath, 'vbrcore.md')
+        if _write_if_changed(vbrcore_md, vbrcore):
+            print("Rebuilt vbrcore.md")
 
-        return
+        print(f"CB pages: {len(report['rebuilt'])} rebuilt, {len(report['skipped'])} skipped; "
+              f"images: {len(report['copied'])} copied, {len(report['images_skipped'])} skipped")
+        if incremental and len(report['skipped']) > 0:
+            print("  unchanged pages skipped: " + ", ".join(report['skipped']))
+
+        return report
 
     def CBlistEntry(self,f,permalink):
         thestr='* `'+f+'` [link](/vbr'+permalink+')\n'
@@ -202,6 +277,101 @@ class CBwalker(object):
         return rows
 
 
+def _build_CB_page(mfile: str, VBRpath: str, write_md: bool, images: list[str]):
+    ''' builds a single CB page and copies its images (run in the worker processes) '''
+    CB = CBexample(mfile=mfile, VBRpath=VBRpath)
+    if write_md:
+        print("Processing " + mfile)
+        CB.write_md()
+    CB.copyImages(images)
+    return mfile
+
+
+def _write_if_changed(filename: str, lines: list[str]) -> bool:
+    ''' writes lines to filename unless it already has that content '''
+    new_text = ''.join(lines)
+    if os.path.isfile(filename):
+        with open(filename, 'r') as fi:
+            if fi.read() == new_text:
+                return False
+    with open(filename, 'w') as fi:
+        fi.write(new_text)
+    return True
+
+
+class BuildManifest(object):
+    ''' record of the source files used by the last incremental docs build
+
+    For each source file, the manifest stores its modification time, size
+    and sha256 hash, along with any extra values that determine its output
+    (e.g., the list of figures of a CB page, or a parsed docstring). A file
+    is current if its mtime and size match, or, if they do not, its hash
+    does. Files are keyed by their path relative to the VBRc top level.
+    '''
+    def __init__(self, manifest_file: str, VBRpath: str):
+        self.manifest_file = manifest_file
+        self.VBRpath = VBRpath
+        self.entries: dict[str, dict] = {}
+        if os.path.isfile(manifest_file):
+            with open(manifest_file, 'r') as fi:
+                data = json.load(fi)
+            if data.get('version', None) == _manifest_version:
+                self.entries = data['entries']
+
+    @classmethod
+    def for_vbr(cls, VBRpath: str):
+        manifest_file = os.path.join(VBRpath, 'vbr', 'support', 'buildingdocs',
+                                     '.doc_build_manifest.json')
+        return cls(manifest_file, VBRpath)
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.VBRpath))
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as fi:
+            for chunk in iter(lambda: fi.read(1 << 20), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def get(self, path: str, field: str):
+        ''' an extra value stored for path, None if not present '''
+        return self.entries.get(self._key(path), {}).get(field, None)
+
+    def is_current(self, path: str, **extra) -> bool:
+        ''' True if path and the extra values match the manifest '''
+        entry = self.entries.get(self._key(path), None)
+        if entry is None:
+            return False
+        for field, val in extra.items():
+            if entry.get(field, None) != val:
+                return False
+        stat = os.stat(path)
+        if entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return True
+        if entry['sha256'] == self.file_hash(path):
+            # touched but unchanged
+            entry['mtime'] = stat.st_mtime
+            return True
+        return False
+
+    def update(self, path: str, **extra):
+        ''' records the current state of path, with any extra values '''
+        stat = os.stat(path)
+        entry = {'mtime': stat.st_mtime, 'size': stat.st_size,
+                 'sha256': self.file_hash(path)}
+        entry.update(extra)
+        self.entries[self._key(path)] = entry
+
+    def save(self):
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w') as fi:
+            json.dump({'version': _manifest_version, 'entries': self.entries}, fi,
+                      indent=1, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+
 def sync_release_notes():
 
     vbrinfo = VBRinit()
@@ -392,7 +562,10 @@ class SupportFunctions(VBRinit):
             for func in self.support_functions[cat]:
                 self.func_readers[cat].append(MatlabFunction(func, self.paths[cat]))
 
-    def build_lines(self):
+    def build_lines(self, manifest: BuildManifest | None = None):
+        ''' builds the page, reusing docstrings from the manifest if given '''
+        self.parsed: list[str] = []
+        self.skipped: list[str] = []
 
         lines = self.header('/vbrmethods/support/support/', 'Additional functions', include_toc=True)
 
@@ -422,7 +595,7 @@ class SupportFunctions(VBRinit):
             for func in funcs:
                 lines.append(f"\n### {func.func_name}\n")
                 lines.append(f"path: `{func.rel_path}`\n\n")
-                lines += func.docstring
+                lines += self._get_docstring(func, manifest)
                 lines.append(f"[top of category!]({cat_title_link})\n")
                 lines.append("[top of page!](#overview)\n")
 
@@ -431,13 +604,37 @@ class SupportFunctions(VBRinit):
         return lines
 
 
-    def write_page(self):
-        lines = self.build_lines()
+    def _get_docstring(self, func: MatlabFunction, manifest: BuildManifest | None):
+        if manifest is not None and manifest.is_current(func.full_file):
+            docstring = manifest.get(func.full_file, 'docstring')
+            if docstring is not None:
+                self.skipped.append(func.mfile_name)
+                return docstring
+
+        self.parsed.append(func.mfile_name)
+        docstring = func.docstring
+        if manifest is not None:
+            manifest.update(func.full_file, docstring=docstring)
+        return docstring
+
+    def write_page(self, incremental: bool = False):
+        ''' writes support.md. If incremental, only the m-files that changed
+        since the last incremental build are parsed and the page is only
+        written if its contents changed. '''
+        manifest = None
+        if incremental:
+            manifest = BuildManifest.for_vbr(str(self.VBRpath))
+
+        lines = self.build_lines(manifest=manifest)
+        if manifest is not None:
+            manifest.save()
 
-        with open(self.target_md, 'w') as fi:
-            fi.writelines(lines)
+        written = _write_if_changed(self.target_md, lines)
+        print(f"support functions: {len(self.parsed)} parsed, {len(self.skipped)} unchanged; "
+              f"support.md {'written' if written else 'unchanged, skipped'}")
+        return {'parsed': self.parsed, 'skipped': self.skipped, 'written': written}
 
 
-def sync_support_functions():
+def sync_support_functions(incremental: bool = False):
     support_funcs = SupportFunctions()
-    support_funcs.write_page()
+    return support_funcs.write_page(incremental=incremental)
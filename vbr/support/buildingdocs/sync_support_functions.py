@@ -2,6 +2,8 @@
 script for just syncing the support functions
 '''
 from doc_builder import converter
+import sys
 
 if __name__ == "__main__":
-    converter.sync_support_functions()
+    incremental = '--incremental' in sys.argv[1:]
+    converter.sync_support_functions(incremental=incremental)
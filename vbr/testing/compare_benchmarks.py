@@ -0,0 +1,106 @@
+'''
+compares two benchmark result files written by run_benchmarks.m
+
+flags every benchmark (method, number of states, number of frequencies) that
+is slower in the new file than in the baseline by more than a threshold
+ratio. Run with:
+
+    python compare_benchmarks.py baseline.json new.json --threshold 1.2
+
+Exits with status 1 if any slowdowns are found, so it can be used in CI.
+'''
+import argparse
+import json
+import sys
+
+
+def load_results(fname):
+    ''' loads a results file, returns the header and a dict of records '''
+    with open(fname) as f:
+        bench = json.load(f)
+    records = {}
+    for rec in bench['results']:
+        records[(rec['case'], rec['n_states'], rec['n_freq'])] = rec
+    return bench, records
+
+
+def compare(baseline, new, threshold=1.2, min_time=1e-3):
+    '''
+    compares two dicts of records (from load_results)
+
+    Parameters
+    ----------
+    baseline, new : dict
+        the records, keyed by (case, n_states, n_freq)
+    threshold : float
+        a benchmark is a slowdown if new time / baseline time > threshold
+    min_time : float
+        benchmarks faster than this in both files [s] are not flagged, as
+        their times are dominated by timer noise
+
+    Returns
+    -------
+    rows : list
+        (key, baseline time, new time, ratio, flagged) for each shared key
+    missing : list
+        keys in the baseline that are not in new
+    '''
+    rows = []
+    for key in sorted(baseline):
+        if key not in new:
+            continue
+        t_base = baseline[key]['wall_time_s']
+        t_new = new[key]['wall_time_s']
+        ratio = t_new / t_base if t_base > 0 else float('inf')
+        flagged = ratio > threshold and max(t_base, t_new) >= min_time
+        rows.append((key, t_base, t_new, ratio, flagged))
+    missing = [key for key in sorted(baseline) if key not in new]
+    return rows, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare VBRc benchmark results')
+    parser.add_argument('baseline', help='the baseline results JSON file')
+    parser.add_argument('new', help='the new results JSON file')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='flag benchmarks slower than threshold * baseline (default 1.2)')
+    parser.add_argument('--min-time', type=float, default=1e-3,
+                        help='ignore benchmarks faster than this [s] (default 1e-3)')
+    parser.add_argument('--all', action='store_true',
+                        help='print every benchmark, not only the slowdowns')
+    args = parser.parse_args()
+
+    base_info, baseline = load_results(args.baseline)
+    new_info, new = load_results(args.new)
+    print('baseline: VBRc ' + base_info['vbr_version'] + ', ' + base_info['platform']
+          + ', ' + base_info['date'])
+    print('new:      VBRc ' + new_info['vbr_version'] + ', ' + new_info['platform']
+          + ', ' + new_info['date'])
+    print('')
+
+    rows, missing = compare(baseline, new, args.threshold, args.min_time)
+    n_slow = sum(row[4] for row in rows)
+    header = '{:<28} {:>9} {:>6} {:>12} {:>12} {:>7}'.format(
+        'case', 'n_states', 'n_freq', 'baseline [s]', 'new [s]', 'ratio')
+    print(header)
+    print('-' * len(header))
+    for (case, n_states, n_freq), t_base, t_new, ratio, flagged in rows:
+        if flagged or args.all:
+            print('{:<28} {:>9d} {:>6d} {:>12.4g} {:>12.4g} {:>7.2f}{}'.format(
+                case, int(n_states), int(n_freq), t_base, t_new, ratio,
+                '  SLOWER' if flagged else ''))
+
+    print('')
+    for case, n_states, n_freq in missing:
+        print('missing from new results: {} ({} states, {} frequencies)'.format(
+            case, int(n_states), int(n_freq)))
+    for rec in new_info.get('skipped', []):
+        print('skipped in new results (max_evaluations): {} ({} states, {} frequencies)'.format(
+            rec['case'], int(rec['n_states']), int(rec['n_freq'])))
+    print('{} of {} benchmarks slower than {:.2f} x baseline'.format(
+        n_slow, len(rows), args.threshold))
+    return 1 if n_slow > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+function Results = run_benchmarks(varargin)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % Results = run_benchmarks(varargin)
+    %
+    % times the VBR core methods on a set of standard grid sizes and saves the
+    % results as JSON, for tracking performance between versions. Compare two
+    % result files with compare_benchmarks.py:
+    %
+    %    python compare_benchmarks.py baseline.json new.json
+    %
+    % Each method is run through VBR_spine with VBR.in.GlobalSettings.profile = 1,
+    % so that the recorded time is that of the method alone (not its
+    % dependencies, e.g., the anharmonic moduli of the anelastic methods). The
+    % state variables are column vectors spanning upper mantle conditions.
+    % Frequency dependent (anelastic) methods are timed at every number of
+    % frequencies, the other methods with a single frequency. By default, the
+    % full grid is run, including 1e6 states at 100 frequencies, which needs
+    % several GB of memory for the anelastic methods: use 'max_evaluations'
+    % or smaller 'n_states' for a quicker run. Skipped cases are listed in the
+    % output and in the JSON file.
+    %
+    % Parameters
+    % ----------
+    % optional key-value pairs:
+    %   'n_states'        array of the number of states, default [1e2 1e3 1e4 1e5 1e6]
+    %   'n_freqs'         array of the number of frequencies, default [1 10 100]
+    %   'n_repeats'       number of times to run each case, default 3
+    %   'max_evaluations' cases with more than max_evaluations evaluations
+    %                     (n_states * n_freq) are skipped, default Inf (no cases
+    %                     are skipped)
+    %   'cases'           cell array of the case names to run or 'all' (default).
+    %                     The case names are 'property.method', e.g.,
+    %                     'anelastic.andrade_psp', see benchmark_cases below.
+    %   'output_file'     the JSON filename, default 'vbr_benchmarks.json'. Set to
+    %                     '' to skip saving.
+    %
+    % Output
+    % ------
+    % Results   structure with the run information, including
+    %           .max_evaluations, a .results structure array with a record
+    %           for each benchmark:
+    %              .case, .property, .method, .n_states, .n_freq,
+    %              .wall_time_s (the minimum over the repeats),
+    %              .median_time_s, .evaluations_per_s
+    %           and a .skipped structure array with the .case, .n_states and
+    %           .n_freq of each case skipped by max_evaluations
+    %
+    % Examples
+    % --------
+    %    Results = run_benchmarks('n_states', [1e2, 1e4], 'n_freqs', [1, 10], ...
+    %                             'output_file', 'vbr_benchmarks_small.json');
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    defaults.n_states = [1e2, 1e3, 1e4, 1e5, 1e6];
+    defaults.n_freqs = [1, 10, 100];
+    defaults.n_repeats = 3;
+    defaults.max_evaluations = Inf;
+    defaults.cases = 'all';
+    defaults.output_file = 'vbr_benchmarks.json';
+    options = nested_structure_update(defaults, varargin_keyvals_to_structure(varargin));
+
+    cases = benchmark_cases();
+    if ~strcmp(options.cases, 'all')
+        case_names = arrayfun(@(c) [c.property, '.', c.method], cases, 'UniformOutput', false);
+        cases = cases(ismember(case_names, options.cases));
+    end
+
+    Version = vbr_version();
+    Results.vbr_version = Version.version;
+    Results.platform = platform_string();
+    Results.date = datestr(now, 'yyyy-mm-ddTHH:MM:SS');
+    Results.n_repeats = options.n_repeats;
+    Results.max_evaluations = options.max_evaluations;
+    records = cell(0, 1);
+    skipped = struct('case', {}, 'n_states', {}, 'n_freq', {});
+
+    for i_case = 1:numel(cases)
+        bench = cases(i_case);
+        name = [bench.property, '.', bench.method];
+        n_freqs = options.n_freqs;
+        if ~strcmp(bench.property, 'anelastic')
+            n_freqs = 1;
+        end
+        for n_states = options.n_states(:)'
+            for n_freq = n_freqs(:)'
+                if n_states * n_freq > options.max_evaluations
+                    disp(['    skipping ', name, sprintf(' (%d states, %d frequencies)', n_states, n_freq)])
+                    skipped(end+1) = struct('case', name, 'n_states', n_states, 'n_freq', n_freq);
+                    continue
+                end
+                VBR = benchmark_VBR(bench, n_states, n_freq);
+                times = zeros(1, options.n_repeats);
+                for i_rep = 1:options.n_repeats
+                    VBR_out = VBR_spine(VBR);
+                    profile = VBR_out.out.profile;
+                    i_run = find(strcmp(profile.property, bench.property) & ...
+                                 strcmp(profile.method, bench.method));
+                    times(i_rep) = profile.wall_time_s(i_run);
+                end
+                clear VBR_out
+
+                record.case = name;
+                record.property = bench.property;
+                record.method = bench.method;
+                record.n_states = n_states;
+                record.n_freq = n_freq;
+                record.wall_time_s = min(times);
+                record.median_time_s = median(times);
+                record.evaluations_per_s = n_states * n_freq / max(min(times), eps);
+                records{end+1} = record;
+                disp(sprintf('    %-26s %8d states %4d freqs: %10.4g s', name, n_states, ...
+                             n_freq, record.wall_time_s))
+            end
+        end
+    end
+    Results.results = [records{:}];
+    Results.skipped = skipped;
+
+    if numel(options.output_file) > 0
+        write_results_json(Results, options.output_file);
+        disp(['Saved benchmark results to ', options.output_file])
+    end
+end
+
+function cases = benchmark_cases()
+    % the benchmarked methods and any non-default method parameters
+    cases = struct('property', {}, 'method', {}, 'params', {});
+    cases(end+1) = struct('property', 'elastic', 'method', 'anharmonic', 'params', struct());
+    cases(end+1) = struct('property', 'viscous', 'method', 'HK2003', 'params', struct());
+    cases(end+1) = struct('property', 'viscous', 'method', 'HZK2011', 'params', struct());
+    cases(end+1) = struct('property', 'viscous', 'method', 'xfit_premelt', 'params', struct());
+    cases(end+1) = struct('property', 'anelastic', 'method', 'andrade_psp', 'params', struct());
+    cases(end+1) = struct('property', 'anelastic', 'method', 'xfit_mxw', 'params', struct());
+    cases(end+1) = struct('property', 'anelastic', 'method', 'xfit_premelt', 'params', struct());
+    cases(end+1) = struct('property', 'anelastic', 'method', 'eburgers_psp', ...
+                          'params', struct('method', 'FastBurger'));
+end
+
+function VBR = benchmark_VBR(bench, n_states, n_freq)
+    % VBR structure for a single benchmark case
+    VBR = struct();
+    VBR.in.GlobalSettings.profile = 1;
+    VBR.in.elastic.methods_list = {'anharmonic'};
+    if strcmp(bench.property, 'viscous')
+        VBR.in.viscous.methods_list = {bench.method};
+    elseif strcmp(bench.property, 'anelastic')
+        VBR.in.anelastic.methods_list = {bench.method};
+        if strcmp(bench.method, 'xfit_mxw')
+            VBR.in.viscous.methods_list = {'HZK2011'};
+        end
+    end
+    VBR.in.(bench.property).(bench.method) = bench.params;
+
+    sz = [n_states, 1];
+    VBR.in.SV.T_K = linspace(1200, 1500, n_states)' + 273; % temperature [K]
+    VBR.in.SV.Tsolidus_K = full_nd(1350 + 273, sz); % solidus [K]
+    VBR.in.SV.phi = linspace(0, 0.01, n_states)'; % melt fraction
+    VBR.in.SV.dg_um = logspace(3, 4, n_states)'; % grain size [um]
+    VBR.in.SV.P_GPa = linspace(2, 4, n_states)'; % pressure [GPa]
+    VBR.in.SV.rho = full_nd(3300, sz); % density [kg m^-3]
+    VBR.in.SV.sig_MPa = full_nd(0.1, sz); % differential stress [MPa]
+    VBR.in.SV.f = logspace(-2, 0, n_freq); % [Hz]
+end
+
+function str = platform_string()
+    if is_octave()
+        str = ['Octave ', version()];
+    else
+        str = ['MATLAB ', version()];
+    end
+    str = [str, ' (', computer(), ')'];
+end
+
+function write_results_json(Results, fname)
+    fid = fopen(fname, 'w');
+    if fid < 0
+        error(['could not open ', fname, ' for writing'])
+    end
+    fprintf(fid, '{\n');
+    fprintf(fid, '  "vbr_version": "%s",\n', Results.vbr_version);
+    fprintf(fid, '  "platform": "%s",\n', Results.platform);
+    fprintf(fid, '  "date": "%s",\n', Results.date);
+    fprintf(fid, '  "n_repeats": %d,\n', Results.n_repeats);
+    if isinf(Results.max_evaluations)
+        fprintf(fid, '  "max_evaluations": null,\n');
+    else
+        fprintf(fid, '  "max_evaluations": %d,\n', Results.max_evaluations);
+    end
+    fprintf(fid, '  "skipped": [');
+    for i_rec = 1:numel(Results.skipped)
+        rec = Results.skipped(i_rec);
+        if i_rec > 1
+            fprintf(fid, ',');
+        end
+        fprintf(fid, '\n    {"case": "%s", "n_states": %d, "n_freq": %d}', ...
+                rec.case, rec.n_states, rec.n_freq);
+    end
+    if numel(Results.skipped) > 0
+        fprintf(fid, '\n  ');
+    end
+    fprintf(fid, '],\n');
+    fprintf(fid, '  "results": [');
+    for i_rec = 1:numel(Results.results)
+        rec = Results.results(i_rec);
+        if i_rec > 1
+            fprintf(fid, ',');
+        end
+        fprintf(fid, ['\n    {"case": "%s", "property": "%s", "method": "%s", ', ...
+                      '"n_states": %d, "n_freq": %d, "wall_time_s": %.6g, ', ...
+                      '"median_time_s": %.6g, "evaluations_per_s": %.6g}'], ...
+                rec.case, rec.property, rec.method, rec.n_states, rec.n_freq, ...
+                rec.wall_time_s, rec.median_time_s, rec.evaluations_per_s);
+    end
+    fprintf(fid, '\n  ]\n}\n');
+    fclose(fid);
+end
@@ -0,0 +1,261 @@
+'''
+runs the VBRc test functions (test_*.m in this directory) in parallel Octave
+processes and writes a JSON and/or JUnit XML report. Run from anywhere with:
+
+    python run_tests_parallel.py --workers 4 --junit report.xml
+
+The tests are split into one shard per worker, each run by a single Octave
+process (initialized as in run_all_tests.m, with its own VBR_TEST_DATA_DIR).
+Tests are assigned longest first, using the durations from previous runs
+(stored in .vbr_test_durations.json in this directory), so that the shards
+take about the same time. Tests listed as matlab_only in get_config.m are
+skipped, as in run_tests.m. Like run_tests.m, an optional string selects the
+tests whose names contain it:
+
+    python run_tests_parallel.py fm_plates
+
+Exits with status 1 if any test fails or errors, or if no tests are found.
+'''
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+testing_dir = os.path.dirname(os.path.abspath(__file__))
+vbr_top_dir = os.path.dirname(os.path.dirname(testing_dir))
+durations_file = os.path.join(testing_dir, '.vbr_test_durations.json')
+
+# the octave code run by each worker: one result line per test, written as
+# soon as the test finishes (name, status, duration [s], message)
+worker_template = '''
+cd('{vbr_top_dir}');
+vbr_init('quiet', 1);
+addpath(fullfile('vbr', 'testing'));
+addpath(fullfile('Projects', 'vbr_core_examples'));
+setenv('VBRcTesting', '1');
+test_names = {{{test_names}}};
+fid = fopen('{result_file}', 'w');
+for itest = 1:numel(test_names)
+  funcname = test_names{{itest}};
+  disp(['    **** Running ', funcname, ' ****'])
+  t0 = tic;
+  try
+    testResult = feval(funcname);
+    if testResult.passed > 0
+      status = 'passed';
+    else
+      status = 'failed';
+    end
+    msg = testResult.fail_message;
+  catch ME
+    status = 'error';
+    msg = [ME.identifier, ': ', ME.message];
+  end
+  msg = strrep(strrep(strrep(msg, char(9), ' '), char(10), ' '), char(13), ' ');
+  fprintf(fid, '%s\\t%s\\t%.6f\\t%s\\n', funcname, status, toc(t0), msg);
+  fflush(fid);
+end
+fclose(fid);
+setenv('VBRcTesting', '0');
+'''
+
+
+def discover_tests(test_file_string='all'):
+    ''' names of the test functions, as selected by run_tests.m '''
+    names = []
+    for fname in sorted(os.listdir(testing_dir)):
+        if not fname.endswith('.m') or fname == 'run_tests.m':
+            continue
+        if test_file_string == 'all':
+            if fname.startswith('test_'):
+                names.append(fname[:-2])
+        elif test_file_string in fname:
+            names.append(fname[:-2])
+    return names
+
+
+def read_config_list(field):
+    ''' the test names in a cell array of get_config.m, e.g., matlab_only '''
+    with open(os.path.join(testing_dir, 'get_config.m')) as f:
+        config = f.read()
+    match = re.search(r'test_config\.' + field + r'\s*=\s*\{(.*?)\}', config, re.DOTALL)
+    if match is None:
+        return []
+    return [name for name in re.findall(r"'([^']*)'", match.group(1)) if len(name) > 0]
+
+
+def load_durations():
+    if os.path.isfile(durations_file):
+        with open(durations_file) as f:
+            return json.load(f)
+    return {}
+
+
+def save_durations(durations, results):
+    for res in results:
+        if res['status'] in ('passed', 'failed'):
+            durations[res['name']] = res['duration_s']
+    with open(durations_file, 'w') as f:
+        json.dump(durations, f, indent=1, sort_keys=True)
+
+
+def make_shards(names, durations, n_workers):
+    '''
+    splits the tests into shards of about equal total duration, assigning the
+    longest tests first to the shard with the least time. Tests without a
+    previous duration are assumed to take the mean duration.
+    '''
+    known = [durations[name] for name in names if name in durations]
+    default = sum(known) / len(known) if len(known) > 0 else 1.0
+    expected = {name: durations.get(name, default) for name in names}
+    order = sorted(names, key=lambda name: (-expected[name], name))
+
+    n_shards = max(1, min(n_workers, len(names)))
+    shards = [[] for _ in range(n_shards)]
+    totals = [0.0] * n_shards
+    for name in order:
+        i_shard = totals.index(min(totals))
+        shards[i_shard].append(name)
+        totals[i_shard] += expected[name]
+    return shards
+
+
+def run_shard(i_shard, test_names, octave, timeout, log_dir):
+    ''' runs one shard in an Octave process, returns a list of results '''
+    with tempfile.TemporaryDirectory(prefix='vbr_test_shard_') as tmp_dir:
+        result_file = os.path.join(tmp_dir, 'results.tsv')
+        code = worker_template.format(
+            vbr_top_dir=vbr_top_dir.replace("'", "''"),
+            test_names=', '.join("'" + name + "'" for name in test_names),
+            result_file=result_file.replace("'", "''"))
+        env = dict(os.environ, VBR_TEST_DATA_DIR=tmp_dir)
+
+        t0 = time.time()
+        try:
+            proc = subprocess.run([octave, '--no-gui', '--quiet', '--eval', code],
+                                  cwd=vbr_top_dir, env=env, timeout=timeout,
+                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  universal_newlines=True)
+            output = proc.stdout
+            worker_error = 'worker exited with status {}'.format(proc.returncode)
+        except subprocess.TimeoutExpired as err:
+            output = err.stdout or ''
+            if isinstance(output, bytes):
+                output = output.decode(errors='replace')
+            worker_error = 'worker timed out after {} s'.format(timeout)
+        wall_time = time.time() - t0
+
+        results = []
+        if os.path.isfile(result_file):
+            with open(result_file) as f:
+                for line in f:
+                    name, status, duration, message = line.rstrip('\n').split('\t', 3)
+                    results.append({'name': name, 'status': status,
+                                    'duration_s': float(duration), 'message': message,
+                                    'shard': i_shard})
+
+    # tests that did not report a result (e.g., the worker crashed)
+    finished = set(res['name'] for res in results)
+    for name in test_names:
+        if name not in finished:
+            results.append({'name': name, 'status': 'error', 'duration_s': 0.0,
+                            'message': worker_error, 'shard': i_shard})
+
+    if log_dir is not None:
+        with open(os.path.join(log_dir, 'shard_{:02d}.log'.format(i_shard)), 'w') as f:
+            f.write(output)
+    print('shard {}: {} tests in {:.1f} s'.format(i_shard, len(test_names), wall_time))
+    return results
+
+
+def write_junit(results, fname, wall_time):
+    n_fail = sum(res['status'] == 'failed' for res in results)
+    n_err = sum(res['status'] == 'error' for res in results)
+    n_skip = sum(res['status'] == 'skipped' for res in results)
+    suite = ET.Element('testsuite', name='VBRc', tests=str(len(results)),
+                       failures=str(n_fail), errors=str(n_err), skipped=str(n_skip),
+                       time='{:.3f}'.format(wall_time))
+    for res in sorted(results, key=lambda res: res['name']):
+        case = ET.SubElement(suite, 'testcase', classname='vbr.testing', name=res['name'],
+                             time='{:.3f}'.format(res['duration_s']))
+        if res['status'] == 'failed':
+            ET.SubElement(case, 'failure', message=res['message'])
+        elif res['status'] == 'error':
+            ET.SubElement(case, 'error', message=res['message'])
+        elif res['status'] == 'skipped':
+            ET.SubElement(case, 'skipped', message=res['message'])
+    ET.ElementTree(suite).write(fname, encoding='utf-8', xml_declaration=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='run the VBRc tests in parallel Octave processes')
+    parser.add_argument('test_file_string', nargs='?', default='all',
+                        help="only run tests with names containing this string (default 'all')")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of Octave processes (default: number of CPUs)')
+    parser.add_argument('--octave', default='octave', help='the Octave executable')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='maximum time for each worker [s] (default: no limit)')
+    parser.add_argument('--json', default=None, help='write a JSON report to this file')
+    parser.add_argument('--junit', default=None, help='write a JUnit XML report to this file')
+    parser.add_argument('--log-dir', default=None,
+                        help='write the output of each worker to this directory')
+    args = parser.parse_args()
+
+    names = discover_tests(args.test_file_string)
+    matlab_only = read_config_list('matlab_only')
+    results = [{'name': name, 'status': 'skipped', 'duration_s': 0.0,
+                'message': 'MATLAB Only', 'shard': None} for name in names if name in matlab_only]
+    to_run = [name for name in names if name not in matlab_only]
+    if len(to_run) == 0:
+        print('found no tests to run')
+        return 1
+
+    if args.log_dir is not None:
+        os.makedirs(args.log_dir, exist_ok=True)
+    durations = load_durations()
+    shards = make_shards(to_run, durations, args.workers)
+    print('running {} tests in {} shards'.format(len(to_run), len(shards)))
+
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        futures = [pool.submit(run_shard, i_shard, shard, args.octave, args.timeout, args.log_dir)
+                   for i_shard, shard in enumerate(shards)]
+        for future in futures:
+            results += future.result()
+    wall_time = time.time() - t0
+    save_durations(durations, results)
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump({'wall_time_s': wall_time, 'n_workers': len(shards),
+                       'results': sorted(results, key=lambda res: res['name'])}, f, indent=1)
+    if args.junit is not None:
+        write_junit(results, args.junit, wall_time)
+
+    print('')
+    print('{:<50} {:>8} {:>10}'.format('test', 'status', 'time [s]'))
+    print('-' * 70)
+    for res in sorted(results, key=lambda res: -res['duration_s']):
+        print('{:<50} {:>8} {:>10.2f}'.format(res['name'], res['status'], res['duration_s']))
+    print('')
+    failed = [res for res in results if res['status'] in ('failed', 'error')]
+    for res in sorted(failed, key=lambda res: res['name']):
+        print('{} {}: {}'.format(res['status'], res['name'], res['message']))
+    for res in results:
+        if res['status'] == 'skipped':
+            print('skipped {}: {}'.format(res['name'], res['message']))
+    print('{} passed, {} failed, {} skipped in {:.1f} s'.format(
+        sum(res['status'] == 'passed' for res in results), len(failed),
+        sum(res['status'] == 'skipped' for res in results), wall_time))
+    return 1 if len(failed) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
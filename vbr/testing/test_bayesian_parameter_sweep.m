@@ -0,0 +1,87 @@
+function TestResult = test_bayesian_parameter_sweep()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_bayesian_parameter_sweep()
+%
+% test that a parameter sweep of the bayesian fitting project
+% (generate_parameter_sweep) split into shards, with one shard's checkpoints
+% removed and then resumed, merges to the same sweep as a serial run.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+    TestResult.passed=true;
+    TestResult.fail_message = '';
+
+    % assumes we are running from top level directory
+    addpath(fullfile('Projects', 'bayesian_fitting', 'functions'));
+
+    sweep_params.T = [1300, 1400];
+    sweep_params.phi = [0.0, 0.01];
+    sweep_params.gs = [1e3, 1e4];
+    sweep_params.per_bw_max = 30;
+    sweep_params.per_bw_min = 10;
+    sweep_serial = generate_parameter_sweep(sweep_params);
+
+    test_config = get_config();
+    checkpoint_dir = fullfile(test_config.vbr_test_data_dir, 'sweep_checkpoints');
+    clear_checkpoints(checkpoint_dir);
+    sweep_params.checkpoint_dir = checkpoint_dir;
+
+    % two shards: the first leaves the sweep incomplete, the second loads the
+    % first shard's steps and merges the sweep
+    sweep_params.shard = [1, 2];
+    sweep_1 = generate_parameter_sweep(sweep_params);
+    sweep_params.shard = [2, 2];
+    sweep_2 = generate_parameter_sweep(sweep_params);
+    if numel(sweep_1.Box) > 0
+        TestResult.passed = false;
+        TestResult.fail_message = 'a single shard should not return a complete sweep';
+        return
+    end
+    if ~isequal(sweep_2.Box, sweep_serial.Box)
+        TestResult.passed = false;
+        TestResult.fail_message = 'the merged, sharded sweep does not match the serial sweep';
+        return
+    end
+
+    % the first shard's steps are lost, resuming recalculates them and
+    % loads the second shard's steps
+    step_files = dir(fullfile(checkpoint_dir, 'sweep_step_*.mat'));
+    n_steps = numel(sweep_serial.z);
+    if numel(step_files) ~= n_steps
+        TestResult.passed = false;
+        TestResult.fail_message = ['expected ', num2str(n_steps), ' step files, found ', ...
+                                   num2str(numel(step_files))];
+        return
+    end
+    for i_P = 1:2:n_steps
+        delete(fullfile(checkpoint_dir, sprintf('sweep_step_%04d.mat', i_P)));
+    end
+    sweep_params = rmfield(sweep_params, 'shard');
+    sweep_resumed = generate_parameter_sweep(sweep_params);
+
+    if ~isequal(sweep_resumed.Box, sweep_serial.Box)
+        TestResult.passed = false;
+        TestResult.fail_message = 'the resumed, sharded sweep does not match the serial sweep';
+    end
+    if numel(dir(fullfile(checkpoint_dir, 'sweep_step_*.mat'))) ~= n_steps
+        TestResult.passed = false;
+        TestResult.fail_message = 'the resumed sweep did not save the recalculated steps';
+    end
+    clear_checkpoints(checkpoint_dir);
+end
+
+function clear_checkpoints(checkpoint_dir)
+    step_files = dir(fullfile(checkpoint_dir, 'sweep_step_*.mat'));
+    for i_file = 1:numel(step_files)
+        delete(fullfile(checkpoint_dir, step_files(i_file).name));
+    end
+end
@@ -0,0 +1,69 @@
+'''
+test_compare_benchmarks.py
+
+tests for compare_benchmarks.py, with two small result files in the format
+written by run_benchmarks.m. Run with pytest from this directory.
+'''
+
+import json, os, subprocess, sys
+import pytest
+
+import compare_benchmarks as cb
+
+
+def write_results(fname, times, skipped=()):
+    ''' a results file with a record for each (case, n_states, n_freq): time '''
+    results=[{'case': case, 'property': case.split('.')[0], 'method': case.split('.')[1],
+              'n_states': n_states, 'n_freq': n_freq, 'wall_time_s': t,
+              'median_time_s': t, 'evaluations_per_s': n_states*n_freq/t}
+             for (case, n_states, n_freq), t in times.items()]
+    skipped=[{'case': case, 'n_states': n_states, 'n_freq': n_freq}
+             for case, n_states, n_freq in skipped]
+    with open(fname, 'w') as f:
+        json.dump({'vbr_version': '1.2.0', 'platform': 'test', 'date': '2026-01-01T00:00:00',
+                   'n_repeats': 3, 'max_evaluations': None, 'skipped': skipped,
+                   'results': results}, f)
+    return fname
+
+
+@pytest.fixture
+def result_files(tmp_path):
+    slow=('anelastic.andrade_psp', 1000, 10)
+    fast=('anelastic.andrade_psp', 1000, 100)
+    tiny=('elastic.anharmonic', 100, 1)
+    dropped=('viscous.HK2003', 100, 1)
+    baseline=write_results(str(tmp_path/'baseline.json'),
+                           {slow: 0.10, fast: 1.00, tiny: 1e-5, dropped: 0.01})
+    # 50% slower, 10% slower and a 3x slowdown of a case below min_time
+    new=write_results(str(tmp_path/'new.json'), {slow: 0.15, fast: 1.10, tiny: 3e-5},
+                      skipped=[dropped])
+    return baseline, new, slow, fast, tiny, dropped
+
+
+def test_compare(result_files):
+    baseline, new, slow, fast, tiny, dropped=result_files
+    _, base_records=cb.load_results(baseline)
+    _, new_records=cb.load_results(new)
+    rows, missing=cb.compare(base_records, new_records, threshold=1.2)
+    flagged={row[0]: row[4] for row in rows}
+    assert flagged == {slow: True, fast: False, tiny: False}
+    assert missing == [dropped]
+
+    # a lower threshold also flags the 10% slowdown
+    rows, _=cb.compare(base_records, new_records, threshold=1.05)
+    assert {row[0] for row in rows if row[4]} == {slow, fast}
+
+
+def test_main_exit_status(result_files):
+    baseline, new, slow, fast, tiny, dropped=result_files
+    script=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compare_benchmarks.py')
+    result=subprocess.run([sys.executable, script, baseline, new],
+                          capture_output=True, text=True)
+    assert result.returncode == 1
+    assert '1 of 3 benchmarks slower' in result.stdout
+    assert 'skipped in new results (max_evaluations): viscous.HK2003' in result.stdout
+
+    result=subprocess.run([sys.executable, script, baseline, new, '--threshold', '2'],
+                          capture_output=True, text=True)
+    assert result.returncode == 0
+    assert '0 of 3 benchmarks slower' in result.stdout
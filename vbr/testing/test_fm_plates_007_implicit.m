@@ -0,0 +1,111 @@
+function TestResult = test_fm_plates_007_implicit()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_fm_plates_007_implicit()
+%
+% checks the implicit diffusion step against the analytical decay of a sine
+% profile and that the adaptive Crank-Nicolson time stepping of
+% Thermal_Evolution matches the explicit solution in fewer steps. Steps that
+% are accepted with an error above settings.dT_tol are counted in
+% Info.n_dT_tol_exceeded.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  TestResult.passed=true;
+  TestResult.fail_message = '';
+
+  % analytical solution: T = sin(pi z / L) exp(-kappa pi^2 t / L^2) for T = 0
+  % at z = 0, L.
+  L = 100e3; dz = 1e3;
+  zs = (0:dz:L)';
+  z = stag(zs);
+  z = [z(1)-dz; z; z(end)+dz];
+  nz = numel(z);
+  Rho = ones(nz,1); Cp = 1e6 * ones(nz,1); K = ones(nz,1); % kappa = 1e-6
+  [BCs]=init_BCs(struct(),'T','zmin','dirichlet',0);
+  [BCs]=init_BCs(BCs,'T','zmax','dirichlet',0);
+  T0 = BC_setghosts(sin(pi*z/L),BCs.val_T,BCs.type_T,dz);
+  tau = L^2 / (1e-6 * pi^2);
+  dt = 0.3 * tau / 30;
+  T_analytical = sin(pi*z/L) * exp(-0.3);
+
+  thetas = [0.5, 1];
+  tols = [1e-4, 5e-3]; % Crank-Nicolson is second order, backward Euler first
+  for itheta = 1:2
+    T = T0;
+    for istep = 1:30
+      T = diffusion_step(z,Rho,Cp,K,T,dt,thetas(itheta),BCs,dz);
+    end
+    rel_err = max(abs(T(2:nz-1) - T_analytical(2:nz-1))) / exp(-0.3);
+    if rel_err > tols(itheta)
+      TestResult.passed = false;
+      TestResult.fail_message = sprintf('diffusion_step with theta=%g has error %g', ...
+                                        thetas(itheta), rel_err);
+      return
+    end
+  end
+
+  % full model: Crank-Nicolson vs explicit
+  [Vars_cn,Info_cn] = run_model('crank_nicolson', 5);
+  t_cn = Info_cn.t(end);
+  [Vars_ex,Info_ex] = run_model('explicit', t_cn/(3600*24*365*1e6));
+  if numel(unique(Info_cn.t)) >= numel(unique(Info_ex.t))
+    TestResult.passed = false;
+    TestResult.fail_message = 'crank_nicolson did not take fewer steps than explicit';
+    return
+  end
+  [t_ex, i_t] = unique(Info_ex.t(:)); % the final step is stored twice
+  T_ex = interp1(t_ex, Vars_ex.T(:,i_t)', t_cn)';
+  max_diff = max(abs(T_ex - Vars_cn.T(:,end)));
+  if max_diff > 10
+    TestResult.passed = false;
+    TestResult.fail_message = sprintf('crank_nicolson differs from explicit by %g C', max_diff);
+    return
+  end
+
+  % a tolerance that is not met in a single try: every step is accepted
+  % after the maximum number of tries and counted
+  if Info_cn.n_dT_tol_exceeded ~= 0 || Info_ex.n_dT_tol_exceeded ~= 0
+    TestResult.passed = false;
+    TestResult.fail_message = 'steps within settings.dT_tol were counted as exceeding it';
+    return
+  end
+  extra_settings = struct('dT_tol', 1e-12, 'dT_max_tries', 1, 'nt', 3);
+  [~,Info_tol] = run_model('crank_nicolson', 5, extra_settings);
+  if Info_tol.n_dT_tol_exceeded ~= 3
+    TestResult.passed = false;
+    TestResult.fail_message = sprintf(['expected 3 steps exceeding settings.dT_tol, ',...
+                                       'found %d'], Info_tol.n_dT_tol_exceeded);
+  end
+end
+
+function [Vars,Info] = run_model(scheme, t_max_Myrs, extra_settings)
+  [settings]=init_settings;
+  settings.dz0=3; % grid cell size [km]
+  settings.Z_moho_km = 30; % Moho depth [km]
+  settings.Flags.verbosity_level = 0; % quiet!
+  settings.Flags.DiffusionScheme = scheme;
+  settings.nt= 1000; % max number of time steps
+  settings.outk = 1 ; % store every step
+  settings.t_max_Myrs=t_max_Myrs; % max time to calculate [Myr]
+  settings.Flags.T_init='continental';
+  if exist('extra_settings', 'var')
+    settings = nested_structure_update(settings, extra_settings);
+  end
+
+  settings.Zinfo.zmax=settings.zPlate;
+  settings.Zinfo.dz0 = settings.dz0;
+  settings.Zinfo = init_mesh(settings.Zinfo); % build the mesh!
+  [Info] = init_values(settings); % calculate initial values
+  [Info.BCs]=init_BCs(struct(),'T','zmin','dirichlet',0);
+  [Info.BCs]=init_BCs(Info.BCs,'T','zmax','dirichlet',Info.init.T(end));
+  [Vars,Info]=Thermal_Evolution(Info,settings);
+end
@@ -0,0 +1,117 @@
+function TestResult = test_fm_plates_008_box_columnar()
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % TestResult = test_fm_plates_008_box_columnar()
+  %
+  % checks that the columnar and frames Box formats store the same profiles,
+  % that boxes convert between the formats and that saveBox/loadBox round
+  % trip a box, including partial loads.
+  %
+  % Parameters
+  % ----------
+  % none
+  %
+  % Output
+  % ------
+  % TestResult  struct with fields:
+  %           .passed         True if passed, False otherwise.
+  %           .fail_message   Message to display if false
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  TestResult.passed = true;
+  TestResult.fail_message = '';
+
+  settings.Box.DownSampleMeth = 'interp';
+  settings.Box.DownSampleFactor = 2;
+
+  % two runs with a different number of timesteps
+  nts = [5, 3];
+  Box_col = struct();
+  Box_frm = struct();
+  for iBox = 1:2
+    [Vars, Info] = synthetic_run(nts(iBox), iBox);
+    Box_col(iBox).info.var1val = iBox;
+    Box_frm(iBox).info.var1val = iBox;
+    settings.Box.Format = 'columnar';
+    Box_col = Put_in_Box(Box_col, Vars, Info, settings, iBox);
+    settings.Box.Format = 'frames';
+    Box_frm = Put_in_Box(Box_frm, Vars, Info, settings, iBox);
+  end
+
+  if ~isfield(Box_col, 'Profiles') || isfield(Box_col, 'Frames')
+    TestResult.passed = false;
+    TestResult.fail_message = 'columnar Box does not use Box.Profiles';
+    return
+  end
+  if size(Box_col(1).Profiles.T, 2) ~= nts(1) || numel(Box_frm(1).Frames) ~= nts(1)
+    TestResult.passed = false;
+    TestResult.fail_message = 'Box does not store every timestep';
+    return
+  end
+
+  % the accessors agree for both formats
+  for iBox = 1:2
+    if ~isequal(getBoxField(Box_col, iBox, 'T'), getBoxField(Box_frm, iBox, 'T'))
+      TestResult.passed = false;
+      TestResult.fail_message = 'getBoxField differs between formats';
+      return
+    end
+    if ~isequal(getBoxFrame(Box_col, iBox, 'end'), getBoxFrame(Box_frm, iBox, 'end'))
+      TestResult.passed = false;
+      TestResult.fail_message = 'getBoxFrame differs between formats';
+      return
+    end
+    Vars_col = pullFromBox(Box_col, iBox);
+    Vars_frm = pullFromBox(Box_frm, iBox);
+    if ~isequal(Vars_col, Vars_frm)
+      TestResult.passed = false;
+      TestResult.fail_message = 'pullFromBox differs between formats';
+      return
+    end
+  end
+
+  % conversion round trip
+  Box_conv = convertBoxFormat(Box_frm, 'columnar');
+  if ~isequal(Box_conv(2).Profiles, Box_col(2).Profiles)
+    TestResult.passed = false;
+    TestResult.fail_message = 'convertBoxFormat to columnar does not match';
+    return
+  end
+  Box_conv = convertBoxFormat(Box_col, 'frames');
+  if ~isequal(Box_conv(1).Frames, Box_frm(1).Frames)
+    TestResult.passed = false;
+    TestResult.fail_message = 'convertBoxFormat to frames does not match';
+    return
+  end
+
+  % save and load, in full and in part
+  test_config = get_config();
+  fname = fullfile(test_config.vbr_test_data_dir, 'test_box_columnar.mat');
+  saveBox(Box_frm, fname);
+  Box_loaded = loadBox(fname);
+  if ~isequal(Box_loaded(1).Profiles, Box_col(1).Profiles) || ...
+     ~isequal(Box_loaded(2).Profiles, Box_col(2).Profiles)
+    TestResult.passed = false;
+    TestResult.fail_message = 'loadBox does not match the saved Box';
+    return
+  end
+  Box_part = loadBox(fname, 'fields', {'T'}, 'iBox', 2);
+  if numel(Box_part) ~= 1 || ~isequal(fieldnames(Box_part.Profiles), {'T'}) || ...
+     ~isequal(Box_part.Profiles.T, Box_col(2).Profiles.T) || Box_part.info.var1val ~= 2
+    TestResult.passed = false;
+    TestResult.fail_message = 'partial loadBox does not match the saved Box';
+  end
+end
+
+function [Vars, Info] = synthetic_run(nt, seed)
+  nz = 20;
+  z_km = linspace(0, 200, nz)';
+  Info.t = linspace(0, 1, nt);
+  Info.tMyrs = Info.t;
+  Info.ssresid = zeros(1, nt);
+  Info.zLAB = 100 * ones(1, nt);
+  Info.zSOL = 120 * ones(1, nt);
+  Info.final_message = 'done';
+  Info.z_km = z_km;
+  Vars.T = z_km * (seed + Info.t);
+  Vars.P = 3300 * 9.8 * z_km * 1e3 * ones(1, nt);
+end
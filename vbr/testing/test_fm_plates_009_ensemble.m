@@ -0,0 +1,84 @@
+function TestResult = test_fm_plates_009_ensemble()
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  % TestResult = test_fm_plates_009_ensemble()
+  %
+  % checks that runBoxEnsemble stores the same runs as running each model
+  % directly, and that it resumes from the checkpoints: completed runs are
+  % loaded, missing runs are recalculated.
+  %
+  % Parameters
+  % ----------
+  % none
+  %
+  % Output
+  % ------
+  % TestResult  struct with fields:
+  %           .passed         True if passed, False otherwise.
+  %           .fail_message   Message to display if false
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  TestResult.passed = true;
+  TestResult.fail_message = '';
+
+  settings.Box.var1range = [1300, 1400];
+  settings.Box.var1name = 'Tpot';
+  settings.Box.var1units = ' C';
+  settings.dz0 = 5; % grid cell size [km]
+  settings.Z_moho_km = 30; % Moho depth [km]
+  settings.Flags.verbosity_level = 0; % quiet!
+  settings.nt = 10; % max number of time steps
+  settings.outk = 5; % frequency of output (output every outk steps)
+  settings.t_max_Myrs = 1; % max time to calculate [Myr]
+
+  test_config = get_config();
+  checkpoint_dir = fullfile(test_config.vbr_test_data_dir, 'test_box_ensemble');
+  if exist(checkpoint_dir, 'dir') == 7
+    rmdir(checkpoint_dir, 's');
+  end
+
+  [Box, box_settings, Status] = runBoxEnsemble(settings, checkpoint_dir);
+  if ~all(Status.complete(:)) || numel(Box) ~= 2
+    TestResult.passed = false;
+    TestResult.fail_message = 'runBoxEnsemble did not complete every run';
+    return
+  end
+
+  % the second run, calculated directly
+  run_settings = box_settings;
+  run_settings.Tpot = settings.Box.var1range(2);
+  run_settings.Zinfo.zmax = run_settings.zPlate;
+  run_settings.Zinfo.dz0 = run_settings.dz0;
+  run_settings.Zinfo = init_mesh(run_settings.Zinfo);
+  [Info] = init_values(run_settings);
+  [Info.BCs] = init_BCs(struct(), 'T', 'zmin', 'dirichlet', 0);
+  [Info.BCs] = init_BCs(Info.BCs, 'T', 'zmax', 'dirichlet', Info.init.T(end));
+  [Vars, Info] = Thermal_Evolution(Info, run_settings);
+  [Vars, Info] = postproc_append_astheno(Vars, Info, run_settings);
+  Box_direct = Put_in_Box(Box(2), Vars, Info, run_settings, 1);
+  if ~isequal(getBoxField(Box, 2, 'T'), getBoxField(Box_direct, 1, 'T'))
+    TestResult.passed = false;
+    TestResult.fail_message = 'runBoxEnsemble run differs from running the model directly';
+    return
+  end
+
+  % resume: the first run is recalculated, the second is loaded from its
+  % checkpoint (marked so that a recalculation would be detected)
+  delete(fullfile(checkpoint_dir, 'box_run_000001.mat'));
+  run_file = fullfile(checkpoint_dir, 'box_run_000002.mat');
+  saved = load(run_file);
+  saved.Box_run.run_info.final_message = 'loaded from checkpoint';
+  VBR_save(saved, run_file);
+  T_first = getBoxField(Box, 1, 'T');
+
+  [Box, ~, Status] = runBoxEnsemble(settings, checkpoint_dir);
+  if ~all(Status.complete(:)) || exist(fullfile(checkpoint_dir, 'box_run_000001.mat'), 'file') ~= 2
+    TestResult.passed = false;
+    TestResult.fail_message = 'runBoxEnsemble did not recalculate the missing run';
+    return
+  end
+  if ~isequal(getBoxField(Box, 1, 'T'), T_first) || ...
+     ~strcmp(Box(2).run_info.final_message, 'loaded from checkpoint')
+    TestResult.passed = false;
+    TestResult.fail_message = 'runBoxEnsemble did not resume from the checkpoints';
+  end
+end
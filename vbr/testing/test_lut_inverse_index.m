@@ -0,0 +1,94 @@
+function TestResult = test_lut_inverse_index()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_lut_inverse_index()
+%
+% checks the matches of lut_inverse_query against a scan of the full LUT,
+% for a batch of observations at several frequencies, with repeated and NaN
+% values in the LUT.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  TestResult.passed = true;
+  TestResult.fail_message = '';
+
+  % a synthetic LUT
+  [T, phi, dg] = ndgrid(linspace(1100, 1500, 11), linspace(0, 0.03, 7), logspace(3, 4, 5));
+  VBR = struct();
+  VBR.in.SV.T_K = T + 273;
+  VBR.in.SV.phi = phi;
+  VBR.in.SV.dg_um = dg;
+  VBR.in.SV.f = [0.01, 0.1];
+  n_f = numel(VBR.in.SV.f);
+  V = zeros([size(T), n_f]);
+  Q = zeros([size(T), n_f]);
+  for i_f = 1:n_f
+    V(:, :, :, i_f) = 4800 - (T - 1100) - 1e4 * phi + 50 * log10(dg) + 20 * i_f;
+    Q(:, :, :, i_f) = 200 * exp(-(T - 1100) / 150) .* (dg / 1e3).^0.3 * i_f;
+  end
+  V(1:3, 1, 1, 1) = 4500; % ties
+  V(end, end, end, :) = NaN;
+  VBR.out.anelastic.meth_a.V = V;
+  VBR.out.anelastic.meth_a.Q = Q;
+  VBR.out.anelastic.meth_b.V = V * 0.99;
+  VBR.out.anelastic.meth_b.Q = Q * 1.1;
+
+  scale = [1e-3, 1];
+  rel_tol = [0.005, 0.1];
+  Index = lut_inverse_index(VBR, {'V', 'Q'}, 'scale', scale);
+  obs.V = [4.5; 4.4; 4.6; 9; 4.45];
+  obs.Q = [100; 60; 150; 100; 40];
+  obs.f = [0.01; 0.1; 0.012; 0.01; 0.2];
+  Matches = lut_inverse_query(Index, obs, 'rel_tol', rel_tol);
+
+  if ~isequal(Matches.f_index(:)', [1, 2, 1, 1, 2])
+    TestResult.passed = false;
+    TestResult.fail_message = 'observations not matched to the nearest frequency';
+    return
+  end
+
+  meths = {'meth_a'; 'meth_b'};
+  n_total = 0;
+  for i_meth = 1:numel(meths)
+    meth = meths{i_meth};
+    result = Matches.(meth);
+    for i_obs = 1:numel(obs.V)
+      i_f = Matches.f_index(i_obs);
+      V_f = VBR.out.anelastic.(meth).V(:, :, :, i_f) * scale(1);
+      Q_f = VBR.out.anelastic.(meth).Q(:, :, :, i_f) * scale(2);
+      expected = find(abs(V_f - obs.V(i_obs)) <= rel_tol(1) * obs.V(i_obs) & ...
+                      abs(Q_f - obs.Q(i_obs)) <= rel_tol(2) * obs.Q(i_obs));
+      found = result.state_index(result.obs_start(i_obs) + (0:result.n_matches(i_obs)-1));
+      if ~isequal(sort(found(:)), expected(:))
+        TestResult.passed = false;
+        TestResult.fail_message = sprintf('%s: matches of observation %d differ from a full scan', meth, i_obs);
+        return
+      end
+      n_total = n_total + numel(expected);
+
+      if isempty(expected)
+        range_ok = isnan(result.ranges.T_K.min(i_obs)) && isnan(result.ranges.phi.max(i_obs));
+      else
+        range_ok = result.ranges.T_K.min(i_obs) == min(VBR.in.SV.T_K(expected)) && ...
+                   result.ranges.phi.max(i_obs) == max(VBR.in.SV.phi(expected));
+      end
+      if ~range_ok
+        TestResult.passed = false;
+        TestResult.fail_message = sprintf('%s: state variable ranges of observation %d are wrong', meth, i_obs);
+        return
+      end
+    end
+  end
+  if n_total == 0
+    TestResult.passed = false;
+    TestResult.fail_message = 'no observations matched, test is not informative';
+  end
+end
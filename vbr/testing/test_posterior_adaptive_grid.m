@@ -0,0 +1,72 @@
+function TestResult = test_posterior_adaptive_grid()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_posterior_adaptive_grid()
+%
+% checks that the adaptive grid posterior matches the full-grid posterior
+% while evaluating the forward model at fewer points.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  TestResult.passed = true;
+  TestResult.fail_message = '';
+
+  states.T = linspace(1100, 1800, 33);
+  states.phi = linspace(0, 0.05, 33);
+  states.gs = logspace(2, 4, 9);
+  states.T_mean = 1400;
+  states.T_std = 150;
+  states.T_pdf_type = 'normal';
+  states_fields = {'T', 'phi', 'gs'};
+  obs = struct('value', {4.25, 60}, 'std', {0.01, 3});
+
+  Post = posterior_adaptive_grid(states, states_fields, @forward, obs, ...
+                                 'pair_marginals', 1);
+
+  % full grid
+  [T, phi, gs] = ndgrid(states.T, states.phi, states.gs);
+  full_pred = forward(struct('T', T(:), 'phi', phi(:), 'gs', gs(:)));
+  obs_full = obs;
+  obs_full(1).predicted = reshape(full_pred(:, 1), size(T));
+  obs_full(2).predicted = reshape(full_pred(:, 2), size(T));
+  Post_full = posterior_streaming(states, states_fields, obs_full, 'pair_marginals', 1);
+
+  n_grid = numel(T);
+  if Post.n_evaluations > 0.6 * n_grid
+    TestResult.passed = false;
+    TestResult.fail_message = sprintf('evaluated %d of %d grid points', ...
+                                      Post.n_evaluations, n_grid);
+    return
+  end
+  for i_var = 1:3
+    field = states_fields{i_var};
+    max_diff = max(abs(Post.marginals.(field) - Post_full.marginals.(field)));
+    if max_diff > 1e-6
+      TestResult.passed = false;
+      TestResult.fail_message = sprintf('marginal of %s differs by %g', field, max_diff);
+      return
+    end
+  end
+  max_diff = max(abs(Post.pair_marginals.T_phi(:) - Post_full.pair_marginals.T_phi(:)));
+  if max_diff > 1e-6 || ~isequal(Post.top_k.index, Post_full.top_k.index)
+    TestResult.passed = false;
+    TestResult.fail_message = 'joint posterior differs from the full grid';
+  end
+end
+
+function predicted = forward(points)
+  % a smooth, nonlinear stand-in for Vs and Q
+  predicted = zeros(numel(points.T), 2);
+  predicted(:, 1) = 4.9 - 1.2e-3 * (points.T - 1100) - 3 * points.phi ...
+                    + 0.02 * log10(points.gs);
+  predicted(:, 2) = exp(6 - (points.T - 1100) / 150 - 20 * points.phi ...
+                        + 0.3 * log(points.gs));
+end
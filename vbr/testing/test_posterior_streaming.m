@@ -0,0 +1,90 @@
+function TestResult = test_posterior_streaming()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_posterior_streaming()
+%
+% checks the chunked, log-space posterior against the full-grid posterior
+% from priorModelProbs and likelihood_from_residuals, and that it does not
+% underflow for very small probabilities.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  TestResult.passed = true;
+  TestResult.fail_message = '';
+
+  states.T = linspace(1100, 1800, 13);
+  states.phi = linspace(0, 0.05, 7);
+  states.gs = logspace(2, 4, 9);
+  states.T_mean = 1400;
+  states.T_std = 150;
+  states.T_pdf_type = 'normal';
+  states_fields = {'T', 'phi', 'gs'};
+  [T, phi, gs] = ndgrid(states.T, states.phi, states.gs);
+  Vs = 4.8 - 1e-3 * (T - 1100) - 2 * phi + 0.05 * log10(gs) ...
+       + 0.01 * sin(T / 37 + 300 * phi + gs / 500);
+  obs = struct('value', 4.3, 'std', 0.05, 'predicted', Vs);
+
+  % full-grid posterior
+  grid_states = states;
+  grid_states.T = T;
+  grid_states.phi = phi;
+  grid_states.gs = gs;
+  prior = priorModelProbs(grid_states, states_fields);
+  likelihood = likelihood_from_residuals(obs.value, obs.std, Vs);
+  posterior = likelihood .* prior;
+  posterior = posterior / sum(posterior(:));
+
+  % chunks that do not divide the grid, with predictions read by a function
+  obs_fun = obs;
+  obs_fun.predicted = @(inds) Vs(inds);
+  for chunk_size = [50, numel(T)]
+    Post = posterior_streaming(states, states_fields, obs_fun, ...
+                               'chunk_size', chunk_size, 'top_k', 5, ...
+                               'pair_marginals', 1);
+    marg_T = reshape(sum(sum(posterior, 2), 3), [], 1);
+    marg_T_phi = sum(posterior, 3);
+    max_gs = reshape(max(max(posterior, [], 1), [], 2), [], 1);
+    [p_sorted, i_sorted] = sort(posterior(:), 'descend');
+    if max(abs(Post.marginals.T - marg_T)) > 1e-12 || ...
+       max(abs(Post.pair_marginals.T_phi(:) - marg_T_phi(:))) > 1e-12 || ...
+       max(abs(Post.max_profile.gs - max_gs)) > 1e-12
+      TestResult.passed = false;
+      TestResult.fail_message = sprintf('marginals do not match for chunk_size = %d', chunk_size);
+      return
+    end
+    if ~isequal(Post.top_k.index, i_sorted(1:5)) || ...
+       max(abs(Post.top_k.posterior - p_sorted(1:5))) > 1e-12
+      TestResult.passed = false;
+      TestResult.fail_message = sprintf('top_k does not match for chunk_size = %d', chunk_size);
+      return
+    end
+  end
+
+  % a very precise observation: the likelihood underflows in linear space
+  obs.std = 1e-5;
+  likelihood = likelihood_from_residuals(obs.value, obs.std, Vs);
+  if any(likelihood(:) > 0)
+    TestResult.passed = false;
+    TestResult.fail_message = 'test observation does not underflow the likelihood';
+    return
+  end
+  Post = posterior_streaming(states, states_fields, obs, 'chunk_size', 100);
+  if abs(sum(Post.marginals.T) - 1) > 1e-10 || ~isfinite(Post.log_evidence)
+    TestResult.passed = false;
+    TestResult.fail_message = 'log-space posterior is not normalized for small probabilities';
+    return
+  end
+  [~, i_best] = min(abs(Vs(:) - obs.value));
+  if Post.top_k.index(1) ~= i_best
+    TestResult.passed = false;
+    TestResult.fail_message = 'most probable state is not the best fitting state';
+  end
+end
@@ -0,0 +1,69 @@
+'''
+test_pyvbr.py
+
+tests for the python batch engine (vbr/pyvbr): the parameter file parser, the
+method validation and the comparison to the MATLAB VBRc (matlab_check.py).
+The comparison runs MATLAB if it is on the path, otherwise Octave, and is
+skipped when neither is available. Set VBR_MATLAB_EXECUTABLE to choose the
+executable. Run with pytest from this directory.
+'''
+
+import os, shutil, sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyvbr import load_params, vbr_spine
+from pyvbr import matlab_check
+
+
+def matlab_executable():
+    exe=os.environ.get('VBR_MATLAB_EXECUTABLE')
+    if exe is not None:
+        return shutil.which(exe)
+    for exe in ['matlab', 'octave']:
+        if shutil.which(exe) is not None:
+            return shutil.which(exe)
+    return None
+
+
+def small_VBR(anelastic_methods):
+    SV=matlab_check.default_state_variables()
+    return {'in': {'SV': SV,
+                   'elastic': {'methods_list': ['anharmonic']},
+                   'viscous': {'methods_list': ['HZK2011']},
+                   'anelastic': {'methods_list': anelastic_methods}}}
+
+
+def test_multiline_cell_array():
+    # a cell array spanning lines without ... continuations
+    citations=load_params('anelastic', 'xfit_premelt').citations
+    assert len(citations) == 2
+    assert citations[1].startswith('Yamauchi and Takei, 2024')
+
+
+def test_unsupported_statement_raises():
+    # the eburgers_psp parameters set values in a for loop
+    with pytest.raises(ValueError, match=r'Params_Anelastic\.m.*for imeth'):
+        load_params('anelastic', 'eburgers_psp')
+
+
+def test_unsupported_method_rejected():
+    with pytest.raises(ValueError, match='eburgers_psp'):
+        vbr_spine(small_VBR(['andrade_analytical', 'eburgers_psp']))
+
+
+def test_supported_methods_run():
+    VBR=vbr_spine(small_VBR(matlab_check.ported_methods))
+    n_f=len(VBR['in'].SV.f)
+    for meth in matlab_check.ported_methods:
+        V=VBR.out.anelastic[meth].V
+        assert V.shape == VBR['in'].SV.T_K.shape+(n_f,)
+        assert np.all(np.isfinite(V))
+
+
+@pytest.mark.skipif(matlab_executable() is None,
+                    reason='MATLAB or Octave is not available')
+def test_matches_matlab():
+    matlab_check.compare(executable=matlab_executable())
@@ -0,0 +1,174 @@
+'''
+test_pyvbr_reader.py
+
+tests for the lazy VBR file reader (vbr/pyvbr/reader.py): small files in the
+MATLAB v7.3 and Octave HDF5 layouts, written with h5py, and a default format
+.mat file, written with scipy. Run with pytest from this directory.
+'''
+
+import os, sys
+import numpy as np
+import scipy.io as scp
+import pytest
+
+h5py=pytest.importorskip('h5py')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyvbr import ParamStruct, VBRFile, LazyArray, load_vbr
+
+
+# a MATLAB array of size [4, 3, 5], e.g., V(T, phi, f)
+V=np.arange(60, dtype=np.float64).reshape((4, 3, 5), order='F')*0.5+1.
+f=np.array([[0.01, 0.1, 1.]])  # a MATLAB row vector
+
+
+def write_matlab_file(fname):
+    ''' the MATLAB v7.3 layout of VBR.in.SV.f, VBR.in.elastic.methods_list,
+    VBR.out.anelastic.andrade_psp.V (chunked) and VBR.out.units.V '''
+
+    with h5py.File(fname, 'w', userblock_size=512) as h5:
+        def struct(grp, name):
+            g=grp.create_group(name)
+            g.attrs['MATLAB_class']=np.bytes_('struct')
+            return g
+
+        def double(grp, name, data, **kwargs):
+            # HDF5 stores MATLAB's column-major arrays with reversed dimensions
+            ds=grp.create_dataset(name, data=np.asarray(data).transpose(), **kwargs)
+            ds.attrs['MATLAB_class']=np.bytes_('double')
+            return ds
+
+        def char(grp, name, string):
+            codes=np.array([[ord(c) for c in string]], dtype=np.uint16)
+            ds=grp.create_dataset(name, data=codes.transpose())
+            ds.attrs['MATLAB_class']=np.bytes_('char')
+            return ds
+
+        refs=h5.create_group('#refs#')
+        VBR=struct(h5, 'VBR')
+        SV=struct(struct(VBR, 'in'), 'SV')
+        double(SV, 'f', f)
+        elastic=struct(VBR['in'], 'elastic')
+        cell_refs=[char(refs, name, name).ref for name in ['anharmonic', 'anh_poro']]
+        methods=elastic.create_dataset('methods_list', data=np.array([cell_refs]).transpose(),
+                                       dtype=h5py.ref_dtype)
+        methods.attrs['MATLAB_class']=np.bytes_('cell')
+        andrade=struct(struct(struct(VBR, 'out'), 'anelastic'), 'andrade_psp')
+        double(andrade, 'V', V, chunks=(1, 3, 4))
+        double(andrade, 'n_peaks', 1.)
+        char(struct(VBR['out'], 'units'), 'V', 'm/s')
+
+    # the MATLAB .mat header in the user block
+    with open(fname, 'r+b') as fid:
+        fid.write(b'MATLAB 7.3 MAT-file'.ljust(116))
+
+
+def write_octave_file(fname):
+    ''' the Octave HDF5 layout (save -hdf5) of the same structure '''
+
+    with h5py.File(fname, 'w') as h5:
+        h5.attrs['OCTAVE_NEW_FORMAT']=np.uint8(1)
+
+        def variable(grp, name, vtype):
+            g=grp.create_group(name)
+            g.create_dataset('type', data=np.bytes_(vtype))
+            return g
+
+        def struct(grp, name):
+            return variable(grp, name, 'scalar struct').create_group('value')
+
+        def matrix(grp, name, data, **kwargs):
+            data=np.asarray(data)
+            vtype='scalar' if data.size == 1 else 'matrix'
+            variable(grp, name, vtype).create_dataset('value', data=data.transpose(), **kwargs)
+
+        def string(grp, name, string):
+            codes=np.array([[ord(c) for c in string]], dtype=np.int8)
+            variable(grp, name, 'string').create_dataset('value', data=codes.transpose())
+
+        VBR=struct(h5, 'VBR')
+        VBR_in=struct(VBR, 'in')
+        matrix(struct(VBR_in, 'SV'), 'f', f)
+        methods=variable(struct(VBR_in, 'elastic'), 'methods_list', 'cell').create_group('value')
+        methods.create_dataset('dims', data=np.array([1, 2], dtype=np.int64))
+        string(methods, '_0', 'anharmonic')
+        string(methods, '_1', 'anh_poro')
+        VBR_out=struct(VBR, 'out')
+        andrade=struct(struct(VBR_out, 'anelastic'), 'andrade_psp')
+        matrix(andrade, 'V', V, chunks=(1, 3, 4))
+        matrix(andrade, 'n_peaks', 1.)
+        string(struct(VBR_out, 'units'), 'V', 'm/s')
+
+
+@pytest.fixture(params=['matlab', 'octave'])
+def hdf5_file(request, tmp_path):
+    fname=str(tmp_path/'VBR.mat')
+    if request.param == 'matlab':
+        write_matlab_file(fname)
+    else:
+        write_octave_file(fname)
+    return fname
+
+
+def test_structure_types(hdf5_file):
+    with VBRFile(hdf5_file) as vbr_file:
+        assert vbr_file.is_lazy
+        VBR=vbr_file.VBR['VBR']
+        assert isinstance(VBR, ParamStruct)
+        assert isinstance(VBR['in'].SV, ParamStruct)
+        assert VBR['in'].elastic.methods_list == ['anharmonic', 'anh_poro']
+        assert VBR.out.units.V == 'm/s'
+        assert VBR.out.anelastic.andrade_psp.n_peaks == 1.
+        assert np.array_equal(np.asarray(VBR['in'].SV.f), f)
+
+
+def test_lazy_slicing(hdf5_file):
+    with VBRFile(hdf5_file) as vbr_file:
+        V_lazy=vbr_file.VBR['VBR'].out.anelastic.andrade_psp.V
+        assert isinstance(V_lazy, LazyArray)
+        # MATLAB dimension order
+        assert V_lazy.shape == V.shape
+        assert V_lazy.chunks == (4, 3, 1)
+        V_full=np.asarray(V_lazy)
+        assert np.array_equal(V_full, V)
+
+        keys=[(slice(None), slice(None), 0),
+              (1, Ellipsis),
+              (slice(1, 3), 2, slice(None, None, 2)),
+              (slice(None, None, -1), [0, 2], -1),
+              (np.array([True, False, True, True]), slice(None), 3),
+              (Ellipsis, slice(5, 5))]
+        for key in keys:
+            assert np.array_equal(V_lazy[key], V_full[key])
+
+        # index arrays select along each dimension separately, as in MATLAB
+        i_T=np.array([True, False, True, True])
+        i_f=[4, 1, 1]
+        assert np.array_equal(V_lazy[i_T, :, i_f], V_full[np.ix_(i_T, range(3), i_f)])
+
+        with pytest.raises(IndexError):
+            V_lazy[4, 0, 0]
+        with pytest.raises(IndexError):
+            V_lazy[0, 0, 0, 0]
+
+
+def test_load_vbr(hdf5_file):
+    VBR=load_vbr(hdf5_file)['VBR']
+    assert np.array_equal(VBR.out.anelastic.andrade_psp.V[:, 1, :], V[:, 1, :])
+
+
+def test_default_mat_format(tmp_path):
+    fname=str(tmp_path/'VBR.mat')
+    scp.savemat(fname, {'VBR': {'in': {'SV': {'f': f},
+                                       'elastic': {'methods_list': np.array(['anharmonic', 'anh_poro'],
+                                                                            dtype=object)}},
+                                'out': {'anelastic': {'andrade_psp': {'V': V}},
+                                        'units': {'V': 'm/s'}}}})
+    vbr_file=VBRFile(fname)
+    assert not vbr_file.is_lazy
+    VBR=vbr_file.VBR['VBR']
+    assert isinstance(VBR.out, ParamStruct)
+    assert VBR['in'].elastic.methods_list == ['anharmonic', 'anh_poro']
+    assert VBR.out.units.V == 'm/s'
+    assert np.array_equal(VBR.out.anelastic.andrade_psp.V, V)
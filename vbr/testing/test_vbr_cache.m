@@ -0,0 +1,128 @@
+function TestResult = test_vbr_cache()
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % check the VBR_spine result cache: hits, misses, key
+    % changes, LRU eviction, rebuilding an unreadable index, the index lock and
+    % skipping the cache for chunks streamed to disk
+    % TestResult  struct with fields:
+    %           .passed         True if passed, False otherwise.
+    %           .fail_message   Message to display if false
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+    TestResult.passed = true;
+    TestResult.fail_message = '';
+
+    test_config = get_config();
+    cache_dir = fullfile(test_config.vbr_test_data_dir, 'vbr_cache');
+    VBR_cache_clear(cache_dir);
+
+    % first call is a miss, second a hit with identical output
+    VBR_1 = VBR_spine(get_VBR(cache_dir));
+    VBR_2 = VBR_spine(get_VBR(cache_dir));
+    if VBR_1.cache_info.hit ~= 0 || VBR_2.cache_info.hit ~= 1
+        TestResult.passed = false;
+        TestResult.fail_message = 'expected a cache miss followed by a hit';
+    end
+    V_1 = VBR_1.out.anelastic.andrade_psp.V;
+    V_2 = VBR_2.out.anelastic.andrade_psp.V;
+    if ~isequal(V_1, V_2) || ~isequal(size(VBR_2.in.SV.T_K), size(VBR_1.in.SV.T_K))
+        TestResult.passed = false;
+        TestResult.fail_message = 'cached output does not match';
+    end
+    if ~isfield(VBR_2.in.anelastic, 'andrade_psp')
+        TestResult.passed = false;
+        TestResult.fail_message = 'cached method parameters were not restored';
+    end
+
+    % changing a parameter or a state variable changes the key
+    VBR = get_VBR(cache_dir);
+    VBR.in.anelastic.andrade_psp.n = 0.3;
+    VBR_3 = VBR_spine(VBR);
+    VBR = get_VBR(cache_dir);
+    VBR.in.SV.T_K(1) = VBR.in.SV.T_K(1) + 1;
+    VBR_4 = VBR_spine(VBR);
+    if VBR_3.cache_info.hit ~= 0 || VBR_4.cache_info.hit ~= 0
+        TestResult.passed = false;
+        TestResult.fail_message = 'changed inputs should not be cache hits';
+    end
+
+    stats = VBR_cache_stats(cache_dir);
+    if stats.hits ~= 1 || stats.misses ~= 3 || stats.n_entries ~= 3
+        TestResult.passed = false;
+        TestResult.fail_message = 'unexpected cache counters';
+    end
+
+    % with a tiny size limit, storing a new result keeps only that entry
+    VBR = get_VBR(cache_dir);
+    VBR.in.SV.T_K(2) = VBR.in.SV.T_K(2) + 1;
+    VBR.in.cache.max_size_MB = 1e-6;
+    VBR = VBR_spine(VBR);
+    stats = VBR_cache_stats(cache_dir);
+    if stats.n_entries ~= 1 || stats.evictions ~= 3
+        TestResult.passed = false;
+        TestResult.fail_message = 'least recently used entries were not evicted';
+    end
+
+    % an unreadable index is rebuilt from the entry files
+    fid = fopen(fullfile(cache_dir, 'vbr_cache_index.mat'), 'w');
+    fwrite(fid, 'not a mat file');
+    fclose(fid);
+    VBR = get_VBR(cache_dir);
+    VBR.in.SV.T_K(2) = VBR.in.SV.T_K(2) + 1;
+    VBR = VBR_spine(VBR);
+    if VBR.cache_info.hit ~= 1
+        TestResult.passed = false;
+        TestResult.fail_message = 'the unreadable cache index was not rebuilt';
+    end
+    if numel(dir(fullfile(cache_dir, 'vbr_cache_tmp_*.mat'))) > 0
+        TestResult.passed = false;
+        TestResult.fail_message = 'temporary cache files were left behind';
+    end
+    if exist(fullfile(cache_dir, '.lock'), 'dir') == 7
+        TestResult.passed = false;
+        TestResult.fail_message = 'the cache lock was not released';
+    end
+
+    % the lock is a directory in the cache directory
+    VBR_cache_lock(cache_dir);
+    locked = exist(fullfile(cache_dir, '.lock'), 'dir') == 7;
+    VBR_cache_unlock(cache_dir);
+    if ~locked || exist(fullfile(cache_dir, '.lock'), 'dir') == 7
+        TestResult.passed = false;
+        TestResult.fail_message = 'VBR_cache_lock or VBR_cache_unlock failed';
+    end
+
+    % output streamed to disk in chunks is not cached
+    VBR = get_VBR(cache_dir);
+    VBR.in.SV.T_K(3) = VBR.in.SV.T_K(3) + 1;
+    VBR.in.chunks.size = 5;
+    VBR.in.chunks.dir = fullfile(test_config.vbr_test_data_dir, 'vbr_cache_chunks');
+    VBR = VBR_spine(VBR);
+    stats = VBR_cache_stats(cache_dir);
+    if isfield(VBR, 'cache_info') || stats.n_entries ~= 1
+        TestResult.passed = false;
+        TestResult.fail_message = 'chunks streamed to disk were cached';
+    end
+
+    VBR_cache_clear(cache_dir);
+    stats = VBR_cache_stats(cache_dir);
+    if stats.n_entries ~= 0 || stats.hits ~= 0
+        TestResult.passed = false;
+        TestResult.fail_message = 'VBR_cache_clear did not reset the cache';
+    end
+end
+
+function VBR = get_VBR(cache_dir)
+    VBR = struct();
+    VBR.in.cache.dir = cache_dir;
+    VBR.in.elastic.methods_list={'anharmonic'};
+    VBR.in.anelastic.methods_list={'andrade_psp'};
+    VBR.in.SV.f = [0.01, 0.1];
+    sz = [5, 2];
+    VBR.in.SV.T_K = linspace(1200, 1400, 10) + 273;
+    VBR.in.SV.T_K = reshape(VBR.in.SV.T_K, sz);
+    VBR.in.SV.P_GPa = full_nd(2, sz); % pressure [GPa]
+    VBR.in.SV.rho = full_nd(3300, sz); % density [kg m^-3]
+    VBR.in.SV.sig_MPa = full_nd(10, sz); % differential stress [MPa]
+    VBR.in.SV.dg_um = full_nd(0.01 * 1e6, sz); % grain size [um]
+    VBR.in.SV.phi = full_nd(0.0, sz); % melt fraction
+end
@@ -0,0 +1,58 @@
+function TestResult = test_vbr_profile()
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % check the per-method profile report and its export
+    % TestResult  struct with fields:
+    %           .passed         True if passed, False otherwise.
+    %           .fail_message   Message to display if false
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+    TestResult.passed = true;
+    TestResult.fail_message = '';
+
+    VBR.in.GlobalSettings.profile = 1;
+    VBR.in.elastic.methods_list={'anharmonic'};
+    VBR.in.viscous.methods_list={'HZK2011'};
+    VBR.in.anelastic.methods_list={'andrade_psp'; 'xfit_mxw'};
+    VBR.in.SV.f = [0.01, 0.1, 1.0];
+    sz = [4, 3];
+    VBR.in.SV.T_K = full_nd(1473, sz); % temperature [K]
+    VBR.in.SV.P_GPa = full_nd(2, sz); % pressure [GPa]
+    VBR.in.SV.rho = full_nd(3300, sz); % density [kg m^-3]
+    VBR.in.SV.sig_MPa = full_nd(10, sz); % differential stress [MPa]
+    VBR.in.SV.dg_um = full_nd(0.01 * 1e6, sz); % grain size [um]
+    VBR.in.SV.phi = full_nd(0.0, sz); % melt fraction
+    VBR = VBR_spine(VBR);
+
+    profile = VBR.out.profile;
+    expected_methods = {'anharmonic', 'HZK2011', 'andrade_psp', 'xfit_mxw'};
+    if ~isequal(profile.method, expected_methods)
+        TestResult.passed = false;
+        TestResult.fail_message = 'profile does not list the expected methods';
+        return
+    end
+    expected_evals = [12, 12, 36, 36];
+    if ~isequal(profile.n_evaluations, expected_evals) || any(profile.wall_time_s < 0) ...
+       || any(profile.output_bytes <= 0)
+        TestResult.passed = false;
+        TestResult.fail_message = 'unexpected profile values';
+        return
+    end
+
+    test_config = get_config();
+    csv_file = fullfile(test_config.vbr_test_data_dir, 'test_vbr_profile.csv');
+    json_file = fullfile(test_config.vbr_test_data_dir, 'test_vbr_profile.json');
+    VBR_profile_export(VBR, csv_file);
+    VBR_profile_export(VBR, json_file);
+
+    csv_lines = strsplit(strtrim(fileread(csv_file)), char(10));
+    if numel(csv_lines) ~= 5 || ~strncmp(csv_lines{1}, 'property,method,wall_time_s', 27)
+        TestResult.passed = false;
+        TestResult.fail_message = 'unexpected CSV profile export';
+        return
+    end
+    json_text = fileread(json_file);
+    if numel(strfind(json_text, '"method": ')) ~= 4
+        TestResult.passed = false;
+        TestResult.fail_message = 'unexpected JSON profile export';
+    end
+end
@@ -50,4 +50,15 @@ function TestResult = test_vbr_save()
         disp(msg)
     end
 
+    save_file = fullfile(save_dir, "test_vbr_save_hdf5.mat");
+    VBR_save(VBR, save_file, 0, 'hdf5')
+    VBR_loaded = load(save_file);
+    V = VBR.out.anelastic.xfit_premelt.V;
+    if ~isequal(VBR_loaded.out.anelastic.xfit_premelt.V, V)
+        msg = ['         VBR structure saved as HDF5 does not match'];
+        TestResult.passed = false;
+        TestResult.fail_message = msg;
+        disp(msg)
+    end
+
 end
@@ -0,0 +1,85 @@
+function TestResult = test_vbrcore_013_eburgers_batched()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_vbrcore_013_eburgers_batched()
+%
+% accuracy benchmark of the batched eburgers_psp integration
+% (integration_method=3) against the quadgk integration (integration_method=2),
+% with and without the dissipation peak.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+    TestResult.passed=true;
+    TestResult.fail_message = '';
+
+    rel_tol = 1e-4; % the dissipation peak truncation gives up to about 6e-5
+    fits = {'bg_only'; 'bg_peak'};
+    for ifit = 1:numel(fits)
+        fit = fits{ifit};
+        VBR_gk = run_eburgers(get_VBR(), fit, 2, 5000);
+        VBR_b = run_eburgers(get_VBR(), fit, 3, 5000);
+        gk = VBR_gk.out.anelastic.eburgers_psp;
+        b = VBR_b.out.anelastic.eburgers_psp;
+
+        fields = {'J1'; 'J2'; 'V'; 'Qinv'};
+        for ifield = 1:numel(fields)
+            fld = fields{ifield};
+            if sum(size(b.(fld)) == size(gk.(fld))) ~= ndims(gk.(fld))
+                TestResult.passed = false;
+                TestResult.fail_message = [fit, ' batched ', fld, ' has the wrong size'];
+                return
+            end
+            max_err = max(abs(b.(fld)(:) ./ gk.(fld)(:) - 1));
+            if max_err > rel_tol
+                TestResult.passed = false;
+                msg = [fit, ' batched ', fld, ' differs from quadgk, max relative error: ', ...
+                       num2str(max_err), ' (tolerance ', num2str(rel_tol), ')'];
+                TestResult.fail_message = msg;
+                return
+            end
+        end
+
+        % the result should not depend on the block size
+        VBR_b7 = run_eburgers(get_VBR(), fit, 3, 7);
+        max_err = max(abs(VBR_b7.out.anelastic.eburgers_psp.J2(:) ./ b.J2(:) - 1));
+        if max_err > 1e-12
+            TestResult.passed = false;
+            TestResult.fail_message = [fit, ' batched J2 depends on integration_block_size'];
+            return
+        end
+    end
+end
+
+function VBR = run_eburgers(VBR, fit, int_meth, block_size)
+    VBR.in.anelastic.eburgers_psp = Params_Anelastic('eburgers_psp');
+    VBR.in.anelastic.eburgers_psp.eBurgerFit = fit;
+    VBR.in.anelastic.eburgers_psp.integration_method = int_meth;
+    VBR.in.anelastic.eburgers_psp.integration_block_size = block_size;
+    VBR = VBR_spine(VBR);
+end
+
+function VBR = get_VBR()
+
+    VBR = struct();
+    VBR.in.elastic.methods_list={'anharmonic'};
+    VBR.in.anelastic.methods_list={'eburgers_psp'};
+
+    sz = [4, 3];
+    T_K = linspace(1000, 1400, sz(1))' + 273;
+    dg_um = [0.001, 0.01, 0.1] * 1e6;
+    VBR.in.SV.T_K = repmat(T_K, 1, sz(2)); % temperature [K]
+    VBR.in.SV.dg_um = repmat(dg_um, sz(1), 1); % grain size [um]
+    VBR.in.SV.phi = full_nd(0.0, sz); % melt fraction
+    VBR.in.SV.P_GPa = full_nd(2.5, sz); % pressure [GPa]
+    VBR.in.SV.rho = full_nd(3300, sz); % density [kg m^-3]
+    VBR.in.SV.sig_MPa = full_nd(.1, sz); % differential stress [MPa]
+    VBR.in.SV.f = logspace(-4, 1, 4); % [Hz]
+end
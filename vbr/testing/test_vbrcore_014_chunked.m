@@ -0,0 +1,107 @@
+function TestResult = test_vbrcore_014_chunked()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_vbrcore_014_chunked()
+%
+% test that chunked execution of VBR_spine (VBR.in.chunks) reproduces the
+% unchunked output, in memory and when streaming chunks to disk. Every output
+% is compared, for chunk sizes with a last chunk of a different size.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+    TestResult.passed=true;
+    TestResult.fail_message = '';
+
+    VBR_full = VBR_spine(get_VBR());
+
+    % 24 states: chunks of 7, 7, 7, 3 states (the last chunk has the size of
+    % the frequency dimension), of 5, 5, 5, 5, 4 states and a single chunk
+    % of 24 states (a remainder of a single state joins the last chunk).
+    chunk_sizes = [7, 5, 23];
+    for i_size = 1:numel(chunk_sizes)
+        VBR = get_VBR();
+        VBR.in.chunks.size = chunk_sizes(i_size);
+        VBR_chunked = VBR_spine(VBR);
+        full_out = rmfield(VBR_full.out, 'computation_time');
+        mismatch = compare_outputs(full_out, VBR_chunked.out, 'out');
+        if numel(mismatch) > 0
+            TestResult.passed = false;
+            TestResult.fail_message = ['chunked output (chunks of ', ...
+                                       num2str(chunk_sizes(i_size)), ...
+                                       ') does not match for ', mismatch];
+            return
+        end
+    end
+
+    % streaming to disk
+    test_config = get_config();
+    VBR = get_VBR();
+    VBR.in.chunks.size = 10;
+    VBR.in.chunks.dir = fullfile(test_config.vbr_test_data_dir, 'vbr_chunks');
+    VBR_streamed = VBR_spine(VBR);
+    if numel(VBR_streamed.out.chunk_files) ~= 3
+        TestResult.passed = false;
+        TestResult.fail_message = 'expected 3 chunk files';
+        return
+    end
+    chunk = load(VBR_streamed.out.chunk_files{3});
+    V_full = reshape(VBR_full.out.anelastic.andrade_psp.V, [], numel(VBR.in.SV.f));
+    V_chunk = chunk.out.anelastic.andrade_psp.V;
+    if ~isequal(V_chunk, V_full(chunk.chunk_index, :))
+        TestResult.passed = false;
+        TestResult.fail_message = 'streamed chunk output does not match';
+    end
+end
+
+function mismatch = compare_outputs(expected, found, name)
+    % the name of the first output of expected that differs in found, or
+    % an empty string if all outputs match
+    mismatch = '';
+    if isstruct(expected)
+        flds = fieldnames(expected);
+        for ifld = 1:numel(flds)
+            fld_name = [name, '.', flds{ifld}];
+            if ~isfield(found, flds{ifld})
+                mismatch = fld_name;
+            else
+                mismatch = compare_outputs(expected.(flds{ifld}), found.(flds{ifld}), fld_name);
+            end
+            if numel(mismatch) > 0
+                return
+            end
+        end
+    elseif isnumeric(expected)
+        rel_err = abs(found(:) - expected(:)) ./ abs(expected(:));
+        if ~isequal(size(found), size(expected)) || max(rel_err(expected(:) ~= 0)) > 1e-12
+            mismatch = name;
+        end
+    elseif ~isequal(found, expected)
+        mismatch = name;
+    end
+end
+
+function VBR = get_VBR()
+    VBR = struct();
+    VBR.in.elastic.methods_list={'anharmonic'};
+    VBR.in.viscous.methods_list={'HZK2011'};
+    VBR.in.anelastic.methods_list={'andrade_psp'; 'xfit_mxw'};
+
+    [T_K, dg_um, phi] = meshgrid(linspace(1200, 1400, 4) + 273, ...
+                                 [0.001, 0.01, 0.1] * 1e6, [0, 0.01]);
+    sz = size(T_K);
+    VBR.in.SV.T_K = T_K; % temperature [K]
+    VBR.in.SV.dg_um = dg_um; % grain size [um]
+    VBR.in.SV.phi = phi; % melt fraction
+    VBR.in.SV.P_GPa = full_nd(2.5, sz); % pressure [GPa]
+    VBR.in.SV.rho = full_nd(3300, sz); % density [kg m^-3]
+    VBR.in.SV.sig_MPa = full_nd(.1, sz); % differential stress [MPa]
+    VBR.in.SV.f = logspace(-2, 0, 3); % [Hz]
+end
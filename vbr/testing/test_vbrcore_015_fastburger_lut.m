@@ -0,0 +1,115 @@
+function TestResult = test_vbrcore_015_fastburger_lut()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_vbrcore_015_fastburger_lut()
+%
+% accuracy of the FastBurger look-up table integration against quadgk
+% (integration_method=2) over a wide range of states, and the in-memory and
+% on-disk caching of the look-up table.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+    TestResult.passed=true;
+    TestResult.fail_message = '';
+
+    % accuracy
+    VBR = get_VBR();
+    VBR.in.anelastic.eburgers_psp.integration_method = 2;
+    gk = VBR_spine(VBR);
+    gk = gk.out.anelastic.eburgers_psp;
+    VBR = get_VBR();
+    VBR.in.anelastic.eburgers_psp.method = 'FastBurger';
+    fast = VBR_spine(VBR);
+    fast = fast.out.anelastic.eburgers_psp;
+    fields = {'V'; 'Qinv'};
+    rel_tol = [1e-6; 1e-4];
+    for ifield = 1:numel(fields)
+        fld = fields{ifield};
+        if ~isequal(size(fast.(fld)), size(gk.(fld)))
+            TestResult.passed = false;
+            TestResult.fail_message = ['FastBurger ', fld, ' has the wrong size'];
+            return
+        end
+        max_err = max(abs(fast.(fld)(:) ./ gk.(fld)(:) - 1));
+        if max_err > rel_tol(ifield)
+            msg = ['FastBurger ', fld, ' differs from quadgk, max relative error: ', ...
+                   num2str(max_err)];
+            TestResult.passed = false;
+            TestResult.fail_message = msg;
+            return
+        end
+    end
+
+    % caching: the table is reused from memory, rebuilt for a new alf or
+    % nTauGlob and reloaded from disk
+    clear Q_eFastBurgers_lut
+    test_config = get_config();
+    lut_dir = fullfile(test_config.vbr_test_data_dir, 'fastburger_lut');
+    delete_luts(lut_dir);
+    params = Params_Anelastic('eburgers_psp');
+    params.lut_cache_dir = lut_dir;
+    alf = params.bg_only.alf;
+    [lut_1, source_1] = Q_eFastBurgers_lut(alf, params);
+    [lut_2, source_2] = Q_eFastBurgers_lut(alf, params);
+    [lut_3, source_3] = Q_eFastBurgers_lut(alf * 1.1, params);
+    if ~strcmp(source_1, 'built') || ~strcmp(source_2, 'memory') || ~strcmp(source_3, 'built')
+        TestResult.passed = false;
+        TestResult.fail_message = 'look-up table was not reused from memory or not rebuilt for a new alf';
+        return
+    end
+    if strcmp(lut_1.key, lut_3.key) || isequal(lut_1.J1.F, lut_3.J1.F)
+        TestResult.passed = false;
+        TestResult.fail_message = 'look-up tables for different alf are not distinct';
+        return
+    end
+    params.nTauGlob = params.nTauGlob + 1;
+    [lut_4, source_4] = Q_eFastBurgers_lut(alf, params);
+    if ~strcmp(source_4, 'built') || numel(lut_4.J1.F) ~= params.nTauGlob
+        TestResult.passed = false;
+        TestResult.fail_message = 'look-up table was not rebuilt for a new nTauGlob';
+        return
+    end
+
+    clear Q_eFastBurgers_lut
+    params.nTauGlob = params.nTauGlob - 1;
+    [lut_5, source_5] = Q_eFastBurgers_lut(alf, params);
+    if ~strcmp(source_5, 'disk') || ~isequal(lut_5.J2.C, lut_1.J2.C)
+        TestResult.passed = false;
+        TestResult.fail_message = 'look-up table was not loaded from disk';
+    end
+    delete_luts(lut_dir);
+end
+
+function delete_luts(lut_dir)
+    lut_files = dir(fullfile(lut_dir, 'fastburger_lut_*.mat'));
+    for ifile = 1:numel(lut_files)
+        delete(fullfile(lut_dir, lut_files(ifile).name));
+    end
+end
+
+function VBR = get_VBR()
+
+    VBR = struct();
+    VBR.in.elastic.methods_list={'anharmonic'};
+    VBR.in.anelastic.methods_list={'eburgers_psp'};
+    VBR.in.anelastic.eburgers_psp = Params_Anelastic('eburgers_psp');
+
+    sz = [5, 3];
+    T_K = linspace(900, 1400, sz(1))' + 273;
+    dg_um = [0.001, 0.01, 0.1] * 1e6;
+    VBR.in.SV.T_K = repmat(T_K, 1, sz(2)); % temperature [K]
+    VBR.in.SV.dg_um = repmat(dg_um, sz(1), 1); % grain size [um]
+    VBR.in.SV.phi = full_nd(0.0, sz); % melt fraction
+    VBR.in.SV.P_GPa = full_nd(2.5, sz); % pressure [GPa]
+    VBR.in.SV.rho = full_nd(3300, sz); % density [kg m^-3]
+    VBR.in.SV.sig_MPa = full_nd(.1, sz); % differential stress [MPa]
+    VBR.in.SV.f = logspace(-4, 1, 4); % [Hz]
+end
@@ -0,0 +1,136 @@
+function TestResult = test_vbrcore_016_band_average()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_vbrcore_016_band_average()
+%
+% band-limited evaluation (VBR.in.band): the band averages of V and Qinv
+% match averages over a dense frequency grid, using fewer frequencies, and
+% the frequency-dependent outputs correspond to VBR.out.band.f.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+    TestResult.passed=true;
+    TestResult.fail_message = '';
+
+    f_range = [1/150, 1/20];
+    sz = [4, 3];
+
+    % dense reference, trapezoidal rule uniform in log10(f)
+    n_dense = 201;
+    VBR = get_VBR(sz);
+    VBR.in.SV.f = logspace(log10(f_range(1)), log10(f_range(2)), n_dense);
+    dense = VBR_spine(VBR);
+    w_dense = ones(1, n_dense) / (n_dense - 1);
+    w_dense([1, end]) = w_dense([1, end]) / 2;
+
+    VBR = get_VBR(sz);
+    VBR.in.band.f_range = f_range;
+    VBR.in.band.tol = 1e-6;
+    band = VBR_spine(VBR);
+
+    if band.out.band.converged ~= 1 || band.out.band.n_nodes >= n_dense / 10
+        TestResult.passed = false;
+        TestResult.fail_message = ['band average did not converge with few frequencies, n_nodes = ', ...
+                                   num2str(band.out.band.n_nodes)];
+        return
+    end
+    if abs(sum(band.out.band.weights) - 1) > 1e-12 || any(diff(band.out.band.f) <= 0) ...
+        || abs(band.out.band.f(1) / f_range(1) - 1) > 1e-12 ...
+        || abs(band.out.band.f(end) / f_range(2) - 1) > 1e-12
+        TestResult.passed = false;
+        TestResult.fail_message = 'band frequencies or weights are incorrect';
+        return
+    end
+
+    VBR = get_VBR(sz);
+    VBR.in.SV.f = band.out.band.f;
+    direct = VBR_spine(VBR);
+
+    meths = VBR.in.anelastic.methods_list;
+    flds = {'V', 'Vave'; 'Qinv', 'Qinvave'};
+    for i_meth = 1:numel(meths)
+        meth = meths{i_meth};
+        out_band = band.out.anelastic.(meth);
+        out_dense = dense.out.anelastic.(meth);
+        if ~isequal(size(out_band.V), [sz, band.out.band.n_nodes])
+            TestResult.passed = false;
+            TestResult.fail_message = [meth, ' V has the wrong size'];
+            return
+        end
+        for ifld = 1:size(flds, 1)
+            expected = Q_aveVoverf(out_dense.(flds{ifld, 1}), dense.in.SV.f, w_dense);
+            actual = out_band.(flds{ifld, 2});
+            max_err = max(abs(actual(:) ./ expected(:) - 1));
+            if ~isequal(size(actual), sz) || max_err > 1e-5
+                msg = [meth, ' ', flds{ifld, 2}, ' differs from the dense average, max relative error: ', ...
+                       num2str(max_err)];
+                TestResult.passed = false;
+                TestResult.fail_message = msg;
+                return
+            end
+        end
+
+        % the outputs at the band frequencies match a direct calculation
+        max_err = max(abs(out_band.V(:) ./ direct.out.anelastic.(meth).V(:) - 1));
+        if max_err > 1e-10
+            TestResult.passed = false;
+            TestResult.fail_message = [meth, ' V at the band frequencies differs from VBR_spine'];
+            return
+        end
+    end
+
+    % a single state: the frequency-dependent outputs are found from their
+    % shape and are (1, n_nodes), the band averages are scalars
+    VBR = get_VBR(sz);
+    SV_flds = fieldnames(VBR.in.SV);
+    for ifld = 1:numel(SV_flds)
+        VBR.in.SV.(SV_flds{ifld}) = VBR.in.SV.(SV_flds{ifld})(1);
+    end
+    VBR_single = VBR;
+    VBR_single.in.band.f_range = f_range;
+    VBR_single.in.band.tol = 1e-6;
+    VBR_single = VBR_spine(VBR_single);
+    VBR.in.SV.f = VBR_single.out.band.f;
+    direct = VBR_spine(VBR);
+    for i_meth = 1:numel(meths)
+        meth = meths{i_meth};
+        out_band = VBR_single.out.anelastic.(meth);
+        if ~isequal(size(out_band.V), [1, VBR_single.out.band.n_nodes]) ...
+            || ~isequal(size(out_band.Vave), [1, 1])
+            TestResult.passed = false;
+            TestResult.fail_message = [meth, ' band outputs of a single state have the wrong size'];
+            return
+        end
+        max_err = max(abs(out_band.V(:) ./ direct.out.anelastic.(meth).V(:) - 1));
+        if max_err > 1e-10
+            TestResult.passed = false;
+            TestResult.fail_message = [meth, ' V of a single state differs from VBR_spine'];
+            return
+        end
+    end
+end
+
+function VBR = get_VBR(sz)
+
+    VBR = struct();
+    VBR.in.elastic.methods_list={'anharmonic'};
+    VBR.in.viscous.methods_list={'HZK2011'};
+    VBR.in.anelastic.methods_list={'eburgers_psp'; 'andrade_psp'; 'xfit_mxw'};
+
+    T_K = linspace(1100, 1400, sz(1))' + 273;
+    dg_um = [0.001, 0.005, 0.01] * 1e6;
+    VBR.in.SV.T_K = repmat(T_K, 1, sz(2)); % temperature [K]
+    VBR.in.SV.dg_um = repmat(dg_um, sz(1), 1); % grain size [um]
+    VBR.in.SV.phi = full_nd(0.0, sz); % melt fraction
+    VBR.in.SV.P_GPa = full_nd(2.5, sz); % pressure [GPa]
+    VBR.in.SV.rho = full_nd(3300, sz); % density [kg m^-3]
+    VBR.in.SV.sig_MPa = full_nd(.1, sz); % differential stress [MPa]
+end
@@ -0,0 +1,91 @@
+function TestResult = test_vbrcore_017_memo()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_vbrcore_017_memo()
+%
+% the intermediate quantities shared between methods in a VBR_spine call
+% (memo_fetch): running several anelastic methods together gives the same
+% results as running each alone, and the store is not left in VBR.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+    TestResult.passed=true;
+    TestResult.fail_message = '';
+
+    % memo_fetch stores the first value for a key, and always calculates
+    % without a store
+    VBR = struct();
+    val_1 = memo_fetch(VBR, 'a', @plus, 1, 1);
+    val_2 = memo_fetch(VBR, 'a', @plus, 1, 2);
+    VBR.memo = containers.Map();
+    val_3 = memo_fetch(VBR, 'a', @plus, 1, 1);
+    val_4 = memo_fetch(VBR, 'a', @plus, 1, 2);
+    if val_1 ~= 2 || val_2 ~= 3 || val_3 ~= 2 || val_4 ~= 2
+        TestResult.passed = false;
+        TestResult.fail_message = 'memo_fetch did not store or calculate values as expected';
+        return
+    end
+
+    % functions given by name, as for the parameter functions
+    VBR.memo = containers.Map();
+    params = memo_fetch(VBR, 'params:anelastic:', 'Params_Anelastic', '');
+    params_stored = memo_fetch(VBR, 'params:anelastic:', 'Params_Anelastic', 'eburgers_psp');
+    val_5 = memo_fetch(struct(), 'b', 'plus', 2, 3);
+    if ~isequal(params, Params_Anelastic('')) || ~isequal(params_stored, params) || val_5 ~= 5
+        TestResult.passed = false;
+        TestResult.fail_message = 'memo_fetch did not call a function given by name';
+        return
+    end
+
+    meths = {'eburgers_psp'; 'andrade_psp'; 'xfit_mxw'};
+    VBR = get_VBR();
+    VBR.in.anelastic.methods_list = meths;
+    VBR = VBR_spine(VBR);
+    if isfield(VBR, 'memo')
+        TestResult.passed = false;
+        TestResult.fail_message = 'VBR.memo was not removed by VBR_spine';
+        return
+    end
+
+    flds = {'V'; 'Qinv'};
+    for i_meth = 1:numel(meths)
+        meth = meths{i_meth};
+        VBR_single = get_VBR();
+        VBR_single.in.anelastic.methods_list = {meth};
+        VBR_single = VBR_spine(VBR_single);
+        for ifld = 1:numel(flds)
+            fld = flds{ifld};
+            if ~isequal(VBR.out.anelastic.(meth).(fld), VBR_single.out.anelastic.(meth).(fld))
+                TestResult.passed = false;
+                TestResult.fail_message = [meth, ' ', fld, ' differs when run with other methods'];
+                return
+            end
+        end
+    end
+end
+
+function VBR = get_VBR()
+
+    VBR = struct();
+    VBR.in.elastic.methods_list={'anharmonic'};
+    VBR.in.viscous.methods_list={'HZK2011'};
+
+    sz = [4, 3];
+    T_K = linspace(1100, 1400, sz(1))' + 273;
+    phi = [0.0, 0.005, 0.02];
+    VBR.in.SV.T_K = repmat(T_K, 1, sz(2)); % temperature [K]
+    VBR.in.SV.phi = repmat(phi, sz(1), 1); % melt fraction
+    VBR.in.SV.dg_um = full_nd(0.01 * 1e6, sz); % grain size [um]
+    VBR.in.SV.P_GPa = full_nd(2.5, sz); % pressure [GPa]
+    VBR.in.SV.rho = full_nd(3300, sz); % density [kg m^-3]
+    VBR.in.SV.sig_MPa = full_nd(.1, sz); % differential stress [MPa]
+    VBR.in.SV.f = logspace(-2, -1, 4); % [Hz]
+end
@@ -0,0 +1,136 @@
+function TestResult = test_vbrcore_018_output_policy()
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% TestResult = test_vbrcore_018_output_policy()
+%
+% the output policy (VBR.in.output): kept, dropped and single precision
+% fields, the error of the single precision and restored outputs relative to
+% the full precision output, and the same output with chunked execution.
+%
+% Parameters
+% ----------
+% none
+%
+% Output
+% ------
+% TestResult  struct with fields:
+%           .passed         True if passed, False otherwise.
+%           .fail_message   Message to display if false
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+    TestResult.passed=true;
+    TestResult.fail_message = '';
+
+    meths = {'eburgers_psp'; 'andrade_psp'; 'xfit_mxw'};
+    VBR_full = VBR_spine(get_VBR(meths));
+
+    % single precision, without derived fields
+    VBR = get_VBR(meths);
+    VBR.in.output.single = 'all';
+    VBR.in.output.drop_derived = 1;
+    VBR = VBR_spine(VBR);
+    % the relative error of rounding to single precision is at most
+    % eps('single') / 2, calculating Q or M in double from single precision
+    % values adds at most about twice that
+    stored_tol = eps('single');
+    restored_tol = 4 * eps('single');
+    for i_meth = 1:numel(meths)
+        meth = meths{i_meth};
+        out = VBR.out.anelastic.(meth);
+        if isfield(out, 'Q') || isfield(out, 'M')
+            TestResult.passed = false;
+            TestResult.fail_message = [meth, ': Q and M were not dropped'];
+            return
+        end
+        flds = {'V'; 'Qinv'; 'J1'; 'J2'; 'Vave'};
+        for ifld = 1:numel(flds)
+            fld = flds{ifld};
+            if ~isa(out.(fld), 'single')
+                TestResult.passed = false;
+                TestResult.fail_message = [meth, '.', fld, ' is not single precision'];
+                return
+            end
+            if max_rel_error(out.(fld), VBR_full.out.anelastic.(meth).(fld)) > stored_tol
+                TestResult.passed = false;
+                TestResult.fail_message = [meth, '.', fld, ' exceeds the single precision error bound'];
+                return
+            end
+        end
+    end
+    if ~isa(VBR.out.elastic.anharmonic.Gu, 'single') || ~isa(VBR.out.viscous.HZK2011.eta_total, 'single')
+        TestResult.passed = false;
+        TestResult.fail_message = 'elastic and viscous outputs are not single precision';
+        return
+    end
+
+    VBR = VBR_restore_derived(VBR);
+    for i_meth = 1:numel(meths)
+        meth = meths{i_meth};
+        flds = {'Q'; 'M'};
+        for ifld = 1:numel(flds)
+            fld = flds{ifld};
+            if max_rel_error(VBR.out.anelastic.(meth).(fld), VBR_full.out.anelastic.(meth).(fld)) > restored_tol
+                TestResult.passed = false;
+                TestResult.fail_message = [meth, '.', fld, ' restored from single precision exceeds the error bound'];
+                return
+            end
+        end
+    end
+
+    % only the kept fields, some in single precision, with and without chunks
+    VBR = get_VBR(meths);
+    VBR.in.output.keep = {'V'; 'Qinv'};
+    VBR.in.output.single = {'V'};
+    VBR_chunked = VBR;
+    VBR_chunked.in.chunks.size = 5;
+    VBR = VBR_spine(VBR);
+    VBR_chunked = VBR_spine(VBR_chunked);
+    for i_meth = 1:numel(meths)
+        meth = meths{i_meth};
+        out = VBR.out.anelastic.(meth);
+        if ~isequal(sort(fieldnames(out)), {'Qinv'; 'V'; 'units'})
+            TestResult.passed = false;
+            TestResult.fail_message = [meth, ': fields other than V, Qinv and units were kept'];
+            return
+        end
+        if ~isa(out.V, 'single') || ~isa(out.Qinv, 'double') || ...
+           ~isequal(out.Qinv, VBR_full.out.anelastic.(meth).Qinv)
+            TestResult.passed = false;
+            TestResult.fail_message = [meth, ': V is not single or Qinv is not the full precision output'];
+            return
+        end
+        % chunking changes the double precision output by rounding only
+        out_chunked = VBR_chunked.out.anelastic.(meth);
+        if ~isa(out_chunked.V, 'single') || ...
+           max_rel_error(out_chunked.V, double(out.V)) > stored_tol || ...
+           max_rel_error(out_chunked.Qinv, out.Qinv) > 1e-12 || ...
+           ~isequal(sort(fieldnames(VBR_chunked.out.anelastic.(meth))), {'Qinv'; 'V'; 'units'})
+            TestResult.passed = false;
+            TestResult.fail_message = [meth, ': chunked output differs with the output policy'];
+            return
+        end
+    end
+end
+
+function err = max_rel_error(val, ref)
+    err = abs(double(val(:)) - ref(:)) ./ abs(ref(:));
+    err = max(err(ref(:) ~= 0));
+end
+
+function VBR = get_VBR(meths)
+
+    VBR = struct();
+    VBR.in.elastic.methods_list={'anharmonic'};
+    VBR.in.viscous.methods_list={'HZK2011'};
+    VBR.in.anelastic.methods_list = meths;
+
+    sz = [4, 3];
+    T_K = linspace(1100, 1400, sz(1))' + 273;
+    phi = [0.0, 0.005, 0.02];
+    VBR.in.SV.T_K = repmat(T_K, 1, sz(2)); % temperature [K]
+    VBR.in.SV.phi = repmat(phi, sz(1), 1); % melt fraction
+    VBR.in.SV.dg_um = full_nd(0.01 * 1e6, sz); % grain size [um]
+    VBR.in.SV.P_GPa = full_nd(2.5, sz); % pressure [GPa]
+    VBR.in.SV.rho = full_nd(3300, sz); % density [kg m^-3]
+    VBR.in.SV.sig_MPa = full_nd(.1, sz); % differential stress [MPa]
+    VBR.in.SV.f = logspace(-2, -1, 4); % [Hz]
+end
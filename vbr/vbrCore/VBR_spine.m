@@ -35,6 +35,56 @@
 %        For example:
 %            VBR.in.anelastic.methods_list={'AndradePsP';'YT_maxwell'};
 %
+% Optional fields in VBR structure:
+%    VBR.in.cache.
+%        enables the on-disk result cache. When the same inputs (state
+%        variables, methods, parameters and VBRc version) have been run before,
+%        the results are loaded from the cache instead of being recalculated.
+%
+%             .dir          the cache directory (required)
+%             .max_size_MB  cache size limit, least recently used results are
+%                           removed when exceeded (default 1024)
+%
+%        see VBR_cache_stats and VBR_cache_clear. The cache is not used when
+%        the output is streamed to disk (VBR.in.chunks.dir).
+%
+%    VBR.in.chunks.
+%        enables chunked execution: the state variables are split into chunks
+%        that are calculated one at a time, limiting memory use for large
+%        arrays. VBR.out is the same as without chunking.
+%
+%             .size   number of states in each chunk (required, at least 2)
+%             .dir    optional directory. If set, the output of each chunk is
+%                     saved to disk instead of kept in memory and
+%                     VBR.out.chunk_files lists the files (see spineChunked).
+%
+%    VBR.in.band.
+%        band-limited evaluation for band-averaged properties: the anelastic
+%        methods are evaluated only at the quadrature frequencies needed to
+%        average over a frequency band, instead of at VBR.in.SV.f (which is not
+%        needed). Vave, Qave and Qinvave of each anelastic method are the band
+%        averages, and the frequency dimension of the other anelastic outputs
+%        corresponds to VBR.out.band.f (see spineBand).
+%
+%             .f_range    [f_min, f_max], the band in Hz (required)
+%             .tol        relative tolerance of the band averages (default 1e-4)
+%             .max_nodes  maximum number of frequencies (default 33)
+%             .spacing    'log' (default) to average uniformly in log10(f),
+%                         'linear' to average uniformly in f
+%
+%    VBR.in.output.
+%        output policy, to reduce the memory and storage of the method outputs
+%        (e.g., for look-up tables). Applied after the calculations (to each
+%        chunk when used with VBR.in.chunks), see spineOutputPolicy.
+%
+%             .keep          cell array of the output fields to keep for every
+%                            method, e.g., {'V'; 'Qinv'}, or 'all' (default)
+%             .single        cell array of the output fields to store in single
+%                            precision, or 'all'. Default {}.
+%             .drop_derived  1 to drop the anelastic outputs that can be
+%                            recalculated with VBR_restore_derived: Q (from
+%                            Qinv) and M (from J1 and J2). Default 0.
+%
 % Output
 % ------
 % VBR    the VBR structure with output in VBR.out
@@ -54,6 +104,40 @@ function [VBR] = VBR_spine(VBR)
   end
   VBR = attach_input_metadata(VBR);
   VBR.version_used = vbr_version();
+
+  use_cache = isfield(VBR.in,'cache');
+  if use_cache && isfield(VBR.in,'chunks') && isfield(VBR.in.chunks,'dir')
+    % VBR.out only lists the chunk files, which are not part of the cache
+    use_cache = false;
+  end
+  if use_cache
+    [VBR,cache_hit] = VBR_cache_lookup(VBR);
+    if cache_hit
+      return
+    end
+  end
+
+  if isfield(VBR.in,'band')
+    VBR = spineBand(VBR);
+    if isfield(VBR.in,'output') && VBR.status == 1
+      VBR = spineOutputPolicy(VBR);
+    end
+    if use_cache && VBR.status == 1
+      VBR = VBR_cache_store(VBR);
+    end
+    return
+  end
+
+  if isfield(VBR.in,'chunks')
+    VBR = spineChunked(VBR);
+    if use_cache && VBR.status == 1
+      VBR = VBR_cache_store(VBR);
+    end
+    return
+  end
+
+  % store for intermediate quantities shared between methods, see memo_fetch
+  VBR.memo = containers.Map();
 %% =====================================================================
 %% ELASTIC properties ==================================================
 %% =====================================================================
@@ -80,5 +164,13 @@ end
 
 %% ========================================================================
    VBR.out.computation_time=telapsed; % store elapsed time for each
+   VBR = rmfield(VBR,'memo');
+   if isfield(VBR.in,'output')
+     VBR = spineOutputPolicy(VBR);
+   end
+
+  if use_cache
+    VBR = VBR_cache_store(VBR);
+  end
 
 end
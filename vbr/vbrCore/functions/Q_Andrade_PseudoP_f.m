@@ -168,6 +168,7 @@ function Xtilde = calculateXtilde(VBR)
   end
 
   % apply melt enhancement
-  [Xtilde_prime] = sr_melt_enhancement(phi,alpha,x_phi_c,phi_c) ;
+  key = sprintf('melt_enhancement:%s:%s:%s', num2hex(alpha), num2hex(x_phi_c), num2hex(phi_c));
+  [Xtilde_prime] = memo_fetch(VBR, key, @sr_melt_enhancement, phi, alpha, x_phi_c, phi_c) ;
   Xtilde = Xtilde_prime.*Xtilde ;
 end
@@ -1,12 +1,15 @@
-function Vave=Q_aveVoverf(V_f,f_vec)
+function Vave=Q_aveVoverf(V_f,f_vec,weights)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-  % Q_aveVoverf(V_f)
+  % Q_aveVoverf(V_f,f_vec,weights)
   %
   % averages velocity matrix over the frequency dimension
   %
   % Parameters:
   % ----------
   % V_f the frequency-dependent velocity matrix
+  % f_vec the frequencies
+  % weights optional quadrature weights for each frequency (summing to 1),
+  %         e.g., VBR.out.band.weights. If not given, the plain mean is used.
   %
   % Output:
   % ------
@@ -18,7 +21,13 @@ function Vave=Q_aveVoverf(V_f,f_vec)
   else
     sz=size(V_f); % total size
     freq_dim=numel(sz); % frequency is last dimension
-    Vave=mean(V_f,freq_dim);
+    if nargin > 2
+      w_sz=ones(1,freq_dim);
+      w_sz(freq_dim)=numel(weights);
+      Vave=sum(bsxfun(@times,V_f,reshape(weights,w_sz)),freq_dim);
+    else
+      Vave=mean(V_f,freq_dim);
+    end
   end
 
 end
@@ -0,0 +1,169 @@
+function [VBR] = Q_eBurgers_batched(VBR)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  %
+  % [VBR] = Q_eBurgers_batched(VBR)
+  %
+  % extended burgers model after JF2010, as in Q_eBurgers_f, with the
+  % integrals over relaxation period of every thermodynamic state and
+  % frequency evaluated at once (PointWise method with integration_method of
+  % 3). Includes the high temperature background and the optional
+  % dissipation peak.
+  %
+  % reference:
+  % Jackson & Faul, "Grainsize-sensitive viscoelastic relaxation in
+  % olivine: Towards a robust laboratory-based model for seismological
+  % application," Physics of the Earth and Planetary Interiors 183 (2010) 151–163
+  %
+  % Parameters:
+  % ----------
+  % VBR    the VBR structure
+  %
+  % Output:
+  % ------
+  % VBR    the VBR structure, with new VBR.out.anelastic.eburgers_psp structure
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  % State Variables
+  [rho_mat, Mu, Ju_mat, f_vec, elastic_method] = Q_get_state_vars(VBR);
+  w_vec = 2*pi.*f_vec ;
+
+  % allocation (frequency is added as a new dimension at end of array.)
+  nfreq = numel(f_vec);
+  sz=size(Ju_mat);
+  [J1, J2, ~, M, V] = Q_init_output_vars(sz, nfreq);
+
+  % Calculate maxwell time, integration limits and location of peak:
+  tau=Q_eBurgers_mxwll(VBR,Mu,elastic_method);
+
+  % batched integration, all states and frequencies at once
+  Burger_params=VBR.in.anelastic.eburgers_psp;
+  [J1_b, J2_b] = batched_compliances(tau, w_vec, Burger_params);
+  Ju = repmat(Ju_mat(:), nfreq, 1);
+  rho = repmat(rho_mat(:), nfreq, 1);
+  J1(:) = Ju .* J1_b(:);
+  J2(:) = Ju .* J2_b(:);
+  M(:) = (J1(:).^2 + J2(:).^2).^(-0.5) ;
+  V(:) = sqrt(M(:) ./ rho) ;
+
+  % Store relevant values
+  onm='eburgers_psp';
+  VBR.out.anelastic.(onm).J1 = J1;
+  VBR.out.anelastic.(onm).J2 = J2;
+  VBR.out.anelastic.(onm).Qinv = Qinv_from_J1_J2(J1, J2);
+  VBR.out.anelastic.(onm).Q = 1./VBR.out.anelastic.(onm).Qinv;
+  VBR.out.anelastic.(onm).M=M;
+  VBR.out.anelastic.(onm).V=V;
+  VBR.out.anelastic.(onm).tau_M=tau.maxwell;
+
+  % calculate mean velocity along frequency dimension
+  VBR.out.anelastic.(onm).Vave = Q_aveVoverf(V,f_vec);
+  VBR.out.anelastic.(onm).units = Q_method_units();
+  VBR.out.anelastic.(onm).units.tau_M = "s";
+
+end
+
+function [J1, J2] = batched_compliances(tau, w_vec, Burger_params)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  %
+  % [J1, J2] = batched_compliances(tau, w_vec, Burger_params)
+  %
+  % batched integration of the extended burgers compliances. The integration limits and the peak location all scale with the
+  % same factor (see Q_eBurgers_mxwll), so after normalizing by Tau_L (or
+  % Tau_P) every state and frequency shares the same integration grid in
+  % log(tau). Each integral then reduces to a matrix-vector product with a fixed
+  % set of quadrature weights, evaluated in blocks of state-frequency pairs.
+  %
+  % Parameters:
+  % ----------
+  % tau            structure with the maxwell times, integration limits and
+  %                peak location (from Q_eBurgers_mxwll)
+  % w_vec          angular frequencies [rad/s]
+  % Burger_params  the eburgers_psp parameter structure
+  %
+  % Output:
+  % ------
+  % J1, J2   the real and imaginary parts of the compliance, normalized by the
+  %          unrelaxed compliance. Arrays of size (number of states, nfreq).
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  bType = Burger_params.eBurgerFit;
+  alf = Burger_params.(bType).alf ;
+  DeltaB = Burger_params.(bType).DeltaB ;
+  DeltaP = Burger_params.(bType).DeltaP ;
+  sig = Burger_params.(bType).sig ;
+  ntau = Burger_params.tau_integration_points ;
+  nblock = Burger_params.integration_block_size ;
+
+  n_th = numel(tau.L);
+  nfreq = numel(w_vec);
+  Tau_L = tau.L(:);
+  Tau_P = tau.P(:);
+  Tau_M = tau.maxwell(:);
+  w = w_vec(:);
+
+  % high temperature background: tau = Tau_L * exp(v), with v from 0 to
+  % log(Tau_H / Tau_L) for all states.
+  v_max = log(Burger_params.(bType).Tau_HR / Burger_params.(bType).Tau_LR);
+  [v, wts] = quad_weights(0, v_max, ntau);
+  s = exp(v);
+  Tau_fac = alf / (exp(alf * v_max) - 1);
+  W_B = Tau_fac * [s.^alf .* wts; s.^(alf + 1) .* wts]';
+
+  % dissipation peak: tau = Tau_P * exp(u). The gaussian in u is truncated at
+  % 10 sig, the upper limit is extended by sig^2 to cover the exp(u) weighting.
+  if DeltaP > 0
+    [u, wts_P] = quad_weights(-10 * sig, 10 * sig + sig^2, ntau);
+    s_P = exp(u);
+    g = exp(-(u / sig).^2 / 2) .* wts_P / (sig * sqrt(2 * pi));
+    W_P = [g; g .* s_P]';
+  end
+
+  J1 = zeros(n_th, nfreq);
+  J2 = zeros(n_th, nfreq);
+
+  % loop over blocks of the linear index, i_glob = x1 + (ifreq - 1) * n_th
+  n_pairs = n_th * nfreq;
+  for i_start = 1:nblock:n_pairs
+    i_glob = (i_start:min(i_start + nblock - 1, n_pairs))';
+    x1 = mod(i_glob - 1, n_th) + 1;
+    w_i = w((i_glob - x1) / n_th + 1);
+
+    int_B = (1 ./ (1 + ((w_i .* Tau_L(x1)) * s).^2)) * W_B;
+    J1(i_glob) = 1 + DeltaB * int_B(:, 1);
+    J2(i_glob) = DeltaB * w_i .* Tau_L(x1) .* int_B(:, 2) + 1 ./ (w_i .* Tau_M(x1));
+
+    if DeltaP > 0
+      int_P = (1 ./ (1 + ((w_i .* Tau_P(x1)) * s_P).^2)) * W_P;
+      J1(i_glob) = J1(i_glob) + DeltaP * int_P(:, 1);
+      J2(i_glob) = J2(i_glob) + DeltaP * w_i .* Tau_P(x1) .* int_P(:, 2);
+    end
+  end
+end
+
+function [x, wts] = quad_weights(x_min, x_max, n)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  %
+  % [x, wts] = quad_weights(x_min, x_max, n)
+  %
+  % evenly spaced points and end-corrected trapezoidal (Gregory) weights,
+  % fourth order accurate. sum(wts .* f(x)) approximates the integral of f.
+  %
+  % Parameters:
+  % ----------
+  % x_min, x_max   the integration limits
+  % n              number of points, at least 6
+  %
+  % Output:
+  % ------
+  % x      the integration points (row vector)
+  % wts    the quadrature weights (row vector)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  if n < 6
+    error('tau_integration_points must be at least 6 for integration_method=3')
+  end
+  x = linspace(x_min, x_max, n);
+  h = x(2) - x(1);
+  wts = h * ones(1, n);
+  wts(1:3) = h * [3/8, 7/6, 23/24];
+  wts(n-2:n) = h * [23/24, 7/6, 3/8];
+end
@@ -16,7 +16,11 @@ function [VBR] = Q_eBurgers_decider(VBR)
   % VBR   the VBR structure, with VBR.out.anelastic.eBurgers structure
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
   if strcmp(lower(VBR.in.anelastic.eburgers_psp.method),'pointwise')
-    VBR=Q_eBurgers_f(VBR);
+    if VBR.in.anelastic.eburgers_psp.integration_method == 3
+      VBR=Q_eBurgers_batched(VBR);
+    else
+      VBR=Q_eBurgers_f(VBR);
+    end
   elseif strcmp(lower(VBR.in.anelastic.eburgers_psp.method),'fastburger')
     [VBR]=Q_eFastBurgers(VBR) ;
   else
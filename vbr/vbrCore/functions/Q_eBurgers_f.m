@@ -23,7 +23,7 @@ function [VBR] = Q_eBurgers_f(VBR)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 
   % State Variables
-  [rho_mat, Mu, Ju_mat, f_vec] = Q_get_state_vars(VBR);
+  [rho_mat, Mu, Ju_mat, f_vec, elastic_method] = Q_get_state_vars(VBR);
   w_vec = 2*pi.*f_vec ;
 
   % allocation (frequency is added as a new dimension at end of array.)
@@ -33,7 +33,7 @@ function [VBR] = Q_eBurgers_f(VBR)
 
   % Calculate maxwell time, integration limits and location of peak:
   % tau=MaxwellTimes(VBR,Mu);
-  tau=Q_eBurgers_mxwll(VBR,Mu);
+  tau=Q_eBurgers_mxwll(VBR,Mu,elastic_method);
 
   % Read in parameters needed for integration
   Burger_params=VBR.in.anelastic.eburgers_psp;
@@ -1,7 +1,7 @@
-function tau = Q_eBurgers_mxwll(VBR,Gu)
+function tau = Q_eBurgers_mxwll(VBR,Gu,elastic_method)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
   %
-  % tau = Q_eBurgers_mxwll(VBR,Gu)
+  % tau = Q_eBurgers_mxwll(VBR,Gu,elastic_method)
   %
   % calculatues the maxwell time & limits for extended burgers model
   %
@@ -9,6 +9,9 @@ function tau = Q_eBurgers_mxwll(VBR,Gu)
   % ----------
   % VBR    the VBR structure
   % Gu     unrelaxed modulus [GPa]
+  % elastic_method  optional, the elastic method of Gu. If given, the maxwell
+  %        time from the viscous method is shared with other methods (see
+  %        memo_fetch)
   %
   % Output:
   % ------
@@ -39,41 +42,50 @@ function tau = Q_eBurgers_mxwll(VBR,Gu)
   m_a = Burger_params.(bType).m_a ; % grain size exponent (anelastic)
   m_v = Burger_params.(bType).m_v ; % grain size exponent (viscous)
 
+  % temperature and pressure dependence, shared by the maxwell time and the
+  % integration limits
+  arrhenius=exp((E/R).*(1./T_K_mat-1/TR)).*exp((Vstar/R).*(P_Pa_mat./T_K_mat-PR/TR));
+
   % maxwell time calculation
   [visc_exists,missing]=checkStructForField(VBR,{'in','viscous','methods_list'},0);
   if Burger_params.useJF10visc || visc_exists==0
     % use JF10's exact relationship
-    scale=((d_mat./dR).^m_v).*exp((E/R).*(1./T_K_mat-1/TR)).*exp((Vstar/R).*(P_Pa_mat./T_K_mat-PR/TR));
-    scale=addMeltEffects(phi,scale,VBR.in.GlobalSettings,Burger_params);
+    scale=((d_mat./dR).^m_v).*arrhenius;
+    scale=addMeltEffects(VBR,phi,scale,Burger_params);
     Tau_MR = Burger_params.(bType).Tau_MR ;
     tau.maxwell=Tau_MR .* scale ; % steady state viscous maxwell time
   else
     % use diffusion viscosity from VBR to get maxwell time
     visc_method=VBR.in.viscous.methods_list{1};
     eta_diff = VBR.out.viscous.(visc_method).diff.eta ; % viscosity for maxwell relaxation time
-    tau.maxwell = eta_diff ./ Gu ; % maxwell relaxation time
+    if nargin > 2
+      key = ['tau_maxwell:', visc_method, ':', elastic_method];
+      tau.maxwell = memo_fetch(VBR, key, @rdivide, eta_diff, Gu); % maxwell relaxation time
+    else
+      tau.maxwell = eta_diff ./ Gu ; % maxwell relaxation time
+    end
   end
 
   % integration limits and peak location
-  LHP=((d_mat./dR).^m_a).*exp((E/R).*(1./T_K_mat-1/TR)).*exp((Vstar/R).*(P_Pa_mat./T_K_mat-PR/TR));
-  LHP=addMeltEffects(phi,LHP,VBR.in.GlobalSettings,Burger_params);
+  LHP=((d_mat./dR).^m_a).*arrhenius;
+  LHP=addMeltEffects(VBR,phi,LHP,Burger_params);
   tau.L = Burger_params.(bType).Tau_LR * LHP;
   tau.H = Burger_params.(bType).Tau_HR * LHP;
   tau.P = Burger_params.(bType).Tau_PR * LHP;
 end
 
-function scaleMat=addMeltEffects(phi,scaleMat,GlobalSettings,Burger_params)
+function scaleMat=addMeltEffects(VBR,phi,scaleMat,Burger_params)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
   %
-  % scaleMat=addMeltEffects(phi,scaleMat,GlobalSettings,Burger_params)
+  % scaleMat=addMeltEffects(VBR,phi,scaleMat,Burger_params)
   %
   % adds on Melt Effects
   %
   % Parameters:
   % ----------
+  % VBR              the VBR structure
   % phi              melt fraction
   % scaleMat         the initial maxwell time matrix
-  % GlobalSettings   global settings structure with melt_enhancement flag
   % Burger_params    the parameter structure for burgers model
   %
   % Output:
@@ -91,6 +103,7 @@ function scaleMat=addMeltEffects(phi,scaleMat,GlobalSettings,Burger_params)
   scaleMat = scaleMat.* x_phi_c ;
 
   % add melt effects
-  [scale_mat_prime] = sr_melt_enhancement(phi,alpha,x_phi_c,phi_c) ;
+  key = sprintf('melt_enhancement:%s:%s:%s', num2hex(alpha), num2hex(x_phi_c), num2hex(phi_c));
+  [scale_mat_prime] = memo_fetch(VBR, key, @sr_melt_enhancement, phi, alpha, x_phi_c, phi_c) ;
   scaleMat = scaleMat ./ scale_mat_prime;
 end
@@ -4,9 +4,10 @@ function [VBR] = Q_eFastBurgers(VBR)
 % calculates material properties for extended burgers model using the
 % FastBurger integration algorithm. Rather than integrate over relaxation
 % period for every thermodynamic state (as in Q_eBurgers_f.m), the
-% FastBurger algorithm first integrates over the entire range of relaxation
-% periods of all input thermodynamic states, then extracts the relevant
-% range for each thermodynamic state. See Notes for detailed description.
+% FastBurger algorithm uses a look-up table of the cumulative integrals in
+% w*tau (see Q_eFastBurgers_lut.m), which depends only on the background
+% exponent and is cached between calls, then extracts the relevant range for
+% every thermodynamic state and frequency at once.
 %
 % For High Temp Background only. To include peak, must use Q_eBurgers_f().
 %
@@ -38,7 +39,7 @@ function [VBR] = Q_eFastBurgers(VBR)
 %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 
   % State Variables
-  [rho_mat, Mu, Ju_mat, f_vec] = Q_get_state_vars(VBR);
+  [rho_mat, Mu, Ju_mat, f_vec, elastic_method] = Q_get_state_vars(VBR);
   w_vec = 2*pi.*f_vec ; % period
 
   %  allocate matrices
@@ -54,7 +55,7 @@ function [VBR] = Q_eFastBurgers(VBR)
     wrn=[wrn,'switch eBurgerMethod to PoinstWise to include peak.'];
     wrn=[wrn,' Continuing with bg_only.'];
     disp(wrn)
-    btype='bg_only';
+    bType='bg_only';
   end
   alf = Burger_params.(bType).alf ;
   DeltaB = Burger_params.(bType).DeltaB ; % relaxation strength of background
@@ -62,78 +63,27 @@ function [VBR] = Q_eFastBurgers(VBR)
   sig=Burger_params.(bType).sig; % for peak
 
 % calculate maxwell times
-  tau=Q_eBurgers_mxwll(VBR,Mu);
+  tau=Q_eBurgers_mxwll(VBR,Mu,elastic_method);
 
-% build look-up table for integration
-  nglobvec0=Burger_params.nTauGlob;
-  minTau_L=min(tau.L(:));
-  maxTau_H=max(tau.H(:));
-  nTau = numel(tau.L);
-  Tau_glob_vec0(1:nglobvec0) = logspace(log10(minTau_L),log10(maxTau_H),nglobvec0);
+% fetch the look-up table for integration (depends only on alf, nTauGlob)
+  lut=Q_eFastBurgers_lut(alf,Burger_params);
 
-% make sure each Tau_L, Tau_H appears in vector exactly
-  for i_th = 1:nTau;
-       Tau_L0 = tau.L(i_th);
-       Tau_H0 = tau.H(i_th);
+% integrate over each state's relaxation period range at every frequency at
+% once: in x = w*tau, the integration limits are w*Tau_L, w*Tau_H
+  x_L = tau.L(:) * w_vec(:)'; % (number of states, nfreq)
+  x_H = tau.H(:) * w_vec(:)';
+  x_fac = x_H.^alf - x_L.^alf; % w^alf * (Tau_H^alf - Tau_L^alf)
 
-       if isempty(find(Tau_glob_vec0==Tau_L0));
-           Tau_glob_vec0 = [Tau_glob_vec0 Tau_L0];
-       end
-       if isempty(find(Tau_glob_vec0==Tau_H0));
-           Tau_glob_vec0 = [Tau_glob_vec0 Tau_H0];
-       end
-  end
-
-  % sort the new vector, track indeces
-  [Tau_glob_vec,TauIndx]=sort(Tau_glob_vec0);
-  nglobvec=numel(Tau_glob_vec);
-
-  % integrate the portions that depend only on frequency, cumulatively
-  ints=repmat(struct('J1', nglobvec,'J2', nglobvec), nfreq, 1 );
-  for iw = 1:nfreq
-   w = w_vec(iw); % for now
-
-   ints(iw).J1= cumtrapz(Tau_glob_vec,Tau_glob_vec.^(alf-1)./(1+w^2.*Tau_glob_vec.^2)) ;
-   ints(iw).J2 = cumtrapz(Tau_glob_vec,Tau_glob_vec.^alf./(1+w^2.*Tau_glob_vec.^2)) ;
-  end
-
-  % now go through each i_th, find the interval of interest for each and
-  % calculate the modulus
-  for i_th = 1:nTau
-    % get current i_th values
-    Tau_M = tau.maxwell(i_th);
-    Ju = Ju_mat(i_th) ;
-    rho = rho_mat(i_th) ;
-
-    % the bounds to find
-    Tau_L0 = tau.L(i_th);
-    Tau_H0 = tau.H(i_th);
-
-    % find the bounds
-    iLow = find(Tau_glob_vec==Tau_L0);
-    iHigh = find(Tau_glob_vec==Tau_H0);
-
-    % loop over frequency
-    for iw=1:nfreq
-      i_glob = i_th + (iw - 1) * nTau; % the linear index of the arrays with
-                                       % a frequency index
-      w = w_vec(iw) ;
-
-      int_J1 = ints(iw).J1;
-      d_integral=alf*(int_J1(iHigh)-int_J1(iLow))./(Tau_H0^alf - Tau_L0^alf);
-      J_int_1_0 = (1+DeltaB*d_integral) ;
-
-      int_J2 = ints(iw).J2;
-      d_integral=alf*(int_J2(iHigh)-int_J2(iLow))./(Tau_H0^alf - Tau_L0^alf);
-      J_int_2_0 = (w*DeltaB*d_integral + 1/(w*Tau_M)) ;
+  J_int_1_0 = 1 + DeltaB * alf * lut_integral(lut.J1, lut, x_L, x_H) ./ x_fac;
+  J_int_2_0 = DeltaB * alf * lut_integral(lut.J2, lut, x_L, x_H) ./ x_fac ...
+            + 1 ./ (tau.maxwell(:) * w_vec(:)');
 
-      J1(i_glob)=Ju * J_int_1_0;
-      J2(i_glob)=Ju * J_int_2_0;
-
-      M(i_glob) = (J1(i_glob).^2 + J2(i_glob).^2).^(-0.5) ;
-      V(i_glob) = sqrt(M(i_glob)./rho) ;
-    end
-  end
+  Ju = repmat(Ju_mat(:), 1, nfreq);
+  rho = repmat(rho_mat(:), 1, nfreq);
+  J1(:) = Ju .* J_int_1_0;
+  J2(:) = Ju .* J_int_2_0;
+  M(:) = (J1(:).^2 + J2(:).^2).^(-0.5) ;
+  V(:) = sqrt(M(:)./rho(:)) ;
 
   %% WRITE VBR
   onm='eburgers_psp';
@@ -149,3 +99,37 @@ function [VBR] = Q_eFastBurgers(VBR)
   VBR.out.anelastic.(onm).units = Q_method_units();
 
 end
+
+function I = lut_integral(tab, lut, x_L, x_H)
+  % integral of exp(p*u)/(1+exp(2*u)) from u = ln(x_L) to ln(x_H), from the
+  % cumulative integrals below (F) and above (C) u = 0.
+  u_L = log(x_L);
+  u_H = log(x_H);
+  I = (lut_lower(tab, lut, min(u_H, 0)) - lut_lower(tab, lut, min(u_L, 0))) ...
+    + (lut_upper(tab, lut, max(u_L, 0)) - lut_upper(tab, lut, max(u_H, 0)));
+end
+
+function F = lut_lower(tab, lut, u)
+  % integral from -infinity to u, with the asymptote below the table
+  F = lut_hermite(tab.F, tab.g, lut, u);
+  below = u < lut.u0;
+  F(below) = exp(tab.p * u(below)) / tab.p;
+end
+
+function C = lut_upper(tab, lut, u)
+  % integral from u to infinity, with the asymptote above the table
+  C = lut_hermite(tab.C, -tab.g, lut, u);
+  above = u > lut.u0 + (numel(tab.C) - 1) * lut.du;
+  C(above) = exp((tab.p - 2) * u(above)) / (2 - tab.p);
+end
+
+function y = lut_hermite(Y, dY, lut, u)
+  % cubic hermite interpolation of Y, with derivative dY, on the table grid
+  n_u = numel(Y);
+  k = floor((u - lut.u0) / lut.du) + 1;
+  k = min(max(k, 1), n_u - 1);
+  t = (u - lut.u0) / lut.du - (k - 1);
+  t = min(max(t, 0), 1);
+  y = (2*t.^3 - 3*t.^2 + 1) .* Y(k) + (t.^3 - 2*t.^2 + t) .* lut.du .* dY(k) ...
+    + (3*t.^2 - 2*t.^3) .* Y(k+1) + (t.^3 - t.^2) .* lut.du .* dY(k+1);
+end
@@ -0,0 +1,123 @@
+function [lut, source] = Q_eFastBurgers_lut(alf, Burger_params)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  %
+  % [lut, source] = Q_eFastBurgers_lut(alf, Burger_params)
+  %
+  % returns the integration look-up table for the FastBurger method, building
+  % it only if it is not already cached.
+  %
+  % With x = w * tau, the high temperature background integrals become
+  %
+  %   int tau^(alf-1) / (1 + w^2 tau^2) dtau = w^(-alf) * int x^(alf-1) / (1 + x^2) dx
+  %   int tau^alf / (1 + w^2 tau^2) dtau = w^(-alf-1) * int x^alf / (1 + x^2) dx
+  %
+  % so a single table of the cumulative integrals over x, for a given alf,
+  % covers every thermodynamic state and frequency. The table is stored in
+  % u = ln(x) on an evenly spaced grid of nTauGlob points (10^-20 < x < 10^20)
+  % and holds both the integral from 0 to x (F) and from x to infinity (C),
+  % so that integrals over large x keep their relative precision. Beyond the
+  % table, the integrands are replaced by their power law asymptotes.
+  %
+  % Tables are kept in memory between calls (clear Q_eFastBurgers_lut to
+  % empty it) and, if Burger_params.lut_cache_dir is set, are saved to and
+  % loaded from that directory. A table is identified by a key built from
+  % alf, nTauGlob and the table range, so changing any of these builds a new
+  % table.
+  %
+  % Parameters:
+  % ----------
+  % alf             the high temperature background exponent
+  % Burger_params   the eburgers_psp parameter structure, for nTauGlob and
+  %                 lut_cache_dir
+  %
+  % Output:
+  % ------
+  % lut      the look-up table structure with fields
+  %          .key     the table key
+  %          .alf     the background exponent
+  %          .u0, .du the first value and spacing of the u = ln(x) grid
+  %          .J1, .J2 for the J1 and J2 integrals: the exponent p of the
+  %                   integrand in u, exp(p*u)/(1+exp(2*u)), the integrand
+  %                   g, and the cumulative integrals F and C at each u
+  % source   'memory', 'disk' or 'built'
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  persistent luts
+  max_luts = 20; % maximum number of tables kept in memory
+  log10_x_range = [-20, 20];
+  lut_version = 1;
+
+  n_u = Burger_params.nTauGlob;
+  key = sprintf('%s_%d_%d_%d_v%d', num2hex(alf), n_u, log10_x_range, lut_version);
+
+  if isempty(luts)
+    luts = struct('key', {}, 'lut', {});
+  end
+  i_lut = find(strcmp({luts.key}, key));
+  if numel(i_lut) > 0
+    lut = luts(i_lut).lut;
+    source = 'memory';
+    return
+  end
+
+  lut_file = '';
+  if isfield(Burger_params, 'lut_cache_dir') && numel(Burger_params.lut_cache_dir) > 0
+    lut_file = fullfile(Burger_params.lut_cache_dir, ['fastburger_lut_', key, '.mat']);
+  end
+
+  source = 'built';
+  if numel(lut_file) > 0 && exist(lut_file, 'file') == 2
+    lut = load(lut_file);
+    if isfield(lut, 'key') && strcmp(lut.key, key)
+      source = 'disk';
+    end
+  end
+
+  if strcmp(source, 'built')
+    lut = build_lut(alf, n_u, log10_x_range);
+    lut.key = key;
+    if numel(lut_file) > 0
+      if exist(Burger_params.lut_cache_dir, 'dir') ~= 7
+        mkdir(Burger_params.lut_cache_dir);
+      end
+      VBR_save(lut, lut_file);
+    end
+  end
+
+  % store in memory, dropping the oldest table if full
+  if numel(luts) >= max_luts
+    luts(1) = [];
+  end
+  luts(end+1).key = key;
+  luts(end).lut = lut;
+end
+
+function lut = build_lut(alf, n_u, log10_x_range)
+  % cumulative integrals of g(u) = exp(p*u) / (1 + exp(2*u)) for p = alf
+  % (J1) and p = alf + 1 (J2), using the trapezoidal rule with the endpoint
+  % derivative correction (fourth order accurate). The integrals below and
+  % above the table start from the asymptotes exp(p*u)/p and
+  % exp((p-2)*u)/(2-p).
+  u = linspace(log10_x_range(1), log10_x_range(2), n_u)' * log(10);
+  du = u(2) - u(1);
+  p = [alf, alf + 1];
+  e2u = exp(2 * u);
+  g = bsxfun(@rdivide, exp(u * p), 1 + e2u);
+  dg = g .* bsxfun(@minus, p, 2 * e2u ./ (1 + e2u));
+  segments = du / 2 * (g(1:end-1, :) + g(2:end, :)) ...
+           + du^2 / 12 * (dg(1:end-1, :) - dg(2:end, :));
+  F_start = exp(p * u(1)) ./ p;
+  C_end = exp((p - 2) * u(end)) ./ (2 - p);
+  F = cumsum([F_start; segments], 1);
+  C = flipud(cumsum([C_end; flipud(segments)], 1));
+
+  lut.alf = alf;
+  lut.u0 = u(1);
+  lut.du = du;
+  flds = {'J1', 'J2'};
+  for ifld = 1:2
+    lut.(flds{ifld}).p = p(ifld);
+    lut.(flds{ifld}).g = g(:, ifld);
+    lut.(flds{ifld}).F = F(:, ifld);
+    lut.(flds{ifld}).C = C(:, ifld);
+  end
+end
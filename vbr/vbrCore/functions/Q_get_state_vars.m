@@ -1,12 +1,14 @@
-function [rho_in, Mu_in, Ju_in, f_vec] = Q_get_state_vars(VBR)
+function [rho_in, Mu_in, Ju_in, f_vec, elastic_method] = Q_get_state_vars(VBR)
   % state variables
   rho_in = VBR.in.SV.rho ;
   if isfield(VBR.in.elastic,'anh_poro')
-   Mu_in = VBR.out.elastic.anh_poro.Gu ;
+   elastic_method = 'anh_poro';
   elseif isfield(VBR.in.elastic,'anharmonic')
-   Mu_in = VBR.out.elastic.anharmonic.Gu ;
+   elastic_method = 'anharmonic';
   end
-  Ju_in = 1./Mu_in;
+  Mu_in = VBR.out.elastic.(elastic_method).Gu ;
+  % unrelaxed compliance, shared by the anelastic methods (see memo_fetch)
+  Ju_in = memo_fetch(VBR, ['Ju:', elastic_method], @rdivide, 1, Mu_in);
   % Frequency
   f_vec = VBR.in.SV.f;  % frequency
-end
\ No newline at end of file
+end
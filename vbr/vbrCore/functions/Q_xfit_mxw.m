@@ -21,7 +21,7 @@ function [VBR] = Q_xfit_mxw(VBR)
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 
   % state variables
-  [rho_in, Mu_in, Ju_in, f_vec] = Q_get_state_vars(VBR);
+  [rho_in, Mu_in, Ju_in, f_vec, elastic_method] = Q_get_state_vars(VBR);
   period_vec = 1./f_vec ;
   omega_vec = f_vec.*(2*pi) ;
   tau_vec = 1./omega_vec ;
@@ -29,7 +29,8 @@ function [VBR] = Q_xfit_mxw(VBR)
   % The scaling function (maxwell time):
   visc_method=VBR.in.viscous.methods_list{1};
   eta_diff = VBR.out.viscous.(visc_method).diff.eta ; % viscosity for maxwell relaxation time
-  tau.maxwell = eta_diff./ Mu_in ; % maxwell relaxation time
+  key = ['tau_maxwell:', visc_method, ':', elastic_method];
+  tau.maxwell = memo_fetch(VBR, key, @rdivide, eta_diff, Mu_in); % maxwell relaxation time
 
   % allocation of new matrixes
   n_freq = numel(f_vec);
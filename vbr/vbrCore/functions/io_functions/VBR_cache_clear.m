@@ -0,0 +1,43 @@
+function VBR_cache_clear(cache_dir)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % VBR_cache_clear(cache_dir)
+    %
+    % Remove all entries of a VBR_spine result cache and reset its
+    % counters, along with temporary files left by interrupted writes.
+    % Files in cache_dir that do not belong to the cache are left in
+    % place. Clears the cache with the cache locked (VBR_cache_lock).
+    %
+    % Parameters
+    % ----------
+    % cache_dir: string
+    %     the cache directory
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    if exist(cache_dir, 'dir') == 0
+        return
+    end
+    VBR_cache_lock(cache_dir);
+    try
+        clear_files(cache_dir);
+    catch err
+        VBR_cache_unlock(cache_dir);
+        rethrow(err);
+    end
+    VBR_cache_unlock(cache_dir);
+end
+
+function clear_files(cache_dir)
+    [index, index_file] = VBR_cache_index(cache_dir);
+    for i_entry = 1:numel(index.keys)
+        entry_file = fullfile(cache_dir, [index.keys{i_entry}, '.mat']);
+        if exist(entry_file, 'file') == 2
+            delete(entry_file);
+        end
+    end
+    if exist(index_file, 'file') == 2
+        delete(index_file);
+    end
+    tmp_files = dir(fullfile(cache_dir, 'vbr_cache_tmp_*.mat'));
+    for i_tmp = 1:numel(tmp_files)
+        delete(fullfile(cache_dir, tmp_files(i_tmp).name));
+    end
+end
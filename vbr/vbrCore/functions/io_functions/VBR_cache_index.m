@@ -0,0 +1,60 @@
+function [index, index_file] = VBR_cache_index(cache_dir)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  %
+  % [index, index_file] = VBR_cache_index(cache_dir)
+  %
+  % loads the index of the VBR_spine result cache. If the index file is
+  % missing or can not be read (e.g., it was truncated), the index is rebuilt
+  % from the entry files in the cache directory, with the counters reset.
+  %
+  % Parameters:
+  % ----------
+  % cache_dir    the cache directory
+  %
+  % Output:
+  % ------
+  % index        the index structure, with fields
+  %                .keys       cell array of cache keys (see VBR_cache_key)
+  %                .bytes      size on disk of each entry
+  %                .last_used  access counter value of the last use of each entry
+  %                .clock      the access counter, incremented on every lookup
+  %                .hits, .misses, .evictions    cache counters
+  % index_file   the index filename, save with VBR_cache_write(index, index_file)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  index_file = fullfile(cache_dir, 'vbr_cache_index.mat');
+  index_flds = {'keys'; 'bytes'; 'last_used'; 'clock'; 'hits'; 'misses'; 'evictions'};
+  if exist(index_file, 'file') == 2
+    try
+      index = load(index_file);
+      if all(isfield(index, index_flds))
+        return
+      end
+    catch
+    end
+    disp(['VBR_cache_index: could not read ', index_file, ', rebuilding the index'])
+  end
+  index = rebuild_index(cache_dir);
+end
+
+function index = rebuild_index(cache_dir)
+  % an index of the entry files in cache_dir (named by their 32 character
+  % key), all equally recently used
+  index = struct();
+  index.keys = {};
+  index.bytes = [];
+  index.last_used = [];
+  index.clock = 0;
+  index.hits = 0;
+  index.misses = 0;
+  index.evictions = 0;
+
+  entries = dir(fullfile(cache_dir, '*.mat'));
+  for i_entry = 1:numel(entries)
+    [~, key] = fileparts(entries(i_entry).name);
+    if numel(regexp(key, '^[0-9a-f]{32}$')) > 0
+      index.keys{end+1} = key;
+      index.bytes(end+1) = entries(i_entry).bytes;
+      index.last_used(end+1) = 0;
+    end
+  end
+end
@@ -0,0 +1,114 @@
+function key = VBR_cache_key(VBR)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % key = VBR_cache_key(VBR)
+    %
+    % Calculate the result cache key of a VBR structure: an md5 hash
+    % of everything that determines VBR.out. This includes VBR.in
+    % (state variables, methods lists, global settings), the full
+    % parameter structure of every method in the methods lists
+    % (defaults merged with user-set values) and the VBRc version.
+    % VBR.in.cache is not included.
+    %
+    % Parameters
+    % ----------
+    % VBR: structure
+    %     the VBR structure, before calling VBR_spine
+    %
+    % Returns
+    % -------
+    % key: string
+    %     the 32 character hexadecimal md5 hash
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    key_in = VBR.in;
+    if isfield(key_in, 'cache')
+        key_in = rmfield(key_in, 'cache');
+    end
+
+    if ~isfield(key_in, 'GlobalSettings')
+        key_in.GlobalSettings = Params_Global();
+    end
+
+    % replace the method parameters with the parameters that will be used,
+    % as in loadThenCallMethod
+    properties = {'elastic'; 'viscous'; 'anelastic'};
+    for iprop = 1:numel(properties)
+        property = properties{iprop};
+        if isfield(key_in, property) && isfield(key_in.(property), 'methods_list')
+            param_func = fetchParamFunction(property);
+            methods_list = key_in.(property).methods_list;
+            for i_method = 1:numel(methods_list)
+                meth = methods_list{i_method};
+                meth_params = feval(param_func, meth, key_in.GlobalSettings);
+                if isfield(key_in.(property), meth)
+                    meth_params = nested_structure_update(meth_params, key_in.(property).(meth));
+                end
+                key_in.(property).(meth) = meth_params;
+            end
+        end
+    end
+
+    Version = vbr_version();
+    bytes = [uint8(['VBRc ', Version.version, ';']), serialize_value(key_in)];
+    key = md5_hex(bytes);
+end
+
+function bytes = serialize_value(val)
+    % unambiguous byte representation of a value: the class and size, then
+    % the contents. structure fields are sorted so that field order does not
+    % change the key.
+    header = uint8([class(val), '[', sprintf('%d,', size(val)), ']']);
+    if isa(val, 'string')
+        bytes = [header, serialize_value(cellstr(val))];
+    elseif isempty(val) && ~isstruct(val)
+        bytes = header;
+    elseif isstruct(val)
+        flds = sort(fieldnames(val));
+        parts = cell(1, numel(val) * numel(flds) * 2 + 1);
+        parts{1} = header;
+        i_part = 1;
+        for i_el = 1:numel(val)
+            for ifld = 1:numel(flds)
+                parts{i_part + 1} = uint8([flds{ifld}, '=']);
+                parts{i_part + 2} = serialize_value(val(i_el).(flds{ifld}));
+                i_part = i_part + 2;
+            end
+        end
+        bytes = [parts{:}];
+    elseif iscell(val)
+        parts = cell(1, numel(val) + 1);
+        parts{1} = header;
+        for i_el = 1:numel(val)
+            parts{i_el + 1} = serialize_value(val{i_el});
+        end
+        bytes = [parts{:}];
+    elseif ischar(val)
+        bytes = [header, typecast(uint16(val(:))', 'uint8')];
+    elseif isnumeric(val) || islogical(val)
+        vals = double(val(:))';
+        if ~isreal(val)
+            vals = [real(vals), imag(vals)];
+        end
+        bytes = [header, typecast(vals, 'uint8')];
+    elseif isa(val, 'function_handle')
+        bytes = [header, uint8(func2str(val))];
+    else
+        error(['VBR_cache_key: cannot hash values of class ', class(val)])
+    end
+end
+
+function hex = md5_hex(bytes)
+    if is_octave()
+        hex = hash('md5', char(bytes));
+    else
+        if ~usejava('jvm')
+            error(['VBR_cache_key: the VBR_spine result cache needs the Java ', ...
+                   'virtual machine in MATLAB (to calculate md5 hashes), but ', ...
+                   'MATLAB is running without it (-nojvm). Start MATLAB with ', ...
+                   'the JVM or remove VBR.in.cache to run without the cache.'])
+        end
+        md = java.security.MessageDigest.getInstance('MD5');
+        md.update(typecast(bytes, 'int8'));
+        digest = typecast(md.digest(), 'uint8');
+        hex = lower(reshape(dec2hex(digest, 2)', 1, []));
+    end
+end
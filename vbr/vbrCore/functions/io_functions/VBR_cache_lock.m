@@ -0,0 +1,53 @@
+function VBR_cache_lock(cache_dir)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % VBR_cache_lock(cache_dir)
+    %
+    % Acquire the lock of a VBR_spine result cache, held while the
+    % cache index is read, changed and rewritten so that processes
+    % sharing a cache directory (e.g., the workers of a parallel
+    % parameter sweep) do not overwrite each other's index updates.
+    % The lock is the directory <cache_dir>/.lock, created with mkdir,
+    % which fails if another process holds the lock. Release it with
+    % VBR_cache_unlock(cache_dir).
+    %
+    % A lock older than 60 s is left by a process that stopped while
+    % holding it and is removed. Waits at most 300 s for the lock.
+    %
+    % Parameters
+    % ----------
+    % cache_dir: string
+    %     the cache directory
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    stale_s = 60;
+    max_wait_s = 300;
+    lock_dir = fullfile(cache_dir, '.lock');
+
+    t_start = tic();
+    while true
+        [status, msg] = mkdir(lock_dir);
+        % mkdir also succeeds, with a message, if the directory exists
+        if status == 1 && isempty(msg)
+            return
+        end
+        if lock_age_s(cache_dir) > stale_s
+            disp(['VBR_cache_lock: removing a stale lock in ', cache_dir])
+            rmdir(lock_dir);
+        elseif toc(t_start) > max_wait_s
+            error(['VBR_cache_lock: could not acquire the lock in ', cache_dir, ...
+                   ' within ', num2str(max_wait_s), ' s, remove ', lock_dir, ...
+                   ' if no other process is using the cache'])
+        else
+            pause(0.01 + 0.04 * rand());
+        end
+    end
+end
+
+function age_s = lock_age_s(cache_dir)
+    % seconds since the lock directory was created, 0 if it was removed
+    age_s = 0;
+    entries = dir(cache_dir);
+    i_lock = find(strcmp({entries.name}, '.lock'));
+    if numel(i_lock) > 0
+        age_s = (now() - entries(i_lock(1)).datenum) * 86400;
+    end
+end
@@ -0,0 +1,93 @@
+function [VBR, cache_hit] = VBR_cache_lookup(VBR)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  %
+  % [VBR, cache_hit] = VBR_cache_lookup(VBR)
+  %
+  % looks up the VBR structure in the result cache in VBR.in.cache.dir. On a
+  % hit, the cached VBR.out (and the method parameters in VBR.in) are loaded
+  % into VBR. Updates the cache counters, with the cache locked
+  % (VBR_cache_lock), and stores the cache key and counters in VBR.cache_info.
+  %
+  % Parameters:
+  % ----------
+  % VBR          the VBR structure, with VBR.in.cache.dir set
+  %
+  % Output:
+  % ------
+  % VBR          the VBR structure, with results loaded if found
+  % cache_hit    1 if the results were found, 0 otherwise
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  if ~isfield(VBR.in.cache, 'dir')
+    error('VBR.in.cache.dir must be set to use the VBR_spine result cache')
+  end
+  cache_dir = VBR.in.cache.dir;
+  if exist(cache_dir, 'dir') == 0
+    mkdir(cache_dir);
+  end
+
+  key = VBR_cache_key(VBR);
+  entry_file = fullfile(cache_dir, [key, '.mat']);
+  entry_loaded = false;
+  if exist(entry_file, 'file') == 2
+    try
+      cached = load(entry_file);
+      entry_loaded = true;
+    catch
+      % an unreadable entry is recalculated and replaced
+    end
+  end
+
+  % the index is shared with other processes using the cache directory
+  VBR_cache_lock(cache_dir);
+  try
+    [index, cache_hit] = update_index(cache_dir, key, entry_loaded);
+  catch err
+    VBR_cache_unlock(cache_dir);
+    rethrow(err);
+  end
+  VBR_cache_unlock(cache_dir);
+
+  if cache_hit
+    flds = fieldnames(cached);
+    for ifld = 1:numel(flds)
+      fld = flds{ifld};
+      if strcmp(fld, 'in')
+        % the cached input structure does not include SV
+        in_flds = fieldnames(cached.in);
+        for i_in = 1:numel(in_flds)
+          VBR.in.(in_flds{i_in}) = cached.in.(in_flds{i_in});
+        end
+      else
+        VBR.(fld) = cached.(fld);
+      end
+    end
+  end
+
+  VBR.cache_info = struct();
+  VBR.cache_info.key = key;
+  VBR.cache_info.hit = cache_hit;
+  VBR.cache_info.hits = index.hits;
+  VBR.cache_info.misses = index.misses;
+end
+
+function [index, cache_hit] = update_index(cache_dir, key, entry_loaded)
+  % updates the counters and the entry's last use and saves the index. Call
+  % with the cache locked.
+  [index, index_file] = VBR_cache_index(cache_dir);
+  i_entry = find(strcmp(index.keys, key));
+  cache_hit = numel(i_entry) > 0 && entry_loaded;
+  index.clock = index.clock + 1;
+  if cache_hit
+    index.hits = index.hits + 1;
+    index.last_used(i_entry) = index.clock;
+  else
+    index.misses = index.misses + 1;
+    if numel(i_entry) > 0
+      % the entry file was removed or is unreadable, drop it from the index
+      index.keys(i_entry) = [];
+      index.bytes(i_entry) = [];
+      index.last_used(i_entry) = [];
+    end
+  end
+  VBR_cache_write(index, index_file);
+end
@@ -0,0 +1,31 @@
+function stats = VBR_cache_stats(cache_dir)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % stats = VBR_cache_stats(cache_dir)
+    %
+    % Summarize a VBR_spine result cache. The cache is enabled by
+    % setting VBR.in.cache.dir before calling VBR_spine (and,
+    % optionally, VBR.in.cache.max_size_MB, default 1024).
+    %
+    % Parameters
+    % ----------
+    % cache_dir: string
+    %     the cache directory
+    %
+    % Returns
+    % -------
+    % stats: structure with fields
+    %     .n_entries: number of cached results
+    %     .size_MB: total size of the cached results
+    %     .hits, .misses: number of cache hits and misses
+    %     .hit_rate: hits / (hits + misses)
+    %     .evictions: number of entries evicted to respect the size limit
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    index = VBR_cache_index(cache_dir);
+    stats = struct();
+    stats.n_entries = numel(index.keys);
+    stats.size_MB = sum(index.bytes) / 1024^2;
+    stats.hits = index.hits;
+    stats.misses = index.misses;
+    stats.hit_rate = index.hits / max(index.hits + index.misses, 1);
+    stats.evictions = index.evictions;
+end
@@ -0,0 +1,71 @@
+function VBR = VBR_cache_store(VBR)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  %
+  % VBR = VBR_cache_store(VBR)
+  %
+  % stores the results of VBR_spine in the result cache, using the key from
+  % VBR_cache_lookup. The state variables are not stored. If the cache exceeds
+  % VBR.in.cache.max_size_MB (default 1024), the least recently used entries
+  % are evicted. The index is updated with the cache locked (VBR_cache_lock).
+  %
+  % Parameters:
+  % ----------
+  % VBR    the VBR structure, after VBR_cache_lookup and VBR_spine
+  %
+  % Output:
+  % ------
+  % VBR    the VBR structure, with updated VBR.cache_info
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  cache_dir = VBR.in.cache.dir;
+  max_size_MB = 1024;
+  if isfield(VBR.in.cache, 'max_size_MB')
+    max_size_MB = VBR.in.cache.max_size_MB;
+  end
+
+  key = VBR.cache_info.key;
+  entry_file = fullfile(cache_dir, [key, '.mat']);
+  VBRout = rmfield(VBR, 'cache_info');
+  VBRout.in = rmfield(VBRout.in, 'cache');
+  VBR_cache_write(VBRout, entry_file, 1);
+  entry_info = dir(entry_file);
+
+  % the index is shared with other processes using the cache directory
+  VBR_cache_lock(cache_dir);
+  try
+    index = update_index(cache_dir, key, entry_info.bytes, max_size_MB);
+  catch err
+    VBR_cache_unlock(cache_dir);
+    rethrow(err);
+  end
+  VBR_cache_unlock(cache_dir);
+
+  VBR.cache_info.evictions = index.evictions;
+end
+
+function index = update_index(cache_dir, key, entry_bytes, max_size_MB)
+  % adds the entry to the index, evicts entries over the size limit and
+  % saves the index. Call with the cache locked.
+  [index, index_file] = VBR_cache_index(cache_dir);
+  index.clock = index.clock + 1;
+  i_entry = find(strcmp(index.keys, key));
+  if numel(i_entry) == 0
+    i_entry = numel(index.keys) + 1;
+    index.keys{i_entry} = key;
+  end
+  index.bytes(i_entry) = entry_bytes;
+  index.last_used(i_entry) = index.clock;
+
+  % evict least recently used entries, always keeping the new entry
+  while sum(index.bytes) > max_size_MB * 1024^2 && numel(index.keys) > 1
+    [~, i_old] = min(index.last_used);
+    old_file = fullfile(cache_dir, [index.keys{i_old}, '.mat']);
+    if exist(old_file, 'file') == 2
+      delete(old_file);
+    end
+    index.keys(i_old) = [];
+    index.bytes(i_old) = [];
+    index.last_used(i_old) = [];
+    index.evictions = index.evictions + 1;
+  end
+  VBR_cache_write(index, index_file);
+end
@@ -0,0 +1,17 @@
+function VBR_cache_unlock(cache_dir)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % VBR_cache_unlock(cache_dir)
+    %
+    % Release the lock of a VBR_spine result cache acquired with
+    % VBR_cache_lock(cache_dir).
+    %
+    % Parameters
+    % ----------
+    % cache_dir: string
+    %     the cache directory
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    lock_dir = fullfile(cache_dir, '.lock');
+    if exist(lock_dir, 'dir') == 7
+        rmdir(lock_dir);
+    end
+end
@@ -0,0 +1,28 @@
+function VBR_cache_write(data, fname, exclude_SVs)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % VBR_cache_write(data, fname, exclude_SVs)
+    %
+    % Save a file of the VBR_spine result cache (an entry or the
+    % index) with VBR_save, writing to a temporary file in the same
+    % directory that is then renamed to fname. An interrupted write,
+    % or another process reading the cache at the same time, never
+    % sees a partially written file.
+    %
+    % Parameters
+    % ----------
+    % data: structure
+    %     the structure to save
+    % fname: string
+    %     the filename, including the .mat extension
+    % exclude_SVs: optional integer
+    %     passed to VBR_save, default 0
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    if ~exist('exclude_SVs', 'var')
+        exclude_SVs = 0;
+    end
+    [fdir, fbase] = fileparts(fname);
+    [~, unique_name] = fileparts(tempname());
+    tmp_file = fullfile(fdir, ['vbr_cache_tmp_', fbase, '_', unique_name, '.mat']);
+    VBR_save(data, tmp_file, exclude_SVs);
+    movefile(tmp_file, fname, 'f');
+end
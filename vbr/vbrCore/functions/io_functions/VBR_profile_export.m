@@ -0,0 +1,82 @@
+function VBR_profile_export(VBR, fname)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % VBR_profile_export(VBR, fname)
+    %
+    % Export the per-method profile report, VBR.out.profile, to a CSV
+    % or JSON file. The profile is recorded when VBR_spine is called
+    % with VBR.in.GlobalSettings.profile = 1, with one entry for each
+    % method: property, method, wall_time_s, n_states, n_freq,
+    % n_evaluations and output_bytes.
+    %
+    % Parameters
+    % ----------
+    % VBR: structure
+    %     the VBR structure, after calling VBR_spine with profiling
+    % fname: string
+    %     the filename. Written as JSON (a list of records, one per
+    %     method) if it ends in .json, as CSV otherwise.
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    if ~isfield(VBR, 'out') || ~isfield(VBR.out, 'profile')
+        error(['VBR.out.profile does not exist, set ', ...
+               'VBR.in.GlobalSettings.profile = 1 before calling VBR_spine'])
+    end
+    profile = VBR.out.profile;
+    text_cols = {'property'; 'method'};
+    num_cols = {'wall_time_s'; 'n_states'; 'n_freq'; 'n_evaluations'; ...
+                'output_bytes'};
+    [~, ~, ext] = fileparts(fname);
+    as_json = strcmpi(ext, '.json');
+
+    fid = fopen(fname, 'w');
+    if fid < 0
+        error(['could not open ', fname, ' for writing'])
+    end
+    n_runs = numel(profile.method);
+    if as_json
+        fprintf(fid, '[');
+    else
+        fprintf(fid, '%s\n', strjoin([text_cols; num_cols]', ','));
+    end
+    for i_run = 1:n_runs
+        vals = cell(1, numel(text_cols) + numel(num_cols));
+        for icol = 1:numel(text_cols)
+            vals{icol} = profile.(text_cols{icol}){i_run};
+            if as_json
+                vals{icol} = ['"', text_cols{icol}, '": "', vals{icol}, '"'];
+            end
+        end
+        for icol = 1:numel(num_cols)
+            val = format_number(profile.(num_cols{icol})(i_run), as_json);
+            if as_json
+                val = ['"', num_cols{icol}, '": ', val];
+            end
+            vals{numel(text_cols) + icol} = val;
+        end
+        if as_json
+            if i_run > 1
+                fprintf(fid, ',');
+            end
+            fprintf(fid, '\n  {%s}', strjoin(vals, ', '));
+        else
+            fprintf(fid, '%s\n', strjoin(vals, ','));
+        end
+    end
+    if as_json
+        fprintf(fid, '\n]\n');
+    end
+    fclose(fid);
+end
+
+function str = format_number(val, as_json)
+    if isnan(val)
+        if as_json
+            str = 'null';
+        else
+            str = '';
+        end
+    elseif val == round(val)
+        str = sprintf('%d', val);
+    else
+        str = sprintf('%.6g', val);
+    end
+end
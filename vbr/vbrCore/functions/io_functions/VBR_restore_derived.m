@@ -0,0 +1,56 @@
+function VBR = VBR_restore_derived(VBR, precision)
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    % VBR = VBR_restore_derived(VBR, precision)
+    %
+    % Recalculate the anelastic outputs dropped by the output policy
+    % (VBR.in.output.drop_derived, see VBR_spine): Q from Qinv, and M
+    % from J1 and J2. Outputs that are already present are not changed.
+    %
+    % Parameters
+    % ----------
+    % VBR: structure
+    %     the VBR structure after VBR_spine
+    % precision: optional string
+    %     'double' (default) to calculate the restored outputs in double
+    %     precision, or 'single' to keep the precision of the stored
+    %     outputs they are calculated from.
+    %
+    % Returns
+    % -------
+    % VBR: structure
+    %     the VBR structure with Q and M restored for each anelastic
+    %     method
+    %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    if ~exist('precision', 'var')
+        precision = 'double';
+    end
+    if ~any(strcmp(precision, {'double'; 'single'}))
+        error('VBR_restore_derived: precision must be ''double'' or ''single''')
+    end
+    if ~isfield(VBR, 'out') || ~isfield(VBR.out, 'anelastic')
+        return
+    end
+
+    meths = fieldnames(VBR.out.anelastic);
+    for i_meth = 1:numel(meths)
+        out = VBR.out.anelastic.(meths{i_meth});
+        if ~isstruct(out)
+            continue
+        end
+        if ~isfield(out, 'Q') && isfield(out, 'Qinv')
+            out.Q = 1 ./ to_precision(out.Qinv, precision);
+        end
+        if ~isfield(out, 'M') && isfield(out, 'J1') && isfield(out, 'J2')
+            J1 = to_precision(out.J1, precision);
+            J2 = to_precision(out.J2, precision);
+            out.M = (J1.^2 + J2.^2).^(-0.5);
+        end
+        VBR.out.anelastic.(meths{i_meth}) = out;
+    end
+end
+
+function val = to_precision(val, precision)
+    if strcmp(precision, 'double')
+        val = double(val);
+    end
+end
@@ -1,9 +1,9 @@
-function VBR_save(VBR, fname, exclude_SVs)
+function VBR_save(VBR, fname, exclude_SVs, file_format)
     %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-    % VBR_save(VBR, fname, exclude_SVs)
+    % VBR_save(VBR, fname, exclude_SVs, file_format)
     %
     % Save a VBR structure to disk as a Matlab binary (even if
-    % running from Octave).
+    % running from Octave), or as an HDF5 file.
     %
     % Parameters
     % ----------
@@ -14,6 +14,13 @@ function VBR_save(VBR, fname, exclude_SVs)
     % exclude_SVs: optional integer
     %     default is 0. set to 1 to exclue VBR.in.SV from save file.
     %     Useful for reducing disk-space when saving multiple results.
+    % file_format: optional string
+    %     'mat' (default) or 'hdf5'. 'hdf5' saves an HDF5 file: a v7.3
+    %     .mat file in MATLAB (which stores large arrays in compressed
+    %     chunks) or an Octave HDF5 file (save -hdf5). Use HDF5 for large
+    %     results: individual fields, or slices of them, can then be read
+    %     without loading the whole file, e.g., with load_vbr in
+    %     vbr/pyvbr/reader.py. Both load in the program that saved them.
     %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
     if exist('exclude_SVs','var') && exclude_SVs == 1
         VBRout = struct();
@@ -37,8 +44,21 @@ function VBR_save(VBR, fname, exclude_SVs)
         VBRout = VBR;
     end
 
+    if ~exist('file_format','var')
+        file_format = 'mat';
+    end
+    if ~any(strcmp(file_format, {'mat'; 'hdf5'}))
+        error(['VBR_save: file_format must be ''mat'' or ''hdf5'', found ', file_format])
+    end
+
     isOctave = is_octave();
-    if isOctave
+    if strcmp(file_format, 'hdf5')
+        if isOctave
+            save(fname, "-struct", "VBRout", "-hdf5");
+        else
+            save(fname, "-struct", "VBRout", "-v7.3");
+        end
+    elseif isOctave
         save(fname, "-struct", "VBRout", "-mat-binary");
     else
         save(fname, "-struct", "VBRout");
@@ -50,8 +50,9 @@ function meth_params = loadTheParams(VBR,property,param_func,meth)
   %  meth_params: the parameter structure
   %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 
-  % load the the default values for this property and method
-  meth_params=feval(param_func,meth,VBR.in.GlobalSettings);
+  % load the the default values for this property and method (once per
+  % VBR_spine call, see memo_fetch)
+  meth_params=memo_fetch(VBR,['params:',property,':',meth],param_func,meth,VBR.in.GlobalSettings);
 
   % loop over all fields and save those defined by user
   if isfield(VBR.in.(property),meth)
@@ -0,0 +1,40 @@
+function val = memo_fetch(VBR, key, func, varargin)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  %
+  % val = memo_fetch(VBR, key, func, varargin)
+  %
+  % returns an intermediate quantity shared between methods, calculating it
+  % only once per VBR_spine call. VBR_spine sets VBR.memo to an empty
+  % containers.Map at the start of a call and removes it at the end. As a
+  % containers.Map is a handle object, values stored by one method are seen
+  % by every later method without returning VBR. If VBR.memo is not set
+  % (e.g., a method function called directly), val is always calculated.
+  %
+  % Only quantities that depend on the state variables (not frequency) and
+  % the values in key should be stored, so that key identifies them within
+  % a call.
+  %
+  % Parameters:
+  % ----------
+  % VBR       the VBR structure
+  % key       string identifying the quantity, e.g., 'Ju:anharmonic'
+  % func      function handle or function name that calculates the quantity
+  % varargin  the arguments of func
+  %
+  % Output:
+  % ------
+  % val       the stored or calculated value, feval(func, varargin{:})
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  use_memo = isfield(VBR, 'memo');
+  if use_memo && isKey(VBR.memo, key)
+    val = VBR.memo(key);
+    return
+  end
+
+  val = feval(func, varargin{:});
+  if use_memo
+    memo = VBR.memo;
+    memo(key) = val;
+  end
+end
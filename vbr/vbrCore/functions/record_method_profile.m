@@ -0,0 +1,64 @@
+function VBR = record_method_profile(VBR, property, meth, wall_time)
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  %
+  % VBR = record_method_profile(VBR, property, meth, wall_time)
+  %
+  % appends the profile of a single method run to VBR.out.profile, used by
+  % spineGeneralized when VBR.in.GlobalSettings.profile is 1. Each field of
+  % VBR.out.profile has one entry per method run:
+  %
+  %   .property       the property ('elastic','viscous','anelastic')
+  %   .method         the method name
+  %   .wall_time_s    wall time of the method [s]
+  %   .n_states       number of thermodynamic states
+  %   .n_freq         number of frequencies (1 for non-anelastic methods)
+  %   .n_evaluations  n_states * n_freq
+  %   .output_bytes   memory used by the method output, VBR.out.(property).(meth)
+  %
+  % Parameters:
+  % ----------
+  %  VBR: the VBR structure, after running the method
+  %  property: the property string
+  %  meth: the method string
+  %  wall_time: the elapsed time of the method [s]
+  %
+  % Output:
+  % ------
+  %  VBR: the VBR structure with the updated VBR.out.profile
+  %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+  if ~isfield(VBR.out, 'profile')
+    VBR.out.profile = struct('property', {{}}, 'method', {{}}, ...
+                             'wall_time_s', [], 'n_states', [], 'n_freq', [], ...
+                             'n_evaluations', [], 'output_bytes', []);
+  end
+
+  % state variable size, frequency excluded
+  n_states = 0;
+  SV_fields = fieldnames(VBR.in.SV);
+  for ifield = 1:numel(SV_fields)
+    val = VBR.in.SV.(SV_fields{ifield});
+    if ~strcmp(SV_fields{ifield}, 'f') && isnumeric(val)
+      n_states = max(n_states, numel(val));
+    end
+  end
+  n_freq = 1;
+  if strcmp(property, 'anelastic') && isfield(VBR.in.SV, 'f')
+    n_freq = numel(VBR.in.SV.f);
+  end
+
+  output_bytes = 0;
+  if isfield(VBR.out, property) && isfield(VBR.out.(property), meth)
+    meth_out = VBR.out.(property).(meth);
+    meth_info = whos('meth_out');
+    output_bytes = meth_info.bytes;
+  end
+
+  i_run = numel(VBR.out.profile.method) + 1;
+  VBR.out.profile.property{i_run} = property;
+  VBR.out.profile.method{i_run} = meth;
+  VBR.out.profile.wall_time_s(i_run) = wall_time;
+  VBR.out.profile.n_states(i_run) = n_states;
+  VBR.out.profile.n_freq(i_run) = n_freq;
+  VBR.out.profile.n_evaluations(i_run) = n_states * n_freq;
+  VBR.out.profile.output_bytes(i_run) = output_bytes;
+end
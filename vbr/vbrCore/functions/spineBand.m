@@ -0,0 +1,327 @@
+function VBR = spineBand(VBR)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% VBR = spineBand(VBR)
+%
+% band-limited execution of VBR_spine: the anelastic methods are evaluated
+% only at the quadrature frequencies needed to average over the band set in
+% VBR.in.band, rather than at the frequencies in VBR.in.SV.f.
+%
+% The band average uses nested Clenshaw-Curtis quadrature (uniform in
+% log10(f) by default). The first pass evaluates 3 frequencies (the band
+% edges and center). Each following pass doubles the number of intervals,
+% evaluating only the new frequencies, until the band-averaged V and Qinv
+% of every anelastic method change by less than the relative tolerance
+% between passes, or max_nodes is reached. The band average is usually
+% converged to 1e-6 or better with 5 to 9 frequencies.
+%
+% The elastic and viscous methods are calculated once, in the first pass.
+% The frequency-dependent anelastic outputs include every evaluated
+% frequency (sorted, increasing), given in VBR.out.band.f, and Vave, Qave
+% and Qinvave are the band averages of V, Q and Qinv.
+%
+% Input:
+%  VBR: The VBR structure, with VBR.in.band.f_range set
+%
+% Ouput:
+%  VBR: The VBR structure with the calculations attached and VBR.out.band,
+%       with fields
+%         .f               the evaluated frequencies [Hz]
+%         .weights         the quadrature weights for each frequency (sum 1)
+%         .n_nodes         the number of evaluated frequencies
+%         .error_estimate  the largest relative change of the band averages
+%                          in the last pass
+%         .converged       1 if error_estimate is below the tolerance
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  defaults.tol = 1e-4;
+  defaults.max_nodes = 33;
+  defaults.spacing = 'log';
+  band = nested_structure_update(defaults, VBR.in.band);
+  if ~isfield(band, 'f_range') || numel(band.f_range) ~= 2 ...
+      || band.f_range(1) <= 0 || band.f_range(2) <= band.f_range(1)
+    error('VBR.in.band.f_range must be set to [f_min, f_max] with 0 < f_min < f_max')
+  end
+  if band.max_nodes < 5
+    error('VBR.in.band.max_nodes must be at least 5')
+  end
+  if ~any(strcmp(band.spacing, {'log'; 'linear'}))
+    error('VBR.in.band.spacing must be ''log'' or ''linear''')
+  end
+  if isfield(VBR.in, 'chunks') && isfield(VBR.in.chunks, 'dir')
+    error('VBR.in.chunks.dir is not supported with VBR.in.band')
+  end
+  if ~isfield(VBR.in, 'anelastic')
+    error('VBR.in.band requires anelastic methods')
+  end
+
+  % the passes run without the band, caching and output policy settings
+  VBR_base = VBR;
+  VBR_base.in = rmfield(VBR_base.in, 'band');
+  flds = {'cache'; 'output'};
+  for ifld = 1:numel(flds)
+    if isfield(VBR_base.in, flds{ifld})
+      VBR_base.in = rmfield(VBR_base.in, flds{ifld});
+    end
+  end
+  if isfield(VBR_base, 'out')
+    VBR_base = rmfield(VBR_base, 'out');
+  end
+  use_chunks = isfield(VBR_base.in, 'chunks');
+  % the state dimensions of the frequency-dependent outputs, as in
+  % proc_add_freq_indeces
+  state_dims = get_SV_size(VBR_base.in.SV);
+  if state_dims(end) == 1
+    state_dims = state_dims(1:end-1);
+  end
+
+  N = 2; % number of quadrature intervals
+  j_nodes = (0:N)'; % node indices, x_j = cos(pi * j / N)
+  x_new = cos(pi * j_nodes / N);
+  aves_old = struct();
+  memo = containers.Map(); % shared by the passes after the first, see memo_fetch
+  converged = 0;
+  err = Inf;
+  while 1
+    f_new = band_frequencies(x_new, band);
+    if N == 2
+      VBR_pass = VBR_base;
+      VBR_pass.in.SV.f = f_new;
+      VBR_pass = VBR_spine(VBR_pass);
+      VBR_first = VBR_pass;
+      telapsed = VBR_pass.out.computation_time;
+    elseif use_chunks
+      VBR_pass = VBR_base;
+      VBR_pass.in.SV.f = f_new;
+      VBR_pass = VBR_spine(VBR_pass);
+      telapsed = add_anelastic_time(telapsed, VBR_pass.out.computation_time.anelastic);
+    else
+      VBR_pass = VBR_first;
+      VBR_pass.in.SV.f = f_new;
+      VBR_pass.memo = memo;
+      VBR_pass.out = rmfield(VBR_pass.out, 'anelastic');
+      [VBR_pass, t_pass] = spineGeneralized(VBR_pass, 'anelastic');
+      telapsed = add_anelastic_time(telapsed, t_pass);
+    end
+    if VBR_pass.status == 0
+      VBR.status = 0;
+      VBR.error_message = VBR_pass.error_message;
+      return
+    end
+
+    if N == 2
+      [anelastic, shapes] = collect_frequencies(struct(), struct(), ...
+          VBR_pass.out.anelastic, state_dims, numel(f_new), 1);
+      f_nodes = f_new;
+    else
+      anelastic = collect_frequencies(anelastic, shapes, ...
+          VBR_pass.out.anelastic, state_dims, numel(f_new), 0);
+      f_nodes = [f_nodes, f_new];
+    end
+
+    weights = cc_weights(N);
+    weights = weights(j_nodes + 1) / 2;
+    aves = band_averages(anelastic, weights);
+    if N > 2
+      err = max_relative_change(aves, aves_old);
+      converged = err <= band.tol;
+    end
+    if converged || 2 * N + 1 > band.max_nodes
+      break
+    end
+
+    % the next pass adds the midpoints of the current intervals
+    aves_old = aves;
+    N = 2 * N;
+    j_nodes = 2 * j_nodes;
+    x_new = cos(pi * (1:2:N-1)' / N);
+    j_nodes = [j_nodes; (1:2:N-1)'];
+  end
+
+  % sort by frequency and restore the output shapes
+  [f_nodes, order] = sort(f_nodes);
+  weights = weights(order);
+  anelastic = restore_shapes(anelastic, shapes, order);
+  meths = fieldnames(anelastic);
+  for i_meth = 1:numel(meths)
+    meth = meths{i_meth};
+    flds = {'V', 'Vave'; 'Q', 'Qave'; 'Qinv', 'Qinvave'};
+    for ifld = 1:size(flds, 1)
+      if isfield(anelastic.(meth), flds{ifld, 1})
+        anelastic.(meth).(flds{ifld, 2}) = Q_aveVoverf(anelastic.(meth).(flds{ifld, 1}), ...
+                                                      f_nodes, weights);
+      end
+    end
+    if isfield(anelastic.(meth), 'units')
+      anelastic.(meth).units.Qave = '';
+      anelastic.(meth).units.Qinvave = '';
+    end
+  end
+
+  VBR.in = restore_band_inputs(VBR_first.in, VBR.in);
+  VBR.out = VBR_first.out;
+  VBR.out.anelastic = anelastic;
+  VBR.out.computation_time = telapsed;
+  VBR.out.band = struct();
+  VBR.out.band.f = f_nodes;
+  VBR.out.band.weights = weights(:)';
+  VBR.out.band.n_nodes = numel(f_nodes);
+  VBR.out.band.error_estimate = err;
+  VBR.out.band.converged = converged;
+  if ~converged
+    warning(['VBR.in.band: band average not converged to tol=', num2str(band.tol), ...
+             ' with ', num2str(numel(f_nodes)), ' frequencies, error estimate ', num2str(err)])
+  end
+end
+
+
+function f = band_frequencies(x, band)
+  % map the quadrature nodes, -1 <= x <= 1, to frequency
+  if strcmp(band.spacing, 'log')
+    lims = log10(band.f_range);
+    f = 10.^((lims(1) + lims(2)) / 2 + (lims(2) - lims(1)) / 2 * x(:)');
+  else
+    lims = band.f_range;
+    f = (lims(1) + lims(2)) / 2 + (lims(2) - lims(1)) / 2 * x(:)';
+  end
+end
+
+
+function w = cc_weights(N)
+  % Clenshaw-Curtis weights on [-1, 1] for the nodes cos(pi * j / N),
+  % j = 0, ..., N (N even)
+  j = (0:N)';
+  k = 1:N/2;
+  b = 2 * ones(1, N/2);
+  b(end) = 1;
+  c = 2 * ones(N + 1, 1);
+  c([1, end]) = 1;
+  w = c / N .* (1 - cos(2 * pi * j * k / N) * (b ./ (4 * k.^2 - 1))');
+end
+
+
+function SV_size = get_SV_size(SV)
+  % size of the largest state variable array (frequency excluded)
+  fields = fieldnames(SV);
+  SV_size = [1, 1];
+  for ifield = 1:numel(fields)
+    val = SV.(fields{ifield});
+    if ~strcmp(fields{ifield}, 'f') && (isnumeric(val) || islogical(val)) ...
+        && numel(val) > prod(SV_size)
+      SV_size = size(val);
+    end
+  end
+end
+
+
+function [out, shapes] = collect_frequencies(out, shapes, new, state_dims, n_freq, is_first)
+  % appends the frequency-dependent outputs of a pass, stored as
+  % (n_states, frequency) arrays with their state dimensions recorded in
+  % shapes. An output is frequency-dependent if its size is
+  % [state_dims, n_freq]. Other outputs are taken from the first pass.
+  n_states = prod(state_dims);
+  flds = fieldnames(new);
+  for ifld = 1:numel(flds)
+    fld = flds{ifld};
+    val = new.(fld);
+    if isstruct(val) && numel(val) == 1
+      if is_first
+        out.(fld) = struct();
+        shapes.(fld) = struct();
+      end
+      if isfield(shapes, fld) && isstruct(shapes.(fld))
+        [out.(fld), shapes.(fld)] = collect_frequencies(out.(fld), shapes.(fld), ...
+                                                        val, state_dims, n_freq, is_first);
+      end
+    elseif varies_by_frequency(val, state_dims, n_freq)
+      if is_first
+        sz = size(val);
+        shapes.(fld) = sz(1:end-1);
+        out.(fld) = reshape(val, n_states, n_freq);
+      elseif isfield(shapes, fld) && ~isstruct(shapes.(fld))
+        out.(fld) = [out.(fld), reshape(val, n_states, n_freq)];
+      end
+    elseif is_first
+      out.(fld) = val;
+    end
+  end
+end
+
+
+function is_freq = varies_by_frequency(val, state_dims, n_freq)
+  % true for numeric arrays of size [state_dims, n_freq]
+  is_freq = (isnumeric(val) || islogical(val)) && isequal(size(val), [state_dims, n_freq]);
+end
+
+
+function out = restore_shapes(out, shapes, order)
+  % reorders the frequencies and reshapes to the state variable shape, with
+  % frequency appended as in proc_add_freq_indeces
+  flds = fieldnames(shapes);
+  for ifld = 1:numel(flds)
+    fld = flds{ifld};
+    if isstruct(shapes.(fld))
+      out.(fld) = restore_shapes(out.(fld), shapes.(fld), order);
+    else
+      out.(fld) = reshape(out.(fld)(:, order), [shapes.(fld), numel(order)]);
+    end
+  end
+end
+
+
+function aves = band_averages(anelastic, weights)
+  % the band averages of V and Qinv of each method, (n_states, 1) arrays
+  aves = struct();
+  meths = fieldnames(anelastic);
+  for i_meth = 1:numel(meths)
+    meth = meths{i_meth};
+    flds = {'V'; 'Qinv'};
+    for ifld = 1:numel(flds)
+      fld = flds{ifld};
+      if isstruct(anelastic.(meth)) && isfield(anelastic.(meth), fld)
+        aves.([meth, '_', fld]) = double(anelastic.(meth).(fld)) * weights(:);
+      end
+    end
+  end
+end
+
+
+function err = max_relative_change(aves, aves_old)
+  err = 0;
+  flds = fieldnames(aves);
+  for ifld = 1:numel(flds)
+    new = aves.(flds{ifld});
+    old = aves_old.(flds{ifld});
+    rel = abs(new - old) ./ max(abs(old), realmin);
+    rel = rel(~isnan(rel));
+    if numel(rel) > 0
+      err = max(err, max(rel));
+    end
+  end
+end
+
+
+function total = add_anelastic_time(total, telapsed)
+  % add the elapsed times of the anelastic methods of a pass
+  flds = fieldnames(telapsed);
+  for ifld = 1:numel(flds)
+    fld = flds{ifld};
+    total.anelastic.(fld) = total.anelastic.(fld) + telapsed.(fld);
+  end
+end
+
+
+function in = restore_band_inputs(pass_in, in)
+  % the inputs of the first pass (with the method parameters loaded), with
+  % the user-set frequencies and the band, caching, chunking and output policy
+  % settings
+  flds = {'band'; 'cache'; 'chunks'; 'output'};
+  SV = in.SV;
+  user_in = in;
+  in = pass_in;
+  in.SV = SV;
+  for ifld = 1:numel(flds)
+    if isfield(user_in, flds{ifld})
+      in.(flds{ifld}) = user_in.(flds{ifld});
+    end
+  end
+end
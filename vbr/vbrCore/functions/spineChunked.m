@@ -0,0 +1,277 @@
+function VBR = spineChunked(VBR)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% VBR = spineChunked(VBR)
+%
+% chunked execution of VBR_spine: the state variable arrays are split into
+% chunks of VBR.in.chunks.size states, VBR_spine is called for each chunk and
+% the outputs are stitched back together into the full VBR.out, with the same
+% shape as the unchunked calculation. This limits the memory used by the
+% intermediate arrays of the methods to that of a single chunk.
+%
+% If VBR.in.chunks.dir is set, the output of each chunk is instead saved to
+% disk with VBR_save (as vbr_chunk_000001.mat, etc.) and not kept in memory.
+% Each file includes the chunk's state variables and chunk_index, the linear
+% indices of the chunk's states in the full state variable arrays. The
+% filenames are stored in VBR.out.chunk_files.
+%
+% Input:
+%  VBR: The VBR structure, with VBR.in.chunks.size set
+%
+% Ouput:
+%  VBR: The VBR structure with the calculations attached
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  chunks = VBR.in.chunks;
+  if ~isfield(chunks, 'size') || chunks.size < 2
+    error('VBR.in.chunks.size must be set to at least 2 states per chunk')
+  end
+  stream_to_disk = isfield(chunks, 'dir');
+  if stream_to_disk && exist(chunks.dir, 'dir') == 0
+    mkdir(chunks.dir);
+  end
+
+  % the chunks run without the chunking and caching settings
+  VBR_base = VBR;
+  VBR_base.in = rmfield(VBR_base.in, 'chunks');
+  if isfield(VBR_base.in, 'cache')
+    VBR_base.in = rmfield(VBR_base.in, 'cache');
+  end
+  if isfield(VBR_base, 'out')
+    VBR_base = rmfield(VBR_base, 'out');
+  end
+
+  % chunk boundaries, a remainder of a single state joins the last chunk
+  SV_size = get_SV_size(VBR.in.SV);
+  n_states = prod(SV_size);
+  chunk_starts = 1:chunks.size:n_states;
+  if numel(chunk_starts) > 1 && chunk_starts(end) == n_states
+    chunk_starts = chunk_starts(1:end-1);
+  end
+  chunk_ends = [chunk_starts(2:end) - 1, n_states];
+  n_chunks = numel(chunk_starts);
+
+  out = struct();
+  shapes = struct();
+  telapsed = struct();
+  profile = struct();
+  chunk_files = cell(n_chunks, 1);
+  for i_chunk = 1:n_chunks
+    idx = (chunk_starts(i_chunk):chunk_ends(i_chunk))';
+    VBR_chunk = VBR_base;
+    VBR_chunk.in = slice_inputs(VBR_base.in, idx, SV_size);
+    VBR_chunk = VBR_spine(VBR_chunk);
+    if VBR_chunk.status == 0
+      VBR.status = 0;
+      VBR.error_message = VBR_chunk.error_message;
+      return
+    end
+
+    telapsed = add_times(telapsed, VBR_chunk.out.computation_time);
+    if isfield(VBR_chunk.out, 'profile')
+      profile = add_profile(profile, VBR_chunk.out.profile, i_chunk == 1);
+      VBR_chunk.out = rmfield(VBR_chunk.out, 'profile');
+    end
+    if i_chunk == 1
+      VBR.in = restore_method_params(VBR.in, VBR_chunk.in);
+    end
+
+    if stream_to_disk
+      VBR_chunk.chunk_index = idx;
+      chunk_files{i_chunk} = fullfile(chunks.dir, sprintf('vbr_chunk_%06d.mat', i_chunk));
+      VBR_save(VBR_chunk, chunk_files{i_chunk});
+    else
+      chunk_out = rmfield(VBR_chunk.out, 'computation_time');
+      state_dims = get_SV_size(VBR_chunk.in.SV);
+      state_dims = state_dims(1:find(state_dims > 1, 1, 'last'));
+      [out, shapes] = stitch_output(out, shapes, chunk_out, idx, state_dims, n_states, i_chunk == 1);
+    end
+  end
+
+  if stream_to_disk
+    VBR.out = struct();
+    VBR.out.chunk_files = chunk_files;
+  else
+    VBR.out = reshape_output(out, shapes, SV_size);
+  end
+  VBR.out.computation_time = telapsed;
+  if numel(fieldnames(profile)) > 0
+    VBR.out.profile = profile;
+  end
+end
+
+
+function SV_size = get_SV_size(SV)
+  % size of the largest state variable array (frequency excluded)
+  fields = fieldnames(SV);
+  SV_size = [1, 1];
+  for ifield = 1:numel(fields)
+    val = SV.(fields{ifield});
+    if ~strcmp(fields{ifield}, 'f') && (isnumeric(val) || islogical(val)) ...
+        && numel(val) > prod(SV_size)
+      SV_size = size(val);
+    end
+  end
+end
+
+
+function in = slice_inputs(in, idx, SV_size)
+  % select the states of a chunk (as column vectors) from the state variables
+  % and from the other inputs that vary by state
+  flds = fieldnames(in.SV);
+  for ifld = 1:numel(flds)
+    if ~strcmp(flds{ifld}, 'f')
+      in.SV.(flds{ifld}) = slice_array(in.SV.(flds{ifld}), idx, SV_size);
+    end
+  end
+
+  if isfield(in, 'elastic')
+    flds = {'Gu_TP'; 'Ku_TP'};
+    for ifld = 1:numel(flds)
+      if isfield(in.elastic, flds{ifld})
+        in.elastic.(flds{ifld}) = slice_array(in.elastic.(flds{ifld}), idx, SV_size);
+      end
+    end
+  end
+
+  if isfield(in, 'anelastic')
+    flds = fieldnames(in.anelastic);
+    for ifld = 1:numel(flds)
+      meth_params = in.anelastic.(flds{ifld});
+      if isstruct(meth_params) && isfield(meth_params, 'eta_ss')
+        in.anelastic.(flds{ifld}).eta_ss = slice_array(meth_params.eta_ss, idx, SV_size);
+      end
+    end
+  end
+end
+
+
+function val = slice_array(val, idx, SV_size)
+  if (isnumeric(val) || islogical(val)) && isequal(size(val), SV_size)
+    val = val(idx);
+    val = val(:);
+  end
+end
+
+
+function in = restore_method_params(in, chunk_in)
+  % copy the method parameters loaded while running a chunk, keeping the
+  % (unsliced) user-set values
+  properties = {'elastic'; 'viscous'; 'anelastic'};
+  for iprop = 1:numel(properties)
+    property = properties{iprop};
+    if isfield(chunk_in, property) && isfield(chunk_in.(property), 'methods_list')
+      methods_list = chunk_in.(property).methods_list;
+      for i_method = 1:numel(methods_list)
+        meth = methods_list{i_method};
+        if isfield(chunk_in.(property), meth)
+          meth_params = chunk_in.(property).(meth);
+          if isfield(in, property) && isfield(in.(property), meth)
+            meth_params = nested_structure_update(meth_params, in.(property).(meth));
+          end
+          in.(property).(meth) = meth_params;
+        end
+      end
+      in.(property).methods_list = methods_list;
+    end
+  end
+end
+
+
+function total = add_times(total, telapsed)
+  % sum the elapsed times of the chunks
+  flds = fieldnames(telapsed);
+  for ifld = 1:numel(flds)
+    fld = flds{ifld};
+    if isstruct(telapsed.(fld))
+      if ~isfield(total, fld)
+        total.(fld) = struct();
+      end
+      total.(fld) = add_times(total.(fld), telapsed.(fld));
+    elseif isfield(total, fld)
+      total.(fld) = total.(fld) + telapsed.(fld);
+    else
+      total.(fld) = telapsed.(fld);
+    end
+  end
+end
+
+
+function total = add_profile(total, profile, is_first)
+  % combine the method profiles of the chunks (see record_method_profile):
+  % times, states and output sizes are summed
+  if is_first
+    total = profile;
+    return
+  end
+  flds = {'wall_time_s'; 'n_states'; 'n_evaluations'; 'output_bytes'};
+  for ifld = 1:numel(flds)
+    total.(flds{ifld}) = total.(flds{ifld}) + profile.(flds{ifld});
+  end
+end
+
+
+function [out, shapes] = stitch_output(out, shapes, chunk_out, idx, state_dims, n_states, is_first)
+  % copies the output of a chunk into the full output. Arrays that vary by
+  % state are those whose leading dimensions are the chunk's state variable
+  % size (state_dims, trailing singleton dimensions removed), decided from the
+  % first chunk. They are stored as (n_states, remaining dimensions) arrays,
+  % with their trailing dimensions recorded in shapes. Other outputs are taken
+  % from the first chunk.
+  n_chunk = numel(idx);
+  flds = fieldnames(chunk_out);
+  for ifld = 1:numel(flds)
+    fld = flds{ifld};
+    val = chunk_out.(fld);
+    if isstruct(val) && numel(val) == 1
+      if is_first
+        out.(fld) = struct();
+        shapes.(fld) = struct();
+      end
+      [out.(fld), shapes.(fld)] = stitch_output(out.(fld), shapes.(fld), val, idx, ...
+                                                state_dims, n_states, is_first);
+    elseif is_first && n_chunk > 1 && varies_by_state(val, state_dims)
+      sz = size(val);
+      val = reshape(val, n_chunk, []);
+      out.(fld) = repmat(val(1), n_states, size(val, 2));
+      out.(fld)(idx, :) = val;
+      shapes.(fld) = sz(numel(state_dims)+1:end);
+    elseif isfield(shapes, fld)
+      if ~varies_by_state(val, state_dims)
+        error(['spineChunked: the output ', fld, ' does not have the ', ...
+               'state variable size in every chunk'])
+      end
+      out.(fld)(idx, :) = reshape(val, n_chunk, []);
+    elseif is_first
+      out.(fld) = val;
+    end
+  end
+end
+
+
+function is_state = varies_by_state(val, state_dims)
+  % true for numeric arrays whose leading dimensions are state_dims
+  sz = size(val);
+  is_state = (isnumeric(val) || islogical(val)) && numel(sz) >= numel(state_dims) ...
+             && isequal(sz(1:numel(state_dims)), state_dims);
+end
+
+
+function out = reshape_output(out, shapes, SV_size)
+  % reshape the stitched arrays to the state variable shape, with any extra
+  % dimensions (e.g., frequency) appended as in proc_add_freq_indeces
+  flds = fieldnames(shapes);
+  for ifld = 1:numel(flds)
+    fld = flds{ifld};
+    if isstruct(shapes.(fld))
+      out.(fld) = reshape_output(out.(fld), shapes.(fld), SV_size);
+    elseif all(shapes.(fld) == 1)
+      out.(fld) = reshape(out.(fld), SV_size);
+    else
+      sz = SV_size;
+      if sz(end) == 1
+        sz = sz(1:end-1);
+      end
+      out.(fld) = reshape(out.(fld), [sz, shapes.(fld)]);
+    end
+  end
+end
@@ -8,6 +8,11 @@ function [VBR,telapsed]=spineGeneralized(VBR,property)
 %  VBR: The VBR structure
 %  property: the property string ('anelastic','elastic','viscous')
 %
+% Intermediate quantities shared between methods (e.g., the unrelaxed
+% compliance, maxwell times and melt enhancement factors) and the default
+% parameters are calculated once per VBR_spine call and stored in VBR.memo,
+% see memo_fetch.
+%
 % Ouput:
 %  VBR: The VBR structure with new calculations attached
 %  telapsed: elapised time structure with field for each method called
@@ -15,12 +20,13 @@ function [VBR,telapsed]=spineGeneralized(VBR,property)
 
   % set the parameter function, load empty parameters and allowed methods
   param_func=fetchParamFunction(property);
-  empty_params=feval(param_func,'');
+  empty_params=memo_fetch(VBR,['params:',property,':'],param_func,'');
   possible_methods=empty_params.possible_methods; % list of allowed methods
 
   % loop over methods set by user
   methods_list=VBR.in.(property).methods_list; % list of methods to use
   telapsed=struct(); % stores elapsed time for each method
+  profiling = isfield(VBR.in.GlobalSettings,'profile') && VBR.in.GlobalSettings.profile;
 
   for i_method = 1:numel(methods_list)
     meth=methods_list{i_method}; % the current method
@@ -28,6 +34,9 @@ function [VBR,telapsed]=spineGeneralized(VBR,property)
       telapsed.(meth)=tic;
       VBR = loadThenCallMethod(VBR,property,meth);
       telapsed.(meth)=toc(telapsed.(meth));
+      if profiling
+        VBR = record_method_profile(VBR,property,meth,telapsed.(meth));
+      end
     else
       disp('')
       disp('WARNING!!!!!')
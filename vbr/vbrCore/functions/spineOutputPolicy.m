@@ -0,0 +1,82 @@
+function VBR = spineOutputPolicy(VBR)
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+% VBR = spineOutputPolicy(VBR)
+%
+% reduces the memory and storage footprint of the method outputs
+% (VBR.out.elastic, VBR.out.viscous and VBR.out.anelastic) following the
+% output policy in VBR.in.output. In order, the policy
+%   1. keeps only the fields in VBR.in.output.keep
+%   2. drops the anelastic outputs that can be recalculated from the kept
+%      outputs (VBR.in.output.drop_derived): Q (from Qinv) and M (from J1 and
+%      J2), see VBR_restore_derived
+%   3. stores the fields in VBR.in.output.single in single precision
+% The units of each method are always kept. Other VBR.out fields (e.g.,
+% computation_time) are not changed.
+%
+% Input:
+%  VBR: The VBR structure after the calculations, with VBR.in.output set
+%
+% Ouput:
+%  VBR: The VBR structure with the reduced outputs
+%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+
+  defaults.keep = 'all';
+  defaults.single = {};
+  defaults.drop_derived = 0;
+  policy = nested_structure_update(defaults, VBR.in.output);
+  policy.keep = field_list(policy.keep, 'keep');
+  policy.single = field_list(policy.single, 'single');
+
+  properties = {'elastic'; 'viscous'; 'anelastic'};
+  for iprop = 1:numel(properties)
+    property = properties{iprop};
+    if isfield(VBR, 'out') && isfield(VBR.out, property)
+      meths = fieldnames(VBR.out.(property));
+      for i_meth = 1:numel(meths)
+        meth = meths{i_meth};
+        if isstruct(VBR.out.(property).(meth))
+          VBR.out.(property).(meth) = apply_policy(VBR.out.(property).(meth), ...
+                                                   policy, strcmp(property, 'anelastic'));
+        end
+      end
+    end
+  end
+end
+
+
+function flds = field_list(flds, option_name)
+  % a cell array of field names, or 'all'
+  if ischar(flds) && strcmp(flds, 'all')
+    return
+  elseif ischar(flds)
+    flds = {flds};
+  elseif ~iscell(flds)
+    error(['VBR.in.output.', option_name, ' must be ''all'' or a cell array of field names'])
+  end
+end
+
+
+function out = apply_policy(out, policy, is_anelastic)
+  flds = fieldnames(out);
+  if iscell(policy.keep)
+    drop = flds(~ismember(flds, [policy.keep(:); {'units'}]));
+    out = rmfield(out, drop);
+  end
+
+  if policy.drop_derived && is_anelastic
+    if isfield(out, 'Q') && isfield(out, 'Qinv')
+      out = rmfield(out, 'Q');
+    end
+    if isfield(out, 'M') && isfield(out, 'J1') && isfield(out, 'J2')
+      out = rmfield(out, 'M');
+    end
+  end
+
+  flds = fieldnames(out);
+  for ifld = 1:numel(flds)
+    fld = flds{ifld};
+    if isfloat(out.(fld)) && (~iscell(policy.single) || any(strcmp(fld, policy.single)))
+      out.(fld) = single(out.(fld));
+    end
+  end
+end
@@ -28,12 +28,14 @@ function params = Params_Anelastic(method,GlobalParams)
                       'Jackson and Faul, 2010, Phys. Earth Planet. Inter., https://doi.org/10.1016/j.pepi.2010.09.005'};
     params.method='PointWise'; % 'FastBurger' uses look-up table for integration, only works for high temp background
                                % 'PointWise' integrates every frequency and state variable condition
-    params.nTauGlob=3000; % points for global Tau discretization ('FastBurger' ONLY)
+    params.nTauGlob=3000; % points in the w*Tau look-up table ('FastBurger' ONLY)
+    params.lut_cache_dir=''; % if set, directory to save and load the 'FastBurger' look-up tables
     params.R = 8.314 ; % gas constant
     params.eBurgerFit='bg_only'; % 'bg_only' or 'bg_peak' or 's6585_bg_only'
     params.useJF10visc=1; % if 1, will use the scaling from JF10 for maxwell time. If 0, will calculate
-    params.integration_method=0; % 0 for trapezoidal, 1 for quadrature.
-    params.tau_integration_points = 500 ; % number of points for integration of high-T background if trapezoidal
+    params.integration_method=0; % 0 for trapezoidal, 1 for quadl, 2 for quadgk, 3 for batched (all states and frequencies at once)
+    params.tau_integration_points = 500 ; % number of points for integration of high-T background if trapezoidal or batched
+    params.integration_block_size = 5000 ; % number of state-frequency pairs integrated at once if batched
     params=load_JF10_eBurger_params(params);
   end
 
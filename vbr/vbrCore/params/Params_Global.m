@@ -18,6 +18,7 @@ function params = Params_Global()
 
   % flags
   params.melt_enhancement=0; % turns melt enhacement on/off
+  params.profile=0; % if 1, records per-method timing and memory in VBR.out.profile
 
   % melt enhancement factors
   params.phi_c = [1e-5 1e-5 1e-5]; % [diff, disl., gbs]